@@ -4,13 +4,110 @@ from baf.core.property import Property
 
 CHECK_TRANSITIONS_DELAY = Property('agent.check_transitions_delay', float, 1.0)
 """
-An agent evaluates periodically all the transitions from the current state to check if someone is satisfied.
+Transitions are evaluated when the session receives an event, when a session variable that a transition condition
+depends on changes, or when a session timer expires. Conditions whose variables are unknown (i.e., arbitrary condition
+functions) can additionally be evaluated periodically, if ``agent.check_transitions_polling`` is enabled.
 
-This property sets the delay between each transitions evaluation, in seconds.
+This property sets the delay between each periodic transitions evaluation, in seconds.
 
-name: ``agent.check_transitions.delay``
+name: ``agent.check_transitions_delay``
 
 type: ``float``
 
 default value: ``1``
-"""
\ No newline at end of file
+"""
+
+CHECK_TRANSITIONS_POLLING = Property('agent.check_transitions_polling', bool, False)
+"""
+Whether the transitions of a state with arbitrary condition functions (i.e., conditions that do not declare the session
+variables they depend on, like time-based conditions) are evaluated periodically, every
+``agent.check_transitions_delay`` seconds, while the session is in that state.
+
+States whose transitions only depend on events and declared session variables are never polled.
+
+name: ``agent.check_transitions_polling``
+
+type: ``bool``
+
+default value: ``False``
+"""
+
+AGENT_SCHEDULER = Property('agent.scheduler.type', str, 'thread_per_session')
+"""
+The session scheduler of the agent, which decides where the events of each user session are processed. Allowed values
+are:
+
+- ``thread_per_session``: each session runs its own event loop in a dedicated thread.
+- ``shared_loops``: all sessions are multiplexed onto a fixed pool of event loops (see ``agent.scheduler.workers``).
+  The events of a session are still processed in order, but a blocking state body delays the other sessions sharing its
+  event loop.
+
+name: ``agent.scheduler.type``
+
+type: ``str``
+
+default value: ``thread_per_session``
+"""
+
+AGENT_SCHEDULER_WORKERS = Property('agent.scheduler.workers', int, 4)
+"""
+The number of shared event loops (each one running in its own thread) when the ``shared_loops`` session scheduler is
+used.
+
+name: ``agent.scheduler.workers``
+
+type: ``int``
+
+default value: ``4``
+"""
+
+AGENT_SESSIONS_IDLE_TTL = Property('agent.sessions.idle_ttl', float, 0.0)
+"""
+The time (in seconds) after which an idle session (i.e., a session that has not received any event) is hibernated: it
+is removed from memory and saved into the session snapshot store (see ``agent.sessions.snapshot_path``). The session is
+transparently restored when it receives a new event. 0 disables the hibernation of idle sessions.
+
+name: ``agent.sessions.idle_ttl``
+
+type: ``float``
+
+default value: ``0``
+"""
+
+AGENT_SESSIONS_MAX_RESIDENT = Property('agent.sessions.max_resident', int, 0)
+"""
+The maximum number of sessions kept in memory. When there are more sessions, the least recently used ones are
+hibernated. 0 means no limit.
+
+name: ``agent.sessions.max_resident``
+
+type: ``int``
+
+default value: ``0``
+"""
+
+AGENT_SESSIONS_SNAPSHOT_PATH = Property('agent.sessions.snapshot_path', str, 'session_snapshots.db')
+"""
+The path of the SQLite database file where the hibernated sessions are stored. When the agent stops, the snapshots
+are discarded, except those of the sessions with pending events, which are restored in the next run. Use ``:memory:``
+to keep the snapshots in memory (the pending events are then discarded when the agent stops).
+
+name: ``agent.sessions.snapshot_path``
+
+type: ``str``
+
+default value: ``session_snapshots.db``
+"""
+
+AGENT_CHAT_HISTORY_BUFFER_SIZE = Property('agent.chat_history.buffer_size', int, 100)
+"""
+The number of recent messages of each session kept in memory, to get the chat history of the session (e.g. the context
+of an LLM) without reading the monitoring database. Older messages are read from the monitoring database. 0 disables
+the in-memory chat history.
+
+name: ``agent.chat_history.buffer_size``
+
+type: ``int``
+
+default value: ``100``
+"""
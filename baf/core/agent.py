@@ -2,23 +2,30 @@ import asyncio
 import json
 import operator
 import threading
+from contextlib import nullcontext
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Callable, get_type_hints
+from typing import Any, Callable, ContextManager
 
 import yaml
 
+from baf import AGENT_SCHEDULER, AGENT_SCHEDULER_WORKERS, AGENT_SESSIONS_IDLE_TTL, AGENT_SESSIONS_MAX_RESIDENT, \
+    AGENT_SESSIONS_SNAPSHOT_PATH
 from baf.core.transition.event import Event
 from baf.core.message import Message, MessageType
 from baf.core.entity.entity import Entity
+from baf.core.hibernation import SessionHibernator, SessionSnapshotStore
 from baf.core.intent.intent import Intent
 from baf.core.intent.intent_parameter import IntentParameter
 from baf.core.property import Property
 from baf.core.processors.processor import Processor
+from baf.core.scheduler import SessionScheduler, SharedLoopScheduler, ThreadPerSessionScheduler
 from baf.core.session import Session
 from baf.core.state import State
 from baf.core.transition.transition import Transition
-from baf.db import DB_MONITORING
+from baf.db import DB_MONITORING, DB_MONITORING_WRITE_QUEUE_SIZE, DB_MONITORING_WRITE_BATCH_SIZE, \
+    DB_MONITORING_WRITE_BATCH_MAX_WAIT, DB_MONITORING_PARTITION_INTERVAL, DB_MONITORING_RETENTION_DAYS, \
+    DB_MONITORING_FILE_STORAGE, DB_MONITORING_FILES_PATH
 from baf.db.db_handler import DBHandler
 from baf.db.monitoring_db import MonitoringDB
 from baf.exceptions.exceptions import AgentNotTrainedError, DuplicatedEntityError, DuplicatedInitialStateError, \
@@ -56,6 +63,10 @@ class Agent:
         _default_ic_config (IntentClassifierConfiguration): the intent classifier configuration used by default for the
             agent states
         _sessions (dict[str, Session]): The agent sessions
+        _scheduler (SessionScheduler or None): The scheduler assigning an event loop to each agent session. If none is
+            set, it is created from the agent properties when the first session starts
+        _hibernator (SessionHibernator or None): The component that hibernates idle sessions. It is created from the
+            agent properties when the first session starts, if session hibernation is enabled
         _trained (bool): Whether the agent has been trained or not. It must be trained before it starts its execution.
         _monitoring_db (MonitoringDB): The monitoring component of the agent that communicates with a database to store
             usage information for later visualization or analysis
@@ -66,6 +77,9 @@ class Agent:
         global_state_component (dict[State, list[State]]): Dictionary of global state components, where key is initial
             global state and values is set of states in corresponding global component
         processors (list[Processors]): List of processors used by the agent
+        _processor_pipelines (dict[tuple[type, bool or None], list[Processor]]): Cache of the processors to run on each
+            message type and direction (see :meth:`_get_processors`)
+        _processor_pipelines_key (tuple[Processor, ...]): The processors when the pipelines were cached
     """
 
     def __init__(
@@ -83,6 +97,8 @@ class Agent:
         self._config: dict[str, Any] = {}
         self._default_ic_config: IntentClassifierConfiguration = SimpleIntentClassifierConfiguration()
         self._sessions: dict[str, Session] = {}
+        self._scheduler: SessionScheduler | None = None
+        self._hibernator: SessionHibernator | None = None
         self._trained: bool = False
         self._monitoring_db: MonitoringDB = None
         self._db_handler: DBHandler | None = None
@@ -92,6 +108,8 @@ class Agent:
         self.global_initial_states: list[tuple[State, Intent]] = []
         self.global_state_component: dict[State, list[State]] = dict()
         self.processors: list[Processor] = []
+        self._processor_pipelines: dict[tuple[type, bool or None], list[Processor]] = {}
+        self._processor_pipelines_key: tuple[Processor, ...] = ()
         self._user_profiles: Any = None
         self._agent_configurations: dict[str, Any] = {}
 
@@ -116,6 +134,61 @@ class Agent:
         """dict[str, Any]: The agent configuration parameters."""
         return self._config
 
+    @property
+    def scheduler(self) -> SessionScheduler:
+        """SessionScheduler: The scheduler assigning an event loop to each agent session.
+
+        If no scheduler has been set with :meth:`set_scheduler`, it is created from the ``agent.scheduler.*``
+        properties the first time it is needed.
+        """
+        if self._scheduler is None:
+            scheduler_type = self.get_property(AGENT_SCHEDULER)
+            if scheduler_type == 'thread_per_session':
+                self._scheduler = ThreadPerSessionScheduler(self)
+            elif scheduler_type == 'shared_loops':
+                self._scheduler = SharedLoopScheduler(self, self.get_property(AGENT_SCHEDULER_WORKERS))
+            else:
+                raise ValueError(f"Invalid value for the agent property '{AGENT_SCHEDULER.name}': {scheduler_type}. "
+                                 f"Allowed values are: [thread_per_session, shared_loops]")
+        return self._scheduler
+
+    def set_scheduler(self, scheduler: SessionScheduler) -> None:
+        """Set the scheduler assigning an event loop to each agent session.
+
+        It must be set before any session is created.
+
+        Args:
+            scheduler (SessionScheduler): the session scheduler
+        """
+        if self._sessions:
+            raise RuntimeError(f"Cannot change the session scheduler of agent '{self._name}' while it has active "
+                               f"sessions")
+        self._scheduler = scheduler
+
+    @property
+    def hibernator(self) -> SessionHibernator | None:
+        """SessionHibernator or None: The component that hibernates idle sessions, or None if session hibernation is
+        disabled.
+
+        It is created from the ``agent.sessions.*`` properties the first time it is needed.
+        """
+        if self._hibernator is None:
+            idle_ttl = self.get_property(AGENT_SESSIONS_IDLE_TTL)
+            max_resident = self.get_property(AGENT_SESSIONS_MAX_RESIDENT)
+            if idle_ttl or max_resident:
+                store = SessionSnapshotStore(self.get_property(AGENT_SESSIONS_SNAPSHOT_PATH))
+                self._hibernator = SessionHibernator(self, store, idle_ttl, max_resident)
+        return self._hibernator
+
+    def _sessions_lock(self) -> ContextManager:
+        """Get the lock that protects the agent sessions from being hibernated while they are accessed.
+
+        Returns:
+            ContextManager: the lock, or a context manager that does nothing if session hibernation is disabled
+        """
+        hibernator = self.hibernator
+        return hibernator.lock if hibernator else nullcontext()
+
     def load_properties(self, path: str) -> None:
         """Read a properties file and store its properties in the agent configuration.
 
@@ -426,6 +499,14 @@ class Agent:
                                 var_name="prev_state", operation=operator.eq, target=state).go_to(state)
             self.global_initial_states.clear()
 
+    def _compile_transitions(self) -> None:
+        """Compile the transitions of all the agent states into dispatch tables.
+
+        See :meth:`baf.core.state.State.compile_transitions`.
+        """
+        for state in self.states:
+            state.compile_transitions()
+
     def _run_platforms(self) -> None:
         """Start the execution of the agent platforms"""
         for platform in self._platforms:
@@ -458,12 +539,23 @@ class Agent:
             self.train()
         if not self._trained:
             raise AgentNotTrainedError(self)
+        self._compile_transitions()
         if self.get_property(DB_MONITORING):
             if not self._monitoring_db:
                 self._monitoring_db = MonitoringDB()
             self._monitoring_db.connect_to_db(self)
             if self._monitoring_db.connected:
-                self._monitoring_db.initialize_db()
+                self._monitoring_db.initialize_db(
+                    partition_interval=self.get_property(DB_MONITORING_PARTITION_INTERVAL),
+                    retention_days=self.get_property(DB_MONITORING_RETENTION_DAYS),
+                    file_storage=self.get_property(DB_MONITORING_FILE_STORAGE),
+                    files_path=self.get_property(DB_MONITORING_FILES_PATH)
+                )
+                self._monitoring_db.start_writer(
+                    max_queue_size=self.get_property(DB_MONITORING_WRITE_QUEUE_SIZE),
+                    max_size=self.get_property(DB_MONITORING_WRITE_BATCH_SIZE),
+                    max_wait=self.get_property(DB_MONITORING_WRITE_BATCH_MAX_WAIT)
+                )
             if not self._monitoring_db.connected and self._persist_sessions:
                 logger.warning(f'Agent {self._name} persistence of sessions is enabled, but the monitoring database is not connected. Sessions will not be persisted.')
                 self._persist_sessions = False
@@ -490,6 +582,12 @@ class Agent:
 
         for session_id in list(self._sessions.keys()):
             self.close_session(session_id)
+        if self._hibernator is not None:
+            self._hibernator.stop()
+            # The sessions kept by the hibernator are restored by a new hibernator in the next run
+            self._hibernator = None
+        if self._scheduler is not None:
+            self._scheduler.stop()
 
     def reset(self, session_id: str) -> Session or None:
         """Reset the agent current state and memory for the specified session. Then, restart the agent again for this session.
@@ -500,15 +598,15 @@ class Agent:
         Returns:
             Session or None: the reset session, or None if the provided session_id does not exist
         """
-        if session_id not in self._sessions:
+        session = self._get_session(session_id)
+        if session is None:
             return None
         else:
-            session = self._sessions[session_id]
             self.delete_session(session_id)
-        self.get_or_create_session(session_id, session.platform)
+        session = self.get_or_create_session(session_id, session.platform)
         logger.info(f'{self._name} restarted by user {session_id}')
 
-        return self._sessions[session_id]
+        return session
 
     def receive_event(self, event: Event) -> None:
         """Receive an external event from a platform.
@@ -519,15 +617,27 @@ class Agent:
             event (Event): the received event
         """
         session: Session = None
+        hibernator = self.hibernator
         if event.is_broadcasted():
-            for session in self._sessions.values():
-                session.events.appendleft(event)
-                session._event_loop.call_soon_threadsafe(session.manage_transition)
+            with self._sessions_lock():
+                sessions = list(self._sessions.values())
+                for session in sessions:
+                    session.events.appendleft(event)
+                if hibernator:
+                    for session_id in hibernator.hibernated_sessions:
+                        hibernator.deliver(session_id, event)
+            for session in sessions:
+                session.call_manage_transition()
         else:
-            session = self._sessions[event.session_id]
-            session.events.appendleft(event)
+            with self._sessions_lock():
+                session = self._get_session(event.session_id)
+                if session is None:
+                    raise KeyError(event.session_id)
+                session.events.appendleft(event)
             session.call_manage_transition()
-        self._monitoring_db_insert_event(event)
+            if hibernator:
+                hibernator.enforce_limits()
+        self._monitoring_db_insert_event(event, None if event.is_broadcasted() else session)
         if isinstance(event, ReceiveMessageEvent):
             if isinstance(event, ReceiveJSONEvent):
                 t = MessageType.JSON
@@ -535,7 +645,7 @@ class Agent:
                 t = MessageType.STR
             session.save_message(Message(t=t, content=event.message, is_user=True, timestamp=datetime.now()))
         if isinstance(event, ReceiveFileEvent):
-            session.save_message(Message(t=MessageType.FILE, content=event.file.get_json_string(), is_user=True, timestamp=datetime.now()))
+            session.save_message(Message(t=MessageType.FILE, content=event.file, is_user=True, timestamp=datetime.now()))
 
         logger.info(f'Received event: {event.log()}')
 
@@ -554,13 +664,54 @@ class Agent:
         Returns:
             Any: the processed message
         """
-        for processor in self.processors:
-            method_return_type = get_type_hints(processor.process).get('return')
-            if method_return_type is not None and isinstance(message, method_return_type):
-                if (processor.agent_messages and not is_user_message) or (processor.user_messages and is_user_message):
-                    message = processor.process(session=session, message=message)
+        for processor in self._get_processors(message.__class__, is_user_message):
+            message = processor.process(session=session, message=message)
         return message
 
+    def _add_processor(self, processor: Processor) -> None:
+        """Register a processor in the agent. Called when the processor is created.
+
+        Args:
+            processor (Processor): the processor to register
+        """
+        self.processors.append(processor)
+        self._processor_pipelines.clear()
+        self._processor_pipelines_key = tuple(self.processors)
+
+    def _get_processors(self, message_class: type, is_user_message: bool or None) -> list[Processor]:
+        """Get the processors to run on a message, in registration order.
+
+        The processors are classified by message type and direction only once, the pipelines are cached until the
+        processors list changes (i.e., a processor is registered, or the list is modified directly).
+
+        Args:
+            message_class (type): the class of the message to process. For ``bytes`` (audio messages), the processors
+                whose ``message`` parameter is annotated as ``bytes`` are returned
+            is_user_message (bool or None): whether the message is a user message (True) or an agent message (False).
+                Ignored for audio messages
+
+        Returns:
+            list[Processor]: the processors to run
+        """
+        processors_key = tuple(self.processors)
+        if self._processor_pipelines_key != processors_key:
+            # The processors list was modified directly (e.g. a processor was removed, replaced or moved)
+            self._processor_pipelines.clear()
+            self._processor_pipelines_key = processors_key
+        key = (message_class, is_user_message)
+        pipeline = self._processor_pipelines.get(key)
+        if pipeline is None:
+            if message_class is bytes and is_user_message is None:
+                pipeline = [processor for processor in self.processors if processor.audio_messages]
+            else:
+                pipeline = [
+                    processor for processor in self.processors
+                    if processor.message_type is not None and issubclass(message_class, processor.message_type)
+                    and (processor.user_messages if is_user_message else processor.agent_messages)
+                ]
+            self._processor_pipelines[key] = pipeline
+        return pipeline
+
     def set_global_fallback_body(self, body: Callable[[Session], None]) -> None:
         """Set the fallback body for all agent states.
 
@@ -585,6 +736,7 @@ class Agent:
         if not self.initial_state():
             raise InitialStateNotFound(self)
         self._init_global_states()
+        self._compile_transitions()
         self._nlp_engine.initialize()
         logger.info(f'{self._name} training started')
         self._nlp_engine.train()
@@ -592,7 +744,7 @@ class Agent:
         self._trained = True
 
     def _get_session(self, session_id: str) -> Session or None:
-        """Get an agent session.
+        """Get an agent session, rehydrating it if it is hibernated.
 
         Args:
             session_id (str): the session id
@@ -600,10 +752,16 @@ class Agent:
         Returns:
             Session or None: the session, if exists, or None
         """
-        if session_id in self._sessions:
-            return self._sessions[session_id]
-        else:
-            return None
+        hibernator = self.hibernator
+        if hibernator is None:
+            return self._sessions.get(session_id)
+        with hibernator.lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = hibernator.rehydrate(session_id)
+            else:
+                hibernator.record_activity(session_id)
+            return session
 
     def _new_session(self, session_id: str, platform: Platform, username: str or None = None, session_name: str or None = None) -> Session:
         """Create a new session for the agent.
@@ -624,26 +782,39 @@ class Agent:
         session = Session(session_id, self, platform, username, session_name)
         self._sessions[session_id] = session
         if self._persist_sessions and self._monitoring_db_session_exists(session_id, platform):
-            dest_state = self._monitoring_db_get_last_state_of_session(session_id, platform)
-            if dest_state:
-                for state in self.states:
-                    if state.name == dest_state:
-                        session._current_state = state
-                        self._monitoring_db_load_session_variables(session)
-                        break
-
+            self._restore_session_from_monitoring_db(session)
         else:
-            self._monitoring_db_insert_session(session)
+            # A new session in the monitoring database has no previous messages, so all its chat history is in memory
+            session._chat_history_complete = self._monitoring_db_insert_session(session)
             session.current_state.run(session)
 
         # ADD LOOP TO CHECK TRANSITIONS HERE
         session._run_event_thread()
         return session
 
+    def _restore_session_from_monitoring_db(self, session: Session) -> None:
+        """Restore the last state and the variables of a session from the monitoring database.
+
+        Args:
+            session (Session): the session to restore
+        """
+        dest_state = self._monitoring_db_get_last_state_of_session(session.id, session.platform)
+        if dest_state:
+            for state in self.states:
+                if state.name == dest_state:
+                    session._current_state = state
+                    self._monitoring_db_load_session_variables(session)
+                    break
+
     def get_or_create_session(self, session_id: str, platform: Platform, username: str or None = None, session_name: str or None = None) -> Session:
         session = self._get_session(session_id)
         if session is None:
             session = self._new_session(session_id, platform, username, session_name)
+            hibernator = self.hibernator
+            if hibernator:
+                with hibernator.lock:
+                    hibernator.record_activity(session_id)
+                hibernator.enforce_limits()
         return session
 
     def close_session(self, session_id: str) -> None:
@@ -652,6 +823,10 @@ class Agent:
         Args:
             session_id (str): the session id
         """
+        if self._hibernator is not None:
+            self._hibernator.forget(session_id)
+            if session_id not in self._sessions:
+                return
         while self._sessions[session_id]._agent_connections:
             agent_connection = next(iter(self._sessions[session_id]._agent_connections.values()))
             agent_connection.close()
@@ -664,6 +839,10 @@ class Agent:
         Args:
             session_id (str): the session id
         """
+        if self._hibernator is not None:
+            # The session must be resident to delete its records from the monitoring database
+            self._get_session(session_id)
+            self._hibernator.forget(session_id)
         while self._sessions[session_id]._agent_connections:
             agent_connection = next(iter(self._sessions[session_id]._agent_connections.values()))
             agent_connection.close()
@@ -745,15 +924,19 @@ class Agent:
             self._db_handler = DBHandler(self)
         return self._db_handler
 
-    def _monitoring_db_insert_session(self, session: Session) -> None:
+    def _monitoring_db_insert_session(self, session: Session) -> bool:
         """Insert a session record into the monitoring database.
 
         Args:
             session (Session): the session of the current user
+
+        Returns:
+            bool: whether the session was inserted into the monitoring database or not
         """
         if self.get_property(DB_MONITORING) and self._monitoring_db.connected:
             # Not in thread since we must ensure it is added before running a state (the chat table needs the session)
-            self._monitoring_db.insert_session(session)
+            return self._monitoring_db.insert_session(session)
+        return False
 
     def _monitoring_db_session_exists(self, session_id: str, platform: Platform) -> bool:
         """
@@ -791,15 +974,18 @@ class Agent:
 
     def _monitoring_db_store_session_variables(
             self,
-            session: Session
+            session: Session,
+            variables: dict[str, str or None] or None = None
     ) -> None:
         """Store the session variables (private data dictionary) in the monitoring database.
 
         Args:
             session (Session): The session to store the variables for.
+            variables (dict[str, str or None] or None): The JSON-serialized value of the variables to store (None to
+                delete a variable). If None, all the session variables are stored.
         """
         if self.get_property(DB_MONITORING) and self._monitoring_db.connected:
-            self._monitoring_db.store_session_variables(session)
+            self._monitoring_db.store_session_variables(session, variables)
 
     def _monitoring_db_load_session_variables(
             self,
@@ -835,9 +1021,7 @@ class Agent:
             predicted_intent (IntentClassifierPrediction): the intent prediction
         """
         if self.get_property(DB_MONITORING) and self._monitoring_db.connected:
-            thread = threading.Thread(target=self._monitoring_db.insert_intent_prediction,
-                                      args=(session, session.current_state, predicted_intent))
-            thread.start()
+            self._monitoring_db.insert_intent_prediction(session, session.current_state, predicted_intent)
 
     def _monitoring_db_insert_transition(self, session: Session, transition: Transition) -> None:
         """Insert a transition record into the monitoring database.
@@ -846,8 +1030,7 @@ class Agent:
             session (Session): the session of the current user
         """
         if self.get_property(DB_MONITORING) and self._monitoring_db.connected:
-            thread = threading.Thread(target=self._monitoring_db.insert_transition, args=(session, transition))
-            thread.start()
+            self._monitoring_db.insert_transition(session, transition)
 
     def _monitoring_db_insert_chat(self, session: Session, message: Message) -> None:
         """Insert a message record into the monitoring database.
@@ -856,19 +1039,14 @@ class Agent:
             session (Session): the session of the current user
         """
         if self.get_property(DB_MONITORING) and self._monitoring_db.connected:
-            thread = threading.Thread(target=self._monitoring_db.insert_chat, args=(session, message))
-            thread.start()
+            self._monitoring_db.insert_chat(session, message)
 
-    def _monitoring_db_insert_event(self, event: Event) -> None:
+    def _monitoring_db_insert_event(self, event: Event, session: Session or None) -> None:
         """Insert an event record into the monitoring database.
 
         Args:
             event (Event): the event to insert into the database
+            session (Session or None): the session that received the event, or None if the event is broadcasted
         """
         if self.get_property(DB_MONITORING) and self._monitoring_db.connected:
-            if event.is_broadcasted():
-                session = None
-            else:
-                session = self._sessions[event.session_id]
-            thread = threading.Thread(target=self._monitoring_db.insert_event, args=(session, event))
-            thread.start()
+            self._monitoring_db.insert_event(session, event)
@@ -1,5 +1,22 @@
 import base64
+import hashlib
 import json
+import re
+import shutil
+import threading
+from tempfile import SpooledTemporaryFile
+from typing import BinaryIO, Iterator
+
+SPOOL_MAX_SIZE: int = 5 * 1024 * 1024
+"""The maximum size (in bytes) of the files read from a path or a stream that are kept in memory. Larger files are
+rolled over to a temporary file on disk."""
+
+CHUNK_SIZE: int = 3 * 256 * 1024
+"""The size (in bytes) of the chunks the file content is read and base64-encoded in. It is a multiple of 3, so that the
+base64 chunks can be concatenated."""
+
+_BASE64_PATTERN: re.Pattern = re.compile(r'[A-Za-z0-9+/]*={0,2}')
+"""Characters of a base64 string (its length must also be a multiple of 4)."""
 
 
 class File:
@@ -7,38 +24,99 @@ class File:
 
     Files are used to encapsulate information about the files exchanged in an agent conversation. They include
     attributes such as the file's name, type, and base64 representation.
-    Note that at least one of path, data or base64 need to be set. 
+    Note that at least one of path, data, stream or base64 need to be set.
+
+    The content is stored only once, as it was provided: raw bytes, a base64 string, or a spooled temporary file (for
+    files read from a path or a stream, see :data:`SPOOL_MAX_SIZE`). The other representations are produced on demand
+    (and not kept), so getting :attr:`base64` or :attr:`data` repeatedly converts the content each time.
 
     Args:
         file_name (str): The name of the file.
         file_type (str): The type of the file.
-        file_base64 (str, optional): The base64 representation of the file.
+        file_base64 (str, optional): The base64 representation of the file. Whitespace (e.g. the line breaks of MIME
+            base64) is removed.
         file_path (str, optional): Path to the file.
         file_data (bytes, optional): Raw file data.
+        file_stream (BinaryIO, optional): A binary stream with the file content (e.g. an upload or a download). It is
+            read in chunks, so large files are never fully loaded in memory.
 
     Attributes:
         _name (str): The name of the file.
         _type (str): The type of the file.
-        _base64 (str): The base64 representation of the file.
+        _data (bytes or None): The raw file data, if the content is stored as bytes.
+        _base64 (str or None): The base64 representation of the file, if the content is stored as a base64 string.
+        _spool (SpooledTemporaryFile or None): The file content, if it is stored in a spooled temporary file.
+        _spool_lock (threading.Lock): Lock to read the spooled temporary file from a single thread at a time.
+        _sha256 (str or None): The SHA-256 digest of the content, once computed.
     """
 
-    def __init__(self, file_name: str = None, file_type: str = None, file_base64: str = None, file_path: str = None, file_data: bytes = None):
+    def __init__(self, file_name: str = None, file_type: str = None, file_base64: str = None, file_path: str = None, file_data: bytes = None,
+                 file_stream: BinaryIO = None):
+        self._data: bytes or None = None
+        self._base64: str or None = None
+        self._spool: SpooledTemporaryFile or None = None
+        self._spool_lock: threading.Lock = threading.Lock()
+        self._sha256: str or None = None
         if file_path:
             with open(file_path, 'rb') as file:
-                file_data = file.read()
+                self._spool = self._spool_stream(file)
                 file_name = file_path.split('/')[-1]
                 file_type = file_path.split('.')[-1]
+        elif file_stream is not None:
+            self._spool = self._spool_stream(file_stream)
         elif file_base64:
-            file_data = base64.b64decode(file_base64)
+            self._base64 = self._normalize_base64(file_base64)
         elif file_data is None:
             raise ValueError("Invalid input parameters")
+        else:
+            self._data = file_data if isinstance(file_data, bytes) else bytes(file_data)
         if not file_name:
             file_name = 'default_filename'
         if not file_type:
             file_type = 'file'
         self._name = file_name
         self._type = file_type
-        self._base64 = base64.b64encode(file_data).decode('utf-8')
+
+    @staticmethod
+    def _spool_stream(stream: BinaryIO) -> SpooledTemporaryFile:
+        """Copy a binary stream into a new spooled temporary file."""
+        spool = SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        shutil.copyfileobj(stream, spool, CHUNK_SIZE)
+        return spool
+
+    @staticmethod
+    def _normalize_base64(value: str) -> str:
+        """Remove the whitespace (e.g. the line breaks of MIME base64) from a base64 string, and check it is valid.
+
+        Args:
+            value (str): the base64 string
+
+        Returns:
+            str: the base64 string without whitespace
+
+        Raises:
+            ValueError: if the string is not a valid base64 string
+        """
+        if not (len(value) % 4 == 0 and _BASE64_PATTERN.fullmatch(value)):
+            value = ''.join(value.split())
+            if not (len(value) % 4 == 0 and _BASE64_PATTERN.fullmatch(value)):
+                raise ValueError("Invalid base64 content")
+        return value
+
+    def __getstate__(self) -> dict:
+        """Get the state of the file to pickle it (e.g. to hibernate a session): the lock is dropped, and the content of
+        the spooled temporary file is stored as bytes."""
+        state = self.__dict__.copy()
+        del state['_spool_lock']
+        if self._spool is not None:
+            state['_data'] = self.data
+            state['_spool'] = None
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        """Restore the state of a pickled file."""
+        self.__dict__.update(state)
+        self._spool_lock = threading.Lock()
 
     @property
     def name(self) -> str:
@@ -53,7 +131,42 @@ class File:
     @property
     def base64(self) -> str:
         """Getter for the base64 representation of the file."""
-        return self._base64
+        if self._base64 is not None:
+            return self._base64
+        if self._data is not None:
+            return base64.b64encode(self._data).decode('utf-8')
+        return ''.join(self.iter_base64())
+
+    @property
+    def data(self) -> bytes:
+        """Getter for the raw file data."""
+        if self._data is not None:
+            return self._data
+        if self._base64 is not None:
+            return base64.b64decode(self._base64)
+        with self._spool_lock:
+            self._spool.seek(0)
+            return self._spool.read()
+
+    @property
+    def size(self) -> int:
+        """Getter for the size of the file, in bytes."""
+        if self._data is not None:
+            return len(self._data)
+        if self._base64 is not None:
+            return len(self._base64) * 3 // 4 - self._base64[-2:].count('=')
+        with self._spool_lock:
+            return self._spool.seek(0, 2)
+
+    @property
+    def sha256(self) -> str:
+        """Getter for the SHA-256 digest (hex) of the file content."""
+        if self._sha256 is None:
+            digest = hashlib.sha256()
+            for chunk in self.iter_bytes():
+                digest.update(chunk)
+            self._sha256 = digest.hexdigest()
+        return self._sha256
 
     @name.setter
     def name(self, value: str) -> None:
@@ -68,7 +181,69 @@ class File:
     @base64.setter
     def base64(self, value: str) -> None:
         """Setter for the base64 representation of the file."""
-        self._base64 = value
+        self._base64 = self._normalize_base64(value)
+        self._data = None
+        self._spool = None
+        self._sha256 = None
+
+    def iter_bytes(self, chunk_size: int = CHUNK_SIZE) -> Iterator[bytes]:
+        """Read the raw file data in chunks.
+
+        Args:
+            chunk_size (int): the size of the chunks, in bytes. If the content is stored as a base64 string, it is
+                rounded up to a multiple of 3
+
+        Returns:
+            Iterator[bytes]: the chunks of the file data
+        """
+        if self._base64 is not None:
+            chunk_size = -(-chunk_size // 3) * 3
+            encoded_size = chunk_size // 3 * 4
+            for i in range(0, len(self._base64), encoded_size):
+                yield base64.b64decode(self._base64[i:i + encoded_size])
+            return
+        if self._spool is None:
+            data = memoryview(self._data)
+            for i in range(0, len(data), chunk_size):
+                yield bytes(data[i:i + chunk_size])
+            return
+        offset = 0
+        while True:
+            with self._spool_lock:
+                self._spool.seek(offset)
+                chunk = self._spool.read(chunk_size)
+            if not chunk:
+                return
+            offset += len(chunk)
+            yield chunk
+
+    def iter_base64(self, chunk_size: int = CHUNK_SIZE) -> Iterator[str]:
+        """Get the base64 representation of the file in chunks, which can be concatenated (e.g. to stream it).
+
+        Args:
+            chunk_size (int): the size of the (raw) chunks, in bytes. It is rounded up to a multiple of 3
+
+        Returns:
+            Iterator[str]: the chunks of the base64 representation
+        """
+        chunk_size = -(-chunk_size // 3) * 3
+        if self._base64 is not None:
+            encoded_size = chunk_size // 3 * 4
+            for i in range(0, len(self._base64), encoded_size):
+                yield self._base64[i:i + encoded_size]
+            return
+        for chunk in self.iter_bytes(chunk_size):
+            yield base64.b64encode(chunk).decode('utf-8')
+
+    def save(self, path: str) -> None:
+        """Write the file content to a path, in chunks.
+
+        Args:
+            path (str): the path of the file to write
+        """
+        with open(path, 'wb') as file:
+            for chunk in self.iter_bytes():
+                file.write(chunk)
 
     @staticmethod
     def decode(file_str):
@@ -88,24 +263,27 @@ class File:
         if file_name and file_type and file_base64:
             return File(file_name=file_name, file_type=file_type, file_base64=file_base64)
         return None
-    
+
     def get_json_string(self) -> str:
         """Returns a stringified dictionary containing the attributes of the File object."""
-        return json.dumps({
-            "name": self.name,
-            "type": self.type,
-            "base64": self.base64,
-        })
+        return json.dumps(self.to_dict())
+
+    def to_dict(self, encoded: bool = True):
+        """Returns a dictionary containing the attributes of the File object.
 
-    def to_dict(self):
-        """Returns a dictionary containing the attributes of the File object."""
+        Args:
+            encoded (bool): whether the content must be a base64 string. If false, the content is not converted: it is
+                either a base64 string or raw bytes, whichever is stored (the payload codecs encode it as needed)
+        """
         return {
             "name": self.name,
             "type": self.type,
-            "base64": self.base64,
+            "base64": self.base64 if encoded or self._base64 is not None else self.data,
         }
-        
+
     @staticmethod
     def from_dict(data):
         """Returns a File object generated based on the given dict object."""
+        if isinstance(data['base64'], (bytes, bytearray)):
+            return File(file_data=data['base64'], file_type=data['type'], file_name=data['name'])
         return File(file_base64=data['base64'], file_type=data['type'], file_name=data['name'])
@@ -0,0 +1,513 @@
+import io
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from collections import deque
+from typing import Any, TYPE_CHECKING
+
+from baf.core.entity.entity import Entity
+from baf.core.intent.intent import Intent
+from baf.core.session import Session
+from baf.core.state import State
+from baf.core.transition.event import Event
+from baf.exceptions.logger import logger
+from baf.platforms.platform import Platform
+
+if TYPE_CHECKING:
+    from baf.core.agent import Agent
+
+MAX_SWEEP_INTERVAL: float = 60
+"""Maximum time (in seconds) between two checks of the idle sessions."""
+
+
+class _SnapshotPickler(pickle.Pickler):
+    """Pickler that stores references to the agent components (states, intents, entities, platforms and the agent
+    itself) by name, instead of copying them into the snapshot.
+
+    Args:
+        file (io.BytesIO): the buffer where the snapshot is written
+        agent (Agent): the agent the snapshot belongs to
+    """
+
+    def __init__(self, file: io.BytesIO, agent: 'Agent'):
+        super().__init__(file)
+        self._agent: 'Agent' = agent
+
+    def persistent_id(self, obj: Any) -> tuple[str, str] or None:
+        if obj is self._agent:
+            return 'agent', obj.name
+        if isinstance(obj, State):
+            return 'state', obj.name
+        if isinstance(obj, Intent):
+            return 'intent', obj.name
+        if isinstance(obj, Entity):
+            return 'entity', obj.name
+        if isinstance(obj, Platform):
+            return 'platform', obj.__class__.__name__
+        if isinstance(obj, Session):
+            raise pickle.PicklingError('Sessions cannot be referenced from a session snapshot')
+        return None
+
+
+class _SnapshotUnpickler(pickle.Unpickler):
+    """Unpickler that resolves the agent components referenced by a session snapshot.
+
+    Args:
+        file (io.BytesIO): the buffer where the snapshot is read from
+        agent (Agent): the agent the snapshot belongs to
+    """
+
+    def __init__(self, file: io.BytesIO, agent: 'Agent'):
+        super().__init__(file)
+        self._agent: 'Agent' = agent
+
+    def persistent_load(self, pid: tuple[str, str]) -> Any:
+        kind, name = pid
+        if kind == 'agent':
+            return self._agent
+        components = {
+            'state': self._agent.states,
+            'intent': self._agent.intents,
+            'entity': self._agent.entities,
+            'platform': self._agent._platforms,
+        }[kind]
+        for component in components:
+            component_name = component.__class__.__name__ if kind == 'platform' else component.name
+            if component_name == name:
+                return component
+        raise pickle.UnpicklingError(f"The {kind} '{name}' does not exist in agent '{self._agent.name}'")
+
+
+class SessionSnapshotStore:
+    """A local SQLite store for the snapshots of hibernated sessions.
+
+    Each snapshot is stored with the name of the platform of the session and its number of pending events, so that the
+    hibernated sessions with pending events can be kept when the agent stops (see :meth:`SessionHibernator.stop`).
+
+    Args:
+        path (str): the path of the SQLite database file. Use ``:memory:`` to keep the snapshots in memory
+
+    Attributes:
+        _path (str): The path of the SQLite database file
+        _conn (sqlite3.Connection or None): The connection to the database. It is opened when first needed
+        _lock (threading.Lock): Lock to safely use the connection from different threads
+    """
+
+    def __init__(self, path: str):
+        self._path: str = path
+        self._conn: sqlite3.Connection or None = None
+        self._lock: threading.Lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self._path, check_same_thread=False)
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS session_snapshot ('
+                'session_id TEXT PRIMARY KEY, snapshot BLOB NOT NULL, platform TEXT NOT NULL, '
+                'pending_events INTEGER NOT NULL, hibernated_at REAL NOT NULL)'
+            )
+            self._conn.commit()
+        return self._conn
+
+    @property
+    def persistent(self) -> bool:
+        """bool: Whether the snapshots are kept after closing the store (i.e., they are not stored in memory)."""
+        return self._path != ':memory:'
+
+    def save(self, session_id: str, snapshot: bytes, platform: str, pending_events: int) -> None:
+        """Save (or replace) the snapshot of a session.
+
+        Args:
+            session_id (str): the session id
+            snapshot (bytes): the serialized session
+            platform (str): the name (i.e., the class name) of the platform of the session
+            pending_events (int): the number of events of the session that have not been processed yet
+        """
+        with self._lock:
+            conn = self._connection()
+            conn.execute('INSERT OR REPLACE INTO session_snapshot VALUES (?, ?, ?, ?, ?)',
+                         (session_id, snapshot, platform, pending_events, time.time()))
+            conn.commit()
+
+    def sessions(self) -> list[tuple[str, str]]:
+        """Get the sessions that have a snapshot.
+
+        Returns:
+            list[tuple[str, str]]: the id and the platform name of each session
+        """
+        with self._lock:
+            return self._connection().execute('SELECT session_id, platform FROM session_snapshot').fetchall()
+
+    def load(self, session_id: str) -> bytes or None:
+        """Load the snapshot of a session.
+
+        Args:
+            session_id (str): the session id
+
+        Returns:
+            bytes or None: the serialized session, or None if there is no snapshot of the session
+        """
+        with self._lock:
+            row = self._connection().execute('SELECT snapshot FROM session_snapshot WHERE session_id = ?',
+                                             (session_id,)).fetchone()
+        return row[0] if row else None
+
+    def delete(self, session_id: str) -> None:
+        """Delete the snapshot of a session, if it exists.
+
+        Args:
+            session_id (str): the session id
+        """
+        with self._lock:
+            conn = self._connection()
+            conn.execute('DELETE FROM session_snapshot WHERE session_id = ?', (session_id,))
+            conn.commit()
+
+    def clear(self, keep_pending_events: bool = False) -> int:
+        """Delete all the snapshots.
+
+        Args:
+            keep_pending_events (bool): whether to keep the snapshots of the sessions with pending events
+
+        Returns:
+            int: the number of pending events of the deleted snapshots
+        """
+        with self._lock:
+            conn = self._connection()
+            where = ' WHERE pending_events = 0' if keep_pending_events else ''
+            pending_events = conn.execute(f'SELECT SUM(pending_events) FROM session_snapshot{where}').fetchone()[0]
+            conn.execute(f'DELETE FROM session_snapshot{where}')
+            conn.commit()
+        return pending_events or 0
+
+    def close(self) -> None:
+        """Close the connection to the database."""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class SessionHibernator:
+    """Evicts idle agent sessions from memory and restores them when they are needed again.
+
+    A hibernated session releases its runtime (its event loop assignment and its timers) and its current state name,
+    private data and pending events are serialized into a :class:`SessionSnapshotStore`. The session is transparently
+    rehydrated the next time the agent needs it (e.g. when it receives an event for that session).
+
+    Sessions are hibernated when they have been idle for longer than the idle TTL, or when there are more resident
+    sessions than the maximum allowed (the least recently used ones are hibernated first). Sessions with running timers
+    or with connections to other agents are never hibernated.
+
+    When the agent stops, the snapshots of the hibernated sessions with pending events are kept (if the store is
+    persistent), and these sessions are hibernated again when the hibernator of the next agent run is created.
+
+    Args:
+        agent (Agent): the agent the hibernator belongs to
+        store (SessionSnapshotStore): the store of the session snapshots
+        idle_ttl (float): the time (in seconds) after which an idle session is hibernated. 0 to disable it
+        max_resident (int): the maximum number of sessions kept in memory. 0 for no limit
+
+    Attributes:
+        _agent (Agent): The agent the hibernator belongs to
+        _store (SessionSnapshotStore): The store of the session snapshots
+        _idle_ttl (float): The time (in seconds) after which an idle session is hibernated. 0 if disabled
+        _max_resident (int): The maximum number of sessions kept in memory. 0 for no limit
+        _activity (OrderedDict[str, float]): The last activity instant of each resident session, from the least to the
+            most recently used
+        _hibernated (dict[str, Platform]): The platform of each hibernated session
+        _sweeper (threading.Thread or None): The thread that periodically hibernates the idle sessions. It is started
+            when the first session is created
+        _stop_sweeper (threading.Event): Signal to stop the sweeper thread
+        lock (threading.RLock): Lock that must be held to access or modify the agent sessions while hibernation is
+            enabled
+    """
+
+    def __init__(self, agent: 'Agent', store: SessionSnapshotStore, idle_ttl: float = 0, max_resident: int = 0):
+        self._agent: 'Agent' = agent
+        self._store: SessionSnapshotStore = store
+        self._idle_ttl: float = idle_ttl
+        self._max_resident: int = max_resident
+        self._activity: OrderedDict[str, float] = OrderedDict()
+        self._hibernated: dict[str, Platform] = {}
+        self._sweeper: threading.Thread or None = None
+        self._stop_sweeper: threading.Event = threading.Event()
+        self.lock: threading.RLock = threading.RLock()
+        self._restore_hibernated_sessions()
+
+    def _restore_hibernated_sessions(self) -> None:
+        """Hibernate the sessions whose snapshots were kept in the store when the agent last stopped."""
+        platforms = {platform.__class__.__name__: platform for platform in self._agent._platforms}
+        for session_id, platform_name in self._store.sessions():
+            platform = platforms.get(platform_name)
+            if platform is None:
+                logger.warning(f'Session {session_id} cannot be restored, platform {platform_name} not found in agent '
+                               f"'{self._agent.name}'")
+                self._store.delete(session_id)
+            else:
+                self._hibernated[session_id] = platform
+        if self._hibernated:
+            logger.info(f'{len(self._hibernated)} hibernated sessions restored from the snapshot store')
+
+    @property
+    def hibernated_sessions(self) -> list[str]:
+        """list[str]: The ids of the hibernated sessions."""
+        return list(self._hibernated)
+
+    def is_hibernated(self, session_id: str) -> bool:
+        """Check if a session is hibernated.
+
+        Args:
+            session_id (str): the session id
+
+        Returns:
+            bool: true if the session is hibernated, false otherwise
+        """
+        return session_id in self._hibernated
+
+    def record_activity(self, session_id: str) -> None:
+        """Record activity on a resident session.
+
+        The caller must hold :attr:`lock`.
+
+        Args:
+            session_id (str): the session id
+        """
+        self._activity[session_id] = time.monotonic()
+        self._activity.move_to_end(session_id)
+
+    def enforce_limits(self) -> None:
+        """Hibernate the least recently used sessions while there are more resident sessions than allowed, and start
+        hibernating idle sessions periodically if an idle TTL is set.
+
+        The caller must not hold :attr:`lock`, since hibernating a session waits for its event loop.
+        """
+        if self._idle_ttl and self._sweeper is None:
+            self._start_sweeper()
+        while self._max_resident:
+            with self.lock:
+                if len(self._activity) <= self._max_resident:
+                    return
+                # The most recently used session is never evicted
+                candidates = list(self._activity)[:-1]
+            if not any(self._try_hibernate(session_id) for session_id in candidates):
+                return
+
+    def forget(self, session_id: str) -> None:
+        """Forget a session that is being closed, deleting its snapshot if it is hibernated.
+
+        Args:
+            session_id (str): the session id
+        """
+        with self.lock:
+            self._activity.pop(session_id, None)
+            if self._hibernated.pop(session_id, None) is not None:
+                self._store.delete(session_id)
+
+    def hibernate(self, session: Session) -> bool:
+        """Hibernate a resident session.
+
+        The session is serialized before its runtime is released, so sessions that cannot be serialized keep running
+        untouched (and they are not hibernated again until their private data changes). While the session runtime is
+        being released, the session stays available to the agent. If it receives activity in the meantime, the
+        hibernation is cancelled.
+
+        Args:
+            session (Session): the session to hibernate
+
+        Returns:
+            bool: true if the session was hibernated, false if it cannot be hibernated
+        """
+        with self.lock:
+            if (self._agent._sessions.get(session.id) is not session or session._agent_connections or session._timers
+                    or session._unserializable):
+                return False
+            # Check that the session can be serialized before releasing its runtime
+            try:
+                self._dump(session)
+            except Exception as e:
+                self._mark_unserializable(session, e)
+                return False
+            # Activity recorded from now on cancels the hibernation
+            self._activity.pop(session.id, None)
+        # Wait for the session event loop without holding the lock, since the loop may be waiting for it
+        session._stop_event_thread()
+        with self.lock:
+            if session.id not in self._activity:
+                try:
+                    snapshot = self._dump(session)
+                except Exception as e:
+                    self._mark_unserializable(session, e)
+                else:
+                    self._store.save(session.id, snapshot, session.platform.__class__.__name__, len(session._events))
+                    self._hibernated[session.id] = session.platform
+                    del self._agent._sessions[session.id]
+                    logger.info(f'Session {session.id} hibernated')
+                    return True
+            # Keep the session resident, processing the events it may have received in the meantime
+            self.record_activity(session.id)
+            session._run_event_thread()
+        return False
+
+    @staticmethod
+    def _mark_unserializable(session: Session, error: Exception) -> None:
+        """Mark a session that cannot be serialized, so it is not hibernated again until its private data changes.
+
+        Args:
+            session (Session): the session
+            error (Exception): the serialization error
+        """
+        session._unserializable = True
+        logger.warning(f'Session {session.id} cannot be hibernated until its data changes, its data is not '
+                       f'serializable: {error}')
+
+    def _try_hibernate(self, session_id: str) -> bool:
+        session = self._agent._sessions.get(session_id)
+        if session is None:
+            with self.lock:
+                self._activity.pop(session_id, None)
+            return False
+        return self.hibernate(session)
+
+    def rehydrate(self, session_id: str) -> Session or None:
+        """Restore a hibernated session, making it resident again.
+
+        Args:
+            session_id (str): the session id
+
+        Returns:
+            Session or None: the restored session, or None if the session is not hibernated
+        """
+        with self.lock:
+            platform = self._hibernated.get(session_id)
+            if platform is None:
+                return None
+            snapshot = self._store.load(session_id)
+            session = Session(session_id, self._agent, platform)
+            if snapshot is not None:
+                self._load(session, snapshot)
+            else:
+                logger.warning(f'The snapshot of session {session_id} was not found')
+                self._agent._restore_session_from_monitoring_db(session)
+            del self._hibernated[session_id]
+            self._store.delete(session_id)
+            self._agent._sessions[session_id] = session
+            session._run_event_thread()
+            self.record_activity(session_id)
+        logger.info(f'Session {session_id} rehydrated')
+        return session
+
+    def deliver(self, session_id: str, event: Event) -> None:
+        """Add an event to the pending events of a hibernated session, without rehydrating it.
+
+        Args:
+            session_id (str): the session id
+            event (Event): the event to deliver
+        """
+        with self.lock:
+            snapshot = self._store.load(session_id)
+            if snapshot is None:
+                return
+            session = Session(session_id, self._agent, self._hibernated[session_id])
+            self._load(session, snapshot)
+            session.events.appendleft(event)
+            self._store.save(session_id, self._dump(session), session.platform.__class__.__name__,
+                             len(session._events))
+
+    def hibernate_idle_sessions(self) -> int:
+        """Hibernate all the sessions that have been idle for longer than the idle TTL.
+
+        Returns:
+            int: the number of hibernated sessions
+        """
+        if not self._idle_ttl:
+            return 0
+        deadline = time.monotonic() - self._idle_ttl
+        with self.lock:
+            idle_sessions = []
+            for session_id, last_activity in self._activity.items():
+                if last_activity > deadline:
+                    break
+                idle_sessions.append(session_id)
+        return sum(self._try_hibernate(session_id) for session_id in idle_sessions)
+
+    def _start_sweeper(self) -> None:
+        with self.lock:
+            if self._sweeper is not None:
+                return
+            interval = min(self._idle_ttl / 2, MAX_SWEEP_INTERVAL)
+            self._stop_sweeper.clear()
+
+            def sweep():
+                while not self._stop_sweeper.wait(interval):
+                    try:
+                        self.hibernate_idle_sessions()
+                    except Exception as e:
+                        logger.error(f'Error hibernating idle sessions: {e}')
+
+            self._sweeper = threading.Thread(target=sweep, name=f'{self._agent.name}-session-hibernator', daemon=True)
+            self._sweeper.start()
+
+    def stop(self) -> None:
+        """Stop hibernating sessions and discard the snapshots.
+
+        The snapshots of the sessions with pending events (e.g. broadcasted events delivered while they were hibernated)
+        are kept, so their events are processed when they are restored in the next agent run. If the store is not
+        persistent, they are discarded too, and the number of discarded events is logged.
+        """
+        self._stop_sweeper.set()
+        if self._sweeper is not None:
+            self._sweeper.join()
+            self._sweeper = None
+        with self.lock:
+            self._activity.clear()
+            self._hibernated.clear()
+            dropped_events = self._store.clear(keep_pending_events=self._store.persistent)
+            if dropped_events:
+                logger.warning(f'{dropped_events} pending events of hibernated sessions were discarded')
+            kept_sessions = self._store.sessions()
+            if kept_sessions:
+                logger.info(f'{len(kept_sessions)} hibernated sessions with pending events are kept until the next '
+                            f'agent run')
+            self._store.close()
+
+    def _dump(self, session: Session) -> bytes:
+        """Serialize the data of a session.
+
+        Args:
+            session (Session): the session to serialize
+
+        Returns:
+            bytes: the serialized session
+        """
+        buffer = io.BytesIO()
+        _SnapshotPickler(buffer, self._agent).dump({
+            'username': session._username,
+            'session_name': session._session_name,
+            'current_state': session.current_state,
+            'dictionary': session._dictionary,
+            'event': session._event,
+            'events': list(session._events),
+            'chat_history': list(session._chat_history),
+            'chat_history_complete': session._chat_history_complete,
+        })
+        return buffer.getvalue()
+
+    def _load(self, session: Session, snapshot: bytes) -> None:
+        """Restore the data of a session from its snapshot.
+
+        Args:
+            session (Session): the session to restore
+            snapshot (bytes): the serialized session
+        """
+        data = _SnapshotUnpickler(io.BytesIO(snapshot), self._agent).load()
+        session._username = data['username']
+        session._session_name = data['session_name']
+        session._current_state = data['current_state']
+        session._dictionary = data['dictionary']
+        session._event = data['event']
+        session._events = deque(data['events'])
+        session._chat_history.extend(data['chat_history'])
+        session._chat_history_complete = data['chat_history_complete']
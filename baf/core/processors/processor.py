@@ -1,5 +1,6 @@
+import inspect
 from abc import ABC, abstractmethod
-from typing import Any, TYPE_CHECKING
+from typing import Any, TYPE_CHECKING, get_type_hints
 
 from baf.core.session import Session
 from baf.exceptions.exceptions import ProcessorTargetUndefined
@@ -15,6 +16,10 @@ class Processor(ABC):
 
     This class serves as a template to implement processors.
 
+    The type of messages a processor is applied to is given by the return type annotation of its :meth:`process`
+    method (e.g. ``str`` or ``dict``). Processors whose ``message`` parameter is annotated as ``bytes`` are applied to
+    audio messages before their transcription. The annotations are read once, when the processor is created.
+
     Args:
         agent (Agent): The agent the processor belongs to
         user_messages (bool): whether the processor should be applied to user messages
@@ -24,6 +29,10 @@ class Processor(ABC):
         agent (Agent): The agent the processor belongs to
         user_messages (bool): whether the processor should be applied to user messages
         agent_messages (bool): whether the processor should be applied to agent messages
+        message_type (type or None): the type of messages the processor is applied to (the return type of
+            :meth:`process`), or None if it is not annotated
+        audio_messages (bool): whether the processor should be applied to audio messages (i.e., the ``message``
+            parameter of :meth:`process` is annotated as ``bytes``)
     """
 
     def __init__(self, agent: 'Agent', user_messages: bool = False, agent_messages: bool = False):
@@ -32,7 +41,10 @@ class Processor(ABC):
         self.agent = agent
         self.user_messages = user_messages
         self.agent_messages = agent_messages
-        self.agent.processors.append(self)
+        self.message_type: type or None = get_type_hints(self.process).get('return')
+        message_parameter = inspect.signature(self.process).parameters.get('message')
+        self.audio_messages: bool = message_parameter is not None and message_parameter.annotation is bytes
+        self.agent._add_processor(self)
 
     @abstractmethod
     def process(self, session: 'Session', message: Any) -> Any:
@@ -0,0 +1,221 @@
+import asyncio
+import threading
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING
+
+from baf.exceptions.logger import logger
+
+if TYPE_CHECKING:
+    from baf.core.agent import Agent
+    from baf.core.session import Session
+
+PLATFORM_START_TIMEOUT: float = 30
+"""Maximum time (in seconds) a session waits for its platform to start before aborting the session start."""
+
+PLATFORM_START_INTERVAL: float = 0.05
+"""Interval (in seconds) between two checks of the session platform status while the session is starting."""
+
+
+class SessionScheduler(ABC):
+    """The session scheduler abstract class.
+
+    A session scheduler decides on which event loop the events of each agent session are processed. All the callbacks
+    of a session (e.g. the evaluation of its current state transitions) run on the event loop assigned to that
+    session, which guarantees that the events of a session are processed in order.
+
+    This class serves as a template to implement session schedulers.
+
+    Args:
+        agent (Agent): the agent the scheduler belongs to
+
+    Attributes:
+        _agent (Agent): The agent the scheduler belongs to
+    """
+
+    def __init__(self, agent: 'Agent'):
+        self._agent: 'Agent' = agent
+
+    @abstractmethod
+    def add_session(self, session: 'Session') -> None:
+        """Assign an event loop to a session and start processing its events.
+
+        Args:
+            session (Session): the session to schedule
+        """
+        pass
+
+    @abstractmethod
+    def remove_session(self, session: 'Session') -> None:
+        """Stop processing the events of a session and release its event loop.
+
+        Args:
+            session (Session): the session to unschedule
+        """
+        pass
+
+    def stop(self) -> None:
+        """Stop the scheduler, releasing all its resources."""
+        pass
+
+    @staticmethod
+    def _start_session(session: 'Session', elapsed: float = 0.0) -> None:
+        """Start evaluating the session transitions once the session platform is running.
+
+        Platforms run in their own threads and may not be ready immediately, so this check is rescheduled on the
+        session event loop (without blocking it) until the platform is running or the timeout expires.
+
+        Args:
+            session (Session): the session to start
+            elapsed (float): the time (in seconds) the session has been waiting for its platform
+        """
+        if session._event_loop is None:
+            return
+        if not session.platform.running:
+            if elapsed >= PLATFORM_START_TIMEOUT:
+                logger.error(f'Platform did not start within {PLATFORM_START_TIMEOUT}s for session {session.id}. '
+                             f'Aborting session start.')
+                return
+            session._timer_handle = session._event_loop.call_later(
+                PLATFORM_START_INTERVAL, SessionScheduler._start_session, session, elapsed + PLATFORM_START_INTERVAL
+            )
+            return
+        session.manage_transition()
+
+
+class ThreadPerSessionScheduler(SessionScheduler):
+    """A session scheduler that runs each session on its own event loop, in a dedicated thread.
+
+    A blocking state body only delays its own session, at the cost of one thread and one event loop per session.
+
+    Args:
+        agent (Agent): the agent the scheduler belongs to
+    """
+
+    def __init__(self, agent: 'Agent'):
+        super().__init__(agent)
+
+    def add_session(self, session: 'Session') -> None:
+        loop = asyncio.new_event_loop()
+
+        def run_event_loop():
+            logger.debug(f'Starting Event Loop for session: {session.id}')
+            asyncio.set_event_loop(loop)
+            loop.run_forever()
+            loop.close()
+            logger.debug(f'Event Loop stopped for: {session.id}')
+
+        session._event_loop = loop
+        session._event_thread = threading.Thread(target=run_event_loop)
+        loop.call_soon(self._start_session, session)
+        session._event_thread.start()
+
+    def remove_session(self, session: 'Session') -> None:
+        session._event_loop.call_soon_threadsafe(session._event_loop.stop)
+        session._event_thread.join()
+        session._event_loop = None
+        session._event_thread = None
+
+
+class _EventLoopWorker:
+    """An event loop running in its own thread, shared by several sessions.
+
+    Args:
+        name (str): the name of the worker thread
+
+    Attributes:
+        loop (asyncio.AbstractEventLoop): The worker event loop
+        thread (threading.Thread): The thread where the event loop is running
+        sessions (set[str]): The ids of the sessions assigned to this worker
+    """
+
+    def __init__(self, name: str):
+        self.loop: asyncio.AbstractEventLoop = asyncio.new_event_loop()
+        self.thread: threading.Thread = threading.Thread(target=self._run, name=name)
+        self.sessions: set[str] = set()
+        self.thread.start()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+        self.loop.close()
+
+    def stop(self) -> None:
+        """Stop the worker event loop and wait for its thread to finish."""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+class SharedLoopScheduler(SessionScheduler):
+    """A session scheduler that multiplexes all the agent sessions onto a fixed pool of event loops.
+
+    Each session is assigned to the least loaded event loop when it is created, and keeps it during its whole lifetime,
+    so the events of a session are still processed in order. The number of threads does not grow with the number of
+    sessions, but a state body that blocks (e.g. waiting for an LLM response) delays the other sessions sharing its
+    event loop, so the number of workers should be sized accordingly.
+
+    Args:
+        agent (Agent): the agent the scheduler belongs to
+        workers (int): the number of shared event loops (each one running in its own thread)
+
+    Attributes:
+        _num_workers (int): The number of shared event loops
+        _workers (list[_EventLoopWorker]): The shared event loops. They are started when the first session is added
+        _session_workers (dict[str, _EventLoopWorker]): The event loop assigned to each session
+        _lock (threading.Lock): Lock to safely add and remove sessions from different threads
+    """
+
+    def __init__(self, agent: 'Agent', workers: int = 4):
+        super().__init__(agent)
+        if workers < 1:
+            raise ValueError(f'A SharedLoopScheduler needs at least 1 worker, got {workers}')
+        self._num_workers: int = workers
+        self._workers: list[_EventLoopWorker] = []
+        self._session_workers: dict[str, _EventLoopWorker] = {}
+        self._lock: threading.Lock = threading.Lock()
+
+    @property
+    def workers(self) -> int:
+        """int: The number of shared event loops."""
+        return self._num_workers
+
+    def add_session(self, session: 'Session') -> None:
+        with self._lock:
+            if not self._workers:
+                self._workers = [_EventLoopWorker(f'{self._agent.name}-session-worker-{i}')
+                                 for i in range(self._num_workers)]
+            worker = min(self._workers, key=lambda w: len(w.sessions))
+            worker.sessions.add(session.id)
+            self._session_workers[session.id] = worker
+        session._event_loop = worker.loop
+        session._event_thread = worker.thread
+        worker.loop.call_soon_threadsafe(self._start_session, session)
+
+    def remove_session(self, session: 'Session') -> None:
+        with self._lock:
+            worker = self._session_workers.pop(session.id, None)
+            if worker is not None:
+                worker.sessions.discard(session.id)
+        if worker is None or session._event_loop is None:
+            return
+        detached = threading.Event()
+
+        def detach():
+            if session._timer_handle:
+                session._timer_handle.cancel()
+            session._event_loop = None
+            detached.set()
+
+        if threading.current_thread() is worker.thread or not worker.thread.is_alive():
+            detach()
+        else:
+            worker.loop.call_soon_threadsafe(detach)
+            detached.wait()
+        session._event_thread = None
+
+    def stop(self) -> None:
+        with self._lock:
+            workers = self._workers
+            self._workers = []
+            self._session_workers.clear()
+        for worker in workers:
+            worker.stop()
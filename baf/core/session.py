@@ -1,20 +1,23 @@
 import asyncio
+import bisect
 import json
 import threading
 import time
 from asyncio import TimerHandle
 from collections import deque
+from contextlib import contextmanager
 from typing import Any, TYPE_CHECKING
 from datetime import datetime
+from operator import attrgetter
 
 from pandas import DataFrame
 from websocket import WebSocketApp
 
-from baf import CHECK_TRANSITIONS_DELAY
+from baf import AGENT_CHAT_HISTORY_BUFFER_SIZE, CHECK_TRANSITIONS_DELAY, CHECK_TRANSITIONS_POLLING
 from baf.core.transition.event import Event
 from baf.core.transition.transition import Transition
 from baf.library.transition.conditions import IntentMatcher
-from baf.library.transition.events.base_events import ReceiveMessageEvent, ReceiveTextEvent
+from baf.library.transition.events.base_events import ReceiveMessageEvent, ReceiveTextEvent, TimerEvent
 from baf.core.message import Message, get_message_type
 from baf.exceptions.logger import logger
 from baf.db import DB_MONITORING
@@ -52,11 +55,27 @@ class Session:
         _dictionary (str): Storage of private data for this session
         _event (Any or None): The last event to trigger a transition.
         _events (deque[Any]): The queue of received external events to process
-        _event_loop (asyncio.AbstractEventLoop): The loop in charge of managing incoming events
+        _event_loop (asyncio.AbstractEventLoop): The loop in charge of managing incoming events. It is assigned by the
+            agent's :class:`~baf.core.scheduler.SessionScheduler` and may be shared with other sessions
         _event_thread (threading.Thread): The thread where the event loop is running
         _timer_handle (TimerHandle): Handler of scheduled calls on the event loop
+        _timers (dict[str, TimerHandle]): The running session timers (see :meth:`start_timer`), by name
         _agent_connections (dict[str, WebSocketApp]): WebSocket client connections to other agent's WebSocket platforms.
             These connections enable an agent to send messages to other agents.
+        _dirty_variables (dict[str, str or None]): The session variables changed since they were last stored in the
+            monitoring database, with their JSON-serialized value (None if the variable was deleted or cannot be
+            serialized)
+        _variables_lock (threading.Lock): Lock of the changed session variables
+        _coalesce_depth (int): The number of nested :meth:`_coalesce_variables` blocks being run. While it is greater
+            than 0, the changed session variables are not stored
+        _chat_history (deque[Message]): The most recent messages of the session (up to the
+            ``agent.chat_history.buffer_size`` property), in chronological order, as they are read from the monitoring
+            database
+        _chat_history_complete (bool): Whether :attr:`_chat_history` contains all the messages of the session (i.e., it
+            is a new session, and no message has been discarded from the buffer yet)
+        _chat_history_lock (threading.Lock): Lock of the in-memory chat history
+        _unserializable (bool): Whether the session data could not be serialized to hibernate the session. It is reset
+            when the private data changes, so the session is not hibernated again until then
     """
 
     def __init__(
@@ -79,7 +98,15 @@ class Session:
         self._event_loop: asyncio.AbstractEventLoop or None = None
         self._event_thread: threading.Thread or None = None
         self._timer_handle: TimerHandle = None
+        self._timers: dict[str, TimerHandle] = {}
         self._agent_connections: dict[str, WebSocketApp] = {}
+        self._dirty_variables: dict[str, str or None] = {}
+        self._variables_lock: threading.Lock = threading.Lock()
+        self._coalesce_depth: int = 0
+        self._chat_history: deque[Message] = deque(maxlen=max(agent.get_property(AGENT_CHAT_HISTORY_BUFFER_SIZE), 0))
+        self._chat_history_complete: bool = False
+        self._chat_history_lock: threading.Lock = threading.Lock()
+        self._unserializable: bool = False
 
     @property
     def id(self):
@@ -124,90 +151,206 @@ class Session:
         """Schedule the next call to manage_transition as soon as possible (cancelling the previously scheduled
         call).
         """
+        event_loop = self._event_loop
+        if event_loop is None:
+            return
         if self._timer_handle:
             self._timer_handle.cancel()  # Cancel previously scheduled call to session.manage_transition()
-        self._event_loop.call_soon_threadsafe(self.manage_transition)
+        try:
+            event_loop.call_soon_threadsafe(self.manage_transition)
+        except RuntimeError:
+            # The event loop was closed while the session was being stopped. Pending events are kept in the session
+            # queue, and processed when the session starts again
+            pass
 
     def manage_transition(self) -> None:
-        """Evaluate the session's current state transitions, where one could be satisfied and triggered."""
+        """Evaluate the session's current state transitions, where one could be satisfied and triggered.
+
+        Transitions are evaluated again when a new event is received, a watched session variable changes or a timer
+        expires. Only if polling is enabled and the current state has condition-only transitions with arbitrary
+        conditions, a new evaluation is scheduled after ``agent.check_transitions_delay`` seconds.
+        """
+        event_loop = self._event_loop
+        if event_loop is None:
+            # The session has been removed from its event loop
+            return
+        if self._timer_handle:
+            self._timer_handle.cancel()
+            self._timer_handle = None
         self.current_state.check_transitions(self)
-        # The delay is in seconds
-        delay = self._agent.get_property(CHECK_TRANSITIONS_DELAY)
-        self._timer_handle = self._event_loop.call_later(delay, self.manage_transition)
+        if self._agent.get_property(CHECK_TRANSITIONS_POLLING) and self.current_state.requires_polling():
+            # The delay is in seconds
+            delay = self._agent.get_property(CHECK_TRANSITIONS_DELAY)
+            self._timer_handle = event_loop.call_later(delay, self.manage_transition)
+
+    def start_timer(self, name: str, delay: float) -> None:
+        """Start a session timer. When it expires, a :class:`~baf.library.transition.events.base_events.TimerEvent`
+        is sent to the session, which can trigger transitions defined with
+        :meth:`~baf.core.state.State.when_timer_expired`.
+
+        Starting a timer that is already running restarts it.
+
+        Args:
+            name (str): the timer name
+            delay (float): the time (in seconds) until the timer expires
+        """
+        event_loop = self._event_loop
+        if event_loop is None:
+            logger.warning(f'Cannot start timer {name} in session {self.id}: the session is not running')
+            return
+
+        def arm():
+            if self._event_loop is None:
+                return
+            if name in self._timers:
+                self._timers[name].cancel()
+            self._timers[name] = event_loop.call_later(delay, self._expire_timer, name)
+
+        event_loop.call_soon_threadsafe(arm)
+
+    def cancel_timer(self, name: str) -> None:
+        """Cancel a running session timer, if it exists.
+
+        Args:
+            name (str): the timer name
+        """
+        event_loop = self._event_loop
+        if event_loop is None:
+            return
+
+        def disarm():
+            timer = self._timers.pop(name, None)
+            if timer:
+                timer.cancel()
+
+        event_loop.call_soon_threadsafe(disarm)
+
+    def _expire_timer(self, name: str) -> None:
+        """Send the event of an expired timer to the session.
+
+        Args:
+            name (str): the timer name
+        """
+        self._timers.pop(name, None)
+        if self._event_loop is None:
+            return
+        self._agent.receive_event(TimerEvent(name, self.id))
 
     def _run_event_thread(self) -> None:
-        """Start the thread managing external events"""
-        self._event_loop = asyncio.new_event_loop()
-
-        def start_event_loop():
-            logger.debug(f'Starting Event Loop for session: {self.id}')
-            # Wait for the platform to finish starting before running the agent.
-            # Platforms run in their own threads and may not be ready immediately.
-            timeout = 30  # seconds
-            elapsed = 0.0
-            interval = 0.05  # 50ms polling interval
-            while not self._platform.running:
-                if elapsed >= timeout:
-                    logger.error(f'Platform did not start within {timeout}s for session {self.id}. Aborting session start.')
-                    return
-                time.sleep(interval)
-                elapsed += interval
-            asyncio.set_event_loop(self._event_loop)
-            asyncio.get_event_loop().call_soon(self.manage_transition)
-            self._event_loop.run_forever()
-            logger.debug(f'Event Loop stopped for: {self.id}')
-
-        thread = threading.Thread(target=start_event_loop)
-        self._event_thread = thread
-        thread.start()
+        """Start managing external events, on the event loop assigned by the agent's session scheduler"""
+        self._agent.scheduler.add_session(self)
 
     def _stop_event_thread(self) -> None:
-        """Stop the thread managing external events"""
-        self._event_loop.stop()
-        self._event_thread.join()
-        self._event_loop = None
-        self._event_thread = None
+        """Stop managing external events, releasing the event loop assigned by the agent's session scheduler"""
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+        self._agent.scheduler.remove_session(self)
 
     def get_chat_history(self, n: int = None, until_timestamp: datetime = None) -> list[Message]:
         """Get the history of messages between this session and its agent.
 
+        The most recent messages are kept in memory. The monitoring database is only read when the requested messages
+        are older than the in-memory ones.
+
         Args:
             n (int or None): the number of messages to get (from the most recents). If none is provided, gets all the
                 messages
+            until_timestamp (datetime or None): if provided, gets only the messages up to this timestamp
 
         Returns:
             list[Message]: the conversation history
         """
         chat_history: list[Message] = []
         if self._agent.get_property(DB_MONITORING) and self._agent._monitoring_db.connected:
+            buffered_history = self._get_buffered_chat_history(n, until_timestamp)
+            if buffered_history is not None:
+                return buffered_history
             chat_df: DataFrame = self._agent._monitoring_db.select_chat(self, n=n, until_timestamp=until_timestamp)
-            for i, row in chat_df.iterrows():
-                t = get_message_type(row['type'])
-                chat_history.append(Message(t=t, content=row['content'], is_user=row['is_user'], timestamp=row['timestamp']))
+            # Iterating the columns is much faster than iterating the rows (DataFrame.iterrows creates a Series per row)
+            for t, content, is_user, timestamp in zip(chat_df['type'], chat_df['content'], chat_df['is_user'],
+                                                      chat_df['timestamp']):
+                chat_history.append(Message(t=get_message_type(t), content=content, is_user=bool(is_user),
+                                            timestamp=timestamp))
         else:
             logger.warning('Could not retrieve the chat history from the database.')
         return chat_history
 
+    def _get_buffered_chat_history(self, n: int or None, until_timestamp: datetime or None) -> list[Message] or None:
+        """Get the history of messages between this session and its agent from the in-memory chat history.
+
+        Args:
+            n (int or None): the number of messages to get (from the most recents). If none is provided, gets all the
+                messages
+            until_timestamp (datetime or None): if provided, gets only the messages up to this timestamp
+
+        Returns:
+            list[Message] or None: the conversation history, or None if some of the requested messages are not in
+            memory
+        """
+        if self._chat_history.maxlen == 0:
+            return None
+        with self._chat_history_lock:
+            chat_history = list(self._chat_history)
+            complete = self._chat_history_complete
+        if until_timestamp is not None:
+            end = bisect.bisect_right(chat_history, until_timestamp, key=attrgetter('timestamp'))
+            chat_history = chat_history[:end]
+        if n and len(chat_history) >= n:
+            return chat_history[-n:]
+        if complete:
+            return chat_history
+        return None
+
     def save_message(self, message: Message) -> None:
-        """Save a message in the dedicated chat DB
+        """Save a message in the dedicated chat DB, and in the in-memory chat history of the session.
 
         Args:
             message (Message): the message to save
         """
+        if self._agent.get_property(DB_MONITORING) and self._agent._monitoring_db.connected:
+            # The content is serialized only once (e.g. files), for both the database and the in-memory chat history
+            message = Message(t=message.type, content=self._agent._monitoring_db.chat_content(message),
+                              is_user=message.is_user, timestamp=message.timestamp)
+            self._buffer_message(message)
         self._agent._monitoring_db_insert_chat(self, message)
 
+    def _buffer_message(self, message: Message) -> None:
+        """Add a message to the in-memory chat history of the session, discarding the oldest one if it is full.
+
+        Args:
+            message (Message): the message to add
+        """
+        if self._chat_history.maxlen == 0 or message.timestamp is None:
+            return
+        # The message is stored as it would be read from the monitoring database
+        buffered_message = Message(t=message.type, content=str(message.content), is_user=message.is_user,
+                                   timestamp=message.timestamp)
+        with self._chat_history_lock:
+            if len(self._chat_history) == self._chat_history.maxlen:
+                self._chat_history.popleft()
+                self._chat_history_complete = False
+            if not self._chat_history or self._chat_history[-1].timestamp <= message.timestamp:
+                self._chat_history.append(buffered_message)
+            else:
+                # Keep the chronological order (e.g. messages created and saved by different threads)
+                i = bisect.bisect_right(self._chat_history, message.timestamp, key=attrgetter('timestamp'))
+                self._chat_history.insert(i, buffered_message)
+
     def set(self, key: str, value: Any) -> None:
         """Set an entry to the session private data storage.
 
+        If the monitoring database is enabled, only the changed entry is stored. Values that are not JSON serializable
+        are kept in the session, but not stored in the database.
+
         Args:
             key (str): the entry key
             value (Any): the entry value
         """
         self._dictionary[key] = value
-        try:
-            self._agent._monitoring_db_store_session_variables(self)
-        except Exception as e:
-            logger.error(f"Failed to store session variables to the database for session {self.id}: {e}", exc_info=True)
+        self._unserializable = False
+        self._store_variable(key)
+        self._variable_changed(key)
 
     def get(self, key: str, default: Any = None) -> Any:
         """Get an entry of the session private data storage.
@@ -236,6 +379,71 @@ class Session:
         except Exception as e:
             logger.error(f"Failed to delete key '{key}' from session {self.id}: {e}", exc_info=True)
             return None
+        self._unserializable = False
+        self._store_variable(key)
+        self._variable_changed(key)
+
+    def _store_variable(self, key: str) -> None:
+        """Store a changed session variable in the monitoring database (if enabled).
+
+        The value is serialized right away, so values that cannot be stored are detected when they are set. Within a
+        :meth:`_coalesce_variables` block, the changed variables are stored together at the end of the block.
+
+        Args:
+            key (str): the name of the changed variable
+        """
+        if not (self._agent.get_property(DB_MONITORING) and self._agent._monitoring_db.connected):
+            return
+        value = None
+        if key in self._dictionary:
+            try:
+                value = json.dumps(self._dictionary[key])
+            except (TypeError, ValueError) as e:
+                # The previously stored value (if any) is deleted, so it is not restored with the session
+                logger.warning(f"Session variable '{key}' of session {self.id} is not JSON serializable, it will not "
+                               f"be stored in the monitoring database: {e}")
+        with self._variables_lock:
+            self._dirty_variables[key] = value
+            coalescing = self._coalesce_depth > 0
+        if not coalescing:
+            self._flush_variables()
+
+    def _flush_variables(self) -> None:
+        """Store the session variables changed since the last call in the monitoring database."""
+        with self._variables_lock:
+            if not self._dirty_variables:
+                return
+            variables, self._dirty_variables = self._dirty_variables, {}
+        try:
+            self._agent._monitoring_db_store_session_variables(self, variables)
+        except Exception as e:
+            logger.error(f"Failed to store session variables to the database for session {self.id}: {e}", exc_info=True)
+
+    @contextmanager
+    def _coalesce_variables(self):
+        """Context manager that stores the session variables changed within it (e.g. in a state body) in a single
+        database write, when it exits."""
+        with self._variables_lock:
+            self._coalesce_depth += 1
+        try:
+            yield
+        finally:
+            with self._variables_lock:
+                self._coalesce_depth -= 1
+                coalescing = self._coalesce_depth > 0
+            if not coalescing:
+                self._flush_variables()
+
+    def _variable_changed(self, key: str) -> None:
+        """Wake up the transitions evaluation if the current state has a transition that depends on a changed session
+        variable.
+
+        Args:
+            key (str): the name of the changed variable
+        """
+        if self._current_state.watches_variable(key):
+            self.call_manage_transition()
+
     def get_dictionary(self) -> dict[str, Any]:
         """
         Returns the private data dictionary for this session.
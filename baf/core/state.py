@@ -1,13 +1,14 @@
 import inspect
 import traceback
-from collections import deque
 from typing import Any, Callable, TYPE_CHECKING, Union
 
 from baf.core.transition.event import Event
+from baf.core.transition.dispatch_table import TransitionDispatchTable
 from baf.core.transition.transition import Transition
 from baf.core.transition.transition_builder import TransitionBuilder
 from baf.library.intent.intent_library import fallback_intent
-from baf.library.transition.events.base_events import ReceiveTextEvent, ReceiveFileEvent, WildcardEvent, ReceiveJSONEvent
+from baf.library.transition.events.base_events import ReceiveTextEvent, ReceiveFileEvent, WildcardEvent, ReceiveJSONEvent, \
+    TimerEvent
 from baf.library.transition.conditions import IntentMatcher, VariableOperationMatcher
 from baf.core.transition.condition import Condition
 from baf.core.intent.intent import Intent
@@ -48,6 +49,8 @@ class State:
             intent)
         _ic_config (IntentClassifierConfiguration): the intent classifier configuration of the state
         _transition_counter (int): Count the number of transitions of this state. Used to name the transitions.
+        _dispatch_table (TransitionDispatchTable or None): The compiled transitions of the state (see
+            :meth:`compile_transitions`)
         intents (list[Intent]): The state intents, i.e. those that can be matched from a specific state
         transitions (list[Transition]): The state's transitions to other states
     """
@@ -68,6 +71,7 @@ class State:
             ic_config = SimpleIntentClassifierConfiguration()
         self._ic_config: IntentClassifierConfiguration = ic_config
         self._transition_counter: int = 0
+        self._dispatch_table: TransitionDispatchTable or None = None
         self.intents: list[Intent] = []
         self.transitions: list[Transition] = []
 
@@ -110,6 +114,43 @@ class State:
         self._transition_counter += 1
         return f"t_{self._transition_counter}"
 
+    def compile_transitions(self) -> TransitionDispatchTable:
+        """Compile the state transitions into a dispatch table, used to efficiently find the transitions triggered by
+        the session events.
+
+        The agent compiles the transitions of all its states when it is trained. The table is compiled again if the
+        transitions of the state change afterwards (i.e., transitions are added, removed, replaced or reordered).
+
+        Returns:
+            TransitionDispatchTable: the compiled transitions
+        """
+        table = self._dispatch_table
+        if table is None or table.transitions != self.transitions:
+            table = TransitionDispatchTable(self.transitions)
+            self._dispatch_table = table
+        return table
+
+    def watches_variable(self, key: str) -> bool:
+        """Check if a change on a session variable may satisfy a transition of this state.
+
+        Args:
+            key (str): the name of the session variable
+
+        Returns:
+            bool: true if some transition condition depends on the variable (or on unknown variables), false otherwise
+        """
+        variables = self.compile_transitions().variables
+        return variables is None or key in variables
+
+    def requires_polling(self) -> bool:
+        """Check if this state has condition-only transitions whose condition depends on unknown variables (e.g.
+        time-based conditions), which can only be satisfied by evaluating them periodically.
+
+        Returns:
+            bool: true if the state transitions require polling, false otherwise
+        """
+        return self.compile_transitions().requires_polling
+
     def set_global(self, intent: Intent):
         """Set state as globally accessible state.
 
@@ -264,6 +305,21 @@ class State:
         transition_builder: TransitionBuilder = TransitionBuilder(source=self, condition=condition)
         return transition_builder
 
+    def when_timer_expired(self, timer_name: str) -> TransitionBuilder:
+        """Start the definition of a "timer expired" transition on this state.
+
+        Timers are started with :meth:`~baf.core.session.Session.start_timer`.
+
+        Args:
+            timer_name (str): the name of the timer
+
+        Returns:
+            TransitionBuilder: the transition builder
+        """
+        event = TimerEvent(timer_name)
+        transition_builder: TransitionBuilder = TransitionBuilder(source=self, event=event)
+        return transition_builder
+
     def when_file_received(self, allowed_types: list[str] or str = None) -> TransitionBuilder:
         """Start the definition of a "file received" transition on this state.
 
@@ -294,52 +350,98 @@ class State:
         If a user message event is received but does not match the transition, run the fallback body (and the event is
         removed from the session queue of events)
 
+        The candidate transitions of each event are found in the state :class:`TransitionDispatchTable` (see
+        :meth:`compile_transitions`).
+
         Args:
             session (Session): the current session
         """
+        table = self.compile_transitions()
         last_event = session.event
-        run_fallback = False
-        for i, next_transition in enumerate(self.transitions):
-            if next_transition.is_event():
-                # TODO: Decide policy to remove events
-                fallback_deque = deque()
-                while session.events:
-                    session.event = session.events.pop()
-                    if isinstance(session.event, ReceiveTextEvent):
-                        session.event.predict_intent(session)
-                    elif isinstance(session.event, ReceiveJSONEvent) and session.event.contains_message:
-                        session.event.predict_intent(session)
-                    if next_transition.evaluate(session, session.event):
-                        session.move(next_transition)
-                        # TODO: Make this configurable (we can consider remove all the previously checked events)
-                        session.events.extend(fallback_deque)  # We restore the queue but with the matched event removed
-                        return
-                    if (isinstance(session.event, ReceiveTextEvent) and session.event.human) or (isinstance(session.event, ReceiveJSONEvent) and session.event.contains_message and session.event.human):
-                        # There is a ReceiveTextEvent or ReceiveJSONEvent (with message) and we couldn't match any transition so far
-                        run_fallback = True
-                        if i < len(self.transitions)-1:
-                            # We only append ReceiveTextEvent or ReceiveJSONEvent (human with message) if we didn't finish checking all transitions
-                            fallback_deque.appendleft(session.event)
-                    else:
-                        fallback_deque.appendleft(session.event)
-                session.events.extend(fallback_deque)
-            else:
-                if next_transition.is_condition_true(session):
-                    session.move(next_transition)
-                    return
-        if run_fallback:
+        transitions = table.transitions
+        # Conditions of the transitions with higher priority than any event transition are checked first, without
+        # having to predict the intent of the received messages
+        for i in table.condition_transitions:
+            if i > table.first_event_transition:
+                break
+            if transitions[i].is_condition_true(session):
+                session.move(transitions[i])
+                return
+        events: list[Event] = []
+        while session.events:
+            events.append(session.events.pop())  # From the oldest to the newest
+        match: tuple[int, int] or None = None  # (transition index, event index)
+        if table.has_event_transitions:
+            for k, event in enumerate(events):
+                session.event = event
+                if isinstance(event, ReceiveTextEvent):
+                    event.predict_intent(session)
+                elif isinstance(event, ReceiveJSONEvent) and event.contains_message:
+                    event.predict_intent(session)
+                limit = match[0] if match else len(transitions)
+                for j in table.candidates(event):
+                    if j >= limit:
+                        break
+                    if transitions[j].evaluate(session, event):
+                        match = (j, k)
+                        break
+        # Condition transitions with higher priority than the matched event transition
+        limit = match[0] if match else len(transitions)
+        for i in table.condition_transitions:
+            if i < table.first_event_transition:
+                continue
+            if i >= limit:
+                break
+            if transitions[i].is_condition_true(session):
+                session.events.extend(reversed(events))
+                session.move(transitions[i])
+                return
+        human_messages_consumed = table.last_is_event
+        if match:
+            j, k = match
+            # When the last transition is checked, the previous unmatched user messages are consumed
+            human_messages_consumed = human_messages_consumed and j == len(transitions) - 1
+            session.events.extend(reversed([
+                event for n, event in enumerate(events)
+                if n != k and not (n < k and human_messages_consumed and self._is_human_message(event))
+            ]))
+            session.event = events[k]
+            session.move(transitions[j])
+            return
+        human_messages = [event for event in events if self._is_human_message(event)]
+        if human_messages_consumed:
+            events = [event for event in events if not self._is_human_message(event)]
+        session.events.extend(reversed(events))
+        if table.has_event_transitions and human_messages:
+            # The fallback body gets the last unmatched user message
+            session.event = human_messages[-1]
             # There was one or more transitions with ReceiveMessageEvent and one ReceiveMessageEvent (human)
             # that didn't match any transition
             self._agent._monitoring_db_insert_intent_prediction(session, session.event.predicted_intent)  # insert fallback intent in DB
             logger.info(f"[{self._name}] Running fallback body {self._fallback_body.__name__}")
             try:
-                self._fallback_body(session)
+                with session._coalesce_variables():
+                    self._fallback_body(session)
             except Exception as _:
                 logger.error(f"An error occurred while executing '{self._fallback_body.__name__}' of state"
                             f"'{self._name}' in agent '{self._agent.name}'. See the attached exception:")
                 traceback.print_exc()
         session.event = last_event
 
+    @staticmethod
+    def _is_human_message(event: Event) -> bool:
+        """Check if an event is a message sent by a human, which runs the fallback body when it does not trigger any
+        transition.
+
+        Args:
+            event (Event): the event to check
+
+        Returns:
+            bool: true if the event is a text message (or a JSON message with text) from a human
+        """
+        return (isinstance(event, ReceiveTextEvent) and event.human) or \
+            (isinstance(event, ReceiveJSONEvent) and event.contains_message and event.human)
+
     def run(self, session: Session) -> None:
         """Run the state body.
 
@@ -348,7 +450,8 @@ class State:
         """
         logger.info(f"[{self._name}] Running body {self._body.__name__}")
         try:
-            self._body(session)
+            with session._coalesce_variables():
+                self._body(session)
         except Exception as _:
             logger.error(f"An error occurred while executing '{self._body.__name__}' of state '{self._name}' in agent '"
                          f"{self._agent.name}'. See the attached exception:")
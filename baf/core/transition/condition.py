@@ -11,15 +11,25 @@ class Condition:
     A condition embeds a boolean function. An agent can define transitions from one state to another based on the
     fulfillment of a condition.
 
+    A condition can declare the session variables it depends on. When these are known, the agent re-evaluates the
+    transition only when one of them changes (see :meth:`~baf.core.session.Session.set`). Otherwise, the condition is
+    considered opaque: it is re-evaluated whenever any session variable changes, and periodically if transitions
+    polling is enabled (see :any:`agent properties <properties-agent>`).
+
     Args:
         function (Callable[[Session], bool]): the condition function. It takes the user session as parameter.
+        variables (set[str] or None): the names of the session variables the condition depends on. None if they are
+            unknown
 
     Attributes:
         function (Callable[[Session], bool]): the condition function. It takes the user session as parameter.
+        variables (set[str] or None): the names of the session variables the condition depends on. None if they are
+            unknown
     """
 
-    def __init__(self, function: Callable[['Session'], bool]):
+    def __init__(self, function: Callable[['Session'], bool], variables: set[str] or None = None):
         self.function: Callable[['Session'], bool] = function
+        self.variables: set[str] or None = variables
 
     def __call__(self, session: 'Session') -> bool:
         return self.function(session)
@@ -45,7 +55,11 @@ class Conjunction(Condition):
     def __init__(self, cond1: Condition, cond2: Condition):
         def conjunction(session: Session) -> bool:
             return cond1.function(session) and cond2.function(session)
-        super().__init__(conjunction)
+        if cond1.variables is None or cond2.variables is None:
+            variables = None
+        else:
+            variables = cond1.variables | cond2.variables
+        super().__init__(conjunction, variables)
         self.log: str = f"{cond1} and {cond2}"
 
     def __str__(self):
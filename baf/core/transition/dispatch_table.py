@@ -0,0 +1,115 @@
+from heapq import merge
+
+from baf.core.transition.event import Event
+from baf.core.transition.transition import Transition
+from baf.library.transition.conditions import IntentMatcher
+from baf.library.transition.events.base_events import ReceiveMessageEvent, TimerEvent
+
+_INSTANCE_MATCHERS = {Event.is_matching, ReceiveMessageEvent.is_matching, TimerEvent.is_matching}
+"""The event matching functions that only match events that are instances of the class of the transition event. The
+transitions of events with these functions can be indexed by event class."""
+
+
+class TransitionDispatchTable:
+    """The compiled transitions of a state.
+
+    Instead of evaluating all the state transitions against every received event, the transitions waiting for an event
+    are indexed by the class of their event and, for intent matching transitions, by the name of their target intent.
+    So, finding the transitions that may be triggered by an event is a dictionary lookup, and only their events and
+    conditions are evaluated.
+
+    Transitions whose event can match events of any class (e.g. a
+    :class:`~baf.library.transition.events.base_events.WildcardEvent`, or a custom event that overrides
+    :meth:`~baf.core.transition.event.Event.is_matching`) are candidates for all events.
+
+    The table also stores which session variables the transition conditions depend on (see
+    :attr:`~baf.core.transition.condition.Condition.variables`).
+
+    Args:
+        transitions (list[Transition]): the transitions of the state, in priority order
+
+    Attributes:
+        transitions (list[Transition]): The compiled transitions, in priority order
+        condition_transitions (list[int]): The indexes of the transitions that do not wait for an event
+        first_event_transition (int): The index of the first transition that waits for an event (or the number of
+            transitions if there is none)
+        last_is_event (bool): Whether the last transition waits for an event
+        variables (set[str] or None): The session variables the transition conditions depend on. None if some
+            condition depends on unknown variables
+        requires_polling (bool): Whether some transition that does not wait for an event has a condition that depends
+            on unknown variables
+        _generic (list[int]): The indexes of the event transitions that can match events of any class
+        _by_class (dict[type, list[int]]): The indexes of the event transitions, indexed by event class
+        _by_intent (dict[type, dict[str, list[int]]]): The indexes of the intent matching transitions, indexed by event
+            class and target intent name
+        _candidates (dict[tuple[type, str or None], tuple[int, ...]]): Cache of the candidate transitions for each
+            event class and predicted intent name
+    """
+
+    def __init__(self, transitions: list[Transition]):
+        self.transitions: list[Transition] = list(transitions)
+        self.condition_transitions: list[int] = []
+        self.last_is_event: bool = bool(transitions) and transitions[-1].is_event()
+        self.variables: set[str] or None = set()
+        self.requires_polling: bool = False
+        self._generic: list[int] = []
+        self._by_class: dict[type, list[int]] = {}
+        self._by_intent: dict[type, dict[str, list[int]]] = {}
+        self._candidates: dict[tuple[type, str or None], tuple[int, ...]] = {}
+        for i, transition in enumerate(self.transitions):
+            self._add(i, transition)
+        self.first_event_transition: int = next(
+            (i for i, transition in enumerate(self.transitions) if transition.is_event()), len(self.transitions)
+        )
+
+    def _add(self, i: int, transition: Transition) -> None:
+        condition = transition.condition
+        if condition is not None:
+            if condition.variables is None:
+                self.variables = None
+                if not transition.is_event():
+                    self.requires_polling = True
+            elif self.variables is not None:
+                self.variables |= condition.variables
+        if not transition.is_event():
+            self.condition_transitions.append(i)
+            return
+        event_class = transition.event.__class__
+        if event_class.is_matching not in _INSTANCE_MATCHERS:
+            self._generic.append(i)
+        elif isinstance(condition, IntentMatcher):
+            self._by_intent.setdefault(event_class, {}).setdefault(condition._intent.name, []).append(i)
+        else:
+            self._by_class.setdefault(event_class, []).append(i)
+
+    def __len__(self):
+        return len(self.transitions)
+
+    @property
+    def has_event_transitions(self) -> bool:
+        """bool: Whether some transition waits for an event."""
+        return len(self.condition_transitions) < len(self.transitions)
+
+    def candidates(self, event: Event) -> tuple[int, ...]:
+        """Get the transitions that may be triggered by an event.
+
+        Args:
+            event (Event): the received event. If it has a predicted intent, it must have already been predicted
+
+        Returns:
+            tuple[int, ...]: the indexes of the candidate transitions, in priority order
+        """
+        predicted_intent = getattr(event, 'predicted_intent', None)
+        intent_name = predicted_intent.intent.name if predicted_intent is not None else None
+        key = (event.__class__, intent_name)
+        candidates = self._candidates.get(key)
+        if candidates is None:
+            lists = [self._generic]
+            for event_class in event.__class__.__mro__:
+                if event_class in self._by_class:
+                    lists.append(self._by_class[event_class])
+                if intent_name is not None and intent_name in self._by_intent.get(event_class, {}):
+                    lists.append(self._by_intent[event_class][intent_name])
+            candidates = tuple(merge(*lists))
+            self._candidates[key] = candidates
+        return candidates
@@ -17,6 +17,11 @@ DB_MONITORING_DIALECT = Property('db.monitoring.dialect', str, None)
 """
 The database dialect (e.g., ``postgresql``).
 
+The embedded dialects do not need a database server: with ``sqlite``, the monitoring database is a SQLite file (whose
+path is ``db.monitoring.database``). ``duckdb`` uses the same SQLite file to store the records, and runs the analytical
+queries of the monitoring UI (e.g. counts per day) with `DuckDB <https://duckdb.org>`_ (the ``duckdb-engine`` package
+must be installed). The host, port, username and password are ignored in both cases.
+
 name: ``db.monitoring.dialect``
 
 type: ``str``
@@ -48,7 +53,7 @@ default value: ``None``
 
 DB_MONITORING_DATABASE = Property('db.monitoring.database', str, None)
 """
-The database name.
+The database name (or, in the ``sqlite`` and ``duckdb`` dialects, the path of the SQLite database file).
 
 name: ``db.monitoring.database``
 
@@ -78,3 +83,144 @@ type: ``str``
 
 default value: ``None``
 """
+
+DB_MONITORING_POOL_SIZE = Property('db.monitoring.pool.size', int, 5)
+"""
+The number of connections kept open in the connection pool of the monitoring database. Each database operation checks
+out a connection from the pool, so several sessions can access the database at the same time.
+
+name: ``db.monitoring.pool.size``
+
+type: ``int``
+
+default value: ``5``
+"""
+
+DB_MONITORING_POOL_MAX_OVERFLOW = Property('db.monitoring.pool.max_overflow', int, 10)
+"""
+The number of connections that can be opened beyond ``db.monitoring.pool.size`` when all the pooled connections are in
+use. They are closed when they are returned to the pool.
+
+name: ``db.monitoring.pool.max_overflow``
+
+type: ``int``
+
+default value: ``10``
+"""
+
+DB_MONITORING_POOL_RECYCLE = Property('db.monitoring.pool.recycle', int, -1)
+"""
+The number of seconds after which a pooled connection is replaced by a new one (e.g., to avoid using connections closed
+by the database server after some idle time). ``-1`` means that connections are never recycled.
+
+name: ``db.monitoring.pool.recycle``
+
+type: ``int``
+
+default value: ``-1``
+"""
+
+DB_MONITORING_POOL_TIMEOUT = Property('db.monitoring.pool.timeout', float, 30.0)
+"""
+The number of seconds to wait for a connection of the pool to be available before failing.
+
+name: ``db.monitoring.pool.timeout``
+
+type: ``float``
+
+default value: ``30.0``
+"""
+
+DB_MONITORING_WRITE_QUEUE_SIZE = Property('db.monitoring.write_queue.max_size', int, 10000)
+"""
+The maximum number of monitoring records (chat messages, transitions, intent predictions and events) waiting to be
+written in the monitoring database. The records are written by a background thread; when the queue is full, the agent
+waits until there is room for new records.
+
+name: ``db.monitoring.write_queue.max_size``
+
+type: ``int``
+
+default value: ``10000``
+"""
+
+DB_MONITORING_WRITE_BATCH_SIZE = Property('db.monitoring.write_batch.max_size', int, 100)
+"""
+The maximum number of monitoring records written at once (with a multi-row insert per table, in a single transaction).
+
+name: ``db.monitoring.write_batch.max_size``
+
+type: ``int``
+
+default value: ``100``
+"""
+
+DB_MONITORING_WRITE_BATCH_MAX_WAIT = Property('db.monitoring.write_batch.max_wait', float, 0.5)
+"""
+The maximum time (in seconds) a monitoring record waits for other records to be written in the same batch.
+
+name: ``db.monitoring.write_batch.max_wait``
+
+type: ``float``
+
+default value: ``0.5``
+"""
+
+DB_MONITORING_PARTITION_INTERVAL = Property('db.monitoring.partition.interval', str, None)
+"""
+The time interval of the partitions of the monitoring tables that grow over time (chat, event and intent_prediction):
+``day``, ``week`` or ``month``. Each partition contains the records of an interval, so that expired records can be
+removed by dropping whole partitions (see ``db.monitoring.retention.days``). If None, the tables are not partitioned.
+
+PostgreSQL databases use native declarative partitioning. In SQLite databases, each partition is a table, and the
+records of all the partitions are read through a view.
+
+Only the tables created while this property is set are partitioned (existing tables are not modified).
+
+name: ``db.monitoring.partition.interval``
+
+type: ``str``
+
+default value: ``None``
+"""
+
+DB_MONITORING_RETENTION_DAYS = Property('db.monitoring.retention.days', int, 0)
+"""
+The number of days the monitoring records of the tables that grow over time (chat, event and intent_prediction) are
+kept. Older records are removed when the agent starts and, in partitioned tables, every time a new partition is
+created. If 0, the records are kept forever.
+
+name: ``db.monitoring.retention.days``
+
+type: ``int``
+
+default value: ``0``
+"""
+
+DB_MONITORING_FILE_STORAGE = Property('db.monitoring.files.storage', str, 'inline')
+"""
+How the files exchanged in the conversations are stored in the chat table of the monitoring database:
+
+- ``inline``: the whole file, base64-encoded.
+- ``hash``: only the name, type, size and SHA-256 digest of the file. Its content is not stored.
+- ``reference``: the name, type, size and SHA-256 digest of the file, and the path of a copy of the file in
+  ``db.monitoring.files.path`` (identical files are stored once).
+
+name: ``db.monitoring.files.storage``
+
+type: ``str``
+
+default value: ``inline``
+"""
+
+DB_MONITORING_FILES_PATH = Property('db.monitoring.files.path', str, 'monitoring_files')
+"""
+The directory where the files exchanged in the conversations are stored, with the ``reference`` file storage (see
+``db.monitoring.files.storage``).
+
+name: ``db.monitoring.files.path``
+
+type: ``str``
+
+default value: ``monitoring_files``
+"""
@@ -1,9 +1,14 @@
 from __future__ import annotations
 
+import hashlib
 import re
-from typing import TYPE_CHECKING, Any
+import threading
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Any, Iterator
 
-from sqlalchemy import create_engine, inspect, text
+import pandas as pd
+from sqlalchemy import TextClause, create_engine, inspect, text
 from sqlalchemy.engine import Connection, Engine, URL
 
 from baf.exceptions.logger import logger
@@ -12,12 +17,27 @@ if TYPE_CHECKING:
     from baf.core.agent import Agent
     from baf.nlp.llm.llm import LLM
 
+Parameters = dict[str, Any] | list[dict[str, Any]] | None
+"""The bound parameters of a SQL query: a dict of values, or a list of dicts to execute the query once per dict"""
+
 
 class DBHandler:
     """Relational database handler for agent business data.
 
     The handler reads SQL database definitions from ``db.sql`` in the agent
-    configuration and opens connections lazily when they are first needed.
+    configuration and creates a connection pool for each one lazily, when it is
+    first needed. The pools are shared safely by all the agent sessions.
+
+    Natural language queries are translated into SQL by an LLM, given the schema of
+    the database. The schema description of each database is cached (for
+    ``schema_cache_ttl`` seconds, or until it is invalidated), and so are the
+    translations (up to ``sql_cache_size`` per database), keyed by the LLM, the
+    normalized question and the schema fingerprint. This way, repeated questions
+    do not call the LLM again, unless the schema changes.
+
+    Attributes:
+        cache_stats (dict[str, int]): The hits and misses of the schema and SQL
+            caches (``schema_hits``, ``schema_misses``, ``sql_hits``, ``sql_misses``)
     """
 
     _DEFAULT_REQUIRED_DB_FIELDS = {'dialect', 'host', 'port', 'database', 'username', 'password'}
@@ -26,12 +46,25 @@ class DBHandler:
         'postgres': {'dialect', 'host', 'port', 'database', 'username', 'password'}
     }
     _SQL_COMMAND_PATTERN = re.compile(r'^\s*(?:/\*.*?\*/\s*|--.*?(?:\n|\r\n?)\s*)*([a-zA-Z]+)', re.DOTALL)
+    _SCHEMA_SQL_COMMANDS = {'create', 'drop', 'alter'}
+    _DEFAULT_SQL_CACHE_SIZE = 256
+    _STATEMENT_CACHE_SIZE = 512
+    _POOL_SETTINGS = {'pool_size': int, 'max_overflow': int, 'pool_recycle': int, 'pool_timeout': float}
 
     def __init__(self, agent: 'Agent'):
         self._agent: 'Agent' = agent
         self._db_configs: dict[str, dict[str, Any]] = self._extract_db_configs(agent.config)
         self._engines: dict[str, Engine] = {}
+        self._engines_lock: threading.Lock = threading.Lock()
         self._connections: dict[str, Connection] = {}
+        # SQL query -> statement, from the least to the most recently used
+        self._statements: OrderedDict[str, TextClause] = OrderedDict()
+        # db_name -> (schema description, schema fingerprint, creation time)
+        self._schema_cache: dict[str, tuple[str, str, float]] = {}
+        # db_name -> {(llm name, normalized question, schema fingerprint): SQL}, from the least to the most recently used
+        self._sql_cache: dict[str, OrderedDict[tuple[str, str, str], str]] = {}
+        self._cache_lock: threading.Lock = threading.Lock()
+        self.cache_stats: dict[str, int] = {'schema_hits': 0, 'schema_misses': 0, 'sql_hits': 0, 'sql_misses': 0}
 
     @property
     def db_names(self) -> list[str]:
@@ -97,31 +130,71 @@ class DBHandler:
             logger.error("Could not build DB URL for '%s': %s", db_name, exc)
             return None
 
+    def get_engine(self, db_name: str) -> Engine | None:
+        """Get or create the engine (i.e., the connection pool) of a configured DB.
+
+        The engine is shared by all the agent sessions: each query checks out a
+        connection from the pool and returns it when it is done, so sessions running
+        in different threads never share a connection. The pool can be configured
+        with the ``pool_size``, ``max_overflow``, ``pool_recycle`` and
+        ``pool_timeout`` properties of the DB.
+        """
+        engine = self._engines.get(db_name)
+        if engine is not None:
+            return engine
+
+        with self._engines_lock:
+            if db_name in self._engines:
+                return self._engines[db_name]
+
+            if db_name not in self._db_configs:
+                logger.error(
+                    "Unknown database '%s'. Available databases: %s",
+                    db_name,
+                    ', '.join(self.db_names) or 'none',
+                )
+                return None
+
+            db_config = self._db_configs[db_name]
+            if not self._validate_db_config(db_name, db_config):
+                return None
+
+            url = self._build_db_url(db_name)
+            if url is None:
+                return None
+
+            pool_settings = {}
+            for name, target_type in self._POOL_SETTINGS.items():
+                value = self._db_setting(db_name, name, None, target_type)
+                if value is not None:
+                    pool_settings[name] = value
+            try:
+                engine = create_engine(url, **pool_settings)
+                # Fail early if the DB is not reachable
+                with engine.connect():
+                    pass
+            except Exception as exc:
+                logger.error("Could not connect to database '%s': %s", db_name, exc)
+                return None
+            self._engines[db_name] = engine
+            return engine
+
     def connect_to_db(self, db_name: str) -> Connection | None:
-        """Get or create an active SQLAlchemy connection for a configured DB."""
+        """Get or create a dedicated SQLAlchemy connection for a configured DB.
+
+        The connection stays open until :meth:`close_all`, and must not be used by
+        several threads at the same time. The query methods of the handler do not
+        use it: they check out a connection from the pool (see :meth:`get_engine`).
+        """
         if db_name in self._connections:
             return self._connections[db_name]
 
-        if db_name not in self._db_configs:
-            logger.error(
-                "Unknown database '%s'. Available databases: %s",
-                db_name,
-                ', '.join(self.db_names) or 'none',
-            )
-            return None
-
-        db_config = self._db_configs[db_name]
-        if not self._validate_db_config(db_name, db_config):
-            return None
-
-        url = self._build_db_url(db_name)
-        if url is None:
+        engine = self.get_engine(db_name)
+        if engine is None:
             return None
 
         try:
-            engine = create_engine(url)
             connection = engine.connect()
-            self._engines[db_name] = engine
             self._connections[db_name] = connection
             return connection
         except Exception as exc:
@@ -129,7 +202,7 @@ class DBHandler:
             return None
 
     def close_all(self) -> None:
-        """Close all opened DB connections."""
+        """Close all opened DB connections and connection pools."""
         for db_name, connection in list(self._connections.items()):
             try:
                 connection.close()
@@ -145,21 +218,26 @@ class DBHandler:
         self._connections.clear()
         self._engines.clear()
 
-    def query(self, db_name: str, query: str, llm: 'LLM | None' = None) -> Any:
+    def query(self, db_name: str, query: str, llm: 'LLM | None' = None, parameters: Parameters = None) -> Any:
         """Execute a SQL query.
 
         If ``llm`` is provided, ``query`` is treated as natural language and first
         translated into SQL using the schema of ``db_name`` as context.
+
+        The query can have bound parameters (e.g. ``WHERE city = :city``), whose
+        values are given in ``parameters`` (a list of dicts executes the query once
+        per dict). Prefer them over formatting the values into the query: the
+        statement is then the same for all the values, so it is compiled only once.
         """
         sql_query = self._resolve_sql_query(db_name=db_name, query=query, llm=llm)
         if sql_query is None:
             return None
-        return self._execute_sql(db_name=db_name, sql_query=sql_query)
+        return self._execute_sql(db_name=db_name, sql_query=sql_query, parameters=parameters)
 
-    def select(self, db_name: str, query: str, llm: 'LLM | None' = None) -> Any:
+    def select(self, db_name: str, query: str, llm: 'LLM | None' = None, parameters: Parameters = None) -> Any:
         """Execute a SELECT query (read-only).
 
-        The SQL command must be ``SELECT``.
+        The SQL command must be ``SELECT``. For large results, see :meth:`stream`.
         """
         sql_query = self._resolve_sql_query(
             db_name=db_name,
@@ -169,9 +247,9 @@ class DBHandler:
         )
         if sql_query is None:
             return None
-        return self._execute_sql(db_name=db_name, sql_query=sql_query)
+        return self._execute_sql(db_name=db_name, sql_query=sql_query, parameters=parameters)
 
-    def insert(self, db_name: str, query: str, llm: 'LLM | None' = None) -> Any:
+    def insert(self, db_name: str, query: str, llm: 'LLM | None' = None, parameters: Parameters = None) -> Any:
         """Execute an INSERT query.
 
         The SQL command must be ``INSERT``.
@@ -184,9 +262,9 @@ class DBHandler:
         )
         if sql_query is None:
             return None
-        return self._execute_sql(db_name=db_name, sql_query=sql_query)
+        return self._execute_sql(db_name=db_name, sql_query=sql_query, parameters=parameters)
 
-    def update(self, db_name: str, query: str, llm: 'LLM | None' = None) -> Any:
+    def update(self, db_name: str, query: str, llm: 'LLM | None' = None, parameters: Parameters = None) -> Any:
         """Execute an UPDATE query.
 
         The SQL command must be ``UPDATE``.
@@ -199,9 +277,9 @@ class DBHandler:
         )
         if sql_query is None:
             return None
-        return self._execute_sql(db_name=db_name, sql_query=sql_query)
+        return self._execute_sql(db_name=db_name, sql_query=sql_query, parameters=parameters)
 
-    def delete(self, db_name: str, query: str, llm: 'LLM | None' = None) -> Any:
+    def delete(self, db_name: str, query: str, llm: 'LLM | None' = None, parameters: Parameters = None) -> Any:
         """Execute a DELETE query.
 
         The SQL command must be ``DELETE``.
@@ -214,7 +292,72 @@ class DBHandler:
         )
         if sql_query is None:
             return None
-        return self._execute_sql(db_name=db_name, sql_query=sql_query)
+        return self._execute_sql(db_name=db_name, sql_query=sql_query, parameters=parameters)
+
+    def stream(
+            self,
+            db_name: str,
+            query: str,
+            llm: 'LLM | None' = None,
+            parameters: dict[str, Any] | None = None,
+            chunk_size: int = 1000,
+    ) -> Iterator[dict[str, Any]]:
+        """Execute a SELECT query and iterate over its rows, without loading the whole result in memory.
+
+        See :meth:`stream_chunks`.
+
+        Yields:
+            dict[str, Any]: each row, as column values by column name
+        """
+        for chunk in self.stream_chunks(db_name, query, llm=llm, parameters=parameters, chunk_size=chunk_size):
+            yield from chunk
+
+    def stream_chunks(
+            self,
+            db_name: str,
+            query: str,
+            llm: 'LLM | None' = None,
+            parameters: dict[str, Any] | None = None,
+            chunk_size: int = 1000,
+            as_dataframe: bool = False,
+    ) -> Iterator[list[dict[str, Any]] | pd.DataFrame]:
+        """Execute a SELECT query and iterate over its result in chunks of rows.
+
+        The rows are fetched ``chunk_size`` at a time, with a server-side cursor in
+        the DBs that support it (e.g. PostgreSQL), so only one chunk is in memory at
+        a time. A pooled connection is used until the iteration ends (or the
+        iterator is closed). If the query fails, the error is logged and the
+        iteration ends.
+
+        Yields:
+            list[dict[str, Any]] or pandas.DataFrame: each chunk of rows
+        """
+        sql_query = self._resolve_sql_query(
+            db_name=db_name,
+            query=query,
+            llm=llm,
+            required_sql_command='select',
+        )
+        if sql_query is None:
+            return
+        engine = self.get_engine(db_name)
+        if engine is None:
+            return
+
+        try:
+            with engine.connect() as connection:
+                result = connection.execution_options(yield_per=chunk_size).execute(
+                    self._statement(sql_query), parameters
+                )
+                columns = list(result.keys())
+                for rows in result.partitions(chunk_size):
+                    if as_dataframe:
+                        yield pd.DataFrame.from_records(rows, columns=columns)
+                    else:
+                        yield [dict(zip(columns, row)) for row in rows]
+        except Exception as exc:
+            logger.error("SQL execution failed on '%s': %s", db_name, exc)
+            self._forget_sql(db_name, sql_query)
 
     def _resolve_sql_query(
             self,
@@ -242,39 +385,147 @@ class DBHandler:
 
         return sql_query
 
-    def _execute_sql(self, db_name: str, sql_query: str) -> Any:
-        connection = self.connect_to_db(db_name)
-        if connection is None:
+    def _statement(self, sql_query: str) -> TextClause:
+        """Get the statement of a SQL query, reusing the statements of recent queries.
+
+        The reused statements are not parsed again, and SQLAlchemy finds their
+        compiled form in the compiled cache of the engine.
+        """
+        with self._cache_lock:
+            statement = self._statements.get(sql_query)
+            if statement is not None:
+                self._statements.move_to_end(sql_query)
+                return statement
+        statement = text(sql_query)
+        with self._cache_lock:
+            self._statements[sql_query] = statement
+            while len(self._statements) > self._STATEMENT_CACHE_SIZE:
+                self._statements.popitem(last=False)
+        return statement
+
+    def _execute_sql(self, db_name: str, sql_query: str, parameters: Parameters = None) -> Any:
+        engine = self.get_engine(db_name)
+        if engine is None:
             return None
 
+        match = self._SQL_COMMAND_PATTERN.match(sql_query)
+        command = match.group(1).lower() if match else None
         try:
-            result = connection.execute(text(sql_query))
-            if result.returns_rows:
-                rows = result.fetchall()
-                columns = list(result.keys())
-                if not rows:
-                    return None
-                if len(rows) == 1 and len(columns) == 1:
-                    return rows[0][0]
-                if len(rows) == 1:
-                    return dict(zip(columns, rows[0]))
-                return [dict(zip(columns, row)) for row in rows]
-
-            connection.commit()
-            return result.rowcount
+            with engine.connect() as connection:
+                result = connection.execute(self._statement(sql_query), parameters)
+                rows = result.fetchall() if result.returns_rows else None
+                # Writes may return rows too (e.g. INSERT ... RETURNING). If the commit is not reached, the
+                # transaction is rolled back when the connection is returned
+                if command != 'select':
+                    connection.commit()
         except Exception as exc:
             logger.error("SQL execution failed on '%s': %s", db_name, exc)
-            try:
-                connection.rollback()
-            except Exception as rollback_exc:
-                logger.error("Rollback failed on '%s': %s", db_name, rollback_exc)
+            self._forget_sql(db_name, sql_query)
+            return None
+
+        if command in self._SCHEMA_SQL_COMMANDS:
+            self.invalidate_schema_cache(db_name)
+        if rows is not None:
+            columns = list(result.keys())
+            if not rows:
+                return None
+            if len(rows) == 1 and len(columns) == 1:
+                return rows[0][0]
+            if len(rows) == 1:
+                return dict(zip(columns, rows[0]))
+            return [dict(zip(columns, row)) for row in rows]
+        return result.rowcount
+
+    def invalidate_schema_cache(self, db_name: str | None = None) -> None:
+        """Discard the cached schema description of a DB (or of all DBs, if ``db_name`` is None).
+
+        The schema is described again the next time a natural language query is
+        translated. The cached SQL translations are kept: they are only used if the
+        schema fingerprint did not change.
+        """
+        with self._cache_lock:
+            if db_name is None:
+                self._schema_cache.clear()
+            else:
+                self._schema_cache.pop(db_name, None)
+
+    def clear_sql_cache(self, db_name: str | None = None) -> None:
+        """Discard the cached SQL translations of a DB (or of all DBs, if ``db_name`` is None)."""
+        with self._cache_lock:
+            if db_name is None:
+                self._sql_cache.clear()
+            else:
+                self._sql_cache.pop(db_name, None)
+
+    def _db_setting(self, db_name: str, name: str, default: Any, target_type: type) -> Any:
+        value = self._db_configs.get(db_name, {}).get(name)
+        if value is None:
+            return default
+        try:
+            return target_type(value)
+        except (TypeError, ValueError):
+            logger.error("Invalid value for 'db.sql.%s.%s': %s. Using %s.", db_name, name, value, default)
+            return default
+
+    def _schema(self, db_name: str) -> tuple[str, str] | None:
+        """Get the (cached) schema description of a DB and its fingerprint."""
+        ttl = self._db_setting(db_name, 'schema_cache_ttl', None, float)
+        with self._cache_lock:
+            entry = self._schema_cache.get(db_name)
+            if entry is not None and (ttl is None or time.monotonic() - entry[2] < ttl):
+                self.cache_stats['schema_hits'] += 1
+                return entry[0], entry[1]
+            self.cache_stats['schema_misses'] += 1
+        description = self._schema_description(db_name)
+        if description == '':
             return None
+        fingerprint = hashlib.sha256(description.encode('utf-8')).hexdigest()[:16]
+        if ttl is None or ttl > 0:
+            with self._cache_lock:
+                self._schema_cache[db_name] = (description, fingerprint, time.monotonic())
+        return description, fingerprint
+
+    @staticmethod
+    def _normalize_question(nl_query: str) -> str:
+        # The case is kept, since the values of the question (e.g. a city name) end up in the SQL
+        return ' '.join(nl_query.split()).rstrip('?.!; ')
+
+    def _cached_sql(self, db_name: str, key: tuple[str, str, str]) -> str | None:
+        with self._cache_lock:
+            cache = self._sql_cache.get(db_name)
+            sql_query = cache.get(key) if cache is not None else None
+            if sql_query is None:
+                self.cache_stats['sql_misses'] += 1
+                return None
+            cache.move_to_end(key)
+            self.cache_stats['sql_hits'] += 1
+            return sql_query
+
+    def _cache_sql(self, db_name: str, key: tuple[str, str, str], sql_query: str) -> None:
+        size = self._db_setting(db_name, 'sql_cache_size', self._DEFAULT_SQL_CACHE_SIZE, int)
+        if size <= 0:
+            return
+        with self._cache_lock:
+            cache = self._sql_cache.setdefault(db_name, OrderedDict())
+            cache[key] = sql_query
+            cache.move_to_end(key)
+            while len(cache) > size:
+                cache.popitem(last=False)
+
+    def _forget_sql(self, db_name: str, sql_query: str) -> None:
+        """Remove a translation that failed to execute from the cache, so the question is translated again."""
+        with self._cache_lock:
+            cache = self._sql_cache.get(db_name)
+            if not cache:
+                return
+            for key in [key for key, value in cache.items() if value == sql_query]:
+                del cache[key]
 
     def _schema_description(self, db_name: str) -> str:
-        connection = self.connect_to_db(db_name)
-        if connection is None:
+        engine = self.get_engine(db_name)
+        if engine is None:
             return ''
-        inspector = inspect(connection)
+        inspector = inspect(engine)
         table_names = inspector.get_table_names()
 
         if not table_names:
@@ -330,10 +581,15 @@ class DBHandler:
             nl_query: str,
             llm: 'LLM',
     ) -> str | None:
-        schema = self._schema_description(db_name)
-        if schema == '':
+        schema = self._schema(db_name)
+        if schema is None:
             logger.error("Could not retrieve DB schema for '%s'.", db_name)
             return None
+        schema, fingerprint = schema
+        cache_key = (llm.name, self._normalize_question(nl_query), fingerprint)
+        sql_query = self._cached_sql(db_name, cache_key)
+        if sql_query is not None:
+            return sql_query
         system_message = (
             'You are an SQL query generator. '
             'Return exactly one valid SQL statement for the provided schema and user request. '
@@ -352,7 +608,10 @@ class DBHandler:
         if llm_response is None:
             logger.error('LLM returned an empty response when translating natural language to SQL.')
             return None
-        return self._extract_sql(llm_response)
+        sql_query = self._extract_sql(llm_response)
+        if sql_query is not None:
+            self._cache_sql(db_name, cache_key, sql_query)
+        return sql_query
 
     @staticmethod
     def _extract_sql(text_response: str) -> str | None:
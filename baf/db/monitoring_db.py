@@ -1,13 +1,19 @@
-from datetime import datetime
-from typing import TYPE_CHECKING, Any, Optional
+import os
+import re
+import threading
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Any, Callable, Optional
 
 import json
 import pandas as pd
-from sqlalchemy import Connection, create_engine, Column, String, Integer, UniqueConstraint, ForeignKey, DateTime, \
-    Float, MetaData, insert, Table, select, Executable, CursorResult, desc, Boolean
+from sqlalchemy import URL, Connection, create_engine, Column, String, Integer, UniqueConstraint, ForeignKey, DateTime, \
+    Float, MetaData, insert, Table, select, Executable, CursorResult, desc, Boolean, JSON, Engine, event, Index, func, \
+    or_, ColumnElement, inspect, text
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import declarative_base
 
+from baf.core.file import File
 from baf.core.message import Message
 from baf.core.session import Session
 from baf.core.state import State
@@ -15,7 +21,9 @@ from baf.core.transition.event import Event
 from baf.core.transition.transition import Transition
 from baf.exceptions.logger import logger
 from baf.db import DB_MONITORING_DIALECT, DB_MONITORING_PORT, DB_MONITORING_HOST, DB_MONITORING_DATABASE, \
-    DB_MONITORING_USERNAME, DB_MONITORING_PASSWORD
+    DB_MONITORING_USERNAME, DB_MONITORING_PASSWORD, DB_MONITORING_POOL_SIZE, DB_MONITORING_POOL_MAX_OVERFLOW, \
+    DB_MONITORING_POOL_RECYCLE, DB_MONITORING_POOL_TIMEOUT
+from baf.db.monitoring_writer import MonitoringDBWriter
 from baf.library.transition.events.base_events import ReceiveMessageEvent, ReceiveFileEvent
 from baf.library.transition.events.github_webhooks_events import GitHubEvent
 from baf.library.transition.events.gitlab_webhooks_events import GitLabEvent
@@ -29,6 +37,9 @@ if TYPE_CHECKING:
 TABLE_SESSION = 'session'
 """The name of the database table that contains the session records"""
 
+TABLE_SESSION_VARIABLE = 'session_variable'
+"""The name of the database table that contains the session variable records"""
+
 TABLE_INTENT_PREDICTION = 'intent_prediction'
 """The name of the database table that contains the intent prediction records"""
 
@@ -44,19 +55,161 @@ TABLE_CHAT = 'chat'
 TABLE_EVENT = 'event'
 """The name of the database table that contains the event records"""
 
+TABLE_ROLLUP_SESSION = 'rollup_session'
+"""The name of the database table that contains the number of new sessions per agent and hour"""
+
+TABLE_ROLLUP_CHAT = 'rollup_chat'
+"""The name of the database table that contains the number of messages per agent, hour and sender"""
+
+TABLE_ROLLUP_INTENT = 'rollup_intent'
+"""The name of the database table that contains the number of intent predictions (and the sum of their scores) per
+agent, hour and intent"""
+
+TABLE_ROLLUP_TRANSITION = 'rollup_transition'
+"""The name of the database table that contains the number of transitions per agent, hour and transition (source state,
+destination state, event and condition)"""
+
+TABLE_ROLLUP_EVENT = 'rollup_event'
+"""The name of the database table that contains the number of events per agent, hour and event"""
+
+ROLLUPS: dict[str, tuple[str, list[str], list[str]]] = {
+    TABLE_SESSION: (TABLE_ROLLUP_SESSION, [], []),
+    TABLE_CHAT: (TABLE_ROLLUP_CHAT, ['is_user'], []),
+    TABLE_INTENT_PREDICTION: (TABLE_ROLLUP_INTENT, ['intent'], ['score']),
+    TABLE_TRANSITION: (TABLE_ROLLUP_TRANSITION, ['source_state', 'dest_state', 'event', 'condition'], []),
+    TABLE_EVENT: (TABLE_ROLLUP_EVENT, ['event'], []),
+}
+"""The rollup table of each monitoring database table, as (rollup table name, grouping columns, summed columns) tuples.
+Rollup tables are also grouped by agent name and hour, and contain the number of records of each group (``count``) and
+the sum of each summed column (``<column>_sum``)."""
+
+
+PARTITIONED_TABLES: list[str] = [TABLE_CHAT, TABLE_EVENT, TABLE_INTENT_PREDICTION]
+"""The monitoring database tables that can be partitioned by time (see :meth:`MonitoringDB.initialize_db`)"""
+
+PARTITION_INTERVALS: list[str] = ['day', 'week', 'month']
+"""The valid time intervals of the partitions of the monitoring database tables"""
+
+FILE_STORAGES: list[str] = ['inline', 'hash', 'reference']
+"""The valid ways of storing the files of the chat messages (see :meth:`MonitoringDB.chat_content`)"""
+
+
+def _partition_bounds(timestamp: datetime, interval: str) -> tuple[datetime, datetime]:
+    """Get the time range (start included, end excluded) of the partition that contains a timestamp.
+
+    Args:
+        timestamp (datetime): the timestamp
+        interval (str): the time interval of the partitions (see :data:`PARTITION_INTERVALS`)
+
+    Returns:
+        tuple[datetime, datetime]: the start and end of the partition
+    """
+    day = datetime.combine(timestamp.date(), datetime.min.time())
+    if interval == 'day':
+        return day, day + timedelta(days=1)
+    if interval == 'week':
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=7)
+    if interval == 'month':
+        start = day.replace(day=1)
+        return start, (start + timedelta(days=32)).replace(day=1)
+    raise ValueError(f"Invalid partition interval '{interval}', it must be one of {PARTITION_INTERVALS}")
+
+
+def _partition_name(table_name: str, start: datetime, end: datetime) -> str:
+    """Get the name of the partition of a table that contains the records of a time range."""
+    return f'{table_name}_p{start:%Y%m%d}_{end:%Y%m%d}'
+
+
+EMBEDDED_DIALECTS: list[str] = ['sqlite', 'duckdb']
+"""The dialects of the monitoring databases that do not need a database server (see :meth:`MonitoringDB.connect`)"""
+
+
+def _create_duckdb_engine(sqlite_path: str) -> Engine:
+    """Create an engine that runs queries with DuckDB on a SQLite database file (in read-only mode).
+
+    Each DuckDB connection is an in-memory database that attaches the SQLite database with the DuckDB ``sqlite``
+    extension (which is installed the first time it is used).
+
+    Args:
+        sqlite_path (str): the path of the SQLite database file
+
+    Returns:
+        sqlalchemy.Engine: the engine
+    """
+    engine = create_engine('duckdb:///:memory:')
+    path = sqlite_path.replace("'", "''")
+
+    @event.listens_for(engine, 'connect')
+    def attach_sqlite(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        cursor.execute('INSTALL sqlite')
+        cursor.execute('LOAD sqlite')
+        cursor.execute(f"ATTACH '{path}' AS monitoring (TYPE sqlite, READ_ONLY)")
+        cursor.execute('USE monitoring')
+        cursor.close()
+
+    return engine
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    """Configure each new SQLite connection for concurrent access: readers do not block the writer (WAL journal), and
+    the writers wait for the database lock instead of failing immediately."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA busy_timeout=30000')
+    cursor.close()
+
 
 class MonitoringDB:
     """This class is an interface to connect to a database where user interactions with the agent are stored to monitor
     the agent for later analysis.
 
+    The monitoring database is accessed concurrently by the agent threads (sessions, platforms, the write-behind
+    queue...). Therefore, each operation checks out its own connection from the pool of the engine, and the operations
+    that modify the database run in their own transaction.
+
+    The insert methods write the records immediately, unless a write-behind :class:`MonitoringDBWriter` has been
+    started (see :meth:`start_writer`). In that case, the records are queued and written in batches by the writer thread,
+    and the methods that read records written by the writer wait for the queued records to be written first.
+
     Attributes:
-        conn (sqlalchemy.Connection): The connection to the monitoring database
+        engine (sqlalchemy.Engine): The engine (i.e., the connection pool) of the monitoring database
+        analytics_engine (sqlalchemy.Engine): The engine that runs the analytical queries of the monitoring UI (e.g.
+            :meth:`aggregate_records`). It is the same as :attr:`engine`, unless another query engine is used (e.g.
+            DuckDB on SQLite databases)
         connected (bool): Whether there is an active connection to the monitoring database or not
+        writer (MonitoringDBWriter or None): The write-behind queue of the monitoring database records, if started
+        _tables (dict[str, sqlalchemy.Table]): The tables of the monitoring database, reflected only once
+        _session_ids (dict[tuple[str, str], int]): The database id (i.e., the ``id`` column of the sessions table) of
+            the known sessions, by (agent name, session id). Sessions are unique by agent name and session id in the
+            database
+        partition_interval (str or None): The time interval of the partitions of the partitioned tables, if any
+        retention_days (int): The number of days the records of the tables in :data:`PARTITIONED_TABLES` are kept (0
+            to keep them forever)
+        _partitions (dict[str, dict[str, tuple[datetime, datetime]]]): The partitions of each partitioned table, as
+            the time range of the records of each partition (by partition name)
+        _partition_templates (dict[str, sqlalchemy.Table]): The schema of the partitions of each partitioned table, in
+            SQLite databases (where each partition is a table)
+        _partitions_lock (threading.Lock): Lock to create or drop partitions from a single thread at a time
+        file_storage (str): How the files of the chat messages are stored (see :data:`FILE_STORAGES`)
+        files_path (str or None): The directory of the stored files, with the ``reference`` file storage
     """
 
     def __init__(self):
-        self.conn: Connection = None
+        self.engine: Engine or None = None
+        self.analytics_engine: Engine or None = None
         self.connected: bool = False
+        self.writer: MonitoringDBWriter or None = None
+        self._tables: dict[str, Table] = {}
+        self._session_ids: dict[tuple[str, str], int] = {}
+        self.partition_interval: str or None = None
+        self.retention_days: int = 0
+        self._partitions: dict[str, dict[str, tuple[datetime, datetime]]] = {}
+        self._partition_templates: dict[str, Table] = {}
+        self._partitions_lock: threading.Lock = threading.Lock()
+        self.file_storage: str = 'inline'
+        self.files_path: str or None = None
 
     def connect_to_db(self, agent: 'Agent') -> None:
         """Connect to the monitoring database.
@@ -71,17 +224,142 @@ class MonitoringDB:
             host = agent.get_property(DB_MONITORING_HOST)
             port = agent.get_property(DB_MONITORING_PORT)
             database = agent.get_property(DB_MONITORING_DATABASE)
-            url = f"{dialect}://{username}:{password}@{host}:{port}/{database}"
-            engine = create_engine(url)
-            self.conn = engine.connect()
-            self.connected = True
+            self.connect(
+                dialect, database, host=host, port=port, username=username, password=password,
+                pool_size=agent.get_property(DB_MONITORING_POOL_SIZE),
+                max_overflow=agent.get_property(DB_MONITORING_POOL_MAX_OVERFLOW),
+                pool_recycle=agent.get_property(DB_MONITORING_POOL_RECYCLE),
+                pool_timeout=agent.get_property(DB_MONITORING_POOL_TIMEOUT)
+            )
         except Exception as e:
             logger.error(f"An error occurred while trying to connect to the monitoring DB in agent '{agent.name}'. "
                           f"See the attached exception:")
             logger.error(e)
 
-    def initialize_db(self) -> None:
-        """Initialize the monitoring database, creating the tables if necessary."""
+    def connect(
+            self,
+            dialect: str,
+            database: str,
+            host: str or None = None,
+            port: int or None = None,
+            username: str or None = None,
+            password: str or None = None,
+            **engine_kwargs
+    ) -> None:
+        """Connect to the monitoring database.
+
+        The embedded dialects (see :data:`EMBEDDED_DIALECTS`) do not need a database server: ``sqlite`` stores the
+        monitoring database in a SQLite file, and ``duckdb`` stores it in a SQLite file too, but runs the analytical
+        queries with DuckDB (see :attr:`analytics_engine`). The host, port, username and password are ignored in both
+        cases.
+
+        Args:
+            dialect (str): the database dialect (e.g. ``postgresql``, ``sqlite`` or ``duckdb``)
+            database (str): the database name, or the path of the database file in the embedded dialects
+            host (str or None): the database host address
+            port (int or None): the database port
+            username (str or None): the database username
+            password (str or None): the database password
+            **engine_kwargs: the arguments of the engine (e.g. the connection pool settings, see
+                :func:`sqlalchemy.create_engine`)
+        """
+        if dialect in EMBEDDED_DIALECTS:
+            if not database:
+                raise ValueError(f'The path of the {dialect} monitoring database file is not set')
+            engine = create_engine(URL.create('sqlite', database=database), **engine_kwargs)
+            analytics_engine = _create_duckdb_engine(database) if dialect == 'duckdb' else None
+        else:
+            engine = create_engine(
+                URL.create(dialect, username=username, password=password, host=host, port=port, database=database),
+                **engine_kwargs
+            )
+            analytics_engine = None
+        self.set_engine(engine, analytics_engine)
+
+    def set_engine(self, engine: Engine, analytics_engine: Engine or None = None) -> None:
+        """Connect to the monitoring database through an existing engine.
+
+        SQLite connections are set to use the WAL journal, so reading the database does not block writing it.
+
+        Args:
+            engine (sqlalchemy.Engine): the engine of the monitoring database
+            analytics_engine (sqlalchemy.Engine or None): the engine that runs the analytical queries. If None, they
+                are run by the engine of the monitoring database
+        """
+        if engine.dialect.name == 'sqlite' and not event.contains(engine, 'connect', _set_sqlite_pragmas):
+            event.listen(engine, 'connect', _set_sqlite_pragmas)
+        # Check that the database is reachable
+        with engine.connect():
+            pass
+        self.engine = engine
+        self.analytics_engine = analytics_engine or engine
+        self.connected = True
+        self._tables = {}
+        self._session_ids = {}
+        self._partitions = {}
+        self._partition_templates = {}
+
+    def initialize_db(
+            self,
+            partition_interval: str or None = None,
+            retention_days: int = 0,
+            file_storage: str = 'inline',
+            files_path: str or None = None
+    ) -> None:
+        """Initialize the monitoring database, creating the tables and their indexes if necessary.
+
+        The indexes and the rollup tables (see :data:`ROLLUPS`) are also created in existing databases (e.g. created by
+        previous versions) that do not have them yet, so it can be safely run at every agent start.
+
+        The tables in :data:`PARTITIONED_TABLES` can be partitioned by time, so that their expired records are removed
+        by dropping whole partitions. PostgreSQL tables use native declarative partitioning (by range of timestamps),
+        and SQLite tables are split into a table per partition, whose records are read through a view with the name of
+        the table. Partitions are created as records of new time intervals are inserted. Only new tables are
+        partitioned: existing tables are not modified.
+
+        Args:
+            partition_interval (str or None): the time interval of the partitions of the new tables (see
+                :data:`PARTITION_INTERVALS`). If None, new tables are not partitioned. Partitions of existing
+                partitioned tables keep their interval
+            retention_days (int): the number of days the records of the tables in :data:`PARTITIONED_TABLES` are kept
+                (see :meth:`apply_retention`). If 0, they are kept forever
+            file_storage (str): how the files of the chat messages are stored (see :data:`FILE_STORAGES` and
+                :meth:`chat_content`)
+            files_path (str or None): the directory where the files are stored, with the ``reference`` file storage
+        """
+        if partition_interval is not None and partition_interval not in PARTITION_INTERVALS:
+            raise ValueError(f"Invalid partition interval '{partition_interval}', it must be one of "
+                             f"{PARTITION_INTERVALS}")
+        if file_storage not in FILE_STORAGES:
+            raise ValueError(f"Invalid file storage '{file_storage}', it must be one of {FILE_STORAGES}")
+        if file_storage == 'reference':
+            if not files_path:
+                raise ValueError("The 'reference' file storage requires a files path")
+            os.makedirs(files_path, exist_ok=True)
+        self.file_storage = file_storage
+        self.files_path = files_path
+        dialect = self.engine.dialect.name
+        with self.engine.connect() as conn:
+            existing_tables = set(inspect(conn).get_table_names())
+            partitioned_tables = self._select_partitioned_tables(conn)
+        if partition_interval is not None:
+            if dialect not in ('postgresql', 'sqlite'):
+                logger.warning(f'Partitioning of the monitoring DB tables is not supported in {dialect} databases')
+            else:
+                for table_name in PARTITIONED_TABLES:
+                    if table_name in partitioned_tables:
+                        continue
+                    if table_name in existing_tables:
+                        logger.warning(f"Table '{table_name}' of the monitoring DB already exists and is not "
+                                       f"partitioned. Only new tables can be partitioned")
+                    else:
+                        partitioned_tables.add(table_name)
+        # Native partitions (PostgreSQL) must include the partition key in the primary key
+        native_partitioned_tables = partitioned_tables if dialect == 'postgresql' else set()
+
+        def partition_args(table_name: str) -> dict[str, Any]:
+            return {'postgresql_partition_by': 'RANGE (timestamp)'} if table_name in native_partitioned_tables else {}
+
         Base = declarative_base()  # Define a declarative base
 
         # Define the table schemas
@@ -99,23 +377,47 @@ class MonitoringDB:
                 UniqueConstraint('agent_name', 'session_id'),
             )
 
+        class TableSessionVariable(Base):
+            __tablename__ = TABLE_SESSION_VARIABLE
+            id = Column(Integer, primary_key=True, autoincrement=True)
+            session_id = Column(Integer, ForeignKey(f'{TABLE_SESSION}.id', ondelete='CASCADE'), nullable=False)
+            name = Column(String, nullable=False)
+            # JSON-serialized value
+            value = Column(String, nullable=False)
+            __table_args__ = (
+                UniqueConstraint('session_id', 'name'),
+            )
+
         class TableIntentPrediction(Base):
             __tablename__ = TABLE_INTENT_PREDICTION
             id = Column(Integer, primary_key=True, autoincrement=True)
             session_id = Column(Integer, ForeignKey(f'{TABLE_SESSION}.id', ondelete='CASCADE'), nullable=False)
             message = Column(String, nullable=False)
-            timestamp = Column(DateTime, nullable=False)
+            timestamp = Column(DateTime, nullable=False, primary_key=TABLE_INTENT_PREDICTION in native_partitioned_tables)
             intent_classifier = Column(String, nullable=False)
             intent = Column(String, nullable=False)
             score = Column(Float, nullable=False)
+            __table_args__ = (
+                Index(f'ix_{TABLE_INTENT_PREDICTION}_session_id_timestamp', 'session_id', 'timestamp'),
+                partition_args(TABLE_INTENT_PREDICTION),
+            )
 
         class TableParameter(Base):
             __tablename__ = TABLE_PARAMETER
             id = Column(Integer, primary_key=True, autoincrement=True)
-            intent_prediction_id = Column(Integer, ForeignKey(f'{TABLE_INTENT_PREDICTION}.id', ondelete='CASCADE'), nullable=False)
+            # A partitioned table cannot be referenced by a foreign key to its id
+            intent_prediction_id = Column(
+                Integer,
+                *([] if TABLE_INTENT_PREDICTION in partitioned_tables
+                  else [ForeignKey(f'{TABLE_INTENT_PREDICTION}.id', ondelete='CASCADE')]),
+                nullable=False
+            )
             name = Column(String, nullable=False)
             value = Column(String)
             info = Column(String)
+            __table_args__ = (
+                Index(f'ix_{TABLE_PARAMETER}_intent_prediction_id', 'intent_prediction_id'),
+            )
 
         class TableTransition(Base):
             __tablename__ = TABLE_TRANSITION
@@ -126,15 +428,26 @@ class MonitoringDB:
             event = Column(String, nullable=True)
             condition = Column(String, nullable=True)
             timestamp = Column(DateTime, nullable=False)
+            __table_args__ = (
+                Index(f'ix_{TABLE_TRANSITION}_session_id_timestamp', 'session_id', 'timestamp'),
+                # The transitions are filtered by source or destination state (see select_transition_counts)
+                Index(f'ix_{TABLE_TRANSITION}_source_state_dest_state', 'source_state', 'dest_state'),
+                Index(f'ix_{TABLE_TRANSITION}_dest_state', 'dest_state'),
+            )
 
         class TableChat(Base):
             __tablename__ = TABLE_CHAT
             id = Column(Integer, primary_key=True, autoincrement=True)
             session_id = Column(Integer, ForeignKey(f'{TABLE_SESSION}.id', ondelete='CASCADE'), nullable=False)
             type = Column(String, nullable=False)
-            content = Column(JSONB, nullable=False)  # JSONB allows to handle the dictionary (TTS messages)
+            # JSONB allows to handle the dictionary (TTS messages)
+            content = Column(JSON().with_variant(JSONB(), 'postgresql'), nullable=False)
             is_user = Column(Boolean, nullable=False)
-            timestamp = Column(DateTime, nullable=False)
+            timestamp = Column(DateTime, nullable=False, primary_key=TABLE_CHAT in native_partitioned_tables)
+            __table_args__ = (
+                Index(f'ix_{TABLE_CHAT}_session_id_timestamp', 'session_id', 'timestamp'),
+                partition_args(TABLE_CHAT),
+            )
 
         class TableEvent(Base):
             __tablename__ = TABLE_EVENT
@@ -142,69 +455,764 @@ class MonitoringDB:
             session_id = Column(Integer, ForeignKey(f'{TABLE_SESSION}.id', ondelete='CASCADE'), nullable=True)
             event = Column(String, nullable=False)
             info = Column(String, nullable=True)
-            timestamp = Column(DateTime, nullable=False)
+            timestamp = Column(DateTime, nullable=False, primary_key=TABLE_EVENT in native_partitioned_tables)
+            __table_args__ = (
+                Index(f'ix_{TABLE_EVENT}_session_id_timestamp', 'session_id', 'timestamp'),
+                partition_args(TABLE_EVENT),
+            )
 
-        Base.metadata.create_all(self.conn)
-        self.conn.commit()
+        class TableRollupSession(Base):
+            __tablename__ = TABLE_ROLLUP_SESSION
+            id = Column(Integer, primary_key=True, autoincrement=True)
+            agent_name = Column(String, nullable=False)
+            hour = Column(DateTime, nullable=False)
+            count = Column(Integer, nullable=False)
+            __table_args__ = (
+                UniqueConstraint('agent_name', 'hour'),
+            )
 
-    def insert_session(self, session: Session) -> None:
-        """Insert a new session record into the sessions table of the monitoring database.
+        class TableRollupChat(Base):
+            __tablename__ = TABLE_ROLLUP_CHAT
+            id = Column(Integer, primary_key=True, autoincrement=True)
+            agent_name = Column(String, nullable=False)
+            hour = Column(DateTime, nullable=False)
+            is_user = Column(Boolean, nullable=False)
+            count = Column(Integer, nullable=False)
+            __table_args__ = (
+                UniqueConstraint('agent_name', 'hour', 'is_user'),
+            )
+
+        class TableRollupIntent(Base):
+            __tablename__ = TABLE_ROLLUP_INTENT
+            id = Column(Integer, primary_key=True, autoincrement=True)
+            agent_name = Column(String, nullable=False)
+            hour = Column(DateTime, nullable=False)
+            intent = Column(String, nullable=False)
+            count = Column(Integer, nullable=False)
+            score_sum = Column(Float, nullable=False)
+            __table_args__ = (
+                UniqueConstraint('agent_name', 'hour', 'intent'),
+            )
+
+        class TableRollupTransition(Base):
+            __tablename__ = TABLE_ROLLUP_TRANSITION
+            id = Column(Integer, primary_key=True, autoincrement=True)
+            agent_name = Column(String, nullable=False)
+            hour = Column(DateTime, nullable=False)
+            source_state = Column(String, nullable=False)
+            dest_state = Column(String, nullable=False)
+            event = Column(String, nullable=False)
+            condition = Column(String, nullable=False)
+            count = Column(Integer, nullable=False)
+            __table_args__ = (
+                UniqueConstraint('agent_name', 'hour', 'source_state', 'dest_state', 'event', 'condition'),
+            )
+
+        class TableRollupEvent(Base):
+            __tablename__ = TABLE_ROLLUP_EVENT
+            id = Column(Integer, primary_key=True, autoincrement=True)
+            # Empty for the events that do not belong to a session
+            agent_name = Column(String, nullable=False)
+            hour = Column(DateTime, nullable=False)
+            event = Column(String, nullable=False)
+            count = Column(Integer, nullable=False)
+            __table_args__ = (
+                UniqueConstraint('agent_name', 'hour', 'event'),
+            )
+
+        # In SQLite, partitioned tables are views of their partitions, which are created from the table schema
+        self._partition_templates = {
+            table_name: Base.metadata.tables[table_name] for table_name in partitioned_tables if dialect == 'sqlite'
+        }
+        tables = [table for table in Base.metadata.sorted_tables if table.name not in self._partition_templates]
+        with self.engine.begin() as conn:
+            Base.metadata.create_all(conn, tables=tables)
+            # Existing tables are not modified by create_all, so their missing indexes must be created (migration)
+            for table in tables:
+                for index in table.indexes:
+                    index.create(conn, checkfirst=True)
+        self._tables = {}
+        with self.engine.connect() as conn:
+            self._partitions = self._select_partitions(conn, partitioned_tables)
+        self.partition_interval = partition_interval or self._infer_partition_interval()
+        self.retention_days = retention_days
+        # The partitions of the current records must exist before reading the tables
+        now = datetime.now()
+        for table_name in partitioned_tables:
+            if self._find_partition(table_name, now) is None:
+                self._create_partition(table_name, now)
+        # Reflect the tables once (they may have been created by a previous version with a different schema)
+        with self.engine.connect() as conn:
+            for table_name in Base.metadata.tables:
+                self._get_table(table_name, conn)
+        if TABLE_SESSION in existing_tables and not existing_tables.issuperset(
+                rollup_name for rollup_name, _, _ in ROLLUPS.values()):
+            # The database was created by a previous version, the rollups of its records must be computed
+            self.rebuild_rollups()
+        if self.retention_days:
+            self.apply_retention()
+
+    def _select_partitioned_tables(self, conn: Connection) -> set[str]:
+        """Get the partitioned tables of the monitoring database.
 
         Args:
-            session (Session): the session to insert into the database
+            conn (sqlalchemy.Connection): the connection used to inspect the database
+
+        Returns:
+            set[str]: the names of the partitioned tables
+        """
+        if conn.dialect.name == 'sqlite':
+            return set(inspect(conn).get_view_names()).intersection(PARTITIONED_TABLES)
+        if conn.dialect.name == 'postgresql':
+            result = conn.execute(text(
+                'SELECT c.relname FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid '
+                'WHERE pg_table_is_visible(c.oid)'
+            ))
+            return set(result.scalars()).intersection(PARTITIONED_TABLES)
+        return set()
+
+    def _select_partitions(
+            self,
+            conn: Connection,
+            partitioned_tables: set[str]
+    ) -> dict[str, dict[str, tuple[datetime, datetime]]]:
+        """Get the partitions of the partitioned tables of the monitoring database.
+
+        The time range of each partition is encoded in its name (see :func:`_partition_name`).
+
+        Args:
+            conn (sqlalchemy.Connection): the connection used to inspect the database
+            partitioned_tables (set[str]): the names of the partitioned tables
+
+        Returns:
+            dict[str, dict[str, tuple[datetime, datetime]]]: the time range of the partitions of each table, by
+            partition name
+        """
+        partitions = {table_name: {} for table_name in partitioned_tables}
+        for name in inspect(conn).get_table_names():
+            match = re.fullmatch(r'(\w+)_p(\d{8})_(\d{8})', name)
+            if match and match.group(1) in partitions:
+                partitions[match.group(1)][name] = (datetime.strptime(match.group(2), '%Y%m%d'),
+                                                    datetime.strptime(match.group(3), '%Y%m%d'))
+        return partitions
+
+    def _infer_partition_interval(self) -> str or None:
+        """Get the time interval of the latest partition of the monitoring database (e.g. created in a previous
+        execution), if any."""
+        if not self._partitions:
+            return None
+        partitions = [bounds for table_partitions in self._partitions.values() for bounds in table_partitions.values()]
+        if not partitions:
+            return 'month'
+        start, end = max(partitions)
+        if end - start == timedelta(days=1):
+            return 'day'
+        if end - start == timedelta(days=7):
+            return 'week'
+        return 'month'
+
+    def _find_partition(self, table_name: str, timestamp: datetime) -> str or None:
+        """Get the partition of a partitioned table that contains the records of a timestamp.
+
+        Args:
+            table_name (str): the name of the partitioned table
+            timestamp (datetime): the timestamp
+
+        Returns:
+            str or None: the name of the partition, or None if it does not exist
+        """
+        for name, (start, end) in self._partitions[table_name].items():
+            if start <= timestamp < end:
+                return name
+        return None
+
+    def _create_partition(self, table_name: str, timestamp: datetime) -> str:
+        """Create the partition of a partitioned table that contains the records of a timestamp, in its own
+        transaction.
+
+        The partition contains the records of the time interval of the timestamp (see :attr:`partition_interval`),
+        except for the parts of the interval already contained in other partitions (e.g. created with another
+        interval).
+
+        Args:
+            table_name (str): the name of the partitioned table
+            timestamp (datetime): the timestamp
+
+        Returns:
+            str: the name of the partition
+        """
+        with self._partitions_lock:
+            # Another thread may have created it
+            name = self._find_partition(table_name, timestamp)
+            if name is not None:
+                return name
+            partitions = self._partitions[table_name]
+            start, end = _partition_bounds(timestamp, self.partition_interval)
+            start = max([start] + [other_end for _, other_end in partitions.values() if other_end <= timestamp])
+            end = min([end] + [other_start for other_start, _ in partitions.values() if other_start > timestamp])
+            name = _partition_name(table_name, start, end)
+            with self.engine.begin() as conn:
+                preparer = conn.dialect.identifier_preparer
+                if conn.dialect.name == 'postgresql':
+                    conn.exec_driver_sql(
+                        f"CREATE TABLE IF NOT EXISTS {preparer.quote(name)} PARTITION OF {preparer.quote(table_name)} "
+                        f"FOR VALUES FROM ('{start.isoformat(sep=' ')}') TO ('{end.isoformat(sep=' ')}')"
+                    )
+                else:
+                    template = self._partition_templates[table_name]
+                    metadata = MetaData()
+                    # The referenced tables are needed to create the foreign keys
+                    template.metadata.tables[TABLE_SESSION].to_metadata(metadata)
+                    partition = template.to_metadata(metadata, name=name)
+                    for index in partition.indexes:
+                        index.name = index.name.replace(f'ix_{table_name}_', f'ix_{name}_', 1)
+                    # The ids of each partition start at a different value, so they are unique in the whole table
+                    partition.dialect_options['sqlite']['autoincrement'] = True
+                    partition.create(conn, checkfirst=True)
+                    conn.execute(
+                        text('INSERT INTO sqlite_sequence (name, seq) SELECT :name, :seq '
+                             'WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = :name)'),
+                        {'name': name, 'seq': int(f'{start:%Y%m%d}') * 10 ** 9}
+                    )
+                    self._create_partition_view(conn, table_name, [*partitions, name])
+            partitions[name] = (start, end)
+            logger.info(f"Created partition '{name}' of the monitoring DB table '{table_name}'")
+            return name
+
+    def _create_partition_view(self, conn: Connection, table_name: str, partition_names: list[str]) -> None:
+        """(Re)create the view that contains the records of all the partitions of a partitioned SQLite table.
+
+        Args:
+            conn (sqlalchemy.Connection): the connection used to create the view
+            table_name (str): the name of the partitioned table (i.e., of the view)
+            partition_names (list[str]): the names of the partitions
         """
-        table = Table(TABLE_SESSION, MetaData(), autoload_with=self.conn)
-        stmt = insert(table).values(
-            username=session._username,
-            session_name=session._session_name,
-            agent_name=session._agent.name,
-            session_id=session.id,
-            platform_name=session.platform.__class__.__name__,
-            timestamp=datetime.now(),
-            variables="{}"
+        preparer = conn.dialect.identifier_preparer
+        columns = ', '.join(preparer.quote(column.name) for column in self._partition_templates[table_name].columns)
+        query = ' UNION ALL '.join(
+            f'SELECT {columns} FROM {preparer.quote(name)}' for name in sorted(partition_names)
         )
-        self.run_statement(stmt)
-    def store_session_variables(self, session: Session) -> None:
+        conn.exec_driver_sql(f'DROP VIEW IF EXISTS {preparer.quote(table_name)}')
+        conn.exec_driver_sql(f'CREATE VIEW {preparer.quote(table_name)} AS {query}')
+
+    def _prepare_partitions(
+            self,
+            records: list[tuple[str, Session or None, dict[str, Any], tuple[str, str, list[dict[str, Any]]] or None]]
+    ) -> None:
+        """Create the partitions the records to insert into partitioned tables belong to, if they do not exist yet.
+
+        The partitions are created (and committed) before inserting the records, so that other transactions can use
+        them. Before creating new partitions, the expired records are removed (see :meth:`apply_retention`).
+
+        Args:
+            records (list[tuple[str, Session or None, dict[str, Any], tuple[str, str, list[dict[str, Any]]] or None]]):
+                the records to insert, as (table name, session, row, children) tuples
+        """
+        new_partitions = [
+            (table_name, row['timestamp']) for table_name, _, row, _ in records
+            if table_name in self._partitions and self._find_partition(table_name, row['timestamp']) is None
+        ]
+        if not new_partitions:
+            return
+        self.apply_retention()
+        for table_name, timestamp in new_partitions:
+            self._create_partition(table_name, timestamp)
+
+    def _route_records(
+            self,
+            conn: Connection,
+            table_name: str,
+            records: list,
+            get_row: Callable[[Any], dict[str, Any]] = lambda record: record
+    ) -> dict[Table, list]:
+        """Group the records to insert into a table by the table they are inserted into: the table itself or, in
+        partitioned SQLite tables, the partition of each record (which must exist, see :meth:`_prepare_partitions`).
+
+        Args:
+            conn (sqlalchemy.Connection): the connection used to insert the records
+            table_name (str): the name of the table
+            records (list): the records
+            get_row (Callable[[Any], dict[str, Any]]): function that gets the columns of a record
+
+        Returns:
+            dict[sqlalchemy.Table, list]: the records to insert into each table
+        """
+        if table_name not in self._partition_templates:
+            return {self._get_table(table_name, conn): records}
+        partition_records: dict[str, list] = {}
+        for record in records:
+            name = self._find_partition(table_name, get_row(record)['timestamp'])
+            partition_records.setdefault(name, []).append(record)
+        return {self._get_table(name, conn): records for name, records in partition_records.items()}
+
+    def _storage_tables(self, table_name: str, conn: Connection or None = None) -> list[Table]:
+        """Get the tables that store the records of a table, to modify them: the table itself or, in partitioned
+        SQLite tables, its partitions (since views cannot be modified).
+
+        Args:
+            table_name (str): the name of the table
+            conn (sqlalchemy.Connection or None): the connection used to reflect the tables
+
+        Returns:
+            list[sqlalchemy.Table]: the tables
+        """
+        if table_name not in self._partition_templates:
+            return [self._get_table(table_name, conn)]
+        return [self._get_table(name, conn) for name in self._partitions[table_name]]
+
+    def apply_retention(self, now: datetime or None = None) -> None:
+        """Remove the records of the tables in :data:`PARTITIONED_TABLES` older than :attr:`retention_days` days (and
+        the parameters of the removed intent predictions).
+
+        In partitioned tables, the partitions whose records are all expired are dropped (the latest partition is always
+        kept), so the records of a partition are removed when the whole partition expires. In other tables, the expired
+        records are deleted. The rollups (see :data:`ROLLUPS`) are not modified, so they keep the counts of the removed
+        records.
+
+        Args:
+            now (datetime or None): the current time. If None, the current system time
+        """
+        if not self.retention_days:
+            return
+        cutoff = (now or datetime.now()) - timedelta(days=self.retention_days)
+        table_parameter = self._get_table(TABLE_PARAMETER)
+        dropped: list[tuple[str, str]] = []
+        with self._partitions_lock:
+            try:
+                with self.engine.begin() as conn:
+                    preparer = conn.dialect.identifier_preparer
+                    for table_name in PARTITIONED_TABLES:
+                        partitions = self._partitions.get(table_name)
+                        if partitions is None:
+                            table = self._get_table(table_name, conn)
+                            if table_name == TABLE_INTENT_PREDICTION:
+                                conn.execute(table_parameter.delete().where(table_parameter.c.intent_prediction_id.in_(
+                                    select(table.c.id).where(table.c.timestamp < cutoff)
+                                )))
+                            conn.execute(table.delete().where(table.c.timestamp < cutoff))
+                            continue
+                        latest = max(partitions, key=lambda name: partitions[name], default=None)
+                        expired = [name for name, (_, end) in partitions.items() if end <= cutoff and name != latest]
+                        if not expired:
+                            continue
+                        if table_name in self._partition_templates:
+                            # The view must not reference the dropped partitions
+                            self._create_partition_view(conn, table_name,
+                                                        [name for name in partitions if name not in expired])
+                        for name in expired:
+                            if table_name == TABLE_INTENT_PREDICTION:
+                                partition = self._get_table(name, conn)
+                                conn.execute(table_parameter.delete().where(
+                                    table_parameter.c.intent_prediction_id.in_(select(partition.c.id))
+                                ))
+                            conn.exec_driver_sql(f'DROP TABLE {preparer.quote(name)}')
+                            if conn.dialect.name == 'sqlite':
+                                conn.execute(text('DELETE FROM sqlite_sequence WHERE name = :name'), {'name': name})
+                            dropped.append((table_name, name))
+            except Exception as e:
+                logger.error(e)
+                return
+            for table_name, name in dropped:
+                del self._partitions[table_name][name]
+                self._tables.pop(name, None)
+                logger.info(f"Dropped expired partition '{name}' of the monitoring DB table '{table_name}'")
+
+    def _get_table(self, table_name: str, conn: Connection or None = None) -> Table:
+        """Get a table of the monitoring database. It is reflected from the database only the first time.
+
+        Args:
+            table_name (str): the name of the table
+            conn (sqlalchemy.Connection or None): the connection used to reflect the table. If None, a connection is
+                checked out from the pool
+
+        Returns:
+            sqlalchemy.Table: the table
+        """
+        table = self._tables.get(table_name)
+        if table is None:
+            if conn is None:
+                with self.engine.connect() as conn:
+                    return self._get_table(table_name, conn)
+            table = Table(table_name, MetaData(), autoload_with=conn)
+            self._tables[table_name] = table
+        return table
+
+    def _get_session_db_id(
+            self,
+            agent_name: str,
+            platform_name: str,
+            session_id: str,
+            conn: Connection or None = None
+    ) -> int or None:
+        """Get the database id (i.e., the ``id`` column of the sessions table) of a session.
+
+        The id is only queried the first time, then it is cached until the session is deleted.
+
+        Args:
+            agent_name (str): the agent name
+            platform_name (str): the platform name
+            session_id (str): the session id
+            conn (sqlalchemy.Connection or None): the connection used to run the query. If None, a connection is
+                checked out from the pool
+
+        Returns:
+            int or None: the session database id, or None if the session is not in the database
         """
-        Stores the current session variables (dictionary) as a JSON string in the monitoring database,
-        replacing the old value for the given session.
+        session_db_id = self._session_ids.get((agent_name, session_id))
+        if session_db_id is None:
+            if conn is None:
+                with self.engine.connect() as conn:
+                    return self._get_session_db_id(agent_name, platform_name, session_id, conn)
+            table = self._get_table(TABLE_SESSION, conn)
+            result = conn.execute(select(table.c.id).where(
+                table.c.agent_name == agent_name,
+                table.c.platform_name == platform_name,
+                table.c.session_id == session_id
+            )).first()
+            if result is None:
+                return None
+            session_db_id = int(result[0])
+            self._session_ids[(agent_name, session_id)] = session_db_id
+        return session_db_id
+
+    def insert_session(self, session: Session) -> bool:
+        """Insert a new session record into the sessions table of the monitoring database.
+
+        Args:
+            session (Session): the session to insert into the database
+
+        Returns:
+            bool: whether the session was inserted or not (e.g. because it already exists in the database)
+        """
+        table = self._get_table(TABLE_SESSION)
+        row = {
+            'username': session._username,
+            'session_name': session._session_name,
+            'agent_name': session._agent.name,
+            'session_id': session.id,
+            'platform_name': session.platform.__class__.__name__,
+            'timestamp': datetime.now(),
+            'variables': "{}"
+        }
+        stmt = insert(table).values(**row).returning(table.c.id)
+        try:
+            with self.engine.begin() as conn:
+                session_db_id = int(conn.execute(stmt).scalar_one())
+                self._update_rollups(conn, TABLE_SESSION, [(session._agent.name, row)])
+            self._session_ids[(session._agent.name, session.id)] = session_db_id
+            return True
+        except Exception as e:
+            logger.error(e)
+            return False
+
+    def store_session_variables(self, session: Session, variables: dict[str, str or None] or None = None) -> None:
+        """Store session variables in the session variables table of the monitoring database, one record per variable.
+
+        Only the given variables (e.g. the ones changed since they were last stored) are written, replacing their
+        previous value, so the size of the write does not depend on the size of the whole session dictionary.
 
         Args:
             session (Session): The session whose variables should be stored.
+            variables (dict[str, str or None] or None): The JSON-serialized value of the variables to store, by name.
+                A None value deletes the variable. If None, all the current session variables are stored (except the
+                ones that are not JSON serializable), replacing the stored ones.
         """
-        table = Table(TABLE_SESSION, MetaData(), autoload_with=self.conn)
-        session_dict = session.get_dictionary()
-        json_variables = json.dumps(session_dict)
-        stmt = (
-            table.update()
-            .where(
-                table.c.agent_name == session._agent.name,
-                table.c.platform_name == session.platform.__class__.__name__,
-                table.c.session_id == session.id
-            )
-            .values(variables=json_variables)
-        )
-        self.run_statement(stmt)
+        replace_all = variables is None
+        if replace_all:
+            variables = {}
+            for key, value in session.get_dictionary().items():
+                try:
+                    variables[key] = json.dumps(value)
+                except (TypeError, ValueError) as e:
+                    logger.warning(f"Session variable '{key}' of session {session.id} is not JSON serializable, it "
+                                   f"will not be stored in the monitoring database: {e}")
+        elif not variables:
+            return
+        session_db_id = self._get_session_db_id(session._agent.name, session.platform.__class__.__name__, session.id)
+        if session_db_id is None:
+            logger.warning(f'Session {session.id} not found in the monitoring DB, its variables will not be stored')
+            return
+        table = self._get_table(TABLE_SESSION_VARIABLE)
+        stmt_delete = table.delete().where(table.c.session_id == session_db_id)
+        if not replace_all:
+            stmt_delete = stmt_delete.where(table.c.name.in_(list(variables)))
+        stmts = [stmt_delete]
+        rows = [
+            {'session_id': session_db_id, 'name': key, 'value': value}
+            for key, value in variables.items() if value is not None
+        ]
+        if rows:
+            stmts.append(insert(table).values(rows))
+        self.run_statements(stmts)
 
     def load_session_variables(self, session: Session) -> None:
         """
-        Loads the session variables from the monitoring database, transforms the JSON string into a dictionary,
-        and sets each key-value pair in the session using session.set(key, value).
+        Loads the session variables from the monitoring database into the session dictionary (without storing them
+        again).
+
+        Sessions stored by previous versions have all their variables in the ``variables`` column of the sessions
+        table. In that case, they are moved to the session variables table.
 
         Args:
             session (Session): The session whose variables should be loaded.
         """
-        session_entry = self.select_session(session)
-        if session_entry.empty:
+        session_db_id = self._get_session_db_id(session._agent.name, session.platform.__class__.__name__, session.id)
+        if session_db_id is None:
             return
-        variables_json = session_entry.iloc[0]['variables']
+        table = self._get_table(TABLE_SESSION_VARIABLE)
+        table_session = self._get_table(TABLE_SESSION)
         try:
-            variables_dict = json.loads(variables_json) if variables_json else {}
+            with self.engine.connect() as conn:
+                rows = conn.execute(
+                    select(table.c.name, table.c.value).where(table.c.session_id == session_db_id)
+                ).all()
+                if rows:
+                    variables_dict = {name: json.loads(value) for name, value in rows}
+                    legacy = False
+                else:
+                    variables_json = conn.execute(
+                        select(table_session.c.variables).where(table_session.c.id == session_db_id)
+                    ).scalar()
+                    variables_dict = json.loads(variables_json) if variables_json else {}
+                    legacy = bool(variables_dict)
             for key, value in variables_dict.items():
-                session.set(key, value)
+                session._dictionary[key] = value
+            if legacy:
+                self.store_session_variables(session)
+                # Otherwise, the old variables would be loaded again if all the session variables were deleted
+                self.run_statement(
+                    table_session.update().where(table_session.c.id == session_db_id).values(variables='{}')
+                )
         except Exception as e:
             logger.error(f"Error loading session variables: {e}")
 
+    def start_writer(self, max_queue_size: int = 10000, max_size: int = 100, max_wait: float = 0.5) -> None:
+        """Start a write-behind queue for the records inserted into the monitoring database.
+
+        Args:
+            max_queue_size (int): the maximum number of records waiting to be written
+            max_size (int): the maximum number of records written in a single batch
+            max_wait (float): the maximum time (in seconds) a record waits for other records to fill its batch
+        """
+        if self.writer is None or not self.writer.running:
+            self.writer = MonitoringDBWriter(self, self.engine, max_queue_size, max_size, max_wait)
+            self.writer.start()
+
+    def flush(self) -> None:
+        """Wait until all the records queued in the write-behind queue (if any) have been written."""
+        if self.writer is not None:
+            self.writer.flush()
+
+    def _insert_record(
+            self,
+            table_name: str,
+            session: Session or None,
+            row: dict[str, Any],
+            children: tuple[str, str, list[dict[str, Any]]] or None = None
+    ) -> None:
+        """Insert a record into the monitoring database, or queue it if the write-behind queue is running.
+
+        Args:
+            table_name (str): the name of the table the record is inserted into
+            session (Session or None): the session the record belongs to
+            row (dict[str, Any]): the record columns (except ``session_id``)
+            children (tuple[str, str, list[dict[str, Any]]] or None): records that reference this one, as a
+                (table name, foreign key column, rows) tuple
+        """
+        if self.writer is not None and self.writer.running:
+            self.writer.put(table_name, session, row, children)
+            return
+        try:
+            with self.engine.begin() as conn:
+                self.write_records([(table_name, session, row, children)], conn)
+        except Exception as e:
+            logger.error(e)
+
+    def write_records(
+            self,
+            records: list[tuple[str, Session or None, dict[str, Any], tuple[str, str, list[dict[str, Any]]] or None]],
+            conn: Connection
+    ) -> None:
+        """Insert a set of records into the monitoring database, with a multi-row insert per table, and update their
+        rollups.
+
+        The records are not committed.
+
+        Args:
+            records (list[tuple[str, Session or None, dict[str, Any], tuple[str, str, list[dict[str, Any]]] or None]]):
+                the records to insert, as (table name, session, row, children) tuples (see
+                :meth:`MonitoringDBWriter.put`)
+            conn (sqlalchemy.Connection): the connection used to insert the records
+        """
+        self._prepare_partitions(records)
+        session_ids = self.select_session_ids([session for _, session, _, _ in records if session is not None], conn)
+        rows: dict[str, list[dict[str, Any]]] = {}
+        parents: dict[str, list[tuple[dict[str, Any], tuple[str, str, list[dict[str, Any]]]]]] = {}
+        rollup_rows: dict[str, list[tuple[str, dict[str, Any]]]] = {}
+        for table_name, session, row, children in records:
+            if session is not None:
+                if session not in session_ids:
+                    logger.warning(f'Session {session.id} not found in the monitoring DB, the {table_name} record '
+                                   f'will not be stored')
+                    continue
+                row = {**row, 'session_id': session_ids[session]}
+            rollup_rows.setdefault(table_name, []).append((session._agent.name if session is not None else '', row))
+            if children is not None:
+                parents.setdefault(table_name, []).append((row, children))
+            else:
+                rows.setdefault(table_name, []).append(row)
+        for table_name, table_rows in rows.items():
+            for table, partition_rows in self._route_records(conn, table_name, table_rows).items():
+                conn.execute(insert(table), partition_rows)
+        for table_name, table_parents in parents.items():
+            for table, partition_parents in self._route_records(conn, table_name, table_parents,
+                                                                lambda parent: parent[0]).items():
+                # The ids of the parent records are needed to insert the records that reference them
+                result = conn.execute(
+                    insert(table).returning(table.c.id, sort_by_parameter_order=True),
+                    [row for row, _ in partition_parents]
+                )
+                child_rows: dict[str, list[dict[str, Any]]] = {}
+                for (parent_id,), (_, (child_table, foreign_key, children_rows)) in zip(result.all(), partition_parents):
+                    child_rows.setdefault(child_table, []).extend(
+                        {**child_row, foreign_key: parent_id} for child_row in children_rows
+                    )
+                for child_table, table_rows in child_rows.items():
+                    if table_rows:
+                        conn.execute(insert(self._get_table(child_table, conn)), table_rows)
+        # The rollups are updated in the same transaction, so they always match the stored records
+        for table_name, table_rollup_rows in rollup_rows.items():
+            self._update_rollups(conn, table_name, table_rollup_rows)
+
+    def _update_rollups(
+            self,
+            conn: Connection,
+            table_name: str,
+            rows: list[tuple[str, dict[str, Any]]],
+            sign: int = 1
+    ) -> None:
+        """Add (or subtract) a set of records of a monitoring database table to its rollup table (see :data:`ROLLUPS`).
+
+        In PostgreSQL and SQLite, the rollup groups are updated with an atomic upsert, so concurrent transactions do not
+        lose updates.
+
+        Args:
+            conn (sqlalchemy.Connection): the connection (in a transaction) used to update the rollups
+            table_name (str): the name of the table the records belong to
+            rows (list[tuple[str, dict[str, Any]]]): the records, as (agent name, record columns) tuples. The agent name
+                is empty for records that do not belong to a session
+            sign (int): 1 to add the records to the rollups, -1 to subtract them (e.g. when they are deleted)
+        """
+        if table_name not in ROLLUPS:
+            return
+        rollup_name, group_columns, sum_columns = ROLLUPS[table_name]
+        groups: dict[tuple, list[float]] = {}
+        for agent_name, row in rows:
+            key = (
+                agent_name or '',
+                row['timestamp'].replace(minute=0, second=0, microsecond=0),
+                *('' if row[column] is None else row[column] for column in group_columns)
+            )
+            group = groups.setdefault(key, [0] * (len(sum_columns) + 1))
+            group[0] += sign
+            for i, column in enumerate(sum_columns, start=1):
+                group[i] += sign * float(row[column] or 0)
+        if not groups:
+            return
+        rollup_table = self._get_table(rollup_name, conn)
+        key_columns = ['agent_name', 'hour', *group_columns]
+        value_columns = ['count', *[f'{column}_sum' for column in sum_columns]]
+        group_rows = [dict(zip(key_columns + value_columns, key + tuple(group))) for key, group in groups.items()]
+        if conn.dialect.name in ('postgresql', 'sqlite'):
+            stmt = (postgresql if conn.dialect.name == 'postgresql' else sqlite).insert(rollup_table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=key_columns,
+                set_={column: rollup_table.c[column] + stmt.excluded[column] for column in value_columns}
+            )
+            conn.execute(stmt, group_rows)
+        else:
+            # Databases without upserts: update the existing groups and insert the new ones
+            for group_row in group_rows:
+                result = conn.execute(
+                    rollup_table.update()
+                    .where(*[rollup_table.c[column] == group_row[column] for column in key_columns])
+                    .values({column: rollup_table.c[column] + group_row[column] for column in value_columns})
+                )
+                if result.rowcount == 0:
+                    conn.execute(insert(rollup_table), group_row)
+        if sign < 0:
+            conn.execute(rollup_table.delete().where(rollup_table.c.count <= 0))
+
+    def _select_rollup_rows(
+            self,
+            conn: Connection,
+            table_name: str,
+            session_db_id: int or None = None,
+            chunk_size: int = 10000
+    ):
+        """Read the records of a monitoring database table that are added to its rollup table, in chunks.
+
+        Only the records of existing sessions (or that do not belong to a session) are read.
+
+        Args:
+            conn (sqlalchemy.Connection): the connection used to read the records
+            table_name (str): the name of the table
+            session_db_id (int or None): if provided, only the records of this session (its database id)
+            chunk_size (int): the maximum number of records of each chunk
+
+        Yields:
+            list[tuple[str, dict[str, Any]]]: a chunk of records, as (agent name, record columns) tuples
+        """
+        _, group_columns, sum_columns = ROLLUPS[table_name]
+        table = self._get_table(table_name, conn)
+        table_session = self._get_table(TABLE_SESSION, conn)
+        if table_name == TABLE_SESSION:
+            stmt = select(table.c.agent_name, table.c.timestamp)
+            if session_db_id is not None:
+                stmt = stmt.where(table.c.id == session_db_id)
+        else:
+            stmt = select(
+                table_session.c.agent_name, table.c.timestamp, *[table.c[column] for column in group_columns + sum_columns]
+            ).select_from(
+                table.outerjoin(table_session, table.c.session_id == table_session.c.id)
+            ).where(
+                or_(table.c.session_id.is_(None), table_session.c.id.is_not(None))
+            )
+            if session_db_id is not None:
+                stmt = stmt.where(table.c.session_id == session_db_id)
+        result = conn.execution_options(yield_per=chunk_size).execute(stmt)
+        for partition in result.partitions():
+            yield [(row.agent_name, row._mapping) for row in partition]
+
+    def rebuild_rollups(self) -> None:
+        """Recompute all the rollup tables from the records of the monitoring database (e.g. the records stored before
+        the rollup tables were created)."""
+        self.flush()
+        with self.engine.begin() as conn:
+            for table_name, (rollup_name, _, _) in ROLLUPS.items():
+                conn.execute(self._get_table(rollup_name, conn).delete())
+                for rollup_rows in self._select_rollup_rows(conn, table_name):
+                    self._update_rollups(conn, table_name, rollup_rows)
+
+    def select_session_ids(self, sessions: list[Session], conn: Connection or None = None) -> dict[Session, int]:
+        """Get the database ids (i.e., the ``id`` column of the sessions table) of a set of sessions.
+
+        Args:
+            sessions (list[Session]): the sessions
+            conn (sqlalchemy.Connection or None): the connection used to run the queries (only for the sessions whose id
+                is not cached). If None, a connection is checked out from the pool
+
+        Returns:
+            dict[Session, int]: the id of each session found in the database
+        """
+        session_ids: dict[Session, int] = {}
+        for session in set(sessions):
+            session_db_id = self._get_session_db_id(session._agent.name, session.platform.__class__.__name__,
+                                                    session.id, conn)
+            if session_db_id is not None:
+                session_ids[session] = session_db_id
+        return session_ids
+
     def insert_intent_prediction(
             self,
             session: Session,
@@ -219,38 +1227,29 @@ class MonitoringDB:
                 changed since the intent prediction, so we need it as argument)
             predicted_intent (IntentClassifierPrediction): the intent prediction
         """
-        table = Table(TABLE_INTENT_PREDICTION, MetaData(), autoload_with=self.conn)
-        session_entry = self.select_session(session)
         if state not in session._agent.nlp_engine._intent_classifiers and predicted_intent.intent.name == 'fallback_intent':
             intent_classifier = 'None'
         elif isinstance(session._agent.nlp_engine._intent_classifiers[state], LLMIntentClassifier):
             intent_classifier = state.ic_config.llm_name
         else:
-            intent_classifier = session._agent.nlp_engine._intent_classifiers[state].__class__.__name__,
-        stmt = insert(table).values(
-            session_id=int(session_entry['id'][0]),
-            message=predicted_intent.matched_sentence,
-            timestamp=datetime.now(),
-            intent_classifier=intent_classifier,
-            intent=predicted_intent.intent.name,
-            score=float(predicted_intent.score)
-        )
-        result = self.conn.execute(stmt.returning(table.c.id))  # Not committed until all parameters have been inserted
-        intent_prediction_id = int(result.fetchone()[0])
-        table = Table(TABLE_PARAMETER, MetaData(), autoload_with=self.conn)
-        rows_to_insert = [
+            intent_classifier = session._agent.nlp_engine._intent_classifiers[state].__class__.__name__
+        row = {
+            'message': predicted_intent.matched_sentence,
+            'timestamp': datetime.now(),
+            'intent_classifier': intent_classifier,
+            'intent': predicted_intent.intent.name,
+            'score': float(predicted_intent.score)
+        }
+        parameter_rows = [
             {
-                'intent_prediction_id': intent_prediction_id,
                 'name': matched_parameter.name,
                 'value': matched_parameter.value,
                 'info': str(matched_parameter.info),
             } for matched_parameter in predicted_intent.matched_parameters
         ]
-        if rows_to_insert:
-            stmt = insert(table).values(rows_to_insert)
-            self.run_statement(stmt)
-        else:
-            self.conn.commit()
+        # The parameters are inserted along with the intent prediction
+        self._insert_record(TABLE_INTENT_PREDICTION, session, row,
+                            (TABLE_PARAMETER, 'intent_prediction_id', parameter_rows))
 
     def insert_transition(self, session: Session, transition: Transition) -> None:
         """Insert a new transition record into the transitions table of the monitoring database.
@@ -259,8 +1258,6 @@ class MonitoringDB:
             session (Session): the session the transition belongs to
             transition (Transition): the transition to insert into the database
         """
-        table = Table(TABLE_TRANSITION, MetaData(), autoload_with=self.conn)
-        session_entry = self.select_session(session)
         if transition.is_event():
             event = transition.event.name
         else:
@@ -269,15 +1266,13 @@ class MonitoringDB:
             condition = str(transition.condition)
         else:
             condition = ''
-        stmt = insert(table).values(
-            session_id=int(session_entry['id'][0]),
-            source_state=transition.source.name,
-            dest_state=transition.dest.name,
-            event=event,
-            condition=condition,
-            timestamp=datetime.now(),
-        )
-        self.run_statement(stmt)
+        self._insert_record(TABLE_TRANSITION, session, {
+            'source_state': transition.source.name,
+            'dest_state': transition.dest.name,
+            'event': event,
+            'condition': condition,
+            'timestamp': datetime.now(),
+        })
 
     def insert_chat(self, session: Session, message: Message) -> None:
         """Insert a new record into the chat table of the monitoring database.
@@ -286,16 +1281,63 @@ class MonitoringDB:
             session (Session): the session the transition belongs to
             message (Message): the message to insert into the database
         """
-        table = Table(TABLE_CHAT, MetaData(), autoload_with=self.conn)
-        session_entry = self.select_session(session)
-        stmt = insert(table).values(
-            session_id=int(session_entry['id'][0]),
-            type=message.type.value,
-            content=str(message.content),
-            is_user=message.is_user,
-            timestamp=message.timestamp,
-        )
-        self.run_statement(stmt)
+        self._insert_record(TABLE_CHAT, session, {
+            'type': message.type.value,
+            'content': self.chat_content(message),
+            'is_user': message.is_user,
+            'timestamp': message.timestamp,
+        })
+
+    def chat_content(self, message: Message) -> str:
+        """Get the content of a message as it is stored in the chat table.
+
+        The files (i.e., :class:`~baf.core.file.File` contents) are stored as a JSON string, according to the
+        :attr:`file_storage`:
+
+        - ``inline``: the name, type and base64 content of the file (see :meth:`~baf.core.file.File.get_json_string`)
+        - ``hash``: the name, type, size and SHA-256 digest of the file. Its content is not stored
+        - ``reference``: the name, type, size and SHA-256 digest of the file, and the path of a copy of the file in
+          :attr:`files_path`, named after its digest (so identical files are stored once)
+
+        Args:
+            message (Message): the message
+
+        Returns:
+            str: the stored content
+        """
+        if not isinstance(message.content, File):
+            return str(message.content)
+        file: File = message.content
+        if self.file_storage == 'inline':
+            return file.get_json_string()
+        file_dict = {'name': file.name, 'type': file.type, 'size': file.size, 'sha256': file.sha256}
+        if self.file_storage == 'reference':
+            path = os.path.join(self.files_path, file.sha256)
+            if not os.path.exists(path):
+                # Written to a temporary path first, so that a file is never read before it is completely written
+                tmp_path = f'{path}.{threading.get_ident()}.tmp'
+                file.save(tmp_path)
+                os.replace(tmp_path, path)
+            file_dict['path'] = path
+        return json.dumps(file_dict)
+
+    @staticmethod
+    def load_file(content: str) -> File or None:
+        """Get the file of a chat message, from its stored content (see :meth:`chat_content`).
+
+        Args:
+            content (str): the stored content of the message
+
+        Returns:
+            File or None: the file, or None if its content was not stored (or its copy no longer exists)
+        """
+        file_dict = json.loads(content)
+        if 'base64' in file_dict:
+            return File.from_dict(file_dict)
+        if 'path' in file_dict and os.path.exists(file_dict['path']):
+            with open(file_dict['path'], 'rb') as stream:
+                return File(file_name=file_dict['name'], file_type=file_dict['type'], file_stream=stream)
+        return None
 
     def insert_event(self, session: Session or None, event: Event) -> None:
         """Insert a new record into the event table of the monitoring database.
@@ -306,11 +1348,6 @@ class MonitoringDB:
             event (Event): the event to insert into the database
         """
         # TODO: We need to store agent id for broadcasted events
-        table = Table(TABLE_EVENT, MetaData(), autoload_with=self.conn)
-        if session is not None:
-            session_id = int(self.select_session(session)['id'][0])
-        else:
-            session_id = None
         if isinstance(event, ReceiveMessageEvent):
             info = event.message
         elif isinstance(event, ReceiveFileEvent):
@@ -321,13 +1358,14 @@ class MonitoringDB:
             info = {'category': event._category, 'action': event.action, 'payload': event.payload}
         else:
             info = ''
-        stmt = insert(table).values(
-            session_id=session_id,
-            event=event.name,
-            info=str(info),
-            timestamp=datetime.now()
-        )
-        self.run_statement(stmt)
+        row = {
+            'event': event.name,
+            'info': str(info),
+            'timestamp': datetime.now()
+        }
+        if session is None:
+            row['session_id'] = None
+        self._insert_record(TABLE_EVENT, session, row)
 
     def select_session(self, session: Session) -> pd.DataFrame:
         """Retrieves a session record from the sessions table of the database.
@@ -339,13 +1377,14 @@ class MonitoringDB:
             pandas.DataFrame: the session record, should be a 1 row DataFrame
 
         """
-        table = Table(TABLE_SESSION, MetaData(), autoload_with=self.conn)
+        table = self._get_table(TABLE_SESSION)
         stmt = select(table).where(
             table.c.agent_name == session._agent.name,
             table.c.platform_name == session.platform.__class__.__name__,
             table.c.session_id == session.id
         )
-        return pd.read_sql_query(stmt, self.conn)
+        with self.engine.connect() as conn:
+            return pd.read_sql_query(stmt, conn)
     def session_exists(self, agent_name: str, platform_name: str, session_id: str) -> bool:
         """
         Checks whether there is an entry with the given agent_name, platform_name, and session_id in the sessions table.
@@ -358,48 +1397,69 @@ class MonitoringDB:
         Returns:
             bool: True if the session exists, False otherwise.
         """
-        table = Table(TABLE_SESSION, MetaData(), autoload_with=self.conn)
+        table = self._get_table(TABLE_SESSION)
         stmt = select(table).where(
             table.c.agent_name == agent_name,
             table.c.platform_name == platform_name,
             table.c.session_id == session_id
         )
-        result = self.conn.execute(stmt)
-        return result.first() is not None
+        with self.engine.connect() as conn:
+            return conn.execute(stmt).first() is not None
 
     def delete_session(self, session: Session) -> None:
         """
-        Deletes the session information, chat messages, and transitions related to the given session from the monitoring database.
+        Deletes the session information, chat messages, intent predictions (and their parameters), events, transitions
+        and variables related to the given session from the monitoring database.
 
         Args:
             session (Session): The session to delete.
         """
+        # The queued records of the session must be written before deleting it
+        self.flush()
         # Get session DB id
-        table_session = Table(TABLE_SESSION, MetaData(), autoload_with=self.conn)
-        stmt_session_id = select(table_session.c.id).where(
-            table_session.c.agent_name == session._agent.name,
-            table_session.c.platform_name == session.platform.__class__.__name__,
-            table_session.c.session_id == session.id
-        )
-        result_session_id = self.conn.execute(stmt_session_id).first()
-        if not result_session_id:
+        table_session = self._get_table(TABLE_SESSION)
+        session_db_id = self._get_session_db_id(session._agent.name, session.platform.__class__.__name__, session.id)
+        if session_db_id is None:
             logger.error(f"Session not found for deletion: {session.id}")
             return
-        session_db_id = result_session_id[0]
-
-        # Delete chat messages
-        table_chat = Table(TABLE_CHAT, MetaData(), autoload_with=self.conn)
-        stmt_delete_chat = table_chat.delete().where(table_chat.c.session_id == session_db_id)
-        self.run_statement(stmt_delete_chat)
+        self._session_ids.pop((session._agent.name, session.id), None)
+
+        # The records of the session are deleted explicitly, since the cascade foreign keys are not enforced by SQLite
+        # and partitioned tables cannot have them.
+        # Delete intent prediction parameters (before the intent predictions they reference)
+        table_parameter = self._get_table(TABLE_PARAMETER)
+        table_intent_prediction = self._get_table(TABLE_INTENT_PREDICTION)
+        stmts_delete_records = [table_parameter.delete().where(table_parameter.c.intent_prediction_id.in_(
+            select(table_intent_prediction.c.id).where(table_intent_prediction.c.session_id == session_db_id)
+        ))]
+
+        # Delete chat messages, intent predictions and events (from each partition, if partitioned)
+        for table_name in [TABLE_CHAT, TABLE_INTENT_PREDICTION, TABLE_EVENT]:
+            stmts_delete_records.extend(
+                table.delete().where(table.c.session_id == session_db_id)
+                for table in self._storage_tables(table_name)
+            )
 
         # Delete transitions
-        table_transition = Table(TABLE_TRANSITION, MetaData(), autoload_with=self.conn)
+        table_transition = self._get_table(TABLE_TRANSITION)
         stmt_delete_transition = table_transition.delete().where(table_transition.c.session_id == session_db_id)
-        self.run_statement(stmt_delete_transition)
+
+        # Delete session variables
+        table_variable = self._get_table(TABLE_SESSION_VARIABLE)
+        stmt_delete_variables = table_variable.delete().where(table_variable.c.session_id == session_db_id)
 
         # Delete session itself
         stmt_delete_session = table_session.delete().where(table_session.c.id == session_db_id)
-        self.run_statement(stmt_delete_session)
+        try:
+            with self.engine.begin() as conn:
+                # The records of the session are subtracted from the rollups
+                for table_name in ROLLUPS:
+                    for rollup_rows in self._select_rollup_rows(conn, table_name, session_db_id):
+                        self._update_rollups(conn, table_name, rollup_rows, sign=-1)
+                for stmt in [*stmts_delete_records, stmt_delete_transition, stmt_delete_variables, stmt_delete_session]:
+                    conn.execute(stmt)
+        except Exception as e:
+            logger.error(e)
     
     def get_last_state_of_session(self, agent_name: str, platform_name: str, session_id: str) -> str | None:
         """
@@ -413,27 +1473,22 @@ class MonitoringDB:
         Returns:
             str | None: The last dest_state value, or None if not found.
         """
+        self.flush()
         # Get session id
-        table_session = Table(TABLE_SESSION, MetaData(), autoload_with=self.conn)
-        stmt_session = select(table_session.c.id).where(
-            table_session.c.agent_name == agent_name,
-            table_session.c.platform_name == platform_name,
-            table_session.c.session_id == session_id
-        )
-        result_session = self.conn.execute(stmt_session).first()
-        if not result_session:
+        session_db_id = self._get_session_db_id(agent_name, platform_name, session_id)
+        if session_db_id is None:
             return None
-        session_db_id = result_session[0]
 
         # Get last dest_state from transition table
-        table_transition = Table(TABLE_TRANSITION, MetaData(), autoload_with=self.conn)
+        table_transition = self._get_table(TABLE_TRANSITION)
         stmt_transition = (
             select(table_transition.c.dest_state)
             .where(table_transition.c.session_id == session_db_id)
             .order_by(desc(table_transition.c.timestamp))
             .limit(1)
         )
-        result_transition = self.conn.execute(stmt_transition).first()
+        with self.engine.connect() as conn:
+            result_transition = conn.execute(stmt_transition).first()
         return result_transition[0] if result_transition else None
 
     def select_chat(
@@ -451,12 +1506,12 @@ class MonitoringDB:
         Returns:
             pandas.DataFrame: the chat records for the given session
         """
-
-        table = Table(TABLE_CHAT, MetaData(), autoload_with=self.conn)
-        session_entry = self.select_session(session)
+        self.flush()
+        table = self._get_table(TABLE_CHAT)
+        session_db_id = self._get_session_db_id(session._agent.name, session.platform.__class__.__name__, session.id)
 
         base_stmt = select(table).where(
-            table.c.session_id == int(session_entry["id"][0])
+            table.c.session_id == session_db_id
         )
 
         if until_timestamp is not None:
@@ -475,7 +1530,8 @@ class MonitoringDB:
             # all rows, ordered chronologically
             stmt = base_stmt.order_by(table.c.timestamp, table.c.id)
 
-        return pd.read_sql_query(stmt, self.conn)
+        with self.engine.connect() as conn:
+            return pd.read_sql_query(stmt, conn)
 
     def run_statement(self, stmt: Executable) -> CursorResult[Any] | None:
         """Executes a SQL statement.
@@ -487,14 +1543,30 @@ class MonitoringDB:
             sqlalchemy.CursorResult[Any] | None: the result of the SQL statement
         """
         try:
-            result = self.conn.execute(stmt)
-            self.conn.commit()
-            return result
+            with self.engine.begin() as conn:
+                return conn.execute(stmt)
         except Exception as e:
             logger.error(e)
-            self.conn.rollback()
             return None
 
+    def run_statements(self, stmts: list[Executable]) -> bool:
+        """Executes a set of SQL statements in a single transaction.
+
+        Args:
+            stmts (list[sqlalchemy.Executable]): the SQL statements
+
+        Returns:
+            bool: whether the transaction was committed or not (i.e., if any statement failed, none is applied)
+        """
+        try:
+            with self.engine.begin() as conn:
+                for stmt in stmts:
+                    conn.execute(stmt)
+            return True
+        except Exception as e:
+            logger.error(e)
+            return False
+
     def get_table(self, table_name: str) -> pd.DataFrame:
         """Gets all the content of a database table (i.e., SELECT * FROM table_name).
 
@@ -505,10 +1577,355 @@ class MonitoringDB:
             pandas.DataFrame: the table in a dataframe
         """
         query = f"SELECT * FROM {table_name}"
-        return pd.read_sql_query(query, self.conn)
+        with self.engine.connect() as conn:
+            return pd.read_sql_query(query, conn)
+
+    def _record_filters(
+            self,
+            table: Table,
+            agent_names: list[str] or None = None,
+            session_ids: list[str] or None = None,
+            start: datetime or None = None,
+            end: datetime or None = None,
+            filters: dict[str, Any] or None = None
+    ) -> list[ColumnElement[bool]]:
+        """Build the SQL conditions that filter the records of a monitoring database table.
+
+        Args:
+            table (sqlalchemy.Table): the table
+            agent_names (list[str] or None): if provided, only the records of the sessions of these agents
+            session_ids (list[str] or None): if provided, only the records of these sessions (the ``session_id`` column
+                of the sessions table)
+            start (datetime or None): if provided, only the records with a later (or equal) timestamp
+            end (datetime or None): if provided, only the records with an earlier (or equal) timestamp
+            filters (dict[str, Any] or None): additional conditions, as column values by column name. A list, tuple or
+                set of values matches any of them
+
+        Returns:
+            list[sqlalchemy.ColumnElement[bool]]: the SQL conditions
+        """
+        conditions = []
+        if table.name == TABLE_PARAMETER:
+            # Parameters are filtered by the intent prediction they belong to
+            table_intent_prediction = self._get_table(TABLE_INTENT_PREDICTION)
+            intent_prediction_conditions = self._record_filters(table_intent_prediction, agent_names, session_ids,
+                                                                start, end)
+            if intent_prediction_conditions:
+                conditions.append(table.c.intent_prediction_id.in_(
+                    select(table_intent_prediction.c.id).where(*intent_prediction_conditions)
+                ))
+        elif table.name == TABLE_SESSION:
+            if agent_names:
+                conditions.append(table.c.agent_name.in_(agent_names))
+            if session_ids:
+                conditions.append(table.c.session_id.in_(session_ids))
+        elif agent_names or session_ids:
+            table_session = self._get_table(TABLE_SESSION)
+            conditions.append(table.c.session_id.in_(
+                select(table_session.c.id).where(*self._record_filters(table_session, agent_names, session_ids))
+            ))
+        if 'timestamp' in table.c:
+            if start is not None:
+                conditions.append(table.c.timestamp >= start)
+            if end is not None:
+                conditions.append(table.c.timestamp <= end)
+        for column, value in (filters or {}).items():
+            if isinstance(value, (list, tuple, set)):
+                conditions.append(table.c[column].in_(list(value)))
+            else:
+                conditions.append(table.c[column] == value)
+        return conditions
+
+    def select_records(
+            self,
+            table_name: str,
+            columns: list[str] or None = None,
+            agent_names: list[str] or None = None,
+            session_ids: list[str] or None = None,
+            start: datetime or None = None,
+            end: datetime or None = None,
+            filters: dict[str, Any] or None = None,
+            limit: int or None = None,
+            offset: int or None = None,
+            after_id: int or None = None,
+            descending: bool = False
+    ) -> pd.DataFrame:
+        """Get a page of the records of a monitoring database table. The records are filtered and paginated in the
+        database, so only the requested records are read.
+
+        The records are sorted by id. Pages can be requested by position (``offset``) or, to get the next page
+        efficiently in large tables, from the last record of the previous page (``after_id``).
+
+        Args:
+            table_name (str): the name of the table
+            columns (list[str] or None): the columns to get. If None, gets all the columns
+            agent_names (list[str] or None): if provided, only the records of the sessions of these agents
+            session_ids (list[str] or None): if provided, only the records of these sessions (the ``session_id`` column
+                of the sessions table)
+            start (datetime or None): if provided, only the records with a later (or equal) timestamp
+            end (datetime or None): if provided, only the records with an earlier (or equal) timestamp
+            filters (dict[str, Any] or None): additional conditions, as column values by column name. A list, tuple or
+                set of values matches any of them
+            limit (int or None): the maximum number of records to get (i.e., the page size)
+            offset (int or None): the number of records to skip
+            after_id (int or None): the id of the last record of the previous page. Only the records after it (in the
+                requested order) are returned
+            descending (bool): whether the records are sorted from the latest (highest id) or not
+
+        Returns:
+            pandas.DataFrame: the records
+        """
+        table = self._get_table(table_name)
+        stmt = select(*[table.c[column] for column in columns]) if columns else select(table)
+        conditions = self._record_filters(table, agent_names, session_ids, start, end, filters)
+        if after_id is not None:
+            conditions.append(table.c.id < after_id if descending else table.c.id > after_id)
+        stmt = stmt.where(*conditions).order_by(desc(table.c.id) if descending else table.c.id)
+        if limit is not None:
+            stmt = stmt.limit(limit)
+        if offset:
+            stmt = stmt.offset(offset)
+        self.flush()
+        with self.analytics_engine.connect() as conn:
+            return pd.read_sql_query(stmt, conn)
+
+    def aggregate_records(
+            self,
+            table_name: str,
+            group_by: list[str] or None = None,
+            per_day: bool = False,
+            mean_columns: list[str] or None = None,
+            agent_names: list[str] or None = None,
+            session_ids: list[str] or None = None,
+            start: datetime or None = None,
+            end: datetime or None = None,
+            filters: dict[str, Any] or None = None
+    ) -> pd.DataFrame:
+        """Count the records of a monitoring database table, grouped by some columns (i.e., SQL GROUP BY).
+
+        Args:
+            table_name (str): the name of the table
+            group_by (list[str] or None): the columns to group the records by. If None, all the records are counted
+                together
+            per_day (bool): whether the records are also grouped by the day of their timestamp (``date`` column)
+            mean_columns (list[str] or None): numeric columns whose average is also computed for each group (in
+                ``mean_<column>`` columns)
+            agent_names (list[str] or None): if provided, only the records of the sessions of these agents
+            session_ids (list[str] or None): if provided, only the records of these sessions (the ``session_id`` column
+                of the sessions table)
+            start (datetime or None): if provided, only the records with a later (or equal) timestamp
+            end (datetime or None): if provided, only the records with an earlier (or equal) timestamp
+            filters (dict[str, Any] or None): additional conditions, as column values by column name. A list, tuple or
+                set of values matches any of them
+
+        Returns:
+            pandas.DataFrame: a row per group, with the group columns, the ``count`` column and the ``mean_<column>``
+            columns
+        """
+        table = self._get_table(table_name)
+        conditions = self._record_filters(table, agent_names, session_ids, start, end, filters)
+        return self._aggregate(table, group_by or [], conditions, per_day, mean_columns or [])
+
+    def select_transition_counts(
+            self,
+            agent_names: list[str] or None = None,
+            session_ids: list[str] or None = None,
+            start: datetime or None = None,
+            end: datetime or None = None,
+            states: list[str] or None = None
+    ) -> pd.DataFrame:
+        """Count the transitions between each pair of states (e.g. to draw the flow graph of the agents).
+
+        Args:
+            agent_names (list[str] or None): if provided, only the transitions of the sessions of these agents
+            session_ids (list[str] or None): if provided, only the transitions of these sessions (the ``session_id``
+                column of the sessions table)
+            start (datetime or None): if provided, only the transitions with a later (or equal) timestamp
+            end (datetime or None): if provided, only the transitions with an earlier (or equal) timestamp
+            states (list[str] or None): if provided, only the transitions from or to these states
+
+        Returns:
+            pandas.DataFrame: a row per distinct transition, with the ``source_state``, ``dest_state``, ``event``,
+            ``condition`` and ``count`` columns
+        """
+        group_by = ['source_state', 'dest_state', 'event', 'condition']
+        if session_ids:
+            # Rollups are not grouped by session, so the transitions of specific sessions are counted from the records
+            table = self._get_table(TABLE_TRANSITION)
+            conditions = self._record_filters(table, agent_names, session_ids, start, end)
+            if states:
+                conditions.append(or_(table.c.source_state.in_(states), table.c.dest_state.in_(states)))
+            return self._aggregate(table, group_by, conditions)
+        table = self._get_table(TABLE_ROLLUP_TRANSITION)
+        conditions = self._rollup_filters(table, agent_names, start, end)
+        if states:
+            conditions.append(or_(table.c.source_state.in_(states), table.c.dest_state.in_(states)))
+        return self._aggregate_rollup(table, group_by, conditions)
+
+    def _rollup_filters(
+            self,
+            table: Table,
+            agent_names: list[str] or None = None,
+            start: datetime or None = None,
+            end: datetime or None = None,
+            filters: dict[str, Any] or None = None
+    ) -> list[ColumnElement[bool]]:
+        """Build the SQL conditions that filter the groups of a rollup table.
+
+        Args:
+            table (sqlalchemy.Table): the rollup table
+            agent_names (list[str] or None): if provided, only the groups of these agents
+            start (datetime or None): if provided, only the groups of the hour of this timestamp and later
+            end (datetime or None): if provided, only the groups of earlier (or equal) hours
+            filters (dict[str, Any] or None): additional conditions, as column values by column name. A list, tuple or
+                set of values matches any of them
+
+        Returns:
+            list[sqlalchemy.ColumnElement[bool]]: the SQL conditions
+        """
+        conditions = []
+        if agent_names:
+            conditions.append(table.c.agent_name.in_(agent_names))
+        if start is not None:
+            conditions.append(table.c.hour >= start.replace(minute=0, second=0, microsecond=0))
+        if end is not None:
+            conditions.append(table.c.hour <= end)
+        for column, value in (filters or {}).items():
+            if isinstance(value, (list, tuple, set)):
+                conditions.append(table.c[column].in_(list(value)))
+            else:
+                conditions.append(table.c[column] == value)
+        return conditions
+
+    def select_rollup(
+            self,
+            table_name: str,
+            group_by: list[str] or None = None,
+            per_day: bool = False,
+            mean_columns: list[str] or None = None,
+            agent_names: list[str] or None = None,
+            start: datetime or None = None,
+            end: datetime or None = None,
+            filters: dict[str, Any] or None = None
+    ) -> pd.DataFrame:
+        """Count the records of a monitoring database table from its rollup table (see :data:`ROLLUPS`), grouped by
+        some columns. This is equivalent to :meth:`aggregate_records`, but reads the (small) rollup table instead of
+        all the records, with an hourly time resolution.
+
+        Args:
+            table_name (str): the name of the table (not the rollup table)
+            group_by (list[str] or None): the columns to group the records by (some of the grouping columns of the
+                rollup table, or ``agent_name``). If None, all the records are counted together
+            per_day (bool): whether the records are also grouped by the day of their timestamp (``date`` column)
+            mean_columns (list[str] or None): summed columns of the rollup table whose average is also computed for
+                each group (in ``mean_<column>`` columns)
+            agent_names (list[str] or None): if provided, only the records of these agents
+            start (datetime or None): if provided, only the records of the hour of this timestamp and later
+            end (datetime or None): if provided, only the records of earlier (or equal) hours
+            filters (dict[str, Any] or None): additional conditions, as column values by column name. A list, tuple or
+                set of values matches any of them
+
+        Returns:
+            pandas.DataFrame: a row per group, with the group columns, the ``count`` column and the ``mean_<column>``
+            columns
+        """
+        table = self._get_table(ROLLUPS[table_name][0])
+        conditions = self._rollup_filters(table, agent_names, start, end, filters)
+        return self._aggregate_rollup(table, group_by or [], conditions, per_day, mean_columns or [])
+
+    def _aggregate(
+            self,
+            table: Table,
+            group_by: list[str],
+            conditions: list[ColumnElement[bool]],
+            per_day: bool = False,
+            mean_columns: list[str] or None = None
+    ) -> pd.DataFrame:
+        """Count the records of a table that satisfy some conditions, grouped by some columns.
+
+        Args:
+            table (sqlalchemy.Table): the table
+            group_by (list[str]): the columns to group the records by
+            conditions (list[sqlalchemy.ColumnElement[bool]]): the conditions the records must satisfy
+            per_day (bool): whether the records are also grouped by the day of their timestamp (``date`` column)
+            mean_columns (list[str] or None): numeric columns whose average is also computed for each group
+
+        Returns:
+            pandas.DataFrame: a row per group, with the group columns, the ``count`` column and the ``mean_<column>``
+            columns
+        """
+        group_columns = [table.c[column] for column in group_by]
+        if per_day:
+            group_columns.append(func.date(table.c.timestamp).label('date'))
+        aggregates = [func.count().label('count')]
+        aggregates.extend(func.avg(table.c[column]).label(f'mean_{column}') for column in mean_columns or [])
+        stmt = select(*group_columns, *aggregates).select_from(table).where(*conditions)
+        if group_columns:
+            stmt = stmt.group_by(*group_columns).order_by(*group_columns)
+        return self._read_aggregates(stmt, per_day)
+
+    def _aggregate_rollup(
+            self,
+            table: Table,
+            group_by: list[str],
+            conditions: list[ColumnElement[bool]],
+            per_day: bool = False,
+            mean_columns: list[str] or None = None
+    ) -> pd.DataFrame:
+        """Add up the groups of a rollup table that satisfy some conditions, grouped by some columns.
+
+        Args:
+            table (sqlalchemy.Table): the rollup table
+            group_by (list[str]): the columns to group the rollup groups by
+            conditions (list[sqlalchemy.ColumnElement[bool]]): the conditions the rollup groups must satisfy
+            per_day (bool): whether the rollup groups are also grouped by the day of their hour (``date`` column)
+            mean_columns (list[str] or None): summed columns whose average is also computed for each group
+
+        Returns:
+            pandas.DataFrame: a row per group, with the group columns, the ``count`` column and the ``mean_<column>``
+            columns
+        """
+        group_columns = [table.c[column] for column in group_by]
+        if per_day:
+            group_columns.append(func.date(table.c.hour).label('date'))
+        aggregates = [func.coalesce(func.sum(table.c.count), 0).label('count')]
+        aggregates.extend(
+            (func.sum(table.c[f'{column}_sum']) / func.nullif(func.sum(table.c.count), 0)).label(f'mean_{column}')
+            for column in mean_columns or []
+        )
+        stmt = select(*group_columns, *aggregates).select_from(table).where(*conditions)
+        if group_columns:
+            stmt = stmt.group_by(*group_columns).order_by(*group_columns)
+        return self._read_aggregates(stmt, per_day)
+
+    def _read_aggregates(self, stmt: Executable, per_day: bool = False) -> pd.DataFrame:
+        """Run an analytical query (see :attr:`analytics_engine`), after writing the queued records.
+
+        Args:
+            stmt (sqlalchemy.Executable): the query
+            per_day (bool): whether the query results have a ``date`` column, which is converted to ISO format strings
+                (each database returns dates in a different type)
+
+        Returns:
+            pandas.DataFrame: the query results
+        """
+        self.flush()
+        with self.analytics_engine.connect() as conn:
+            df = pd.read_sql_query(stmt, conn)
+        if per_day:
+            df['date'] = df['date'].astype(str)
+        return df
 
     def close_connection(self) -> None:
-        """Close the connection to the monitoring database"""
-        self.conn.close()
-        self.conn.engine.dispose()
+        """Close the connection to the monitoring database, after writing the records queued in the write-behind queue"""
+        if self.writer is not None:
+            self.writer.stop()
+            self.writer = None
+        self._tables = {}
+        self._session_ids = {}
+        self._partitions = {}
+        self._partition_templates = {}
+        if self.analytics_engine is not self.engine:
+            self.analytics_engine.dispose()
+        self.engine.dispose()
         self.connected = False
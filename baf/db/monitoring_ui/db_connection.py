@@ -3,7 +3,6 @@ from pathlib import Path
 from typing import Any
 
 import yaml
-from sqlalchemy import create_engine
 
 from baf.core.property import Property
 from baf.db import DB_MONITORING_DIALECT, DB_MONITORING_HOST, DB_MONITORING_PORT, DB_MONITORING_DATABASE, \
@@ -110,9 +109,9 @@ def connect_to_db(config_path: str):
             database = get_property(config, DB_MONITORING_DATABASE)
             username = get_property(config, DB_MONITORING_USERNAME)
             password = get_property(config, DB_MONITORING_PASSWORD)
-            url = f"{dialect}://{username}:{password}@{host}:{port}/{database}"
-            engine = create_engine(url)
-            monitoring_db.conn = engine.connect()
+            monitoring_db.connect(dialect, database, host=host, port=port, username=username, password=password)
+            # Creates the rollup tables (and computes them) if the database was created by a previous version
+            monitoring_db.initialize_db()
             atexit.register(close_connection, monitoring_db)
             logger.info('Connected to DB')
             return monitoring_db
@@ -2,36 +2,34 @@ import streamlit as st
 import streamlit.components.v1 as components
 from pyvis.network import Network
 
-from baf.db.monitoring_db import MonitoringDB, TABLE_TRANSITION, TABLE_SESSION
-from baf.db.monitoring_ui.home import agent_filter, session_filter
+from baf.db.monitoring_db import MonitoringDB
+from baf.db.monitoring_ui.home import agent_filter, date_filter, session_filter
 
 
 def flow_graph(monitoring_db: MonitoringDB):
     st.header('Flow Graph')
     agent_names = agent_filter(monitoring_db)
-    table_transition = monitoring_db.get_table(TABLE_TRANSITION)
-    table_session = monitoring_db.get_table(TABLE_SESSION)
-    if agent_names:
-        # Filter the tables by the specified agents
-        table_session = table_session[table_session['agent_name'].isin(agent_names)]
-        table_transition = table_transition[table_transition['session_id'].isin(table_session['id'])]
-    
-    session_ids = session_filter(monitoring_db)
-    if session_ids:
-        # Filter the tables by the specified sessions
-        table_session = table_session[table_session['session_id'].isin(session_ids)]
-        table_transition = table_transition[table_transition['session_id'].isin(table_session['id'])]
+    session_ids = session_filter(monitoring_db, agent_names)
+    start, end = date_filter()
+    # The transitions are counted by the database
+    transition_counts = monitoring_db.select_transition_counts(agent_names=agent_names, session_ids=session_ids,
+                                                               start=start, end=end)
+    states = sorted(set(transition_counts['source_state']) | set(transition_counts['dest_state']))
+    selected_states = st.multiselect(label='Select one or more states', options=states, placeholder='All states')
+    if selected_states:
+        transition_counts = monitoring_db.select_transition_counts(agent_names=agent_names, session_ids=session_ids,
+                                                                   start=start, end=end, states=selected_states)
 
     nt = Network("700px", "100%", notebook=True, directed=True)
     state_set = set()
     transition_dict = {}
     # TODO: Initial states in another colour, set group=2 in add_node()
     # TODO: SET PHYSICS ATTRS: gravitationalConstant to -12000 and springLength to 200
-    for i, transition in table_transition.iterrows():
-        source_state = transition['source_state']
-        dest_state = transition['dest_state']
-        event = transition['event']
-        condition = transition['condition']
+    for transition in transition_counts.itertuples():
+        source_state = transition.source_state
+        dest_state = transition.dest_state
+        event = transition.event
+        condition = transition.condition
         if event and condition:
             info = f'{event}, {condition}'
         elif event:
@@ -47,9 +45,9 @@ def flow_graph(monitoring_db: MonitoringDB):
             state_set.add(dest_state)
             nt.add_node(dest_state, group=1)
         if (source_state, dest_state, event, info) not in transition_dict:
-            transition_dict[(source_state, dest_state, event, info)] = 1
+            transition_dict[(source_state, dest_state, event, info)] = transition.count
         else:
-            transition_dict[(source_state, dest_state, event, info)] += 1
+            transition_dict[(source_state, dest_state, event, info)] += transition.count
     if transition_dict:
         max_count = max(transition_dict.values())
         for (source_state, dest_state, event, info), count in transition_dict.items():
@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+from datetime import datetime, time
+
+import pandas as pd
 import streamlit as st
 
 from baf.db.monitoring_db import MonitoringDB, TABLE_INTENT_PREDICTION, TABLE_SESSION, TABLE_CHAT, TABLE_EVENT
@@ -15,41 +18,39 @@ except ImportError:
 def home(monitoring_db: MonitoringDB):
     st.header('Home')
     agent_names = agent_filter(monitoring_db)
+    start, end = date_filter()
     col1, col2 = st.columns(2)
     with col1:
-        messages_data(monitoring_db, agent_names)
+        messages_data(monitoring_db, agent_names, start, end)
         # TOTAL NUM OF EVENTS (HISTOGRAM/ DONUT)
         # see utterances x each intent (with params), selectbox
 
     with col2:
         # put a slider at the top to filter the time
-        intent_histogram(monitoring_db, agent_names)
-        get_matched_intents_ratio(monitoring_db, agent_names)
-        event_distribution(monitoring_db, agent_names)
-
-
-def event_distribution(monitoring_db, agent_names):
-    table_event = monitoring_db.get_table(TABLE_EVENT)
-    if agent_names:
-        table_session = monitoring_db.get_table(TABLE_SESSION)
-        # Filter the tables by the specified agents
-        table_session = table_session[table_session['agent_name'].isin(agent_names)]
-        table_event = table_event[table_event['session_id'].isin(table_session['id'])]
-    fig = px.histogram(table_event, x='event', color='event', title='Events')
+        intent_counts = monitoring_db.select_rollup(TABLE_INTENT_PREDICTION, group_by=['intent'],
+                                                    agent_names=agent_names, start=start, end=end)
+        intent_histogram(intent_counts)
+        get_matched_intents_ratio(intent_counts)
+        event_distribution(monitoring_db, agent_names, start, end)
+
+
+def event_distribution(monitoring_db, agent_names, start=None, end=None):
+    event_counts = monitoring_db.select_rollup(TABLE_EVENT, group_by=['event'], agent_names=agent_names,
+                                               start=start, end=end)
+    fig = px.bar(event_counts, x='event', y='count', color='event', title='Events')
     st.plotly_chart(fig, use_container_width=True)
 
 
-def messages_data(monitoring_db, agent_names):
-    table_chat = monitoring_db.get_table(TABLE_CHAT)
-    table_session = monitoring_db.get_table(TABLE_SESSION)
-    if agent_names:
-        # Filter the tables by the specified agents
-        table_session = table_session[table_session['agent_name'].isin(agent_names)]
-        table_chat = table_chat[table_chat['session_id'].isin(table_session['id'])]
-    total_messages = len(table_chat)
-    total_sessions = len(table_session)
-    total_user_messages = len(table_chat[table_chat['is_user'] == True])
-    total_agent_messages = len(table_chat[table_chat['is_user'] == False])
+def messages_data(monitoring_db, agent_names, start=None, end=None):
+    # The records are counted from the hourly rollups, grouped by sender and day
+    chat_counts = monitoring_db.select_rollup(TABLE_CHAT, group_by=['is_user'], per_day=True,
+                                              agent_names=agent_names, start=start, end=end)
+    chat_counts['is_user'] = chat_counts['is_user'].astype(bool)
+    total_sessions = int(monitoring_db.select_rollup(TABLE_SESSION, agent_names=agent_names, start=start,
+                                                     end=end)['count'].sum())
+    total_user_messages = int(chat_counts[chat_counts['is_user']]['count'].sum())
+    total_agent_messages = int(chat_counts[~chat_counts['is_user']]['count'].sum())
+    total_messages = total_user_messages + total_agent_messages
 
     st.info(f'**Total sessions: {total_sessions}**')
     st.info(f'**Total messages: {total_messages} ({total_user_messages} user and {total_agent_messages} agent)**')
@@ -66,31 +67,35 @@ def messages_data(monitoring_db, agent_names):
                  title='Total messages')
     st.plotly_chart(fig, use_container_width=True)
 
-    fig = px.histogram(table_chat, x='timestamp', color='is_user', title='Number of messages', nbins=40)
+    fig = px.bar(chat_counts, x='date', y='count', color='is_user', title='Number of messages')
     st.plotly_chart(fig, use_container_width=True)
 
 
 def agent_filter(monitoring_db: MonitoringDB):
-    agents = monitoring_db.get_table(TABLE_SESSION)['agent_name'].unique()
+    agents = monitoring_db.select_rollup(TABLE_SESSION, group_by=['agent_name'])['agent_name']
     agent_names = st.multiselect(label='Select one or more agents', options=agents, placeholder='All agents')
     return agent_names
 
-def session_filter(monitoring_db: MonitoringDB):
-    sessions = monitoring_db.get_table(TABLE_SESSION)['session_id'].unique()
+
+def session_filter(monitoring_db: MonitoringDB, agent_names=None, max_sessions: int = 1000):
+    # Only the latest sessions are listed
+    sessions = monitoring_db.select_records(TABLE_SESSION, columns=['session_id'], agent_names=agent_names,
+                                            limit=max_sessions, descending=True)['session_id']
     session_ids = st.multiselect(label='Select one or more sessions', options=sessions, placeholder='All sessions')
     return session_ids
 
 
-def get_matched_intents_ratio(monitoring_db: MonitoringDB, agent_names=[]):
-    table_intent_prediction = monitoring_db.get_table(TABLE_INTENT_PREDICTION)
-    if agent_names:
-        table_session = monitoring_db.get_table(TABLE_SESSION)
-        # Filter the tables by the specified agents
-        table_session = table_session[table_session['agent_name'].isin(agent_names)]
-        table_intent_prediction = table_intent_prediction[table_intent_prediction['session_id'].isin(table_session['id'])]
-    value_counts = table_intent_prediction['intent'].value_counts()
-    fallback_count = value_counts['fallback_intent'] if 'fallback_intent' in value_counts else 0
-    intent_matched_count = len(table_intent_prediction) - fallback_count
+def date_filter(key=None):
+    dates = st.date_input('Select a date range', value=(), key=key)
+    if len(dates) != 2:
+        return None, None
+    start_date, end_date = dates
+    return datetime.combine(start_date, time.min), datetime.combine(end_date, time.max)
+
+
+def get_matched_intents_ratio(intent_counts: pd.DataFrame):
+    fallback_count = int(intent_counts[intent_counts['intent'] == 'fallback_intent']['count'].sum())
+    intent_matched_count = int(intent_counts['count'].sum()) - fallback_count
     data = {'names': ['Matched', 'Fallback'], 'values': [intent_matched_count, fallback_count]}
     fig = px.pie(data, values='values', names='names',
                  #color_discrete_sequence=['blue', 'red'],
@@ -99,12 +104,6 @@ def get_matched_intents_ratio(monitoring_db: MonitoringDB, agent_names=[]):
     st.plotly_chart(fig, use_container_width=True)
 
 
-def intent_histogram(monitoring_db: MonitoringDB, agent_names=[]):
-    table_intent_prediction = monitoring_db.get_table(TABLE_INTENT_PREDICTION)
-    if agent_names:
-        table_session = monitoring_db.get_table(TABLE_SESSION)
-        # Filter the tables by the specified agents
-        table_session = table_session[table_session['agent_name'].isin(agent_names)]
-        table_intent_prediction = table_intent_prediction[table_intent_prediction['session_id'].isin(table_session['id'])]
-    fig = px.histogram(table_intent_prediction, x='intent', color='intent', title='Histogram of Intents')
+def intent_histogram(intent_counts: pd.DataFrame):
+    fig = px.bar(intent_counts, x='intent', y='count', color='intent', title='Histogram of Intents')
     st.plotly_chart(fig, use_container_width=True)
@@ -1,21 +1,24 @@
 import streamlit as st
 
 
-from baf.db.monitoring_db import MonitoringDB, TABLE_INTENT_PREDICTION, TABLE_SESSION
-from baf.db.monitoring_ui.home import agent_filter
+from baf.db.monitoring_db import MonitoringDB, TABLE_INTENT_PREDICTION
+from baf.db.monitoring_ui.home import agent_filter, date_filter
+from baf.db.monitoring_ui.utils import paginated_records
 
 
 def intent_details(monitoring_db: MonitoringDB):
     st.header('Intent details')
     agent_names = agent_filter(monitoring_db)
-    table_intent_prediction = monitoring_db.get_table(TABLE_INTENT_PREDICTION)
-    if agent_names:
-        table_session = monitoring_db.get_table(TABLE_SESSION)
-        # Filter the tables by the specified agents
-        table_session = table_session[table_session['agent_name'].isin(agent_names)]
-        table_intent_prediction = table_intent_prediction[
-            table_intent_prediction['session_id'].isin(table_session['id'])]
-    intent = st.selectbox('Select an intent', table_intent_prediction['intent'].unique())
-    table_intent_prediction = table_intent_prediction[table_intent_prediction['intent'] == intent]
-    st.subheader(f'Average score: {table_intent_prediction["score"].mean()}')
-    st.dataframe(table_intent_prediction[['timestamp', 'message', 'score', 'intent_classifier']], use_container_width=True)
+    start, end = date_filter()
+    intent_scores = monitoring_db.select_rollup(TABLE_INTENT_PREDICTION, group_by=['intent'], mean_columns=['score'],
+                                                agent_names=agent_names, start=start, end=end)
+    intent = st.selectbox('Select an intent', intent_scores['intent'])
+    if intent is None:
+        return
+    st.subheader(f'Average score: {intent_scores[intent_scores["intent"] == intent]["mean_score"].iloc[0]}')
+    table_intent_prediction = paginated_records(
+        monitoring_db, TABLE_INTENT_PREDICTION, key=TABLE_INTENT_PREDICTION,
+        columns=['timestamp', 'message', 'score', 'intent_classifier'], agent_names=agent_names, start=start, end=end,
+        filters={'intent': intent}
+    )
+    st.dataframe(table_intent_prediction, use_container_width=True)
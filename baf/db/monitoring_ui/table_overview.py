@@ -2,26 +2,19 @@ import streamlit as st
 
 from baf.db.monitoring_db import MonitoringDB, TABLE_SESSION, TABLE_INTENT_PREDICTION, TABLE_PARAMETER, \
     TABLE_TRANSITION, TABLE_CHAT, TABLE_EVENT
-from baf.db.monitoring_ui.utils import filter_df
+from baf.db.monitoring_ui.home import agent_filter, date_filter, session_filter
+from baf.db.monitoring_ui.utils import filter_df, paginated_records
 
 
 def table_overview(monitoring_db: MonitoringDB):
-
-    st.subheader(f'Table {TABLE_CHAT}')
-    st.dataframe(filter_df(monitoring_db.get_table(TABLE_CHAT), TABLE_CHAT), use_container_width=True)
-
-    st.subheader(f'Table {TABLE_SESSION}')
-    st.dataframe(filter_df(monitoring_db.get_table(TABLE_SESSION), TABLE_SESSION), use_container_width=True)
-
-    st.subheader(f'Table {TABLE_EVENT}')
-    st.dataframe(filter_df(monitoring_db.get_table(TABLE_EVENT), TABLE_EVENT), use_container_width=True)
-
-    st.subheader(f'Table {TABLE_INTENT_PREDICTION}')
-    st.dataframe(filter_df(monitoring_db.get_table(TABLE_INTENT_PREDICTION), TABLE_INTENT_PREDICTION), use_container_width=True)
-
-    st.subheader(f'Table {TABLE_PARAMETER}')
-    st.dataframe(filter_df(monitoring_db.get_table(TABLE_PARAMETER), TABLE_PARAMETER), use_container_width=True)
-
-    st.subheader(f'Table {TABLE_TRANSITION}')
-    st.dataframe(filter_df(monitoring_db.get_table(TABLE_TRANSITION), TABLE_TRANSITION), use_container_width=True)
-
+    # The tables are filtered and paginated by the database, only the shown page is loaded
+    agent_names = agent_filter(monitoring_db)
+    session_ids = session_filter(monitoring_db, agent_names)
+    start, end = date_filter()
+
+    for table_name in [TABLE_CHAT, TABLE_SESSION, TABLE_EVENT, TABLE_INTENT_PREDICTION, TABLE_PARAMETER,
+                       TABLE_TRANSITION]:
+        st.subheader(f'Table {table_name}')
+        table = paginated_records(monitoring_db, table_name, key=table_name, agent_names=agent_names,
+                                  session_ids=session_ids, start=start, end=end)
+        st.dataframe(filter_df(table, table_name), use_container_width=True)
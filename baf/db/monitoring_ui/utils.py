@@ -1,3 +1,6 @@
+from datetime import datetime
+from typing import Any
+
 import pandas as pd
 import streamlit as st
 
@@ -7,6 +10,50 @@ from pandas.api.types import (
     is_object_dtype,
 )
 
+from baf.db.monitoring_db import MonitoringDB
+
+
+def paginated_records(
+        monitoring_db: MonitoringDB,
+        table_name: str,
+        key: str,
+        columns: list[str] = None,
+        agent_names: list[str] = None,
+        session_ids: list[str] = None,
+        start: datetime = None,
+        end: datetime = None,
+        filters: dict[str, Any] = None
+) -> pd.DataFrame:
+    """
+    Adds pagination controls for a monitoring database table and gets the selected page (the latest records first).
+    Only the records of the page are read from the database.
+
+    Args:
+        monitoring_db (MonitoringDB): The monitoring database
+        table_name (str): The name of the table
+        key (str): The key of the pagination widgets, unique in the page
+        columns (list[str]): The columns to get. If None, gets all the columns
+        agent_names (list[str]): If provided, only the records of the sessions of these agents
+        session_ids (list[str]): If provided, only the records of these sessions
+        start (datetime): If provided, only the records with a later (or equal) timestamp
+        end (datetime): If provided, only the records with an earlier (or equal) timestamp
+        filters (dict[str, Any]): Additional conditions, as column values by column name
+
+    Returns:
+        pd.DataFrame: The records of the selected page
+    """
+    num_records = int(monitoring_db.aggregate_records(table_name, agent_names=agent_names, session_ids=session_ids,
+                                                      start=start, end=end, filters=filters)['count'].sum())
+    left, middle, right = st.columns((2, 2, 6))
+    page_size = left.selectbox('Rows per page', [50, 100, 500, 1000], key=f'{key}_page_size')
+    num_pages = max((num_records + page_size - 1) // page_size, 1)
+    page = middle.number_input(f'Page (of {num_pages})', min_value=1, max_value=num_pages, value=1,
+                               key=f'{key}_page')
+    right.caption(f'{num_records} records')
+    return monitoring_db.select_records(table_name, columns=columns, agent_names=agent_names, session_ids=session_ids,
+                                        start=start, end=end, filters=filters, limit=page_size,
+                                        offset=(page - 1) * page_size, descending=True)
+
 
 def filter_df(df: pd.DataFrame, key=None) -> pd.DataFrame:
     """
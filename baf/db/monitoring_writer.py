@@ -0,0 +1,183 @@
+import queue
+import threading
+import time
+from typing import TYPE_CHECKING, Any
+
+from sqlalchemy import Engine
+
+from baf.core.session import Session
+from baf.exceptions.logger import logger
+
+if TYPE_CHECKING:
+    from baf.db.monitoring_db import MonitoringDB
+
+
+class MonitoringDBWriter:
+    """Write-behind queue for the records of the monitoring database.
+
+    The records are queued by the agent threads and written by a single background thread, that groups them in batches.
+    A batch is written (as multi-row inserts, one per table, in a single transaction) when it reaches ``max_size``
+    records or when its first record has been waiting for ``max_wait`` seconds.
+
+    The queue is bounded: when it is full, the threads queueing records are blocked until there is room for them
+    (backpressure), so the agent can never outrun the database indefinitely.
+
+    The writer uses its own database connection, so it does not interfere with the synchronous operations of the
+    :class:`~baf.db.monitoring_db.MonitoringDB`.
+
+    Args:
+        monitoring_db (MonitoringDB): the monitoring database the records are written to
+        engine (sqlalchemy.Engine): the engine used to connect to the monitoring database
+        max_queue_size (int): the maximum number of records waiting to be written
+        max_size (int): the maximum number of records written in a single batch
+        max_wait (float): the maximum time (in seconds) a record waits for other records to fill its batch
+
+    Attributes:
+        _monitoring_db (MonitoringDB): The monitoring database the records are written to
+        _engine (sqlalchemy.Engine): The engine used to connect to the monitoring database
+        _queue (queue.Queue): The records waiting to be written
+        _max_size (int): The maximum number of records written in a single batch
+        _max_wait (float): The maximum time (in seconds) a record waits for other records to fill its batch
+        _thread (threading.Thread or None): The thread where the records are written
+        _stopped (bool): Whether the writer has been stopped or not
+        written_records (int): The number of records written so far
+        written_batches (int): The number of batches written so far
+        dropped_records (int): The number of records discarded because they could not be written
+    """
+
+    _STOP = object()
+    """Queued to stop the writer thread."""
+
+    _FLUSH = object()
+    """Queued to write the current batch without waiting for it to be full."""
+
+    def __init__(
+            self,
+            monitoring_db: 'MonitoringDB',
+            engine: Engine,
+            max_queue_size: int = 10000,
+            max_size: int = 100,
+            max_wait: float = 0.5
+    ):
+        self._monitoring_db: 'MonitoringDB' = monitoring_db
+        self._engine: Engine = engine
+        self._queue: queue.Queue = queue.Queue(maxsize=max(max_queue_size, 1))
+        self._max_size: int = max(max_size, 1)
+        self._max_wait: float = max(max_wait, 0.0)
+        self._thread: threading.Thread or None = None
+        self._stopped: bool = False
+        self.written_records: int = 0
+        self.written_batches: int = 0
+        self.dropped_records: int = 0
+
+    @property
+    def running(self) -> bool:
+        """bool: Whether the writer thread is running or not."""
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Start the writer thread."""
+        if self.running:
+            return
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name='MonitoringDBWriter', daemon=True)
+        self._thread.start()
+
+    def put(
+            self,
+            table_name: str,
+            session: Session or None,
+            row: dict[str, Any],
+            children: tuple[str, str, list[dict[str, Any]]] or None = None
+    ) -> None:
+        """Queue a record to be written in the monitoring database.
+
+        If the queue is full, this method blocks until there is room for the record.
+
+        Args:
+            table_name (str): the name of the table the record is inserted into
+            session (Session or None): the session the record belongs to. Its database id is set as the ``session_id``
+                column of the record when it is written
+            row (dict[str, Any]): the record columns (except ``session_id``)
+            children (tuple[str, str, list[dict[str, Any]]] or None): records that reference this one, as a
+                (table name, foreign key column, rows) tuple. They are inserted along with the record
+        """
+        if self._stopped:
+            logger.warning(f'The monitoring DB writer is stopped, the {table_name} record will not be stored')
+            return
+        self._queue.put((table_name, session, row, children))
+
+    def flush(self) -> None:
+        """Write the queued records right away, blocking until all of them have been written."""
+        if self.running:
+            self._queue.put(MonitoringDBWriter._FLUSH)
+            self._queue.join()
+
+    def stop(self) -> None:
+        """Write the queued records and stop the writer thread."""
+        if self._stopped:
+            return
+        self._stopped = True
+        if self.running:
+            self._queue.put(MonitoringDBWriter._STOP)
+            self._thread.join()
+        self._thread = None
+
+    def _run(self) -> None:
+        """The writer thread loop: collect batches of records and write them."""
+        stop = False
+        while not stop:
+            batch = []
+            markers = 0
+            deadline = None
+            record = self._queue.get()
+            while True:
+                if record is MonitoringDBWriter._STOP or record is MonitoringDBWriter._FLUSH:
+                    # The batch collected so far must be written right away
+                    stop = record is MonitoringDBWriter._STOP
+                    markers += 1
+                    break
+                batch.append(record)
+                if len(batch) >= self._max_size:
+                    break
+                if deadline is None:
+                    deadline = time.monotonic() + self._max_wait
+                try:
+                    record = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            try:
+                if batch:
+                    self._write_batch(batch)
+            finally:
+                for _ in range(len(batch) + markers):
+                    self._queue.task_done()
+
+    def _write_batch(self, batch: list[tuple[str, Session or None, dict, tuple or None]]) -> None:
+        """Write a batch of records in a single transaction.
+
+        If the transaction fails, the batch is split in halves, which are written separately, so that only the records
+        that cannot be written are discarded (and the errors are logged). This way, neither a failing record nor a
+        failing database block the agent.
+
+        Args:
+            batch (list[tuple[str, Session or None, dict, tuple or None]]): the records to write
+        """
+        try:
+            with self._engine.begin() as conn:
+                self._monitoring_db.write_records(batch, conn)
+            self.written_records += len(batch)
+            self.written_batches += 1
+        except Exception as e:
+            if len(batch) > 1:
+                logger.warning(f'Error writing {len(batch)} records in the monitoring DB, retrying them in smaller '
+                               f'batches: {e}')
+                middle = len(batch) // 2
+                self._write_batch(batch[:middle])
+                self._write_batch(batch[middle:])
+                return
+            table_name, session, _, _ = batch[0]
+            self.dropped_records += 1
+            logger.error(f'Error writing a {table_name} record'
+                         f'{f" of session {session.id}" if session is not None else ""} in the monitoring DB, the '
+                         f'record is discarded: {e}')
@@ -25,7 +25,8 @@ class IntentMatcher(Condition):
 
     def __init__(self, intent: Intent):
 
-        super().__init__(partial(intent_matched, params={'intent': intent}))
+        # The predicted intent is part of the event, so this condition does not depend on any session variable
+        super().__init__(partial(intent_matched, params={'intent': intent}), variables=set())
         self._intent: Intent = intent
 
     def __str__(self):
@@ -60,7 +61,8 @@ class VariableOperationMatcher(Condition):
                 params={
                     'var_name': var_name, 'operation': operation, 'target': target
                 }
-            )
+            ),
+            variables={var_name}
         )
         self._var_name: str = var_name
         self._operation: Callable[[Any, Any], bool] = operation
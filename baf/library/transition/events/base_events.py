@@ -191,3 +191,35 @@ class ReceiveFileEvent(Event):
         super().__init__(name='receive_file', session_id=session_id, timestamp=datetime.now())
         self.file: File = file
         self.human: bool = human
+
+
+class TimerEvent(Event):
+    """Event sent to a session when one of its timers expires.
+
+    Args:
+        timer_name (str): the name of the expired timer
+        session_id (str): the id of the session the timer belongs to (can be none)
+
+    Attributes:
+        timer_name (str): the name of the expired timer
+    """
+
+    def __init__(self, timer_name: str = None, session_id: str = None):
+        super().__init__(name='timer', session_id=session_id, timestamp=datetime.now())
+        self.timer_name: str = timer_name
+
+    def is_matching(self, event: 'Event') -> bool:
+        """Check whether an event matches another one.
+
+        Args:
+            event (Event): the target event to compare
+
+        Returns:
+            bool: true if the target event is a timer event of the same timer, false otherwise
+        """
+        if isinstance(event, self.__class__):
+            return self.timer_name == event.timer_name
+        return False
+
+    def log(self):
+        return f'{self._name} ({self.timer_name})'
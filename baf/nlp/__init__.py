@@ -77,6 +77,65 @@ type: ``float``
 default value: ``0.4``
 """
 
+NLP_MODEL_CACHE_PATH = Property('nlp.model_cache.path', str, None)
+"""
+The directory where the trained intent classifier models are cached. When the agent is trained again (e.g. after a
+restart), the intent classifiers whose intents, training sentences, entities, preprocessing settings and configuration
+did not change are loaded from the cache instead of being trained. If not set, the models are not cached.
+
+Only :class:`~baf.nlp.intent_classifier.simple_intent_classifier_pytorch.SimpleIntentClassifierTorch` and
+:class:`~baf.nlp.intent_classifier.simple_intent_classifier_tensorflow.SimpleIntentClassifierTF` are cached.
+
+name: ``nlp.model_cache.path``
+
+type: ``str``
+
+default value: ``None``
+"""
+
+NLP_TRAINING_WORKERS = Property('nlp.training.workers', int, 1)
+"""
+The number of processes used to train the intent classifiers of the agent states in parallel. If it is 1, they are
+trained one after the other in the agent process.
+
+Only :class:`~baf.nlp.intent_classifier.simple_intent_classifier_pytorch.SimpleIntentClassifierTorch` intent
+classifiers are trained in parallel. The worker processes are started with the ``spawn`` method, so the agent must be
+created and run within an ``if __name__ == '__main__':`` block.
+
+name: ``nlp.training.workers``
+
+type: ``int``
+
+default value: ``1``
+"""
+
+NLP_INTENT_BATCH_SIZE = Property('nlp.intent_batch.max_size', int, 16)
+"""
+The maximum number of messages whose intent is predicted at once. When several sessions in the same state receive a
+message at the same time, their intent predictions are grouped into a single batch (e.g. a single forward pass of the
+:class:`~baf.nlp.intent_classifier.simple_intent_classifier_pytorch.SimpleIntentClassifierTorch` model). Set it to 1 to
+predict each message separately.
+
+name: ``nlp.intent_batch.max_size``
+
+type: ``int``
+
+default value: ``16``
+"""
+
+NLP_INTENT_BATCH_MAX_WAIT = Property('nlp.intent_batch.max_wait', float, 0.0)
+"""
+The maximum time, in seconds, an intent prediction waits for other predictions to be grouped in the same batch. With
+0, only the predictions requested while another batch is running are grouped, so no latency is added. Higher values
+(e.g. 0.005) create bigger batches under load, at the cost of a higher latency.
+
+name: ``nlp.intent_batch.max_wait``
+
+type: ``float``
+
+default value: ``0.0``
+"""
+
 
 OPENAI_API_KEY = Property('nlp.openai.api_key', str, None)
 """
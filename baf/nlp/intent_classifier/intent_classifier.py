@@ -1,6 +1,9 @@
+import hashlib
+import json
 from abc import ABC, abstractmethod
-from typing import TYPE_CHECKING
+from typing import Any, Callable, TYPE_CHECKING
 
+from baf import nlp
 from baf.exceptions.exceptions import IntentClassifierWithoutIntentsError
 from baf.nlp.intent_classifier.intent_classifier_prediction import IntentClassifierPrediction
 
@@ -20,6 +23,11 @@ class IntentClassifier(ABC):
 
     This class serves as a template to implement intent classifiers.
 
+    Intent classifiers with a trained model can be stored in the
+    :class:`~baf.nlp.intent_classifier.intent_classifier_cache.IntentClassifierCache`, to avoid training them again
+    when the agent restarts. To support it, they must set :attr:`cache_file_extension` and implement :meth:`save` and
+    :meth:`load`.
+
     Args:
         nlp_engine (NLPEngine): the NLPEngine that handles the NLP processes of the agent
         state (State): the state the intent classifier belongs to
@@ -27,8 +35,12 @@ class IntentClassifier(ABC):
     Attributes:
         _nlp_engine (NLPEngine): The NLPEngine that handles the NLP processes of the agent.
         _state (State): The state the intent classifier belongs to.
+        cache_file_extension (str or None): The extension of the files where the trained model is saved. None if the
+            intent classifier cannot be cached
     """
 
+    cache_file_extension: str or None = None
+
     def __init__(
             self,
             nlp_engine: 'NLPEngine',
@@ -44,6 +56,26 @@ class IntentClassifier(ABC):
         """Train the intent classifier."""
         pass
 
+    def training_job(self) -> tuple[Callable, tuple] or None:
+        """Get the training of the intent classifier as a function and its arguments, which must be picklable and
+        independent of the agent, so the intent classifiers of several states can be trained in parallel processes.
+
+        The value returned by the function must be passed to :meth:`set_training_result`.
+
+        Returns:
+            tuple[Callable, tuple] or None: the training function and its arguments, or None if the intent classifier
+            can only be trained in the agent process with :meth:`train` (the default)
+        """
+        return None
+
+    def set_training_result(self, result: Any) -> None:
+        """Set the result of the training job of the intent classifier (see :meth:`training_job`).
+
+        Args:
+            result (Any): the value returned by the training function
+        """
+        raise NotImplementedError(f'{self.__class__.__name__} has no training job')
+
     @abstractmethod
     def predict(self, message: str) -> list[IntentClassifierPrediction]:
         """Predict the intent of a given message.
@@ -58,3 +90,80 @@ class IntentClassifier(ABC):
             list[IntentClassifierPrediction]: the list of predictions made by the intent classifier.
         """
         pass
+
+    def predict_batch(self, messages: list[str]) -> list[list[IntentClassifierPrediction]]:
+        """Predict the intent of a batch of messages.
+
+        By default, each message is predicted separately with :meth:`predict`. Intent classifiers that can run a single
+        prediction for several messages should override this method.
+
+        Args:
+            messages (list[str]): the messages to predict the intent
+
+        Returns:
+            list[list[IntentClassifierPrediction]]: the predictions made by the intent classifier for each message, in
+            the same order as the messages
+        """
+        return [self.predict(message) for message in messages]
+
+    def _fingerprint_data(self) -> dict[str, Any]:
+        """Get the data that determines the trained model of the intent classifier: the state intents with their
+        training sentences and parameters, the entities of the parameters, the text preprocessing properties and the
+        intent classifier configuration.
+
+        Subclasses can extend it with other data (e.g. the version of the machine learning framework).
+
+        Returns:
+            dict[str, Any]: the fingerprint data. It must be JSON serializable
+        """
+        entities = {}
+        intents = []
+        for intent in self._state.intents:
+            parameters = []
+            for parameter in intent.parameters:
+                parameters.append([parameter.name, parameter.fragment, parameter.entity.name])
+                entities[parameter.entity.name] = parameter.entity.to_json()
+            intents.append({
+                'name': intent.name,
+                'training_sentences': intent.training_sentences,
+                'parameters': parameters
+            })
+        return {
+            'intent_classifier': f'{self.__class__.__module__}.{self.__class__.__qualname__}',
+            'intents': intents,
+            'entities': entities,
+            'language': self._nlp_engine.get_property(nlp.NLP_LANGUAGE),
+            'pre_processing': self._nlp_engine.get_property(nlp.NLP_PRE_PROCESSING),
+            'ic_config': vars(self._state.ic_config),
+        }
+
+    def fingerprint(self) -> str:
+        """Get a fingerprint of the training data and configuration of the intent classifier.
+
+        Two intent classifiers with the same fingerprint produce equivalent models when trained, so a saved model can
+        be reused if its fingerprint matches.
+
+        Returns:
+            str: the fingerprint (a SHA-256 hexadecimal digest)
+        """
+        data = json.dumps(self._fingerprint_data(), sort_keys=True, default=str)
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def save(self, path: str) -> None:
+        """Save the trained model of the intent classifier.
+
+        Args:
+            path (str): the file path, ending with :attr:`cache_file_extension`
+        """
+        raise NotImplementedError(f'{self.__class__.__name__} cannot be saved')
+
+    def load(self, path: str) -> bool:
+        """Load a trained model previously saved with :meth:`save`, instead of training the intent classifier.
+
+        Args:
+            path (str): the file path, ending with :attr:`cache_file_extension`
+
+        Returns:
+            bool: true if the model was loaded, false if the saved model is not compatible with the intent classifier
+        """
+        raise NotImplementedError(f'{self.__class__.__name__} cannot be loaded')
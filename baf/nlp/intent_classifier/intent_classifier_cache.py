@@ -0,0 +1,95 @@
+import os
+import re
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from baf.exceptions.logger import logger
+
+if TYPE_CHECKING:
+    from baf.nlp.intent_classifier.intent_classifier import IntentClassifier
+
+
+class IntentClassifierCache:
+    """On-disk cache of trained intent classifier models.
+
+    Each state intent classifier is saved into a file named after its state and its
+    :meth:`~baf.nlp.intent_classifier.intent_classifier.IntentClassifier.fingerprint`. When the agent is trained again
+    (e.g. after a restart), the saved model is loaded instead of training the intent classifier if the fingerprint
+    matches. Otherwise, the intent classifier is trained and the outdated model of the state is replaced.
+
+    Args:
+        path (str): the directory where the models are saved. It is created if it does not exist
+
+    Attributes:
+        path (Path): The directory where the models are saved
+    """
+
+    def __init__(self, path: str):
+        self.path: Path = Path(path)
+
+    def _file_prefix(self, intent_classifier: 'IntentClassifier') -> str:
+        """Get the prefix of the model files of an intent classifier, derived from its state name."""
+        return re.sub(r'[^\w.-]', '_', intent_classifier._state.name)
+
+    def get_file(self, intent_classifier: 'IntentClassifier') -> Path or None:
+        """Get the file where the trained model of an intent classifier is saved.
+
+        Args:
+            intent_classifier (IntentClassifier): the intent classifier
+
+        Returns:
+            Path or None: the model file, or None if the intent classifier cannot be cached
+        """
+        extension = intent_classifier.cache_file_extension
+        if extension is None:
+            return None
+        prefix = self._file_prefix(intent_classifier)
+        return self.path / f'{prefix}-{intent_classifier.fingerprint()}{extension}'
+
+    def load(self, intent_classifier: 'IntentClassifier') -> bool:
+        """Load the saved model of an intent classifier, if there is one with the same fingerprint.
+
+        Args:
+            intent_classifier (IntentClassifier): the intent classifier
+
+        Returns:
+            bool: true if the model was loaded (so the intent classifier does not need to be trained), false otherwise
+        """
+        file = self.get_file(intent_classifier)
+        if file is None or not file.is_file():
+            return False
+        try:
+            return intent_classifier.load(str(file))
+        except Exception as e:
+            logger.warning(f'The cached model of the intent classifier in {intent_classifier._state.name} could not '
+                           f'be loaded, it will be trained again: {e}')
+            return False
+
+    def save(self, intent_classifier: 'IntentClassifier') -> None:
+        """Save the trained model of an intent classifier, removing the outdated models of its state.
+
+        Args:
+            intent_classifier (IntentClassifier): the (trained) intent classifier
+        """
+        file = self.get_file(intent_classifier)
+        if file is None:
+            return
+        self.path.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file first, so a partially written model is never loaded
+        tmp_file = file.with_name(f'{file.name[:-len(intent_classifier.cache_file_extension)]}.tmp-{os.getpid()}'
+                                  f'{intent_classifier.cache_file_extension}')
+        try:
+            intent_classifier.save(str(tmp_file))
+            os.replace(tmp_file, file)
+        except Exception as e:
+            logger.warning(f'The model of the intent classifier in {intent_classifier._state.name} could not be '
+                           f'cached: {e}')
+            tmp_file.unlink(missing_ok=True)
+            return
+        model_file_name = re.compile(
+            rf'{re.escape(self._file_prefix(intent_classifier))}-[0-9a-f]{{64}}'
+            rf'{re.escape(intent_classifier.cache_file_extension)}'
+        )
+        for outdated_file in self.path.iterdir():
+            if outdated_file != file and model_file_name.fullmatch(outdated_file.name):
+                outdated_file.unlink(missing_ok=True)
@@ -35,6 +35,11 @@ class SimpleIntentClassifierConfiguration(IntentClassifierConfiguration):
             all predictions equals to 1) and 'softmax' (sum of all predictions can be different of 1). Defaults to
             'sigmoid'
         lr (float): Learning rate for the optimizer
+        batch_size (int or None): Number of training sentences per training batch (only for the PyTorch framework).
+            If None, all the training sentences are used in a single batch (full-batch training, suitable for small
+            sets of intents). Defaults to 2
+        seed (int or None): Seed of the random number generators used in training (only for the PyTorch framework).
+            If set, training the intent classifier again produces the same model. Defaults to None
 
     Attributes:
         framework (str): The framework to implement the Simple Intent Classifier ('tensorflow' or 'pytorch'). Defaults
@@ -51,6 +56,11 @@ class SimpleIntentClassifierConfiguration(IntentClassifierConfiguration):
             all predictions equals to 1) and 'softmax' (sum of all predictions can be different of 1). Defaults to
             'sigmoid'
         lr (float): Learning rate for the optimizer
+        batch_size (int or None): Number of training sentences per training batch (only for the PyTorch framework).
+            If None, all the training sentences are used in a single batch (full-batch training, suitable for small
+            sets of intents). Defaults to 2
+        seed (int or None): Seed of the random number generators used in training (only for the PyTorch framework).
+            If set, training the intent classifier again produces the same model. Defaults to None
     """
 
     def __init__(
@@ -64,6 +74,8 @@ class SimpleIntentClassifierConfiguration(IntentClassifierConfiguration):
             check_exact_prediction_match: bool = True,
             activation_last_layer: str = 'sigmoid',
             lr: float = 0.001,
+            batch_size: int or None = 2,
+            seed: int or None = None,
     ):
         super().__init__()
         if framework not in ['pytorch', 'tensorflow']:
@@ -81,6 +93,8 @@ class SimpleIntentClassifierConfiguration(IntentClassifierConfiguration):
         self.check_exact_prediction_match: bool = check_exact_prediction_match
         self.activation_last_layer: str = activation_last_layer
         self.lr: float = lr
+        self.batch_size: int or None = batch_size
+        self.seed: int or None = seed
 
 
 class LLMIntentClassifierConfiguration(IntentClassifierConfiguration):
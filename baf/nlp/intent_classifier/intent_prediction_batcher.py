@@ -0,0 +1,132 @@
+import threading
+import time
+from typing import TYPE_CHECKING
+
+from baf.nlp.intent_classifier.intent_classifier_prediction import IntentClassifierPrediction
+
+if TYPE_CHECKING:
+    from baf.nlp.intent_classifier.intent_classifier import IntentClassifier
+
+
+class _PredictionRequest:
+    """A pending intent prediction.
+
+    Args:
+        message (str): the message to predict the intent
+
+    Attributes:
+        message (str): The message to predict the intent
+        done (bool): Whether the prediction has finished
+        result (list[IntentClassifierPrediction] or None): The predictions of the intent classifier
+        error (Exception or None): The exception raised by the intent classifier, if any
+    """
+
+    __slots__ = ('message', 'done', 'result', 'error')
+
+    def __init__(self, message: str):
+        self.message: str = message
+        self.done: bool = False
+        self.result: list[IntentClassifierPrediction] or None = None
+        self.error: Exception or None = None
+
+
+class IntentPredictionBatcher:
+    """Groups the concurrent intent predictions of an intent classifier into batches.
+
+    Sessions predict the intent of their messages from their own threads. When several sessions in the same state ask
+    for a prediction at the same time, the first one collects the pending requests (waiting at most ``max_wait``
+    seconds for more to arrive, up to ``max_batch_size`` requests) and runs a single
+    :meth:`IntentClassifier.predict_batch() <baf.nlp.intent_classifier.intent_classifier.IntentClassifier.predict_batch>`
+    call for all of them. The rest of sessions wait for their result.
+
+    Requests that arrive while a batch is running are grouped into the next batch, so batches are created under load
+    even if ``max_wait`` is 0.
+
+    Args:
+        intent_classifier (IntentClassifier): the intent classifier running the predictions
+        max_batch_size (int): the maximum number of messages predicted at once. If it is 1, requests are not batched
+        max_wait (float): the maximum time, in seconds, to wait for more requests before running a batch
+
+    Attributes:
+        intent_classifier (IntentClassifier): The intent classifier running the predictions
+        max_batch_size (int): The maximum number of messages predicted at once
+        max_wait (float): The maximum time, in seconds, to wait for more requests before running a batch
+        _condition (threading.Condition): Synchronizes the access to the pending requests
+        _pending (list[_PredictionRequest]): The requests waiting to be predicted, in arrival order
+        _collecting (bool): Whether some thread is collecting or running a batch
+    """
+
+    def __init__(self, intent_classifier: 'IntentClassifier', max_batch_size: int = 16, max_wait: float = 0.0):
+        self.intent_classifier: 'IntentClassifier' = intent_classifier
+        self.max_batch_size: int = max_batch_size
+        self.max_wait: float = max_wait
+        self._condition: threading.Condition = threading.Condition()
+        self._pending: list[_PredictionRequest] = []
+        self._collecting: bool = False
+
+    def predict(self, message: str) -> list[IntentClassifierPrediction]:
+        """Predict the intent of a given message, batched with the concurrent predictions of other sessions.
+
+        Args:
+            message (str): the message to predict the intent
+
+        Returns:
+            list[IntentClassifierPrediction]: the list of predictions made by the intent classifier.
+        """
+        if self.max_batch_size <= 1:
+            return self.intent_classifier.predict(message)
+        request = _PredictionRequest(message)
+        with self._condition:
+            self._pending.append(request)
+            self._condition.notify_all()
+        while not request.done:
+            batch = self._collect_batch(request)
+            if batch:
+                self._run_batch(batch)
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _collect_batch(self, request: _PredictionRequest) -> list[_PredictionRequest]:
+        """Wait until the request is done, or until no thread is collecting a batch and collect the next one.
+
+        Args:
+            request (_PredictionRequest): the request of the calling thread
+
+        Returns:
+            list[_PredictionRequest]: the batch to run by the calling thread, empty if the request is done
+        """
+        with self._condition:
+            while self._collecting and not request.done:
+                self._condition.wait()
+            if request.done:
+                return []
+            self._collecting = True
+            deadline = time.monotonic() + self.max_wait
+            while len(self._pending) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            return batch
+
+    def _run_batch(self, batch: list[_PredictionRequest]) -> None:
+        """Run the predictions of a batch and notify the waiting threads.
+
+        Args:
+            batch (list[_PredictionRequest]): the requests to predict
+        """
+        try:
+            results = self.intent_classifier.predict_batch([request.message for request in batch])
+            for request, result in zip(batch, results):
+                request.result = result
+        except Exception as e:
+            for request in batch:
+                request.error = e
+        with self._condition:
+            for request in batch:
+                request.done = True
+            self._collecting = False
+            self._condition.notify_all()
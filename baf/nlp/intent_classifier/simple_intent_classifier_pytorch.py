@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING
+from typing import Any, Callable, TYPE_CHECKING
 import numpy as np
 
 from baf import nlp
@@ -21,7 +21,7 @@ try:
     import torch
     import torch.optim as optim
     from torch import nn
-    from torch.utils.data import DataLoader, Dataset
+    from torch.utils.data import DataLoader, TensorDataset
 except ImportError:
     logger.warning("torch dependencies in SimpleIntentClassifierTorch could not be imported. You can install them from the "
                    "requirements/requirements-torch.txt file")
@@ -57,28 +57,56 @@ class TextClassifier(nn.Module):
         return x
 
 
-class TextDataset(Dataset):
+def train_text_classifier(
+        model_parameters: dict[str, Any],
+        sequences: list[list[int]],
+        labels: list[int],
+        num_epochs: int,
+        lr: float,
+        batch_size: int or None,
+        seed: int or None
+) -> dict[str, 'torch.Tensor']:
+    """Create and train a :class:`TextClassifier`.
 
-    def __init__(self, texts, labels, vocab, max_len, language):
-        self.texts = texts
-        self.labels = labels
-        self.vocab = vocab
-        self.max_len = max_len
-        self.language = language
+    It only depends on its arguments (and not on the agent), so it can be run in another process.
 
-    def __len__(self):
-        return len(self.texts)
-
-    def __getitem__(self, idx):
-        text = self.texts[idx]
-        label = self.labels[idx]
-
-        # Tokenize and pad text
-        tokens = tokenize(text, self.language)
-        tokens = [self.vocab.get(token, self.vocab[SimpleIntentClassifierTorch.UNK]) for token in tokens]
-        tokens = tokens[:self.max_len] + [self.vocab[SimpleIntentClassifierTorch.PAD]] * (self.max_len - len(tokens))
+    Args:
+        model_parameters (dict[str, Any]): the arguments to create the TextClassifier
+        sequences (list[list[int]]): the tokenized and padded training sentences
+        labels (list[int]): the encoded label of each training sentence
+        num_epochs (int): number of epochs to be run during training
+        lr (float): learning rate for the optimizer
+        batch_size (int or None): number of training sentences per batch, or None for full-batch training
+        seed (int or None): seed of the random number generators, for a deterministic training
+
+    Returns:
+        dict[str, torch.Tensor]: the state dict of the trained model
+    """
+    # The global random state is restored after the training, so seeding it does not affect the rest of the process
+    with torch.random.fork_rng(devices=[], enabled=seed is not None):
+        generator = None
+        if seed is not None:
+            torch.manual_seed(seed)
+            generator = torch.Generator().manual_seed(seed)
+        model = TextClassifier(**model_parameters)
+        # The dataset is tokenized once, instead of tokenizing each sentence in every epoch
+        dataset = TensorDataset(torch.tensor(sequences, dtype=torch.long), torch.tensor(labels, dtype=torch.long))
+        dataloader = DataLoader(dataset, batch_size=batch_size or len(dataset), shuffle=True, generator=generator)
+        criterion = nn.CrossEntropyLoss()
+        optimizer = optim.Adam(model.parameters(), lr=lr)
 
-        return torch.tensor(tokens, dtype=torch.long), torch.tensor(label, dtype=torch.long)
+        model.train()
+        for epoch in range(num_epochs):
+            total_loss = 0
+            for texts, targets in dataloader:
+                optimizer.zero_grad()
+                outputs = model(texts)
+                loss = criterion(outputs, targets)
+                loss.backward()
+                optimizer.step()
+                total_loss += loss.item()
+            # logger.info(f"Epoch {epoch + 1}/{num_epochs}, Loss: {total_loss / len(dataloader):.4f}")
+    return model.state_dict()
 
 
 class SimpleIntentClassifierTorch(IntentClassifier):
@@ -100,6 +128,7 @@ class SimpleIntentClassifierTorch(IntentClassifier):
 
     UNK = '<UNK>'
     PAD = '<PAD>'
+    cache_file_extension = '.pt'
 
     def __init__(
             self,
@@ -152,90 +181,137 @@ class SimpleIntentClassifierTorch(IntentClassifier):
             ])
 
         # Model Initialization
-        self._model = TextClassifier(
-            vocab_size=len(self.__vocab),
-            embed_dim=self._state.ic_config.embedding_dim,
-            hidden_dim=self._state.ic_config.hidden_dim,
-            output_dim=len(set(self.__total_labels_encoded)),
-            pad_idx=self.__vocab[SimpleIntentClassifierTorch.PAD],
-            activation_last_layer=self._state.ic_config.activation_last_layer
-        )
+        self.__model_parameters: dict[str, Any] = {
+            'vocab_size': len(self.__vocab),
+            'embed_dim': self._state.ic_config.embedding_dim,
+            'hidden_dim': self._state.ic_config.hidden_dim,
+            'output_dim': len(set(self.__total_labels_encoded)),
+            'pad_idx': self.__vocab[SimpleIntentClassifierTorch.PAD],
+            'activation_last_layer': self._state.ic_config.activation_last_layer
+        }
+        """The arguments to create the prediction model."""
+
+        self._model = TextClassifier(**self.__model_parameters)
 
     def train(self) -> None:
-        # Dataset and DataLoader
-        dataset = TextDataset(
-            self.__total_training_sentences,
-            self.__total_labels_encoded,
-            self.__vocab,
-            self._state.ic_config.input_max_num_tokens,
-            self._nlp_engine.get_property(nlp.NLP_LANGUAGE)
+        function, args = self.training_job()
+        self.set_training_result(function(*args))
+
+    def training_job(self) -> tuple[Callable, tuple]:
+        max_num_tokens: int = self._state.ic_config.input_max_num_tokens
+        pad: int = self.__vocab[SimpleIntentClassifierTorch.PAD]
+        sequences = [
+            sequence[:max_num_tokens] + [pad] * (max_num_tokens - len(sequence))
+            for sequence in self.__total_training_sequences
+        ]
+        return train_text_classifier, (
+            self.__model_parameters,
+            sequences,
+            [int(label) for label in self.__total_labels_encoded],
+            self._state.ic_config.num_epochs,
+            self._state.ic_config.lr,
+            self._state.ic_config.batch_size,
+            self._state.ic_config.seed,
         )
-        dataloader = DataLoader(dataset, batch_size=2, shuffle=True)
-        criterion = nn.CrossEntropyLoss()
-        optimizer = optim.Adam(self._model.parameters(), lr=self._state.ic_config.lr)
 
-        self._model.train()
-        for epoch in range(self._state.ic_config.num_epochs):
-            total_loss = 0
-            for texts, labels in dataloader:
-                optimizer.zero_grad()
-                outputs = self._model(texts)
-                loss = criterion(outputs, labels)
-                loss.backward()
-                optimizer.step()
-                total_loss += loss.item()
-            # logger.info(f"Epoch {epoch + 1}/{self._state.ic_config.num_epochs}, Loss: {total_loss / len(dataloader):.4f}")
+    def set_training_result(self, result: dict[str, 'torch.Tensor']) -> None:
+        self._model.load_state_dict(result)
+
+    def _fingerprint_data(self) -> dict:
+        data = super()._fingerprint_data()
+        data['torch'] = torch.__version__
+        return data
+
+    def save(self, path: str) -> None:
+        torch.save({'vocab': self.__vocab, 'model': self._model.state_dict()}, path)
+
+    def load(self, path: str) -> bool:
+        checkpoint = torch.load(path, weights_only=True)
+        if checkpoint['vocab'] != self.__vocab:
+            return False
+        self._model.load_state_dict(checkpoint['model'])
+        return True
 
     def predict(self, message: str) -> list[IntentClassifierPrediction]:
-        message = process_text(message, self._nlp_engine)
-        intent_classifier_results: list[IntentClassifierPrediction] = []
-        language: str = self._nlp_engine.get_property(nlp.NLP_LANGUAGE)
+        return self.predict_batch([message])[0]
 
-        # We try to replace all potential entity value with the corresponding entity name
-        ner_prediction: NERPrediction = self._state.agent.nlp_engine.ner.predict(self._state, message)
-        for (ner_sentence, intents) in ner_prediction.ner_sentences.items():
-            run_full_prediction: bool = True
-            self._model.eval()
+    def predict_batch(self, messages: list[str]) -> list[list[IntentClassifierPrediction]]:
+        """Predict the intent of a batch of messages.
+
+        The messages that need a full prediction (i.e., they are not discarded or exactly matched to a training
+        sentence) are padded and predicted with a single forward pass of the model.
+
+        Args:
+            messages (list[str]): the messages to predict the intent
+
+        Returns:
+            list[list[IntentClassifierPrediction]]: the predictions made by the intent classifier for each message, in
+            the same order as the messages
+        """
+        language: str = self._nlp_engine.get_property(nlp.NLP_LANGUAGE)
+        max_num_tokens: int = self._state.ic_config.input_max_num_tokens
+        unk: int = self.__vocab[SimpleIntentClassifierTorch.UNK]
+        pad: int = self.__vocab[SimpleIntentClassifierTorch.PAD]
+        batch_sequences: list[list[int]] = []
+        # For each message, its NER prediction and, for each NER sentence, its intents and its prediction (or the row
+        # of the batch where it is predicted)
+        pending: list[tuple[NERPrediction, list[tuple[str, list[Intent], np.ndarray or int]]]] = []
+        for message in messages:
+            message = process_text(message, self._nlp_engine)
+            # We try to replace all potential entity value with the corresponding entity name
+            ner_prediction: NERPrediction = self._state.agent.nlp_engine.ner.predict(self._state, message)
             tokens = tokenize(message, language)
-            tokens = [self.__vocab.get(token, self.__vocab[SimpleIntentClassifierTorch.UNK]) for token in tokens]
-            tokens = tokens[:self._state.ic_config.input_max_num_tokens]
-
-            if self._state.ic_config.discard_oov_sentences and all(token == self.__vocab[SimpleIntentClassifierTorch.UNK] for token in tokens):
-                # The sentence to predict consists of only out of vocabulary tokens,
-                # so we can automatically assign a zero probability to all classes
-                prediction = np.zeros(len(self._state.intents))
-                run_full_prediction = False  # no need to go ahead with the full NN-based prediction
-            elif self._state.ic_config.check_exact_prediction_match:
-                # We check if there is an exact match with one of the training sentences
-                for i, training_sequence in enumerate(self.__total_training_sequences):
-                    intent_label = self.__total_labels[i]
-                    if np.array_equal(tokens, training_sequence) \
-                            and self.__intent_label_mapping[intent_label] in intents:
-                        run_full_prediction = False
-                        # We set to 1 the corresponding intent with full confidence and to zero all the
-                        prediction = np.zeros(len(self._state.intents))
-                        np.put(prediction, intent_label, 1.0, mode='raise')
-                        # We don't check if there is more than one intent that could be the exact match
-                        # as this would be an inconsistency in the agent definition anyway
-                        break
-
-            if run_full_prediction:
-                tokens = tokens + [self.__vocab[SimpleIntentClassifierTorch.PAD]] * (self._state.ic_config.input_max_num_tokens - len(tokens))
-                input_tensor = torch.tensor(tokens, dtype=torch.long).unsqueeze(0)
-                with torch.no_grad():
-                    output = self._model(input_tensor)
-                    prediction = output.squeeze().tolist()
-                    if isinstance(prediction, float):
-                        prediction = [prediction]
-
-            for intent in intents:
-                # It is impossible to have a duplicated intent in another ner_sentence
-                intent_index = self._state.intents.index(intent)
-                intent_classifier_results.append(IntentClassifierPrediction(
-                    intent,
-                    prediction[intent_index],
-                    ner_sentence,
-                    ner_prediction.intent_matched_parameters[intent]
-                ))
-
-        return intent_classifier_results
+            tokens = [self.__vocab.get(token, unk) for token in tokens]
+            tokens = tokens[:max_num_tokens]
+            batch_row: int or None = None
+            sentences = []
+            for (ner_sentence, intents) in ner_prediction.ner_sentences.items():
+                prediction = None
+                if self._state.ic_config.discard_oov_sentences and all(token == unk for token in tokens):
+                    # The sentence to predict consists of only out of vocabulary tokens,
+                    # so we can automatically assign a zero probability to all classes
+                    prediction = np.zeros(len(self._state.intents))
+                elif self._state.ic_config.check_exact_prediction_match:
+                    # We check if there is an exact match with one of the training sentences
+                    for i, training_sequence in enumerate(self.__total_training_sequences):
+                        intent_label = self.__total_labels[i]
+                        if np.array_equal(tokens, training_sequence) \
+                                and self.__intent_label_mapping[intent_label] in intents:
+                            # We set to 1 the corresponding intent with full confidence and to zero all the
+                            prediction = np.zeros(len(self._state.intents))
+                            np.put(prediction, intent_label, 1.0, mode='raise')
+                            # We don't check if there is more than one intent that could be the exact match
+                            # as this would be an inconsistency in the agent definition anyway
+                            break
+                if prediction is None:
+                    # Full NN-based prediction. All the NER sentences of a message share the same input sequence
+                    if batch_row is None:
+                        batch_row = len(batch_sequences)
+                        batch_sequences.append(tokens + [pad] * (max_num_tokens - len(tokens)))
+                    prediction = batch_row
+                sentences.append((ner_sentence, intents, prediction))
+            pending.append((ner_prediction, sentences))
+
+        outputs: list[list[float]] = []
+        if batch_sequences:
+            self._model.eval()
+            with torch.inference_mode():
+                outputs = self._model(torch.tensor(batch_sequences, dtype=torch.long)).tolist()
+
+        results: list[list[IntentClassifierPrediction]] = []
+        for ner_prediction, sentences in pending:
+            intent_classifier_results: list[IntentClassifierPrediction] = []
+            for ner_sentence, intents, prediction in sentences:
+                if isinstance(prediction, int):
+                    prediction = outputs[prediction]
+                for intent in intents:
+                    # It is impossible to have a duplicated intent in another ner_sentence
+                    intent_index = self._state.intents.index(intent)
+                    intent_classifier_results.append(IntentClassifierPrediction(
+                        intent,
+                        prediction[intent_index],
+                        ner_sentence,
+                        ner_prediction.intent_matched_parameters[intent]
+                    ))
+            results.append(intent_classifier_results)
+        return results
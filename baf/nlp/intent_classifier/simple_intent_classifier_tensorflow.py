@@ -15,6 +15,7 @@ if TYPE_CHECKING:
     from baf.nlp.nlp_engine import NLPEngine
 
 try:
+    import keras
     from keras import Sequential
     from keras.layers import TextVectorization, Dense, Embedding, GlobalAveragePooling1D
     from keras.losses import SparseCategoricalCrossentropy
@@ -44,6 +45,8 @@ class SimpleIntentClassifierTF(IntentClassifier):
         :class:`~baf.nlp.intent_classifier.intent_classifier_configuration.SimpleIntentClassifierConfiguration`.
     """
 
+    cache_file_extension = '.weights.h5'
+
     def __init__(
             self,
             nlp_engine: 'NLPEngine',
@@ -105,6 +108,19 @@ class SimpleIntentClassifierTF(IntentClassifier):
             epochs=self._state.ic_config.num_epochs, verbose=0
         )
 
+    def _fingerprint_data(self) -> dict:
+        data = super()._fingerprint_data()
+        data['keras'] = keras.__version__
+        return data
+
+    def save(self, path: str) -> None:
+        self._model.save_weights(path)
+
+    def load(self, path: str) -> bool:
+        self._model.build(input_shape=(None, self._state.ic_config.input_max_num_tokens))
+        self._model.load_weights(path)
+        return True
+
     def predict(self, message: str) -> list[IntentClassifierPrediction]:
         message = process_text(message, self._nlp_engine)
         intent_classifier_results: list[IntentClassifierPrediction] = []
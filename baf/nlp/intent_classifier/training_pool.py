@@ -0,0 +1,67 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING
+
+from baf.exceptions.logger import logger
+
+if TYPE_CHECKING:
+    from baf.nlp.intent_classifier.intent_classifier import IntentClassifier
+
+
+def _init_worker(num_threads: int) -> None:
+    """Limit the threads of each worker process, so the workers do not compete for the CPU cores.
+
+    Args:
+        num_threads (int): the number of threads each worker can use
+    """
+    try:
+        import torch
+        torch.set_num_threads(num_threads)
+    except ImportError:
+        pass
+
+
+def train_intent_classifiers(intent_classifiers: list['IntentClassifier'], workers: int = 1) -> None:
+    """Train a set of intent classifiers, in parallel processes if possible.
+
+    The intent classifiers that provide a
+    :meth:`~baf.nlp.intent_classifier.intent_classifier.IntentClassifier.training_job` are trained in a pool of
+    ``workers`` processes (started with the ``spawn`` method, so the agent script must create and run the agent within
+    an ``if __name__ == '__main__':`` block). The rest are trained in the current process.
+
+    Args:
+        intent_classifiers (list[IntentClassifier]): the intent classifiers to train
+        workers (int): the maximum number of worker processes. If it is 1, all intent classifiers are trained in the
+            current process
+    """
+    jobs = {}
+    if workers > 1:
+        for intent_classifier in intent_classifiers:
+            job = intent_classifier.training_job()
+            if job is not None:
+                jobs[intent_classifier] = job
+    if len(jobs) > 1:
+        workers = min(workers, len(jobs))
+        try:
+            with ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(max(1, (os.cpu_count() or 1) // workers),)
+            ) as executor:
+                futures = {
+                    intent_classifier: executor.submit(function, *args)
+                    for intent_classifier, (function, args) in jobs.items()
+                }
+                for intent_classifier, future in futures.items():
+                    intent_classifier.set_training_result(future.result())
+        except BrokenProcessPool as e:
+            logger.warning(f'The intent classifiers could not be trained in parallel, training them sequentially: {e}')
+            jobs = {}
+    else:
+        jobs = {}
+    for intent_classifier in intent_classifiers:
+        if intent_classifier not in jobs:
+            intent_classifier.train()
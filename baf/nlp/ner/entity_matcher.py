@@ -0,0 +1,140 @@
+from collections import deque
+from typing import Iterable
+
+
+def _normalize(text: str) -> str:
+    """Lowercase a text, keeping its length (so positions in the normalized text are positions in the original one).
+
+    Args:
+        text (str): the text to normalize
+
+    Returns:
+        str: the normalized text
+    """
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    # Some characters have a lowercase form with more than 1 character (e.g. 'İ')
+    return ''.join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+def _is_word_char(c: str) -> bool:
+    return c.isalnum() or c == '_'
+
+
+class EntityValueMatcher:
+    """Finds entity values in a sentence with a single pass, using an
+    `Aho-Corasick automaton <https://en.wikipedia.org/wiki/Aho%E2%80%93Corasick_algorithm>`_.
+
+    Values are matched case-insensitively and only as whole words, i.e. a value matches where the regular expression
+    ``\\bvalue\\b`` would match (or if it is the whole sentence).
+
+    Args:
+        values (Iterable[str]): the values to look for
+
+    Attributes:
+        _goto (list[dict[str, int]]): The transitions of the automaton nodes
+        _fail (list[int]): The failure link of each node
+        _outputs (list[list[int]]): The lengths of the (normalized) values that end at each node
+        _values (dict[str, list[str]]): The values for each normalized value
+    """
+
+    def __init__(self, values: Iterable[str]):
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        self._outputs: list[list[int]] = [[]]
+        self._values: dict[str, list[str]] = {}
+        for value in values:
+            if not value:
+                continue
+            normalized = _normalize(value)
+            if normalized in self._values:
+                self._values[normalized].append(value)
+                continue
+            self._values[normalized] = [value]
+            node = 0
+            for c in normalized:
+                next_node = self._goto[node].get(c)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][c] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._outputs.append([])
+                node = next_node
+            self._outputs[node].append(len(normalized))
+        self._build_failure_links()
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for c, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and c not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(c, 0)
+                # The values ending at the failure node also end at this node
+                self._outputs[child] = self._outputs[child] + self._outputs[self._fail[child]]
+
+    def __len__(self):
+        return len(self._values)
+
+    def find_all(self, sentence: str) -> list[tuple[int, int, str]]:
+        """Find all the occurrences of the values in a sentence (they may overlap).
+
+        Args:
+            sentence (str): the sentence
+
+        Returns:
+            list[tuple[int, int, str]]: the (start, end, value) of each occurrence, with end exclusive. A normalized
+            value matches all the values with the same normalization (e.g. 'Paris' and 'paris')
+        """
+        if not self._values:
+            return []
+        normalized = _normalize(sentence)
+        n = len(sentence)
+        word = [_is_word_char(c) for c in sentence]
+
+        def boundary(i: int) -> bool:
+            return (i > 0 and word[i - 1]) != (i < n and word[i])
+
+        occurrences = []
+        node = 0
+        for i, c in enumerate(normalized):
+            while node and c not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(c, 0)
+            for length in self._outputs[node]:
+                start, end = i + 1 - length, i + 1
+                if (start == 0 and end == n) or (boundary(start) and boundary(end)):
+                    for value in self._values[normalized[start:end]]:
+                        occurrences.append((start, end, value))
+        return occurrences
+
+
+def select_matches(occurrences: list[tuple[int, int, str]], values: dict) -> list[tuple[int, int, str]]:
+    """Select which occurrences of a set of values are matched in a sentence.
+
+    Longer values have priority. Each value is matched at most once, in its first occurrence that does not overlap the
+    occurrences of values with higher priority.
+
+    Args:
+        occurrences (list[tuple[int, int, str]]): all the occurrences found by :meth:`EntityValueMatcher.find_all`
+        values (dict): the values that can be matched (other occurrences are ignored)
+
+    Returns:
+        list[tuple[int, int, str]]: the matched occurrences, sorted by position
+    """
+    by_value: dict[str, list[tuple[int, int, str]]] = {}
+    for occurrence in occurrences:
+        if occurrence[2] in values:
+            by_value.setdefault(occurrence[2], []).append(occurrence)
+    selected: list[tuple[int, int, str]] = []
+    for value in sorted(by_value, key=lambda v: (len(v), v.casefold()), reverse=True):
+        for start, end, _ in sorted(by_value[value]):
+            if all(end <= s or start >= e for s, e, _ in selected):
+                selected.append((start, end, value))
+                break
+    return sorted(selected)
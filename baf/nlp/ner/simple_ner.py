@@ -8,11 +8,11 @@ from baf.core.state import State
 from baf.library.entity.base_entities import BaseEntities, ordered_base_entities
 from baf.nlp.ner.base.datetime import ner_datetime
 from baf.nlp.ner.base.number import ner_number
+from baf.nlp.ner.entity_matcher import EntityValueMatcher, select_matches
 from baf.nlp.ner.matched_parameter import MatchedParameter
 from baf.nlp.ner.ner import NER
 from baf.nlp.ner.ner_prediction import NERPrediction
-from baf.nlp.utils import find_first_temp, replace_temp_value_in_sentence, replace_value_in_sentence, \
-    value_in_sentence
+from baf.nlp.utils import replace_value_in_sentence
 
 if TYPE_CHECKING:
     from baf.core.agent import Agent
@@ -119,9 +119,17 @@ class SimpleNER(NER):
     It can find an entity value in a user message only with exact matching (i.e. slight variations on an entity value
     within a user message will make the NER fail)
 
+    The values (and synonyms) of the entities of each state are compiled into an :class:`EntityValueMatcher` when the
+    NER is trained, so all of them are found in a message with a single pass.
+
     Args:
         nlp_engine (NLPEngine): the NLPEngine that handles the NLP processes of the agent
         agent (Agent): the agent the NER belongs to
+
+    Attributes:
+        _state_matchers (dict[tuple[State, bool], tuple[EntityValueMatcher, dict[Intent, dict[str, tuple[list[IntentParameter], str]]]]]):
+            For each state (and whether processed entity values are used), the matcher of all its entity values and
+            the entity values dict of each state intent (see :func:`get_custom_entity_values_dict`)
     """
     def __init__(
             self,
@@ -129,61 +137,87 @@ class SimpleNER(NER):
             agent
     ):
         super().__init__(nlp_engine, agent)
+        self._state_matchers: dict[
+            tuple[State, bool],
+            tuple[EntityValueMatcher, dict[Intent, dict[str, tuple[list[IntentParameter], str]]]]
+        ] = {}
 
     def train(self) -> None:
         for entity in self._agent.entities:
             entity.process_entity_entries(self._nlp_engine)
+        self._state_matchers = {}
+        processed_values: bool = self._nlp_engine.get_property(nlp.NLP_PRE_PROCESSING)
+        for state in self._agent.states:
+            self._get_state_matcher(state, processed_values)
+
+    def _get_state_matcher(
+            self,
+            state: State,
+            processed_values: bool
+    ) -> tuple[EntityValueMatcher, dict[Intent, dict[str, tuple[list[IntentParameter], str]]]]:
+        """Get the matcher of the entity values of a state, compiling it if necessary.
+
+        Args:
+            state (State): the state
+            processed_values (bool): whether to use the entities processed values or not
+
+        Returns:
+            tuple[EntityValueMatcher, dict[Intent, dict[str, tuple[list[IntentParameter], str]]]]: the matcher of all
+            the state entity values and the entity values dict of each state intent
+        """
+        key = (state, processed_values)
+        state_matcher = self._state_matchers.get(key)
+        if state_matcher is None:
+            intent_values = {intent: get_custom_entity_values_dict(intent, processed_values) for intent in state.intents}
+            matcher = EntityValueMatcher({value for values in intent_values.values() for value in values})
+            state_matcher = (matcher, intent_values)
+            self._state_matchers[key] = state_matcher
+        return state_matcher
 
     def predict(self, state: State, message: str) -> NERPrediction:
         ner_prediction: NERPrediction = NERPrediction()
+        # Match custom entities
+        processed_values: bool
+        pre_processing = self._nlp_engine.get_property(nlp.NLP_PRE_PROCESSING)
+        if pre_processing:
+            # Other conditions may be necessary to use the processed entity values
+            processed_values = True
+        else:
+            processed_values = False
+        matcher, intent_values = self._get_state_matcher(state, processed_values)
+        # All the entity values of all the state intents are found at once
+        occurrences = matcher.find_all(message)
         for intent in state.intents:
             intent_matches: list[MatchedParameter] = []
-            ner_sentence: str = message
-            # Match custom entities
-            processed_values: bool
-            pre_processing = self._nlp_engine.get_property(nlp.NLP_PRE_PROCESSING)
-            if pre_processing:
-                # Other conditions may be necessary to use the processed entity values
-                processed_values = True
-            else:
-                processed_values = False
-            all_entity_values: dict[str, tuple[list[IntentParameter], str]] = \
-                get_custom_entity_values_dict(intent, processed_values)
-            temps: dict[str, tuple[list[IntentParameter], str]] = {}
-            temp_template = r'/temp{}/'
-            temp_count = 1
-            for value, (intent_parameters, entry_value) in sorted(all_entity_values.items(),
-                                                            key=lambda x: (len(x[0]), x[0].casefold()), reverse=True):
-                # TODO: This approach doesn't allow 2 repetitions of the same value in a sentence
+            all_entity_values: dict[str, tuple[list[IntentParameter], str]] = intent_values[intent]
+            # TODO: This approach doesn't allow 2 repetitions of the same value in a sentence
+            # Longer values are matched first, and each matched value is replaced (in order of appearance in the
+            # sentence) by the 1st entity reference, in order of declaration in the agent definition
+            fragments: list[str] = []
+            last_end = 0
+            intent_parameters_done: list[IntentParameter] = []
+            for start, end, value in select_matches(occurrences, all_entity_values):
                 # entry_value are all entry values of the entity
                 # value can be an entry value (i.e. value == entry_value)
                 # or a synonym of an entry value (i.e. value is a synonym of entry_value)
                 # value can be processed
-                if value_in_sentence(value, ner_sentence):
-                    temp_n = temp_template.format(temp_count)
-                    temp_count += 1
-                    ner_sentence = replace_value_in_sentence(ner_sentence, value, temp_n)
-                    temps[temp_n] = (intent_parameters, entry_value)
-
-            intent_parameters_done: list[IntentParameter] = []
-            while len(temps) > 0:
-                # We get the temp that appears first in the sentence,
-                # and replace it by the 1st entity reference, in order of declaration in the agent definition
-                temp = find_first_temp(ner_sentence)
-                (intent_parameters, value) = temps[temp]
+                (intent_parameters, entry_value) = all_entity_values[value]
+                fragments.append(message[last_end:start])
+                last_end = end
                 intent_parameter = next(
                     (e for e in intent_parameters if e not in intent_parameters_done),
                     None
                 )
                 if intent_parameter is None:
                     # We found 2 values of the same intent_parameter.entity, but there can be only 1
-                    ner_sentence = replace_temp_value_in_sentence(ner_sentence, temp, value)
+                    fragments.append(entry_value)
                     # VALUE IS THE ORIGINAL (woman => Will write Femení!!!)
                 else:
                     intent_parameters_done.append(intent_parameter)
-                    ner_sentence = replace_temp_value_in_sentence(ner_sentence, temp, intent_parameter.entity.name.upper())
-                    intent_matches.append(MatchedParameter(intent_parameter.name, value, {}))
-                temps.pop(temp)
+                    fragments.append(intent_parameter.entity.name.upper())
+                    intent_matches.append(MatchedParameter(intent_parameter.name, entry_value, {}))
+            fragments.append(message[last_end:])
+            ner_sentence: str = ''.join(fragments)
 
             # Match base/system entities (after custom entities)
             base_entity_intent_parameters: list[IntentParameter] = [e for e in intent.parameters if
@@ -1,4 +1,3 @@
-import inspect
 import os
 
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'  # Hide Tensorflow logs
@@ -10,6 +9,7 @@ from baf.core.property import Property
 from baf.core.session import Session
 from baf.exceptions.logger import logger
 from baf.nlp.intent_classifier.intent_classifier import IntentClassifier
+from baf.nlp.intent_classifier.intent_classifier_cache import IntentClassifierCache
 from baf.nlp.intent_classifier.intent_classifier_configuration import (
     LLMIntentClassifierConfiguration,
     SimpleIntentClassifierConfiguration,
@@ -18,6 +18,8 @@ from baf.nlp.intent_classifier.intent_classifier_prediction import (
     IntentClassifierPrediction,
     fallback_intent_prediction,
 )
+from baf.nlp.intent_classifier.intent_prediction_batcher import IntentPredictionBatcher
+from baf.nlp.intent_classifier.training_pool import train_intent_classifiers
 from baf.nlp.intent_classifier.llm_intent_classifier import LLMIntentClassifier
 from baf.nlp.llm.llm import LLM
 from baf.nlp.ner.ner import NER
@@ -45,6 +47,8 @@ class NLPEngine:
         _llms (dict[str, LLM]): The LLMs of the NLPEngine. Keys are the names and values are the LLMs themselves.
         _intent_classifiers (dict[State, IntentClassifier]): The collection of Intent Classifiers of the NLPEngine.
             There is one for each agent state (only states with transitions triggered by intent matching)
+        _intent_prediction_batchers (dict[State, IntentPredictionBatcher]): The batchers grouping the concurrent
+            predictions of each intent classifier
         _ner (NER or None): The NER (Named Entity Recognition) system of the NLPEngine
         _language_to_speech2text_module (dict[str, Speech2Text]): A dictionary mapping the user language to a Speech-to-Text
             system of the NLPEngine. The user language is either automatically recognized if audio_language_detection_processor
@@ -60,6 +64,7 @@ class NLPEngine:
         self._agent: "Agent" = agent
         self._llms: dict[str, LLM] = {}
         self._intent_classifiers: dict["State", IntentClassifier] = {}
+        self._intent_prediction_batchers: dict["State", IntentPredictionBatcher] = {}
         self._ner: NER or None = None
         self._language_to_speech2text_module: dict[str, Speech2Text] = {}
         self._language_to_text2speech_module: dict[str, Text2Speech] = {}
@@ -99,6 +104,12 @@ class NLPEngine:
                         )
                 elif isinstance(state.ic_config, LLMIntentClassifierConfiguration):
                     self._intent_classifiers[state] = LLMIntentClassifier(self, state)
+        for state, intent_classifier in self._intent_classifiers.items():
+            self._intent_prediction_batchers[state] = IntentPredictionBatcher(
+                intent_classifier,
+                max_batch_size=self.get_property(nlp.NLP_INTENT_BATCH_SIZE),
+                max_wait=self.get_property(nlp.NLP_INTENT_BATCH_MAX_WAIT),
+            )
         # TODO: Only instantiate the NER if asked (maybe an agent does not need NER), via agent properties
         self._ner = SimpleNER(self, self._agent)
 
@@ -114,21 +125,39 @@ class NLPEngine:
         return self._agent.get_property(prop)
 
     def train(self) -> None:
-        """Train the NLP components of the NLPEngine."""
+        """Train the NLP components of the NLPEngine.
+
+        If the :obj:`~baf.nlp.NLP_MODEL_CACHE_PATH` property is set, the intent classifiers are loaded from the model
+        cache when possible (see :class:`~baf.nlp.intent_classifier.intent_classifier_cache.IntentClassifierCache`).
+        The rest are trained in :obj:`~baf.nlp.NLP_TRAINING_WORKERS` parallel processes (see
+        :func:`~baf.nlp.intent_classifier.training_pool.train_intent_classifiers`).
+        """
         self._ner.train()
         logger.info(f"NER successfully trained.")
+        cache_path: str = self.get_property(nlp.NLP_MODEL_CACHE_PATH)
+        cache = IntentClassifierCache(cache_path) if cache_path else None
+        pending: dict["State", IntentClassifier] = {}
         for state, intent_classifier in self._intent_classifiers.items():
             if not state.intents:
                 logger.info(
                     f"Intent classifier in {state.name} not trained (no intents found)."
                 )
+            elif cache is not None and cache.load(intent_classifier):
+                logger.info(f"Intent classifier in {state.name} loaded from the model cache.")
             else:
-                intent_classifier.train()
-                logger.info(f"Intent classifier in {state.name} successfully trained.")
+                pending[state] = intent_classifier
+        train_intent_classifiers(list(pending.values()), self.get_property(nlp.NLP_TRAINING_WORKERS))
+        for state, intent_classifier in pending.items():
+            logger.info(f"Intent classifier in {state.name} successfully trained.")
+            if cache is not None:
+                cache.save(intent_classifier)
 
     def predict_intent(self, session: Session) -> IntentClassifierPrediction:
         """Predict the intent of a user message.
 
+        Concurrent predictions of sessions in the same state are grouped into batches (see
+        :class:`~baf.nlp.intent_classifier.intent_prediction_batcher.IntentPredictionBatcher`).
+
         Args:
             session (Session): the user session
 
@@ -140,10 +169,12 @@ class NLPEngine:
         if not session.current_state.intents:
             return fallback_intent
         intent_classifier = self._intent_classifiers[session.current_state]
+        batcher = self._intent_prediction_batchers.get(session.current_state)
         # TODO: check if state is different to run prediction
-        intent_classifier_predictions: list[IntentClassifierPrediction] = (
-            intent_classifier.predict(message)
-        )
+        if batcher is not None and batcher.intent_classifier is intent_classifier:
+            intent_classifier_predictions: list[IntentClassifierPrediction] = batcher.predict(message)
+        else:
+            intent_classifier_predictions: list[IntentClassifierPrediction] = intent_classifier.predict(message)
         best_intent_prediction = self.get_best_intent_prediction(
             intent_classifier_predictions
         )
@@ -190,14 +221,11 @@ class NLPEngine:
 
         logger.info(f"Processing speech2text for session: {session.id}")
         # for processing and detecting the spoken language of the audio bytes before STT is performed
-        for processor in self._agent.processors:
-            sig = inspect.signature(processor.process)
-            params = sig.parameters
-            if "message" in params and params["message"].annotation is bytes:
-                try:
-                    speech = processor.process(session=session, message=speech)
-                except Exception as e:
-                    logger.error(f"Exception in processor.process: {e}")
+        for processor in self._agent._get_processors(bytes, None):
+            try:
+                speech = processor.process(session=session, message=speech)
+            except Exception as e:
+                logger.error(f"Exception in processor.process: {e}")
 
         user_language = "en"
         try:
@@ -1,7 +1,10 @@
+import base64
 import json
+import struct
 from datetime import datetime
 
 from enum import Enum
+from typing import Any
 
 
 class PayloadAction(Enum):
@@ -84,7 +87,33 @@ class PayloadAction(Enum):
     """
 
     FETCH_USER_MESSAGES = 'fetch_user_messages'
-    """PayloadAction: Request to fetch old messages for a given user."""
+    """PayloadAction: Request to fetch old messages for a given user. Each message is sent in its own payload, so prefer
+    :attr:`FETCH_HISTORY_PAGE`."""
+
+    FETCH_HISTORY_PAGE = 'fetch_history_page'
+    """PayloadAction: Request to fetch a page of old messages for a given user. The message is a dictionary with the
+    ``cursor`` of the page (None for the most recent messages) and, optionally, the maximum number of messages
+    (``limit``). The page is sent in an :attr:`AGENT_REPLY_HISTORY` payload."""
+
+    AGENT_REPLY_HISTORY = 'agent_reply_history'
+    """PayloadAction: Indicates that the payload's purpose is to send a page of old messages, requested with
+    :attr:`FETCH_HISTORY_PAGE`. The message is a dictionary with the ``messages`` of the page (their payload
+    dictionaries, in chronological order) and the ``cursor`` of the previous (older) page, or None if there are no
+    older messages."""
+
+
+_PAYLOAD_ACTIONS: dict[str, PayloadAction] = {action.value: action for action in PayloadAction}
+"""The payload actions, by value."""
+
+BINARY_FIELDS: dict[str, str | None] = {
+    PayloadAction.USER_VOICE.value: None,
+    PayloadAction.USER_FILE.value: 'base64',
+    PayloadAction.AGENT_REPLY_FILE.value: 'base64',
+    PayloadAction.AGENT_REPLY_IMAGE.value: None,
+    PayloadAction.AGENT_REPLY_AUDIO.value: 'audio_data_base64',
+}
+"""The binary content of the payloads, by action: the whole message (:obj:`None`) or an entry of the message dictionary.
+It is a base64 string in JSON payloads, and raw bytes in binary payloads (see :class:`BinaryPayloadCodec`)."""
 
 
 class Payload:
@@ -93,24 +122,35 @@ class Payload:
 
     @staticmethod
     def decode(payload_str):
-        """Decode a JSON payload string into a :class:`Payload` object.
+        """Decode a payload into a :class:`Payload` object. Text payloads are decoded as JSON, and binary payloads with
+        the :class:`BinaryPayloadCodec`.
 
         Args:
-            payload_str (str or dict): A JSON-encoded payload string.
+            payload_str (str, dict or bytes): A JSON-encoded payload string (or the already parsed dictionary), or a
+                binary payload.
 
         Returns:
             Payload or None: A Payload object if the decoding is successful,
             None otherwise.
         """
-        payload_dict = json.loads(payload_str)
-        payload_action = payload_dict['action']
-        payload_message = payload_dict['message']
-        history = payload_dict.get('history', False)
+        if isinstance(payload_str, (bytes, bytearray, memoryview)):
+            return BINARY_CODEC.decode(payload_str)
+        return JSON_CODEC.decode(payload_str)
 
-        for action in PayloadAction:
-            if action.value == payload_action:
-                return Payload(action, payload_message, history=history)
-        return None
+    @staticmethod
+    def from_dict(payload_dict: dict) -> 'Payload' or None:
+        """Create a :class:`Payload` object from its dictionary representation.
+
+        Args:
+            payload_dict (dict): the payload dictionary, with its action and message
+
+        Returns:
+            Payload or None: the payload, or None if the action is unknown
+        """
+        action = _PAYLOAD_ACTIONS.get(payload_dict['action'])
+        if action is None:
+            return None
+        return Payload(action, payload_dict['message'], history=payload_dict.get('history', False))
 
     def __init__(self, action: PayloadAction, message: str or dict = None, history: bool = False, timestamp: datetime = None):
         self.action: str = action.value
@@ -118,6 +158,44 @@ class Payload:
         self.history: bool = history
         self.timestamp: datetime = timestamp
 
+    def get_bytes(self) -> bytes or None:
+        """Get the binary content of the payload (see :data:`BINARY_FIELDS`), regardless of the codec it was received
+        with.
+
+        Returns:
+            bytes or None: the binary content, or None if the payload has no binary content
+        """
+        if self.action not in BINARY_FIELDS:
+            return None
+        key = BINARY_FIELDS[self.action]
+        value = self.message
+        if key is not None:
+            if isinstance(value, str):
+                # E.g. a file sent as a JSON string
+                value = json.loads(value)
+            value = value.get(key) if isinstance(value, dict) else None
+        if value is None or isinstance(value, bytes):
+            return value
+        if isinstance(value, (bytearray, memoryview)):
+            return bytes(value)
+        return base64.b64decode(value)
+
+    def to_dict(self) -> dict:
+        """Get the dictionary representation of the payload, which is sent to the clients.
+
+        Returns:
+            dict: the payload dictionary
+        """
+        timestamp = getattr(self, 'timestamp', None)
+        if timestamp:
+            timestamp = timestamp.strftime("%Y-%m-%d %H:%M:%S")
+        return {
+            'action': self.action,
+            'message': self.message,
+            'history': getattr(self, 'history', None),
+            'timestamp': timestamp
+        }
+
 
 class PayloadEncoder(json.JSONEncoder):
     """Encoder for the :class:`Payload` class.
@@ -140,14 +218,159 @@ class PayloadEncoder(json.JSONEncoder):
         """
         if isinstance(obj, Payload):
             # Convert the Payload object to a dictionary
-            timestamp = getattr(obj, 'timestamp', None)
-            if timestamp:
-                timestamp = timestamp.strftime("%Y-%m-%d %H:%M:%S")
-            payload_dict = {
-                'action': obj.action,
-                'message': obj.message,
-                'history': getattr(obj, 'history', None),
-                'timestamp': timestamp
-            }
-            return payload_dict
+            return obj.to_dict()
+        if isinstance(obj, (bytes, bytearray, memoryview)):
+            # JSON has no binary type
+            return base64.b64encode(obj).decode('utf-8')
         return super().default(obj)
+
+
+class PayloadCodec:
+    """The wire format of the payloads exchanged through a WebSocket connection.
+
+    The codec of a connection is negotiated in its opening handshake, with the WebSocket subprotocols: a client
+    offers the subprotocols of the codecs it supports (e.g. ``Sec-WebSocket-Protocol: baf.binary, baf.json``), and the
+    server selects the first one it supports too. Connections without a subprotocol use JSON.
+
+    Args:
+        name (str): the name of the codec
+        subprotocol (str): the WebSocket subprotocol that selects the codec
+
+    Attributes:
+        name (str): The name of the codec
+        subprotocol (str): The WebSocket subprotocol that selects the codec
+    """
+
+    def __init__(self, name: str, subprotocol: str):
+        self.name: str = name
+        self.subprotocol: str = subprotocol
+
+    def encode(self, payload: Payload) -> str or bytes:
+        """Encode a payload.
+
+        Args:
+            payload (Payload): the payload to encode
+
+        Returns:
+            str or bytes: the encoded payload, sent in a text or binary frame, respectively
+        """
+        pass
+
+    def decode(self, data: str or bytes) -> Payload or None:
+        """Decode a payload.
+
+        Args:
+            data (str or bytes): the encoded payload
+
+        Returns:
+            Payload or None: the payload, or None if its action is unknown
+        """
+        pass
+
+
+class JSONPayloadCodec(PayloadCodec):
+    """The default codec: payloads are JSON strings (see :class:`PayloadEncoder`), and their binary content is encoded
+    as base64 strings."""
+
+    def __init__(self):
+        super().__init__('json', 'baf.json')
+
+    def encode(self, payload: Payload) -> str:
+        return json.dumps(payload, cls=PayloadEncoder)
+
+    def decode(self, data: str or dict) -> Payload or None:
+        return Payload.from_dict(data if isinstance(data, dict) else json.loads(data))
+
+
+class BinaryPayloadCodec(PayloadCodec):
+    """A codec that sends the binary content of the payloads (see :data:`BINARY_FIELDS`) as raw bytes, instead of base64
+    strings, which are 33% larger and must be encoded and decoded on both ends.
+
+    A binary payload is a JSON header followed by a body with the binary content::
+
+        +------------------------------+------------------------+-------------------------+
+        | header length (4 bytes, big) | header (JSON, UTF-8)   | body (binary content)   |
+        +------------------------------+------------------------+-------------------------+
+
+    The header is the JSON payload, where each :class:`bytes` value of the message is replaced by ``{"$binary": i}``,
+    the i-th binary content of the body. Their lengths are in the ``binary`` entry of the header.
+    """
+
+    _HEADER_LENGTH = struct.Struct('>I')
+    _BINARY_KEY = '$binary'
+
+    def __init__(self):
+        super().__init__('binary', 'baf.binary')
+
+    def encode(self, payload: Payload) -> bytes:
+        payload_dict = payload.to_dict()
+        message = payload_dict['message']
+        key = BINARY_FIELDS.get(payload.action, '')
+        # The base64 strings of the binary content are sent as bytes
+        if key is None and isinstance(message, str):
+            message = base64.b64decode(message)
+        elif key and isinstance(message, dict) and isinstance(message.get(key), str):
+            message = {**message, key: base64.b64decode(message[key])}
+        binaries = []
+        payload_dict['message'] = self._extract(message, binaries)
+        payload_dict['binary'] = [len(binary) for binary in binaries]
+        header = json.dumps(payload_dict, cls=PayloadEncoder).encode('utf-8')
+        return b''.join([self._HEADER_LENGTH.pack(len(header)), header, *binaries])
+
+    def decode(self, data: bytes) -> Payload or None:
+        data = memoryview(data)
+        header_length, = self._HEADER_LENGTH.unpack_from(data)
+        offset = self._HEADER_LENGTH.size + header_length
+        payload_dict = json.loads(bytes(data[self._HEADER_LENGTH.size:offset]))
+        binaries = []
+        for length in payload_dict.pop('binary', []):
+            binaries.append(bytes(data[offset:offset + length]))
+            offset += length
+        payload_dict['message'] = self._restore(payload_dict['message'], binaries)
+        return Payload.from_dict(payload_dict)
+
+    def _extract(self, value: Any, binaries: list[bytes]) -> Any:
+        """Replace the binary values (in nested dictionaries and lists too) with references to the body."""
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            binaries.append(value)
+            return {self._BINARY_KEY: len(binaries) - 1}
+        if isinstance(value, dict):
+            return {k: self._extract(v, binaries) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [self._extract(v, binaries) for v in value]
+        return value
+
+    def _restore(self, value: Any, binaries: list[bytes]) -> Any:
+        """Replace the references to the body with the binary values."""
+        if isinstance(value, dict):
+            if len(value) == 1 and self._BINARY_KEY in value:
+                return binaries[value[self._BINARY_KEY]]
+            return {k: self._restore(v, binaries) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self._restore(v, binaries) for v in value]
+        return value
+
+
+JSON_CODEC: JSONPayloadCodec = JSONPayloadCodec()
+"""The JSON payload codec."""
+
+BINARY_CODEC: BinaryPayloadCodec = BinaryPayloadCodec()
+"""The binary payload codec."""
+
+PAYLOAD_CODECS: dict[str, PayloadCodec] = {codec.name: codec for codec in [JSON_CODEC, BINARY_CODEC]}
+"""The payload codecs, by name."""
+
+
+def get_codec(subprotocol: str or None) -> PayloadCodec:
+    """Get the payload codec selected by a WebSocket subprotocol.
+
+    Args:
+        subprotocol (str or None): the subprotocol of a WebSocket connection
+
+    Returns:
+        PayloadCodec: the codec of the subprotocol, or the JSON codec if there is no such codec
+    """
+    for codec in PAYLOAD_CODECS.values():
+        if codec.subprotocol == subprotocol:
+            return codec
+    return JSON_CODEC
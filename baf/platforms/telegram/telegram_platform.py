@@ -36,6 +36,19 @@ def _wait_future(future: Future):
     event.wait()
 
 
+def _file_content(file_dict: dict) -> bytes:
+    """
+    Get the raw content of a file dictionary (see :meth:`~baf.core.file.File.to_dict`), which may be a base64 string.
+
+    Args:
+        file_dict (dict): the file dictionary
+    """
+    content = file_dict["base64"]
+    if isinstance(content, str):
+        return base64.b64decode(content)
+    return content
+
+
 class TelegramPlatform(Platform):
     """The Telegram Platform allows an agent to interact via Telegram.
 
@@ -104,10 +117,9 @@ class TelegramPlatform(Platform):
             session = await asyncio.to_thread(self._agent.get_or_create_session, session_id, self)
             file_object = await context.bot.get_file(update.message.document.file_id)
             file_data = await file_object.download_as_bytearray()
-            base64_data = base64.b64encode(file_data).decode()
             f = File(
                 file_name=update.message.document.file_name, file_type=update.message.document.mime_type,
-                file_base64=base64_data
+                file_data=file_data
             )
             event: ReceiveFileEvent = ReceiveFileEvent(
                 file=f,
@@ -124,10 +136,9 @@ class TelegramPlatform(Platform):
             session = await asyncio.to_thread(self._agent.get_or_create_session, session_id, self)
             image_object = await context.bot.get_file(update.message.photo[-1].file_id)
             image_data = await image_object.download_as_bytearray()
-            base64_data = base64.b64encode(image_data).decode()
             f = File(
                 file_name=update.message.photo[-1].file_id + ".jpg", file_type="image/jpeg",
-                file_base64=base64_data
+                file_data=image_data
             )
             event: ReceiveFileEvent = ReceiveFileEvent(
                 file=f,
@@ -193,7 +204,7 @@ class TelegramPlatform(Platform):
             future = asyncio.run_coroutine_threadsafe(
                 self._telegram_app.bot.send_document(
                     chat_id=session_id,
-                    document=base64.b64decode(payload.message["base64"]),
+                    document=_file_content(payload.message),
                     filename=payload.message["name"],
                     caption=payload.message["caption"]
                 ),
@@ -203,7 +214,7 @@ class TelegramPlatform(Platform):
             future = asyncio.run_coroutine_threadsafe(
                 self._telegram_app.bot.send_photo(
                     chat_id=session_id,
-                    photo=base64.b64decode(payload.message["base64"]),
+                    photo=_file_content(payload.message),
                     caption=payload.message["caption"]
                 ),
                 self._event_loop
@@ -241,8 +252,8 @@ class TelegramPlatform(Platform):
         """
         if session.platform is not self:
             raise PlatformMismatchError(self, session)
-        session.save_message(Message(t=MessageType.FILE, content=file.get_json_string(), is_user=False, timestamp=datetime.now()))
-        file_dict = file.to_dict()
+        session.save_message(Message(t=MessageType.FILE, content=file, is_user=False, timestamp=datetime.now()))
+        file_dict = file.to_dict(encoded=False)
         if message:
             file_dict["caption"] = message
         else:
@@ -262,8 +273,8 @@ class TelegramPlatform(Platform):
         """
         if session.platform is not self:
             raise PlatformMismatchError(self, session)
-        session.save_message(Message(t=MessageType.IMAGE, content=file.get_json_string(), is_user=False, timestamp=datetime.now()))
-        file_dict = file.to_dict()
+        session.save_message(Message(t=MessageType.IMAGE, content=file, is_user=False, timestamp=datetime.now()))
+        file_dict = file.to_dict(encoded=False)
         if message:
             file_dict["caption"] = message
         else:
@@ -53,6 +53,107 @@ type: ``list``
 default value: ``None``
 """
 
+WEBSOCKET_SERVER = Property('platforms.websocket.server', str, 'asyncio')
+"""
+The WebSocket server implementation:
+
+- ``asyncio``: all the connections are served by a single asyncio event loop. The agent replies are handed over to the
+  event loop through a bounded outbound queue per connection (see ``platforms.websocket.send_queue.*``), so a slow client
+  never blocks the other sessions.
+- ``sync``: each connection is served by its own thread, and the agent replies are written to the socket by the session
+  that sends them (the behaviour of previous versions).
+
+name: ``platforms.websocket.server``
+
+type: ``str``
+
+default value: ``asyncio``
+"""
+
+WEBSOCKET_SEND_QUEUE_SIZE = Property('platforms.websocket.send_queue.max_size', int, 256)
+"""
+Maximum number of outgoing messages waiting to be sent to each client, in the ``asyncio`` WebSocket server. When a
+client does not read the messages as fast as the agent sends them, the ``platforms.websocket.send_queue.policy`` is
+applied.
+
+name: ``platforms.websocket.send_queue.max_size``
+
+type: ``int``
+
+default value: ``256``
+"""
+
+WEBSOCKET_SLOW_CONSUMER_POLICY = Property('platforms.websocket.send_queue.policy', str, 'block')
+"""
+What to do with an outgoing message when the outbound queue of its client is full, in the ``asyncio`` WebSocket server:
+
+- ``drop``: the message is discarded.
+- ``disconnect``: the client is disconnected (it can reconnect and fetch the chat history).
+- ``block``: the agent session waits until there is room in the queue, for up to
+  ``platforms.websocket.send_queue.block_timeout`` seconds. Then, the client is disconnected.
+
+name: ``platforms.websocket.send_queue.policy``
+
+type: ``str``
+
+default value: ``block``
+"""
+
+WEBSOCKET_SEND_BLOCK_TIMEOUT = Property('platforms.websocket.send_queue.block_timeout', float, 10.0)
+"""
+Maximum time (in seconds) an agent session waits for room in the outbound queue of a client, with the ``block`` slow
+consumer policy.
+
+name: ``platforms.websocket.send_queue.block_timeout``
+
+type: ``float``
+
+default value: ``10.0``
+"""
+
+WEBSOCKET_CODECS = Property('platforms.websocket.codecs', list, ['json', 'binary'])
+"""
+The payload codecs the WebSocket clients can select, with the ``Sec-WebSocket-Protocol`` header of their opening
+handshake (see :class:`~baf.platforms.payload.PayloadCodec`):
+
+- ``json`` (subprotocol ``baf.json``): the payloads are JSON strings, and their binary content (files, images, audio)
+  base64 strings.
+- ``binary`` (subprotocol ``baf.binary``): the payloads are binary frames with a JSON header and the raw binary content.
+
+The clients that do not select any codec use ``json``.
+
+name: ``platforms.websocket.codecs``
+
+type: ``list``
+
+default value: ``['json', 'binary']``
+"""
+
+WEBSOCKET_HISTORY_PAGE_SIZE = Property('platforms.websocket.history.page_size', int, 50)
+"""
+The maximum (and default) number of messages of the chat history pages sent to the clients (see
+:attr:`~baf.platforms.payload.PayloadAction.FETCH_HISTORY_PAGE`).
+
+name: ``platforms.websocket.history.page_size``
+
+type: ``int``
+
+default value: ``50``
+"""
+
+WEBSOCKET_HISTORY_CACHE_SIZE = Property('platforms.websocket.history.cache_size', int, 100)
+"""
+The maximum number of chat histories (one for each client connection) kept in memory to serve their pages. When a
+client requests an older page, the history of its session is read once, and the following pages are served from
+memory. The least recently used histories are discarded first.
+
+name: ``platforms.websocket.history.cache_size``
+
+type: ``int``
+
+default value: ``100``
+"""
+
 STREAMLIT_HOST = Property('platforms.websocket.streamlit.host', str, 'localhost')
 """
 The Streamlit UI host address. If you are using our default UI, you must define its address where you can access and 
@@ -76,6 +177,18 @@ type: ``int``
 default value: ``5000``
 """
 
+STREAMLIT_CODEC = Property('platforms.websocket.streamlit.codec', str, 'binary')
+"""
+The payload codec the Streamlit UI requests to the WebSocket server (see ``platforms.websocket.codecs``). If the server
+does not support it, the UI uses ``json``.
+
+name: ``platforms.websocket.streamlit.codec``
+
+type: ``str``
+
+default value: ``binary``
+"""
+
 STREAMLIT_CHAT_DEFAULT_SIZE = Property('platforms.websocket.streamlit.chat.size', int, 16)
 """
 Default chat font size used by Streamlit chat UI when no profile-specific style is applied.
@@ -0,0 +1,160 @@
+import asyncio
+import threading
+import time
+
+from websockets.exceptions import ConnectionClosed
+from websockets.server import WebSocketServerProtocol
+
+from baf.exceptions.logger import logger
+
+SLOW_CONSUMER_POLICIES: list[str] = ['drop', 'disconnect', 'block']
+"""The policies applied when the outbound queue of a connection is full (see :class:`AsyncConnection`)."""
+
+SLOW_CONSUMER_CLOSE_CODE: int = 1008
+"""The close code sent to the clients disconnected for not reading their messages (policy violation)."""
+
+
+class AsyncConnection:
+    """A client connection of the asyncio WebSocket server, with a bounded outbound queue.
+
+    The agent sessions run in other threads, so they never write to the socket. Instead, :meth:`send` hands the
+    outgoing messages over to the event loop of the server, and a writer task sends them to the client in order. At
+    most ``max_queue_size`` messages can be waiting to be sent. When the queue is full (i.e. the client does not read
+    the messages as fast as the agent sends them), the ``policy`` is applied:
+
+    - ``drop``: the message is discarded.
+    - ``disconnect``: the connection is closed.
+    - ``block``: the sender waits until there is room in the queue, for up to ``block_timeout`` seconds. Then, the
+      connection is closed. When the sender is the event loop itself, which cannot wait, the connection is closed
+      right away.
+
+    Args:
+        websocket (WebSocketServerProtocol): the WebSocket connection
+        max_queue_size (int): the maximum number of messages waiting to be sent
+        policy (str): the policy applied when the queue is full, one of :data:`SLOW_CONSUMER_POLICIES`
+        block_timeout (float): the maximum time (in seconds) a sender waits for room in the queue, with the ``block``
+            policy
+
+    Attributes:
+        websocket (WebSocketServerProtocol): The WebSocket connection
+        id (uuid.UUID): The connection id
+        subprotocol (str or None): The subprotocol negotiated in the opening handshake (i.e., the payload codec)
+        policy (str): The policy applied when the queue is full
+        block_timeout (float): The maximum time (in seconds) a sender waits for room in the queue
+        closed (bool): Whether the connection is closed (or being closed) or not
+        dropped (int): The number of messages discarded because the queue was full
+        _loop (asyncio.AbstractEventLoop): The event loop of the server
+        _queue (asyncio.Queue[str | bytes]): The messages waiting to be sent
+        _slots (threading.Semaphore): The free places of the queue. Senders take one before queueing a message, and
+            the writer task releases it once the message is sent
+        _writer (asyncio.Task or None): The task that sends the queued messages
+    """
+
+    def __init__(self, websocket: WebSocketServerProtocol, max_queue_size: int, policy: str, block_timeout: float):
+        if policy not in SLOW_CONSUMER_POLICIES:
+            raise ValueError(f"Invalid slow consumer policy '{policy}'. Valid policies: {SLOW_CONSUMER_POLICIES}")
+        self.websocket: WebSocketServerProtocol = websocket
+        self.id = websocket.id
+        self.subprotocol: str | None = websocket.subprotocol
+        self.policy: str = policy
+        self.block_timeout: float = block_timeout
+        self.closed: bool = False
+        self.dropped: int = 0
+        self._loop: asyncio.AbstractEventLoop = asyncio.get_running_loop()
+        self._queue: asyncio.Queue[str | bytes] = asyncio.Queue()
+        self._slots: threading.Semaphore = threading.Semaphore(max(1, max_queue_size))
+        self._writer: asyncio.Task or None = None
+
+    def start(self) -> None:
+        """Start sending the queued messages. Must be called from the event loop of the server."""
+        self._writer = self._loop.create_task(self._write())
+
+    async def _write(self) -> None:
+        """Send the queued messages to the client, in order, until the connection is closed."""
+        try:
+            while True:
+                message = await self._queue.get()
+                try:
+                    await self.websocket.send(message)
+                finally:
+                    self._slots.release()
+        except ConnectionClosed:
+            pass
+        finally:
+            self.closed = True
+
+    def send(self, message: str | bytes) -> bool:
+        """Queue a message to be sent to the client. It can be called from any thread.
+
+        Args:
+            message (str or bytes): the message, sent in a text or binary frame, respectively
+
+        Returns:
+            bool: true if the message was queued, false if it was discarded (because the connection is closed or the
+            queue is full)
+        """
+        if self.closed:
+            return False
+        if not self._slots.acquire(blocking=False):
+            if self.policy == 'drop':
+                self.dropped += 1
+                logger.warning(f'Outbound queue of WebSocket connection {self.id} is full, message dropped')
+                return False
+            if self.policy == 'disconnect' or self._in_loop() or not self._wait_for_slot():
+                if not self.closed:
+                    logger.warning(f'Outbound queue of WebSocket connection {self.id} is full, disconnecting client')
+                    self.close(SLOW_CONSUMER_CLOSE_CODE, 'slow consumer')
+                return False
+        try:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, message)
+        except RuntimeError:
+            # The event loop is closed
+            self._slots.release()
+            return False
+        return True
+
+    def _in_loop(self) -> bool:
+        """Check whether the current thread is running the event loop of the server."""
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def _wait_for_slot(self) -> bool:
+        """Wait (up to ``block_timeout`` seconds) until there is room in the queue, or the connection is closed.
+
+        Returns:
+            bool: true if there is room for a message, false otherwise
+        """
+        deadline = time.monotonic() + self.block_timeout
+        while not self.closed:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            if self._slots.acquire(timeout=min(remaining, 0.1)):
+                if self.closed:
+                    self._slots.release()
+                    return False
+                return True
+        return False
+
+    def close(self, code: int = 1000, reason: str = '') -> None:
+        """Close the connection. It can be called from any thread. The messages still in the queue are discarded.
+
+        Args:
+            code (int): the WebSocket close code
+            reason (str): the close reason
+        """
+        self.closed = True
+        if self._in_loop():
+            self._close(code, reason)
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._close, code, reason)
+        except RuntimeError:
+            pass
+
+    def _close(self, code: int, reason: str) -> None:
+        if self._writer is not None:
+            self._writer.cancel()
+        self._loop.create_task(self.websocket.close(code, reason))
@@ -0,0 +1,87 @@
+import threading
+from collections import OrderedDict
+from datetime import datetime
+
+from baf.core.message import Message
+from baf.core.session import Session
+
+
+class ChatHistoryCache:
+    """The chat histories the WebSocket clients are paging through, so that each history is read once.
+
+    A client reads the history of its session from the most recent messages backwards, one page at a time. The position
+    of a page is its offset, i.e., the number of more recent messages. All the pages are taken from the history of the
+    session until the client connected, which does not change, so the offsets stay valid while new messages arrive.
+
+    The first page is read from the session (usually, from its in-memory chat history). When an older page is
+    requested, the whole history is read and cached, and the following pages are served from memory. At most
+    ``max_size`` histories are cached, and the least recently used ones are discarded first.
+
+    Args:
+        max_size (int): the maximum number of cached histories
+
+    Attributes:
+        max_size (int): The maximum number of cached histories
+        _histories (OrderedDict[tuple[str, datetime], list[Message]]): The cached histories, by session id and instant
+            of the connection, from the least to the most recently used
+        _lock (threading.Lock): Lock of the cached histories
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size: int = max_size
+        self._histories: OrderedDict[tuple[str, datetime], list[Message]] = OrderedDict()
+        self._lock: threading.Lock = threading.Lock()
+
+    def get_page(
+            self,
+            session: Session,
+            until_timestamp: datetime,
+            offset: int,
+            limit: int
+    ) -> tuple[list[Message], bool]:
+        """Get a page of the chat history of a session.
+
+        Args:
+            session (Session): the session
+            until_timestamp (datetime): the instant the client connected (the history is read until then)
+            offset (int): the number of messages more recent than the page
+            limit (int): the maximum number of messages of the page
+
+        Returns:
+            tuple[list[Message], bool]: the messages of the page, in chronological order, and whether there are older
+            messages
+        """
+        key = (session.id, until_timestamp)
+        with self._lock:
+            history = self._histories.get(key)
+            if history is not None:
+                self._histories.move_to_end(key)
+        if history is None:
+            if offset == 0:
+                # Clients often read the first page only, so the whole history is not read yet
+                history = session.get_chat_history(n=limit + 1, until_timestamp=until_timestamp)
+                return history[-limit:], len(history) > limit
+            history = session.get_chat_history(until_timestamp=until_timestamp)
+            self._put(key, history)
+        end = max(len(history) - offset, 0)
+        start = max(end - limit, 0)
+        return history[start:end], start > 0
+
+    def _put(self, key: tuple[str, datetime], history: list[Message]) -> None:
+        """Cache a history, discarding the least recently used ones if the cache is full."""
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._histories[key] = history
+            while len(self._histories) > self.max_size:
+                self._histories.popitem(last=False)
+
+    def discard(self, session_id: str) -> None:
+        """Discard the cached histories of a session (e.g. when it is reset or deleted).
+
+        Args:
+            session_id (str): the session id
+        """
+        with self._lock:
+            for key in [key for key in self._histories if key[0] == session_id]:
+                del self._histories[key]
@@ -1,22 +1,22 @@
 import base64
-import json
 import time
 from datetime import datetime
 
 import streamlit as st
 from websocket import WebSocketConnectionClosedException
 
-from baf.core.file import File
 from baf.core.message import Message, MessageType
-from baf.platforms.payload import Payload, PayloadAction, PayloadEncoder
+from baf.platforms.payload import Payload, PayloadAction
 from baf.platforms.websocket.streamlit_ui.audio_queue import enqueue_audio_playback
 from baf.platforms.websocket.streamlit_ui.initialization import (
     ensure_websocket_connection,
     reconnect_websocket,
+    send_payload,
 )
 from baf.platforms.websocket.streamlit_ui.vars import (
     TYPING_TIME,
     HISTORY,
+    HISTORY_CURSOR,
     QUEUE,
     ASSISTANT,
     USER,
@@ -63,10 +63,12 @@ def write_message(message: Message, key_count: int, stream: bool = False):
                 st.audio(message.content, format="audio/wav")
 
         elif message.type == MessageType.FILE:
-            file: File = File.from_dict(message.content)
-            file_name = file.name
-            file_type = file.type
-            file_data = base64.b64decode(file.base64.encode('utf-8'))
+            file_name = message.content['name']
+            file_type = message.content['type']
+            # Raw bytes with the binary payload codec, a base64 string with the JSON one
+            file_data = message.content['base64']
+            if isinstance(file_data, str):
+                file_data = base64.b64decode(file_data.encode('utf-8'))
             st.download_button(label='Download ' + file_name, file_name=file_name, data=file_data, mime=file_type, key=key)
 
         elif message.type == MessageType.IMAGE:
@@ -86,7 +88,7 @@ def write_message(message: Message, key_count: int, stream: bool = False):
                     st.warning("WebSocket connection unavailable. Please retry.")
                     return
                 try:
-                    ws.send(json.dumps(payload, cls=PayloadEncoder))
+                    send_payload(ws, payload)
                 except WebSocketConnectionClosedException:
                     reconnect_websocket()
                     st.warning("Connection dropped. Your option was not sent; please try again.")
@@ -141,10 +143,31 @@ def _send_user_profile_if_needed(ws) -> None:
         message={"user_profile": profile_name},
     )
 
-    ws.send(json.dumps(payload, cls=PayloadEncoder))
+    send_payload(ws, payload)
     st.session_state["sent_user_profile"] = True
 
 
+def _load_older_messages() -> None:
+    """Fetch the page of the chat history preceding the messages already displayed."""
+    ws = ensure_websocket_connection()
+    if not ws:
+        st.warning("WebSocket connection unavailable. Retrying…")
+        return
+    payload = Payload(
+        action=PayloadAction.FETCH_HISTORY_PAGE,
+        message={'cursor': st.session_state[HISTORY_CURSOR]},
+    )
+    try:
+        send_payload(ws, payload)
+        # The page is added to the history when it is received
+        st.session_state[HISTORY_CURSOR] = None
+    except WebSocketConnectionClosedException:
+        reconnect_websocket()
+        st.warning("Connection dropped while loading history. Reconnecting…")
+    except Exception as exc:
+        st.warning(f"Unable to fetch previous messages: {exc}")
+
+
 def load_chat():
     username = st.session_state.get("username")
     fetched_history = st.session_state.get("fetched_user_messages", False)
@@ -162,12 +185,13 @@ def load_chat():
             if not ws:
                 st.warning("WebSocket connection unavailable. Retrying…")
             else:
+                # The most recent messages. The older ones are fetched on demand (see _load_older_messages)
                 payload = Payload(
-                    action=PayloadAction.FETCH_USER_MESSAGES,
-                    message=None,
+                    action=PayloadAction.FETCH_HISTORY_PAGE,
+                    message={'cursor': None},
                 )
                 try:
-                    ws.send(json.dumps(payload, cls=PayloadEncoder))
+                    send_payload(ws, payload)
                     st.session_state["fetched_user_messages"] = True
                 except WebSocketConnectionClosedException:
                     reconnect_websocket()
@@ -177,6 +201,9 @@ def load_chat():
                     st.warning(f"Unable to fetch previous messages: {exc}")
                     st.session_state["fetched_user_messages"] = False
 
+    if st.session_state.get(HISTORY_CURSOR) and websocket_ready:
+        st.button('Load older messages', on_click=_load_older_messages)
+
     key_count = 0
     for message in st.session_state[HISTORY]:
         write_message(message, key_count, stream=False)
@@ -1,3 +1,4 @@
+import os
 import queue
 import sys
 import threading
@@ -6,12 +7,15 @@ import streamlit as st
 import websocket
 from streamlit.runtime.scriptrunner_utils.script_run_context import add_script_run_ctx
 
+from baf.platforms.payload import JSON_CODEC, PAYLOAD_CODECS, Payload, get_codec
+
 from baf.platforms.websocket.streamlit_ui.session_management import session_monitoring
 from baf.platforms.websocket.streamlit_ui.chat_interface_style import load_interface_styles
 from baf.platforms.websocket.streamlit_ui.vars import (
     SESSION_MONITORING_INTERVAL,
     SUBMIT_TEXT,
     HISTORY,
+    HISTORY_CURSOR,
     QUEUE,
     WEBSOCKET,
     SESSION_MONITORING,
@@ -43,12 +47,27 @@ def _resolve_host_port():
     return host, port
 
 
+def _subprotocols() -> list[str]:
+    """The subprotocols offered to the WebSocket server: the payload codec set for the UI, and JSON as a fallback."""
+    codec = PAYLOAD_CODECS.get(os.environ.get("STREAMLIT_PAYLOAD_CODEC", "binary"), JSON_CODEC)
+    return list(dict.fromkeys([codec.subprotocol, JSON_CODEC.subprotocol]))
+
+
+def send_payload(ws: websocket.WebSocketApp, payload: Payload) -> None:
+    """Send a payload to the agent, encoded with the payload codec negotiated for the connection."""
+    handshake_response = getattr(ws.sock, 'handshake_response', None)
+    codec = get_codec(handshake_response.subprotocol if handshake_response else None)
+    data = codec.encode(payload)
+    ws.send(data, opcode=websocket.ABNF.OPCODE_BINARY if isinstance(data, bytes) else websocket.ABNF.OPCODE_TEXT)
+
+
 def _start_websocket(host: str, port: str):
     try:
         if st.session_state.get("username"):
             ws = websocket.WebSocketApp(
                 f"ws://{host}:{port}/",
                 header={"X-User-ID": st.session_state["username"]},
+                subprotocols=_subprotocols(),
                 on_open=on_open,
                 on_message=on_message,
                 on_error=on_error,
@@ -59,6 +78,7 @@ def _start_websocket(host: str, port: str):
         else:
             ws = websocket.WebSocketApp(
                 f"ws://{host}:{port}/",
+                subprotocols=_subprotocols(),
                 on_open=on_open,
                 on_message=on_message,
                 on_error=on_error,
@@ -126,6 +146,9 @@ def initialize():
     if HISTORY not in st.session_state:
         st.session_state[HISTORY] = []
 
+    if HISTORY_CURSOR not in st.session_state:
+        st.session_state[HISTORY_CURSOR] = None
+
     if QUEUE not in st.session_state:
         st.session_state[QUEUE] = queue.Queue()
 
@@ -1,10 +1,10 @@
-import json
 from datetime import datetime
 
 import streamlit as st
 
 from baf.core.message import Message, MessageType
-from baf.platforms.payload import Payload, PayloadAction, PayloadEncoder
+from baf.platforms.payload import Payload, PayloadAction
+from baf.platforms.websocket.streamlit_ui.initialization import send_payload
 from baf.platforms.websocket.streamlit_ui.vars import BUTTONS, SUBMIT_TEXT, WEBSOCKET, USER
 
 
@@ -26,6 +26,6 @@ def message_input():
         payload = Payload(action=PayloadAction.USER_MESSAGE, message=user_input)
         try:
             ws = st.session_state[WEBSOCKET]
-            ws.send(json.dumps(payload, cls=PayloadEncoder))
+            send_payload(ws, payload)
         except Exception as e:
             st.error('Your message could not be sent. The connection is already closed')
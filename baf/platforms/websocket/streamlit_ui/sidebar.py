@@ -1,15 +1,14 @@
-import base64
-import json
 import queue
 from datetime import datetime
 
 import streamlit as st
 
-from baf.core.file import File
 from baf.core.message import MessageType, Message
-from baf.platforms.payload import PayloadEncoder, PayloadAction, Payload
+from baf.platforms.payload import PayloadAction, Payload
 from baf.platforms.websocket.streamlit_ui.audio_queue import stop_audio_playback
-from baf.platforms.websocket.streamlit_ui.vars import WEBSOCKET, HISTORY, QUEUE, SUBMIT_AUDIO, SUBMIT_FILE
+from baf.platforms.websocket.streamlit_ui.initialization import send_payload
+from baf.platforms.websocket.streamlit_ui.vars import WEBSOCKET, HISTORY, HISTORY_CURSOR, QUEUE, SUBMIT_AUDIO, \
+    SUBMIT_FILE
 
 
 def sidebar():
@@ -18,9 +17,10 @@ def sidebar():
     with st.sidebar:
         if reset_button := st.button(label="Reset agent"):
             st.session_state[HISTORY] = []
+            st.session_state[HISTORY_CURSOR] = None
             st.session_state[QUEUE] = queue.Queue()
             payload = Payload(action=PayloadAction.RESET)
-            ws.send(json.dumps(payload, cls=PayloadEncoder))
+            send_payload(ws, payload)
 
         def submit_audio():
             # Necessary callback due to buf after 1.27.0 (https://github.com/streamlit/streamlit/issues/7629)
@@ -31,13 +31,12 @@ def sidebar():
         if st.session_state[SUBMIT_AUDIO]:
             st.session_state[SUBMIT_AUDIO] = False
             voice_bytes = voice_bytes_io.read()
-            # Encode the audio bytes to a base64 string
             voice_message = Message(t=MessageType.AUDIO, content=voice_bytes, is_user=True, timestamp=datetime.now())
             st.session_state.history.append(voice_message)
-            voice_base64 = base64.b64encode(voice_bytes).decode('utf-8')
-            payload = Payload(action=PayloadAction.USER_VOICE, message=voice_base64)
+            # The bytes are sent raw, or as a base64 string with the JSON payload codec
+            payload = Payload(action=PayloadAction.USER_VOICE, message=voice_bytes)
             try:
-                ws.send(json.dumps(payload, cls=PayloadEncoder))
+                send_payload(ws, payload)
             except Exception as e:
                 st.error('Your message could not be sent. The connection is already closed')
 
@@ -50,14 +49,12 @@ def sidebar():
         if st.session_state[SUBMIT_FILE]:
             st.session_state[SUBMIT_FILE] = False
             bytes_data = uploaded_file.read()
-            file_object = File(file_base64=base64.b64encode(bytes_data).decode('utf-8'), file_name=uploaded_file.name,
-                               file_type=uploaded_file.type)
-            payload = Payload(action=PayloadAction.USER_FILE, message=file_object.get_json_string())
-            file_message = Message(t=MessageType.FILE, content=file_object.to_dict(), is_user=True,
-                                   timestamp=datetime.now())
+            file_dict = {'name': uploaded_file.name, 'type': uploaded_file.type, 'base64': bytes_data}
+            payload = Payload(action=PayloadAction.USER_FILE, message=file_dict)
+            file_message = Message(t=MessageType.FILE, content=file_dict, is_user=True, timestamp=datetime.now())
             st.session_state.history.append(file_message)
             try:
-                ws.send(json.dumps(payload, cls=PayloadEncoder))
+                send_payload(ws, payload)
             except Exception as e:
                 st.error('Your message could not be sent. The connection is already closed')
 
@@ -2,6 +2,7 @@
 ASSISTANT = 'assistant'
 BUTTONS = 'buttons'
 HISTORY = 'history'
+HISTORY_CURSOR = 'history_cursor'
 QUEUE = 'queue'
 SESSION_MONITORING = 'session_monitoring'
 SUBMIT_FILE = 'submit_file'
@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import base64
 import json
 from datetime import datetime
 from io import StringIO
@@ -12,7 +11,7 @@ from baf.core.message import MessageType, Message
 from baf.exceptions.logger import logger
 from baf.platforms.payload import PayloadAction, Payload
 from baf.platforms.websocket.streamlit_ui.session_management import get_streamlit_session
-from baf.platforms.websocket.streamlit_ui.vars import QUEUE, HISTORY, WEBSOCKET_READY
+from baf.platforms.websocket.streamlit_ui.vars import QUEUE, HISTORY, HISTORY_CURSOR, WEBSOCKET_READY
 
 try:
     import cv2
@@ -29,7 +28,46 @@ except ImportError:
 def on_message(ws, payload_str):
     # https://github.com/streamlit/streamlit/issues/2838
     streamlit_session = get_streamlit_session()
+    # Text frames are JSON payloads, and binary frames binary payloads (see platforms.websocket.codecs)
     payload: Payload = Payload.decode(payload_str)
+    if payload is None:
+        logger.error("Received a payload with an unknown action")
+    elif payload.action == PayloadAction.AGENT_REPLY_HISTORY.value:
+        # A page of old messages, which are older than the ones already in the history
+        messages = []
+        for payload_dict in payload.message['messages']:
+            history_payload = Payload.from_dict(payload_dict)
+            message = _payload_to_message(history_payload) if history_payload else None
+            if message is not None:
+                messages.append(message)
+        try:
+            streamlit_session._session_state[HISTORY][:0] = messages
+            streamlit_session._session_state[HISTORY_CURSOR] = payload.message['cursor']
+        except Exception as e:
+            logger.error(f"Error adding messages to the history: {e}")
+    else:
+        message = _payload_to_message(payload)
+        if message is not None:
+            try:
+                if payload.history:
+                    streamlit_session._session_state[HISTORY].append(message)
+                else:
+                    streamlit_session._session_state[QUEUE].put(message)
+            except Exception as e:
+                logger.error(f"Error putting message in queue: {e}")
+
+    streamlit_session._handle_rerun_script_request()
+
+
+def _payload_to_message(payload: Payload) -> Message | None:
+    """Get the message to display from a received payload.
+
+    Args:
+        payload (Payload): the payload
+
+    Returns:
+        Message or None: the message, or None if the payload has no message to display
+    """
     content = None
     is_user = False
     if payload.action == PayloadAction.AGENT_REPLY_STR.value:
@@ -49,10 +87,8 @@ def on_message(ws, payload_str):
         content = payload.message
         t = MessageType.FILE
     elif payload.action == PayloadAction.AGENT_REPLY_AUDIO.value:
-        # Encode the string back to bytes (using utf-8 or ascii)
-        base64_bytes = payload.message['audio_data_base64'].encode('utf-8')
-        # Decode the Base64 bytes to get the original raw audio bytes
-        audio_bytes = base64.b64decode(base64_bytes)
+        # The raw audio bytes (sent as a base64 string in JSON payloads)
+        audio_bytes = payload.get_bytes()
         # Convert the raw bytes back to a NumPy array using np.frombuffer
         reconstructed_array_flat = np.frombuffer(audio_bytes, dtype=np.dtype(payload.message['metadata']['dtype']))
         # Verify size consistency
@@ -67,7 +103,7 @@ def on_message(ws, payload_str):
             )
             logger.error("Error during decoding")
             logger.error("Ensure the provided dtype and shape match the original array used for encoding.")
-            return
+            return None
         # Reshape the flat array back to its original shape
         reconstructed_array = reconstructed_array_flat.reshape(shape)
         # recreate original dictionary
@@ -78,7 +114,7 @@ def on_message(ws, payload_str):
         content = tts_dict
         t = MessageType.AUDIO
     elif payload.action == PayloadAction.AGENT_REPLY_IMAGE.value:
-        decoded_data = base64.b64decode(payload.message)  # Decode base64 back to bytes
+        decoded_data = payload.get_bytes()  # The image bytes (sent as a base64 string in JSON payloads)
         np_data = np.frombuffer(decoded_data, np.uint8)  # Convert bytes to numpy array
         img = cv2.imdecode(np_data, cv2.IMREAD_COLOR)  # Decode numpy array back to image
         content = img
@@ -104,17 +140,9 @@ def on_message(ws, payload_str):
     elif payload.action == PayloadAction.AGENT_REPLY_RAG.value:
         t = MessageType.RAG_ANSWER
         content = payload.message
-    if content is not None:
-        message = Message(t=t, content=content, is_user=is_user, timestamp=datetime.now())
-        try:
-            if payload.history:
-                streamlit_session._session_state[HISTORY].append(message)
-            else:
-                streamlit_session._session_state[QUEUE].put(message)
-        except Exception as e:
-            logger.error(f"Error putting message in queue: {e}")
-
-    streamlit_session._handle_rerun_script_request()
+    if content is None:
+        return None
+    return Message(t=t, content=content, is_user=is_user, timestamp=datetime.now())
 
 
 def _set_ready_state(value: bool):
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import base64
 import inspect
 import json
@@ -12,11 +13,13 @@ from urllib.parse import parse_qs, urlsplit
 import numpy as np
 import subprocess
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from typing import TYPE_CHECKING
 
 from besser.BUML.metamodel.gui import GUIModel
 from pandas import DataFrame
 from websockets.exceptions import ConnectionClosedError
+from websockets.server import WebSocketServerProtocol, serve as serve_async
 from websockets.sync.server import ServerConnection, WebSocketServer, serve
 
 from baf.core.gui import gui_to_json
@@ -27,8 +30,10 @@ from baf.exceptions.exceptions import PlatformMismatchError, StreamlitDatabaseEx
 from baf.exceptions.logger import logger
 from baf.nlp.rag.rag import RAGMessage
 from baf.platforms import websocket
-from baf.platforms.payload import Payload, PayloadAction, PayloadEncoder
+from baf.platforms.payload import PAYLOAD_CODECS, Payload, PayloadAction, get_codec
 from baf.platforms.platform import Platform
+from baf.platforms.websocket.async_connection import AsyncConnection
+from baf.platforms.websocket.chat_history_cache import ChatHistoryCache
 from baf.platforms.websocket.streamlit_ui import streamlit_ui
 from baf.core.file import File
 from baf.platforms.websocket.streamlit_ui import (
@@ -41,6 +46,15 @@ from baf.platforms.websocket.streamlit_ui import (
 )
 
 
+def _select_subprotocol(client_subprotocols: list[str], server_subprotocols: list[str]) -> str | None:
+    """Select the first subprotocol offered by a client that the server supports, or None to continue without a
+    subprotocol (i.e., with the JSON payload codec)."""
+    for subprotocol in client_subprotocols:
+        if subprotocol in server_subprotocols:
+            return subprotocol
+    return None
+
+
 def _extract_parameter_from_request(parameter, request) -> str | None:
     if not request:
         return None
@@ -92,6 +106,11 @@ class WebSocketPlatform(Platform):
     This platform implements the WebSocket server, and it can establish connection with a client, allowing the
     bidirectional communication between server and client (i.e. sending and receiving messages).
 
+    By default, the server runs on an asyncio event loop that serves all the connections (see
+    :data:`~baf.platforms.websocket.WEBSOCKET_SERVER`). The incoming messages of each connection are handled in order,
+    by a thread pool, and the agent replies are queued in the bounded outbound queue of each connection (see
+    :class:`~baf.platforms.websocket.async_connection.AsyncConnection`).
+
     Note:
         We provide different interfaces implementing a WebSocket client to communicate with the agent, though you
         can use or create your own UI as long as it has a WebSocket client that connects to the agent's WebSocket server.
@@ -107,10 +126,15 @@ class WebSocketPlatform(Platform):
         _host (str): The WebSocket host address (e.g. `localhost`)
         _port (int): The WebSocket port (e.g. `8765`)
         _use_ui (bool): Whether to use the built-in UI or not
-        _connections (dict[str, ServerConnection]): The list of active connections (i.e. users connected to the agent)
+        _server_type (str or None): The WebSocket server implementation, ``asyncio`` or ``sync``
+        _connections (dict[str, ServerConnection or AsyncConnection]): The list of active connections (i.e. users
+            connected to the agent)
         _websocket_server (WebSocketServer or None): The WebSocket server instance
         _message_handler (Callable[[ServerConnection], None]): The function that handles the user connections
-            (sessions) and incoming messages
+            (sessions) and incoming messages in the ``sync`` server
+        _loop (asyncio.AbstractEventLoop or None): The event loop of the ``asyncio`` server
+        _executor (ThreadPoolExecutor or None): The threads that handle the incoming messages in the ``asyncio`` server
+        _history_cache (ChatHistoryCache): The chat histories the clients are paging through
     """
 
     def __init__(
@@ -125,8 +149,12 @@ class WebSocketPlatform(Platform):
         self._port: int = None
         self._use_ui: bool = use_ui
         self._authenticate_users = authenticate_users
-        self._connections: dict[str, ServerConnection] = {}
+        self._server_type: str = None
+        self._connections: dict[str, ServerConnection | AsyncConnection] = {}
         self._websocket_server: WebSocketServer = None
+        self._loop: asyncio.AbstractEventLoop = None
+        self._executor: ThreadPoolExecutor = None
+        self._history_cache: ChatHistoryCache = ChatHistoryCache(websocket.WEBSOCKET_HISTORY_CACHE_SIZE.default_value)
 
         def message_handler(conn: ServerConnection) -> None:
             """This method is run on each user connection to handle incoming messages and the agent sessions.
@@ -138,14 +166,7 @@ class WebSocketPlatform(Platform):
             current_time = datetime.now()
             request = getattr(conn, "request", None)
             headers = getattr(request, "headers", {}) if request else {}
-            header_user = headers.get("X-User-ID") if hasattr(headers, "get") else None
-            header_session = headers.get("X-Session-ID") if hasattr(headers, "get") else None
-            query_user = _extract_parameter_from_request('user_id', request)
-            query_session = _extract_parameter_from_request('session_id', request)
-            query_session_name = _extract_parameter_from_request('session_name', request)
-            username = header_user or query_user
-            session_key = header_session or query_session or str(conn.id)
-            session_name = query_session_name
+            session_key, username, session_name = self._connection_parameters(request, headers, conn.id)
             self._connections[str(session_key)] = conn
             session = self._agent.get_or_create_session(session_key, self, username, session_name)
             try:
@@ -153,63 +174,7 @@ class WebSocketPlatform(Platform):
                 for payload_str in conn:
                     if not self.running:
                         raise ConnectionClosedError(None, None)
-                    payload: Payload = Payload.decode(payload_str)
-                    if payload.action == PayloadAction.USER_UPDATE_UI.value:
-                        logger.info(f'Received event: {payload_str}')  # TODO: Not implemented
-                    elif payload.action == PayloadAction.FETCH_USER_MESSAGES.value:
-                        try:
-                            chat_history = session.get_chat_history(until_timestamp=current_time)
-                            for message in chat_history:
-                                action = message.get_action()
-                                history_payload = Payload(action=action,
-                                                          message=message.content,
-                                                          history=True,
-                                                          timestamp=message.timestamp
-                                                          )
-                                self._send(session.id, history_payload)
-                        except Exception as e:
-                            logger.error(f"Error fetching chat history: {e}")
-                    elif payload.action == PayloadAction.USER_MESSAGE.value:
-                        event: ReceiveMessageEvent = ReceiveMessageEvent.create_event_from(
-                            message=payload.message,
-                            session=session,
-                            human=True)
-                        self._agent.receive_event(event)
-                    elif payload.action == PayloadAction.USER_VOICE.value:
-                        # Decode the base64 string to get audio bytes
-                        audio_bytes = base64.b64decode(payload.message.encode('utf-8'))
-                        message = self._agent.nlp_engine.speech2text(session, audio_bytes)
-
-                        # Send transcribed message back to the client
-                        payload = Payload(action=PayloadAction.USER_MESSAGE, message=message, history=True, timestamp=datetime.now())
-                        self._send(session.id, payload)
-
-                        event: ReceiveMessageEvent = ReceiveMessageEvent.create_event_from(
-                            message=message,
-                            session=session,
-                            human=True)
-                        self._agent.receive_event(event)
-                    elif payload.action == PayloadAction.USER_FILE.value:
-                        event: ReceiveFileEvent = ReceiveFileEvent(
-                            file=File.decode(payload.message),
-                            session_id=session.id,
-                            human=True)
-                        self._agent.receive_event(event)
-                    elif payload.action == PayloadAction.AGENT_REPLY_STR.value:
-                        event: ReceiveMessageEvent = ReceiveMessageEvent.create_event_from(
-                            message=payload.message,
-                            session=session,
-                            human=False)
-                        self._agent.receive_event(event)
-                    elif payload.action == PayloadAction.RESET.value:
-                        self._agent.reset(session.id)
-                    elif payload.action == PayloadAction.USER_SET_VARIABLE.value:
-                        if not isinstance(payload.message, dict) or not payload.message:
-                            logger.error('Invalid message format for USER_SET_VARIABLE')
-                            continue  # skip this iteration
-                        for key, value in payload.message.items():
-                            session.set(key, value)
-                            logger.info(f"Session variable {key} set to {value}.")
+                    session = self._handle_payload(session_key, username, session_name, current_time, payload_str)
             except ConnectionClosedError:
                 logger.info('Client connection closed unexpectedly')
             except Exception as e:
@@ -227,18 +192,224 @@ class WebSocketPlatform(Platform):
 
         self._message_handler = message_handler
 
-    def initialize(self) -> None:
-        self._host = self._agent.get_property(websocket.WEBSOCKET_HOST)
-        self._port = self._agent.get_property(websocket.WEBSOCKET_PORT)
-        origins = self._agent.get_property(websocket.WEBSOCKET_ORIGINS)
-        self._websocket_server = serve(
-            handler=self._message_handler,
+    @staticmethod
+    def _connection_parameters(request, headers, connection_id) -> tuple[str, str | None, str | None]:
+        """Get the session key, username and session name of a connection, from its request headers (``X-Session-ID``
+        and ``X-User-ID``) or query parameters (``session_id``, ``user_id`` and ``session_name``). The session key
+        defaults to the connection id."""
+        header_user = headers.get("X-User-ID") if hasattr(headers, "get") else None
+        header_session = headers.get("X-Session-ID") if hasattr(headers, "get") else None
+        query_user = _extract_parameter_from_request('user_id', request)
+        query_session = _extract_parameter_from_request('session_id', request)
+        query_session_name = _extract_parameter_from_request('session_name', request)
+        username = header_user or query_user
+        session_key = header_session or query_session or str(connection_id)
+        return session_key, username, query_session_name
+
+    def _handle_payload(
+            self,
+            session_key: str,
+            username: str | None,
+            session_name: str | None,
+            current_time: datetime,
+            payload_str: str
+    ) -> Session:
+        """Handle a payload received from a user connection.
+
+        Args:
+            session_key (str): the id of the session of the connection
+            username (str or None): the user of the connection
+            session_name (str or None): the name of the session
+            current_time (datetime): the instant the connection was established (the chat history is fetched until then)
+            payload_str (str): the received payload
+
+        Returns:
+            Session: the session of the connection
+        """
+        # The session may have been hibernated while the connection was idle
+        session = self._agent.get_or_create_session(session_key, self, username, session_name)
+        payload: Payload = Payload.decode(payload_str)
+        if payload is None:
+            logger.error('Received a payload with an unknown action')
+        elif payload.action == PayloadAction.USER_UPDATE_UI.value:
+            logger.info(f'Received event: {payload.message}')  # TODO: Not implemented
+        elif payload.action == PayloadAction.FETCH_USER_MESSAGES.value:
+            try:
+                chat_history = session.get_chat_history(until_timestamp=current_time)
+                for message in chat_history:
+                    action = message.get_action()
+                    history_payload = Payload(action=action,
+                                              message=message.content,
+                                              history=True,
+                                              timestamp=message.timestamp
+                                              )
+                    self._send(session.id, history_payload)
+            except Exception as e:
+                logger.error(f"Error fetching chat history: {e}")
+        elif payload.action == PayloadAction.FETCH_HISTORY_PAGE.value:
+            try:
+                self._send_history_page(session, current_time, payload.message)
+            except Exception as e:
+                logger.error(f"Error fetching chat history: {e}")
+        elif payload.action == PayloadAction.USER_MESSAGE.value:
+            event: ReceiveMessageEvent = ReceiveMessageEvent.create_event_from(
+                message=payload.message,
+                session=session,
+                human=True)
+            self._agent.receive_event(event)
+        elif payload.action == PayloadAction.USER_VOICE.value:
+            # The audio is a base64 string (JSON payloads) or raw bytes (binary payloads)
+            audio_bytes = payload.get_bytes()
+            message = self._agent.nlp_engine.speech2text(session, audio_bytes)
+
+            # Send transcribed message back to the client
+            payload = Payload(action=PayloadAction.USER_MESSAGE, message=message, history=True, timestamp=datetime.now())
+            self._send(session.id, payload)
+
+            event: ReceiveMessageEvent = ReceiveMessageEvent.create_event_from(
+                message=message,
+                session=session,
+                human=True)
+            self._agent.receive_event(event)
+        elif payload.action == PayloadAction.USER_FILE.value:
+            if isinstance(payload.message, str):
+                file = File.decode(payload.message)
+            else:
+                # The content is raw bytes (binary payloads) or a base64 string (JSON payloads), and it is kept as is
+                file = File.from_dict(payload.message)
+            event: ReceiveFileEvent = ReceiveFileEvent(
+                file=file,
+                session_id=session.id,
+                human=True)
+            self._agent.receive_event(event)
+        elif payload.action == PayloadAction.AGENT_REPLY_STR.value:
+            event: ReceiveMessageEvent = ReceiveMessageEvent.create_event_from(
+                message=payload.message,
+                session=session,
+                human=False)
+            self._agent.receive_event(event)
+        elif payload.action == PayloadAction.RESET.value:
+            self._history_cache.discard(session.id)
+            self._agent.reset(session.id)
+        elif payload.action == PayloadAction.USER_SET_VARIABLE.value:
+            if not isinstance(payload.message, dict) or not payload.message:
+                logger.error('Invalid message format for USER_SET_VARIABLE')
+                return session
+            for key, value in payload.message.items():
+                session.set(key, value)
+                logger.info(f"Session variable {key} set to {value}.")
+        return session
+
+    def _send_history_page(self, session: Session, current_time: datetime, request: dict | None) -> None:
+        """Send a page of the chat history of a session, in a single payload (see
+        :attr:`~baf.platforms.payload.PayloadAction.FETCH_HISTORY_PAGE`).
+
+        Args:
+            session (Session): the session
+            current_time (datetime): the instant the connection was established (the chat history is fetched until then)
+            request (dict or None): the ``cursor`` and ``limit`` of the requested page
+        """
+        request = request or {}
+        page_size = self._agent.get_property(websocket.WEBSOCKET_HISTORY_PAGE_SIZE)
+        limit = max(1, min(int(request.get('limit') or page_size), page_size))
+        cursor = request.get('cursor')
+        # The cursor is the number of messages more recent than the page
+        offset = int(cursor) if cursor else 0
+        if offset < 0:
+            raise ValueError(f'Invalid chat history cursor: {cursor}')
+        messages, more = self._history_cache.get_page(session, current_time, offset, limit)
+        page = {
+            'messages': [Payload(action=message.get_action(),
+                                 message=message.content,
+                                 history=True,
+                                 timestamp=message.timestamp).to_dict() for message in messages],
+            'cursor': str(offset + len(messages)) if more else None,
+        }
+        self._send(session.id, Payload(action=PayloadAction.AGENT_REPLY_HISTORY, message=page, history=True))
+
+    async def _async_message_handler(self, conn: WebSocketServerProtocol) -> None:
+        """Handle a user connection of the asyncio server: its incoming messages are handled in order by the thread
+        pool of the platform, and the agent replies are sent through its outbound queue.
+
+        Args:
+            conn (WebSocketServerProtocol): the user connection
+        """
+        loop = asyncio.get_running_loop()
+        current_time = datetime.now()
+        connection = AsyncConnection(
+            conn,
+            max_queue_size=self._agent.get_property(websocket.WEBSOCKET_SEND_QUEUE_SIZE),
+            policy=self._agent.get_property(websocket.WEBSOCKET_SLOW_CONSUMER_POLICY),
+            block_timeout=self._agent.get_property(websocket.WEBSOCKET_SEND_BLOCK_TIMEOUT),
+        )
+        session_key, username, session_name = self._connection_parameters(conn, conn.request_headers, conn.id)
+        session_key = str(session_key)
+        self._connections[session_key] = connection
+        connection.start()
+        try:
+            await loop.run_in_executor(self._executor, self._agent.get_or_create_session, session_key, self, username,
+                                       session_name)
+            async for payload_str in conn:
+                if not self.running:
+                    break
+                await loop.run_in_executor(self._executor, self._handle_payload, session_key, username, session_name,
+                                           current_time, payload_str)
+        except ConnectionClosedError:
+            logger.info('Client connection closed unexpectedly')
+        except Exception as e:
+            logger.error(f"Server Error: {e}")
+            traceback.print_exc()
+        finally:
+            connection.close()
+            if self._connections.get(session_key) is connection:
+                del self._connections[session_key]
+            logger.info('Session finished')
+
+    async def _serve_async(self, origins: list[str] | None, subprotocols: list[str]) -> WebSocketServer:
+        """Create the asyncio server, in its event loop."""
+        return await serve_async(
+            self._async_message_handler,
             host=self._host,
             port=self._port,
             max_size=self._agent.get_property(websocket.WEBSOCKET_MAX_SIZE),
             origins=origins,
+            subprotocols=subprotocols,
+            select_subprotocol=_select_subprotocol,
         )
 
+    def _subprotocols(self) -> list[str]:
+        """Get the WebSocket subprotocols of the payload codecs the clients can select."""
+        codecs = self._agent.get_property(websocket.WEBSOCKET_CODECS) or []
+        for codec in codecs:
+            if codec not in PAYLOAD_CODECS:
+                raise ValueError(f"Invalid payload codec '{codec}'. Valid codecs: {list(PAYLOAD_CODECS)}")
+        return [PAYLOAD_CODECS[codec].subprotocol for codec in codecs]
+
+    def initialize(self) -> None:
+        self._host = self._agent.get_property(websocket.WEBSOCKET_HOST)
+        self._port = self._agent.get_property(websocket.WEBSOCKET_PORT)
+        self._server_type = self._agent.get_property(websocket.WEBSOCKET_SERVER)
+        self._history_cache.max_size = self._agent.get_property(websocket.WEBSOCKET_HISTORY_CACHE_SIZE)
+        origins = self._agent.get_property(websocket.WEBSOCKET_ORIGINS)
+        subprotocols = self._subprotocols()
+        if self._server_type == 'sync':
+            self._websocket_server = serve(
+                handler=self._message_handler,
+                host=self._host,
+                port=self._port,
+                max_size=self._agent.get_property(websocket.WEBSOCKET_MAX_SIZE),
+                origins=origins,
+                subprotocols=subprotocols,
+                select_subprotocol=lambda conn, offered: _select_subprotocol(offered, subprotocols),
+            )
+        elif self._server_type == 'asyncio':
+            self._loop = asyncio.new_event_loop()
+            self._executor = ThreadPoolExecutor(thread_name_prefix=f'{self._agent.name}-websocket')
+            # The server is bound to the port now, and its event loop runs in start()
+            self._websocket_server = self._loop.run_until_complete(self._serve_async(origins, subprotocols))
+        else:
+            raise ValueError(f"Invalid WebSocket server '{self._server_type}'. Valid servers: asyncio, sync")
+
     def start(self) -> None:
         if self._use_ui:
             def run_streamlit() -> None:
@@ -288,6 +459,7 @@ class WebSocketPlatform(Platform):
                     "contrast": self._agent.get_property(websocket.STREAMLIT_CHAT_DEFAULT_CONTRAST),
                 }
                 os.environ["STREAMLIT_CHAT_INTERFACE_DEFAULT_STYLE_JSON"] = json.dumps(default_chat_style)
+                os.environ["STREAMLIT_PAYLOAD_CODEC"] = self._agent.get_property(websocket.STREAMLIT_CODEC)
 
                 try:
                     raw_configurations = self._agent.agent_configurations
@@ -323,10 +495,36 @@ class WebSocketPlatform(Platform):
             self._use_ui = False
         logger.info(f'{self._agent.name}\'s WebSocketPlatform starting at ws://{self._host}:{self._port}')
         self.running = True
-        self._websocket_server.serve_forever()
+        if self._server_type == 'asyncio':
+            asyncio.set_event_loop(self._loop)
+            try:
+                self._loop.run_forever()
+            finally:
+                self._loop.close()
+                self._executor.shutdown(wait=False)
+        else:
+            self._websocket_server.serve_forever()
+
+    async def _close_async_server(self) -> None:
+        """Close the asyncio server and all its connections."""
+        self._websocket_server.close()
+        await self._websocket_server.wait_closed()
 
     def stop(self):
         self.running = False
+        if self._server_type == 'asyncio':
+            if self._loop.is_running():
+                try:
+                    asyncio.run_coroutine_threadsafe(self._close_async_server(), self._loop).result(timeout=10)
+                except Exception as e:
+                    logger.error(f'Error while stopping the WebSocket server: {e!r}')
+                self._loop.call_soon_threadsafe(self._loop.stop)
+            elif not self._loop.is_closed():
+                self._loop.run_until_complete(self._close_async_server())
+                self._loop.close()
+                self._executor.shutdown(wait=False)
+            logger.info(f'{self._agent.name}\'s WebSocketPlatform stopped')
+            return
         for conn_id in list(self._connections.keys()):
             conn = self._connections[conn_id]
             conn.close_socket()
@@ -341,7 +539,8 @@ class WebSocketPlatform(Platform):
     def _send(self, session_id, payload: Payload) -> None:
         if session_id in self._connections:
             conn = self._connections[session_id]
-            conn.send(json.dumps(payload, cls=PayloadEncoder))
+            # The payload codec negotiated in the opening handshake of the connection
+            conn.send(get_codec(conn.subprotocol).encode(payload))
 
     def reply(self, session: Session, message: str) -> None:
         if session.platform is not self:
@@ -397,10 +596,11 @@ class WebSocketPlatform(Platform):
         """
         if session.platform is not self:
             raise PlatformMismatchError(self, session)
-        message_obj: Message = Message(t=MessageType.FILE, content=file.get_json_string(), is_user=False, timestamp=datetime.now())
+        message_obj: Message = Message(t=MessageType.FILE, content=file, is_user=False, timestamp=datetime.now())
         session.save_message(message_obj)
+        # The file content is not converted: the payload codec of the connection encodes it if necessary
         payload = Payload(action=PayloadAction.AGENT_REPLY_FILE,
-                          message=file.to_dict(),
+                          message=file.to_dict(encoded=False),
                           timestamp=message_obj.timestamp)
         payload.message = self._agent.process(session=session, message=payload.message, is_user_message=False)
         self._send(session.id, payload)
@@ -0,0 +1,96 @@
+"""Measure the latency of Session.get_chat_history with and without the monitoring database indexes.
+
+The benchmark fills a SQLite monitoring database with a large chat table (1M messages by default, spread across many
+sessions) and gets the chat history of random sessions: the last ``n`` messages and the whole history. Then, it drops
+the ``(session_id, timestamp)`` index of the chat table (i.e., the schema of previous versions) and repeats the
+measurements.
+
+Usage::
+
+    python -m baf.test.benchmarks.chat_history_benchmark --messages 1000000 --sessions 10000 --queries 200
+"""
+
+import argparse
+import logging
+import random
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+
+from baf.core.agent import Agent
+from baf.core.session import Session
+from baf.db import DB_MONITORING
+from baf.db.monitoring_db import MonitoringDB, TABLE_CHAT, TABLE_SESSION
+from baf.exceptions.logger import logger
+from baf.test.benchmarks.utils import BenchmarkPlatform, percentile, print_table, timer
+
+
+def fill_db(monitoring_db: MonitoringDB, agent: Agent, platform: BenchmarkPlatform, num_messages: int,
+            num_sessions: int) -> None:
+    start = datetime(2024, 1, 1)
+    with monitoring_db.engine.begin() as conn:
+        conn.exec_driver_sql(
+            f'INSERT INTO {TABLE_SESSION} (id, agent_name, session_id, platform_name, timestamp, variables) '
+            f'VALUES (?, ?, ?, ?, ?, ?)',
+            [(i + 1, agent.name, f'session_{i}', platform.__class__.__name__, start, '{}') for i in range(num_sessions)]
+        )
+        chunk = []
+        for i in range(num_messages):
+            # Messages of different sessions are interleaved, as in a real deployment
+            chunk.append((i % num_sessions + 1, 'str', f'"message {i}"', i % 2 == 0, start + timedelta(seconds=i)))
+            if len(chunk) == 100000 or i == num_messages - 1:
+                conn.exec_driver_sql(
+                    f'INSERT INTO {TABLE_CHAT} (session_id, type, content, is_user, timestamp) VALUES (?, ?, ?, ?, ?)',
+                    chunk
+                )
+                chunk = []
+
+
+def measure(sessions: list[Session], queries: int, n: int or None, rng: random.Random) -> tuple[float, float]:
+    latencies = []
+    for _ in range(queries):
+        session = rng.choice(sessions)
+        with timer() as elapsed:
+            session.get_chat_history(n=n)
+        latencies.append(elapsed['seconds'] * 1000)
+    return percentile(latencies, 50), percentile(latencies, 99)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=1000000)
+    parser.add_argument('--sessions', type=int, default=10000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--n', type=int, default=20, help='number of messages of the "last n" queries')
+    args = parser.parse_args()
+    logger.setLevel(logging.WARNING)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        agent = Agent('history_agent')
+        agent.set_property(DB_MONITORING, True)
+        platform = BenchmarkPlatform()
+        monitoring_db = MonitoringDB()
+        monitoring_db.set_engine(create_engine(f'sqlite:///{tmp}/monitoring.db'))
+        monitoring_db.initialize_db()
+        agent._monitoring_db = monitoring_db
+        with timer() as fill_time:
+            fill_db(monitoring_db, agent, platform, args.messages, args.sessions)
+        print(f'Inserted {args.messages} messages in {fill_time["seconds"]:.1f} s')
+        sessions = [Session(f'session_{i}', agent, platform) for i in range(args.sessions)]
+        for indexed in (True, False):
+            if not indexed:
+                with monitoring_db.engine.begin() as conn:
+                    conn.exec_driver_sql(f'DROP INDEX ix_{TABLE_CHAT}_session_id_timestamp')
+            # Without the index every query is a full scan, so fewer queries are enough
+            queries = args.queries if indexed else max(1, args.queries // 20)
+            for n in (args.n, None):
+                p50, p99 = measure(sessions, queries, n, random.Random(0))
+                rows.append(['yes' if indexed else 'no', f'last {n}' if n else 'all', queries, p50, p99])
+        monitoring_db.close_connection()
+    print_table(['index', 'messages', 'queries', 'p50 (ms)', 'p99 (ms)'], rows)
+
+
+if __name__ == '__main__':
+    main()
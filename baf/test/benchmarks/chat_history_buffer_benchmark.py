@@ -0,0 +1,73 @@
+"""Measure the latency of Session.get_chat_history with and without the in-memory chat history.
+
+A session of an agent connected to a SQLite monitoring database exchanges some messages. Then, the last ``n`` messages
+are requested many times (as the LLMs do to build the context of each message):
+
+- ``database``: the in-memory chat history is disabled (``agent.chat_history.buffer_size`` = 0), so the messages are
+  read from the monitoring database and converted from a DataFrame (as in previous versions).
+- ``memory``: the messages are served from the in-memory chat history of the session.
+
+Usage::
+
+    python -m baf.test.benchmarks.chat_history_buffer_benchmark --messages 1000 --queries 1000 --n 10
+"""
+
+import argparse
+import logging
+import tempfile
+from datetime import datetime
+
+from sqlalchemy import create_engine
+
+from baf import AGENT_CHAT_HISTORY_BUFFER_SIZE
+from baf.core.agent import Agent
+from baf.core.message import Message, MessageType
+from baf.db import DB_MONITORING
+from baf.db.monitoring_db import MonitoringDB
+from baf.exceptions.logger import logger
+from baf.test.benchmarks.utils import BenchmarkPlatform, percentile, print_table, timer
+
+
+def run(db_path: str, buffer_size: int, messages: int, queries: int, n: int) -> list:
+    monitoring_db = MonitoringDB()
+    monitoring_db.set_engine(create_engine(f'sqlite:///{db_path}'))
+    monitoring_db.initialize_db()
+    agent = Agent('history_agent')
+    agent.set_property(DB_MONITORING, True)
+    agent.set_property(AGENT_CHAT_HISTORY_BUFFER_SIZE, buffer_size)
+    agent._monitoring_db = monitoring_db
+    agent.new_state('initial', initial=True)
+    platform = BenchmarkPlatform()
+    agent._platforms.append(platform)
+    session = agent.get_or_create_session('session', platform)
+    for i in range(messages):
+        session.save_message(Message(t=MessageType.STR, content=f'message {i}', is_user=i % 2 == 0,
+                                     timestamp=datetime.now()))
+    latencies = []
+    for _ in range(queries):
+        with timer() as elapsed:
+            history = session.get_chat_history(n=n)
+        latencies.append(elapsed['seconds'] * 1000)
+    assert [message.content for message in history] == [f'message {i}' for i in range(messages - n, messages)]
+    agent.stop()
+    monitoring_db.close_connection()
+    return ['memory' if buffer_size else 'database', percentile(latencies, 50), percentile(latencies, 99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=1000)
+    parser.add_argument('--queries', type=int, default=1000)
+    parser.add_argument('--n', type=int, default=10, help='number of messages of each chat history request')
+    args = parser.parse_args()
+    logger.setLevel(logging.WARNING)
+
+    rows = []
+    for buffer_size in (0, AGENT_CHAT_HISTORY_BUFFER_SIZE.default_value):
+        with tempfile.TemporaryDirectory() as tmp:
+            rows.append(run(f'{tmp}/monitoring.db', buffer_size, args.messages, args.queries, args.n))
+    print_table(['chat history', 'p50 (ms)', 'p99 (ms)'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""Measure the replay of a long chat history to a reconnecting WebSocket client, one message per frame vs. in pages.
+
+A session with ``--messages`` messages is stored in a SQLite monitoring database. Then, a client reconnects ``--replays``
+times and fetches the history of the session:
+
+- ``fetch_user_messages``: the whole history, one frame per message (the previous protocol).
+- ``first page``: the most recent page only (e.g. the user does not scroll up).
+- ``all pages``: every page, from the most recent to the oldest (the user scrolls up to the beginning).
+
+The frames are encoded with the ``--codec`` payload codec, as they would be sent to the client.
+
+Usage::
+
+    python -m baf.test.benchmarks.chat_history_replay_benchmark --messages 10000 --page-size 50 --replays 20
+"""
+
+import argparse
+import logging
+import tempfile
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+
+from baf.core.agent import Agent
+from baf.db import DB_MONITORING
+from baf.db.monitoring_db import MonitoringDB, TABLE_CHAT, TABLE_SESSION
+from baf.exceptions.logger import logger
+from baf.platforms.payload import JSON_CODEC, PAYLOAD_CODECS, Payload, PayloadAction, PayloadCodec
+from baf.platforms.websocket import WEBSOCKET_HISTORY_PAGE_SIZE
+from baf.platforms.websocket.websocket_platform import WebSocketPlatform
+from baf.test.benchmarks.utils import percentile, print_table, timer
+
+SESSION_ID = 'session'
+
+
+def fill_db(monitoring_db: MonitoringDB, agent: Agent, messages: int) -> None:
+    start = datetime(2024, 1, 1)
+    with monitoring_db.engine.begin() as conn:
+        conn.exec_driver_sql(
+            f'INSERT INTO {TABLE_SESSION} (id, agent_name, session_id, platform_name, timestamp, variables) '
+            f'VALUES (?, ?, ?, ?, ?, ?)',
+            [(1, agent.name, SESSION_ID, WebSocketPlatform.__name__, start, '{}')]
+        )
+        conn.exec_driver_sql(
+            f'INSERT INTO {TABLE_CHAT} (session_id, type, content, is_user, timestamp) VALUES (?, ?, ?, ?, ?)',
+            [(1, 'str', f'"message {i} of the conversation"', i % 2 == 0, start + timedelta(seconds=i))
+             for i in range(messages)]
+        )
+
+
+def replay(platform: WebSocketPlatform, scenario: str) -> None:
+    """Fetch the history of the session from a new connection, as its client would."""
+    current_time = datetime.now()
+    if scenario == 'fetch_user_messages':
+        platform._handle_payload(SESSION_ID, None, None, current_time,
+                                 JSON_CODEC.encode(Payload(action=PayloadAction.FETCH_USER_MESSAGES)))
+        return
+    cursor = None
+    while True:
+        platform._handle_payload(SESSION_ID, None, None, current_time, JSON_CODEC.encode(
+            Payload(action=PayloadAction.FETCH_HISTORY_PAGE, message={'cursor': cursor})
+        ))
+        cursor = platform.last_payload.message['cursor']
+        if scenario == 'first page' or cursor is None:
+            return
+
+
+def run(platform: WebSocketPlatform, scenario: str, codec: PayloadCodec, replays: int) -> list:
+    frames = []
+
+    def send(session_id: str, payload: Payload) -> None:
+        platform.last_payload = payload
+        frames.append(len(codec.encode(payload)))
+
+    platform._send = send
+    latencies = []
+    for _ in range(replays):
+        frames.clear()
+        with timer() as elapsed:
+            replay(platform, scenario)
+        latencies.append(elapsed['seconds'] * 1000)
+    return [scenario, percentile(latencies, 50), percentile(latencies, 99), len(frames), sum(frames) / 1024]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=10000)
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--replays', type=int, default=20)
+    parser.add_argument('--codec', choices=list(PAYLOAD_CODECS), default='json')
+    args = parser.parse_args()
+    logger.setLevel(logging.WARNING)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        # The session is restored from the monitoring database, as after restarting the agent
+        agent = Agent('replay_agent', persist_sessions=True)
+        agent.new_state('initial', initial=True)
+        agent.set_property(DB_MONITORING, True)
+        agent.set_property(WEBSOCKET_HISTORY_PAGE_SIZE, args.page_size)
+        monitoring_db = MonitoringDB()
+        monitoring_db.set_engine(create_engine(f'sqlite:///{tmp}/monitoring.db'))
+        monitoring_db.initialize_db()
+        agent._monitoring_db = monitoring_db
+        platform = agent.use_websocket_platform(use_ui=False)
+        fill_db(monitoring_db, agent, args.messages)
+        for scenario in ('fetch_user_messages', 'first page', 'all pages'):
+            rows.append(run(platform, scenario, PAYLOAD_CODECS[args.codec], args.replays))
+        agent.close_session(SESSION_ID)
+        agent.scheduler.stop()
+        monitoring_db.close_connection()
+    print_table(['replay', 'p50 (ms)', 'p99 (ms)', 'frames', 'sent (KB)'], rows)
+
+
+if __name__ == '__main__':
+    main()
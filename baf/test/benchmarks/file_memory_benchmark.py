@@ -0,0 +1,79 @@
+"""Measure the memory used to receive a file from a client and store it in the monitoring database.
+
+A file of ``--file-mb`` MB is uploaded as a WebSocket payload, with each payload codec: the payload is decoded, its file
+is created and saved as a chat message of a session (in the in-memory chat history and an SQLite monitoring database),
+with each monitoring file storage:
+
+- ``inline``: the base64 content of the file is stored in the chat table.
+- ``hash``: only the size and SHA-256 digest of the file are stored.
+- ``reference``: the file is written to a directory, and its path is stored.
+
+The peak memory allocated by Python (from tracemalloc) is given as a multiple of the file size. The payload itself (as
+received from the socket) is not counted.
+
+Usage::
+
+    python -m baf.test.benchmarks.file_memory_benchmark --file-mb 50
+"""
+
+import argparse
+import logging
+import os
+import tempfile
+import tracemalloc
+from datetime import datetime
+
+from sqlalchemy import create_engine
+
+from baf.core.agent import Agent
+from baf.core.file import File
+from baf.core.message import Message, MessageType
+from baf.core.session import Session
+from baf.db import DB_MONITORING
+from baf.db.monitoring_db import FILE_STORAGES, MonitoringDB
+from baf.exceptions.logger import logger
+from baf.platforms.payload import PAYLOAD_CODECS, Payload, PayloadAction, PayloadCodec
+from baf.test.benchmarks.utils import BenchmarkPlatform, current_rss_mb, print_table, timer
+
+
+def run(file_storage: str, codec: PayloadCodec, file_mb: int) -> list:
+    size = file_mb * 1024 * 1024
+    with tempfile.TemporaryDirectory() as tmp:
+        monitoring_db = MonitoringDB()
+        monitoring_db.set_engine(create_engine(f'sqlite:///{tmp}/monitoring.db'))
+        monitoring_db.initialize_db(file_storage=file_storage, files_path=f'{tmp}/files')
+        agent = Agent('file_agent')
+        agent._monitoring_db = monitoring_db
+        agent.set_property(DB_MONITORING, True)
+        session = Session('session', agent, BenchmarkPlatform())
+        monitoring_db.insert_session(session)
+        frame = codec.encode(Payload(action=PayloadAction.USER_FILE, message={
+            'name': 'upload.bin', 'type': 'bin', 'base64': os.urandom(size)
+        }))
+        rss = current_rss_mb()
+        tracemalloc.start()
+        with timer() as elapsed:
+            file = File.from_dict(Payload.decode(frame).message)
+            session.save_message(Message(t=MessageType.FILE, content=file, is_user=True, timestamp=datetime.now()))
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        rss = current_rss_mb() - rss
+        monitoring_db.close_connection()
+    return [file_storage, codec.name, elapsed['seconds'] * 1000, peak / size, rss]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--file-mb', type=int, default=50)
+    args = parser.parse_args()
+    logger.setLevel(logging.WARNING)
+
+    rows = []
+    for file_storage in FILE_STORAGES:
+        for codec in PAYLOAD_CODECS.values():
+            rows.append(run(file_storage, codec, args.file_mb))
+    print_table(['file storage', 'codec', 'time (ms)', 'peak memory (x file size)', 'RSS growth (MB)'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""Measure the intent prediction throughput of the PyTorch intent classifier, with and without batching.
+
+Many sessions in the same state receive messages at the same time, each one predicting the intent from its own thread
+(as with the ``thread_per_session`` scheduler). The benchmark compares:
+
+- ``unbatched``: each message is predicted with its own forward pass (``nlp.intent_batch.max_size = 1``).
+- ``batched``: concurrent predictions are grouped by the
+  :class:`~baf.nlp.intent_classifier.intent_prediction_batcher.IntentPredictionBatcher` into a single forward pass,
+  for different ``nlp.intent_batch.max_wait`` values.
+
+Usage::
+
+    python -m baf.test.benchmarks.intent_batching_benchmark --sessions 64 --messages 20
+"""
+
+import argparse
+import logging
+import threading
+import time
+
+from baf.core.agent import Agent
+from baf.exceptions.logger import logger
+from baf.nlp import NLP_PRE_PROCESSING
+from baf.nlp.intent_classifier.intent_classifier import IntentClassifier
+from baf.nlp.intent_classifier.intent_classifier_configuration import SimpleIntentClassifierConfiguration
+from baf.nlp.intent_classifier.intent_prediction_batcher import IntentPredictionBatcher
+from baf.test.benchmarks.utils import percentile, print_table, timer
+
+WORDS = ['order', 'pizza', 'weather', 'tomorrow', 'book', 'flight', 'cancel', 'reservation', 'music', 'play', 'song',
+         'price', 'ticket', 'hotel', 'room', 'alarm', 'time', 'news', 'today', 'help']
+
+
+def build_classifier(num_intents: int) -> IntentClassifier:
+    ic_config = SimpleIntentClassifierConfiguration(num_epochs=10, input_max_num_tokens=15)
+    agent = Agent('batching_agent')
+    agent.set_property(NLP_PRE_PROCESSING, False)
+    state = agent.new_state('state', initial=True, ic_config=ic_config)
+    for i in range(num_intents):
+        intent = agent.new_intent(f'intent_{i}', [
+            f'{WORDS[i % len(WORDS)]} {WORDS[(i + j) % len(WORDS)]} {WORDS[(i * j) % len(WORDS)]}' for j in range(1, 6)
+        ])
+        state.when_intent_matched(intent).go_to(state)
+    agent.train()
+    return agent._nlp_engine._intent_classifiers[state]
+
+
+def run_configuration(classifier: IntentClassifier, max_batch_size: int, max_wait: float, num_sessions: int,
+                      num_messages: int) -> dict:
+    batcher = IntentPredictionBatcher(classifier, max_batch_size=max_batch_size, max_wait=max_wait)
+    latencies: list[float] = []
+    barrier = threading.Barrier(num_sessions)
+
+    def session(i: int) -> None:
+        barrier.wait()
+        for j in range(num_messages):
+            message = f'{WORDS[(i + j) % len(WORDS)]} {WORDS[(i * j) % len(WORDS)]} please'
+            start = time.perf_counter()
+            batcher.predict(message)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(num_sessions)]
+    with timer() as elapsed:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    return {
+        'throughput': num_sessions * num_messages / elapsed['seconds'],
+        'p50_ms': percentile(latencies, 50),
+        'p99_ms': percentile(latencies, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=64)
+    parser.add_argument('--messages', type=int, default=20, help='messages sent by each session')
+    parser.add_argument('--intents', type=int, default=20)
+    parser.add_argument('--max-batch', type=int, default=32)
+    parser.add_argument('--max-wait', type=float, nargs='+', default=[0.0, 0.002, 0.005])
+    args = parser.parse_args()
+    logger.setLevel(logging.WARNING)
+    classifier = build_classifier(args.intents)
+
+    configurations = [('unbatched', 1, 0.0)] + [('batched', args.max_batch, wait) for wait in args.max_wait]
+    rows = []
+    for name, max_batch_size, max_wait in configurations:
+        result = run_configuration(classifier, max_batch_size, max_wait, args.sessions, args.messages)
+        rows.append([name, max_batch_size, max_wait, result['throughput'], result['p50_ms'], result['p99_ms']])
+    print_table(['mode', 'max batch', 'max wait (s)', 'predictions/s', 'p50 (ms)', 'p99 (ms)'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Measure the agent training (startup) time with and without the trained model cache.
+
+The agent has several states, each one with its own PyTorch intent classifier. The benchmark trains it:
+
+- ``no cache``: every intent classifier is trained (the behaviour of previous versions).
+- ``cold cache``: ``nlp.model_cache.path`` is set but empty, so the models are trained and saved.
+- ``warm cache``: the agent is restarted with the same definition, so the models are loaded from the cache.
+- ``1 state changed``: a training sentence of one state changes, so only its intent classifier is trained again.
+
+Usage::
+
+    python -m baf.test.benchmarks.model_cache_benchmark --states 5 --intents 10 --epochs 300
+"""
+
+import argparse
+import logging
+import tempfile
+
+from baf.core.agent import Agent
+from baf.exceptions.logger import logger
+from baf.nlp import NLP_MODEL_CACHE_PATH
+from baf.nlp.intent_classifier.intent_classifier_configuration import SimpleIntentClassifierConfiguration
+from baf.test.benchmarks.utils import print_table, timer
+
+WORDS = ['order', 'pizza', 'weather', 'tomorrow', 'book', 'flight', 'cancel', 'reservation', 'music', 'play', 'song',
+         'price', 'ticket', 'hotel', 'room', 'alarm', 'time', 'news', 'today', 'help']
+
+
+def build_agent(num_states: int, num_intents: int, epochs: int, cache_path: str or None, changed: bool) -> Agent:
+    agent = Agent('cache_agent')
+    if cache_path:
+        agent.set_property(NLP_MODEL_CACHE_PATH, cache_path)
+    ic_config = SimpleIntentClassifierConfiguration(num_epochs=epochs)
+    for s in range(num_states):
+        state = agent.new_state(f'state_{s}', initial=s == 0, ic_config=ic_config)
+        for i in range(num_intents):
+            k = s + i
+            intent = agent.new_intent(f'state_{s}_intent_{i}', [
+                f'{WORDS[k % len(WORDS)]} {WORDS[(k + j) % len(WORDS)]} {WORDS[(k * j) % len(WORDS)]}'
+                for j in range(1, 6)
+            ])
+            state.when_intent_matched(intent).go_to(state)
+    if changed:
+        agent.intents[0].training_sentences.append('a new training sentence')
+    return agent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--states', type=int, default=5)
+    parser.add_argument('--intents', type=int, default=10)
+    parser.add_argument('--epochs', type=int, default=300)
+    args = parser.parse_args()
+    logger.setLevel(logging.WARNING)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as cache_path:
+        for name, path, changed in (('no cache', None, False), ('cold cache', cache_path, False),
+                                    ('warm cache', cache_path, False), ('1 state changed', cache_path, True)):
+            agent = build_agent(args.states, args.intents, args.epochs, path, changed)
+            with timer() as elapsed:
+                agent.train()
+            rows.append([name, args.states, elapsed['seconds']])
+    print_table(['training', 'states', 'time (s)'], rows)
+
+
+if __name__ == '__main__':
+    main()
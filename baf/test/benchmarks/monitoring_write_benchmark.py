@@ -0,0 +1,91 @@
+"""Measure the monitoring database write throughput with and without the write-behind queue.
+
+Several producer threads (e.g. the sessions of the agent) insert chat records into a SQLite monitoring database:
+
+- ``per record``: each record is inserted and committed on its own (as each of the per-write threads of previous
+  versions did).
+- ``write-behind``: the records are queued and written by the :class:`~baf.db.monitoring_writer.MonitoringDBWriter`
+  thread, in batches of up to ``max_size`` records (a multi-row insert per table and a single commit per batch).
+
+The table shows the time the producers are blocked by each insert, the time until all the records are stored, and the
+number of commits.
+
+Usage::
+
+    python -m baf.test.benchmarks.monitoring_write_benchmark --records 5000 --producers 8 --batch-size 10 100 500
+"""
+
+import argparse
+import logging
+import tempfile
+import threading
+from datetime import datetime
+
+from sqlalchemy import create_engine, event
+
+from baf.core.agent import Agent
+from baf.core.message import Message, MessageType
+from baf.core.session import Session
+from baf.db.monitoring_db import MonitoringDB, TABLE_CHAT
+from baf.exceptions.logger import logger
+from baf.test.benchmarks.utils import BenchmarkPlatform, percentile, print_table, timer
+
+
+def run(db_path: str, records: int, producers: int, batch_size: int or None) -> list:
+    monitoring_db = MonitoringDB()
+    monitoring_db.set_engine(create_engine(f'sqlite:///{db_path}'))
+    monitoring_db.initialize_db()
+    commits = [0]
+
+    @event.listens_for(monitoring_db.engine, 'commit')
+    def on_commit(conn):
+        commits[0] += 1
+
+    agent = Agent('monitoring_agent')
+    sessions = [Session(f'session_{i}', agent, BenchmarkPlatform()) for i in range(producers)]
+    for session in sessions:
+        monitoring_db.insert_session(session)
+    commits[0] = 0
+    if batch_size:
+        monitoring_db.start_writer(max_queue_size=10000, max_size=batch_size, max_wait=0.05)
+    latencies = [[] for _ in range(producers)]
+
+    def produce(i: int):
+        for j in range(records // producers):
+            message = Message(t=MessageType.STR, content=f'message {j}', is_user=True, timestamp=datetime.now())
+            with timer() as elapsed:
+                monitoring_db.insert_chat(sessions[i], message)
+            latencies[i].append(elapsed['seconds'] * 1000)
+
+    threads = [threading.Thread(target=produce, args=(i,)) for i in range(producers)]
+    with timer() as total:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        monitoring_db.flush()
+    stored = len(monitoring_db.get_table(TABLE_CHAT))
+    monitoring_db.close_connection()
+    all_latencies = [latency for producer_latencies in latencies for latency in producer_latencies]
+    return [batch_size or 'per record', percentile(all_latencies, 50), percentile(all_latencies, 99),
+            total['seconds'], stored / total['seconds'], commits[0], stored]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=5000)
+    parser.add_argument('--producers', type=int, default=8)
+    parser.add_argument('--batch-size', type=int, nargs='+', default=[10, 100, 500])
+    args = parser.parse_args()
+    logger.setLevel(logging.WARNING)
+
+    rows = []
+    for batch_size in [None] + args.batch_size:
+        with tempfile.TemporaryDirectory() as tmp:
+            rows.append(run(f'{tmp}/monitoring.db', args.records, args.producers, batch_size))
+    print_table(['batch size', 'insert p50 (ms)', 'insert p99 (ms)', 'total (s)', 'records/s', 'commits', 'stored'],
+                rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Measure the SimpleNER prediction time depending on the number of entity values.
+
+The agent has an intent with a parameter whose entity has many values (e.g. a product catalogue). The benchmark compares
+the regex based matching of previous versions (a regular expression search per entity value and message) with the
+precompiled :class:`~baf.nlp.ner.entity_matcher.EntityValueMatcher`, which finds all the values with a single pass.
+
+Usage::
+
+    python -m baf.test.benchmarks.ner_matching_benchmark --values 100 1000 10000 --messages 200
+"""
+
+import argparse
+import logging
+import random
+
+from baf.core.agent import Agent
+from baf.exceptions.logger import logger
+from baf.nlp import NLP_PRE_PROCESSING
+from baf.nlp.ner.simple_ner import SimpleNER, get_custom_entity_values_dict
+from baf.nlp.utils import find_first_temp, replace_temp_value_in_sentence, replace_value_in_sentence, \
+    value_in_sentence
+from baf.test.benchmarks.utils import percentile, print_table, timer
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'ti', 'vo', 'ze', 'pa', 'do', 'fu']
+
+
+def regex_matching(intent, message: str) -> str:
+    """The custom entity matching of previous versions of the SimpleNER (it returns the NER sentence)."""
+    ner_sentence = message
+    temps = {}
+    for i, (value, (intent_parameters, entry_value)) in enumerate(
+            sorted(get_custom_entity_values_dict(intent).items(), key=lambda x: (len(x[0]), x[0].casefold()),
+                   reverse=True)):
+        if value_in_sentence(value, ner_sentence):
+            temp = f'/temp{i}/'
+            ner_sentence = replace_value_in_sentence(ner_sentence, value, temp)
+            temps[temp] = (intent_parameters, entry_value)
+    while temps:
+        temp = find_first_temp(ner_sentence)
+        intent_parameters, _ = temps.pop(temp)
+        ner_sentence = replace_temp_value_in_sentence(ner_sentence, temp, intent_parameters[0].entity.name.upper())
+    return ner_sentence
+
+
+def build_agent(num_values: int, rng: random.Random) -> tuple[Agent, list[str]]:
+    agent = Agent('ner_agent')
+    agent.set_property(NLP_PRE_PROCESSING, False)
+    values = set()
+    while len(values) < num_values:
+        values.add(' '.join(''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) for _ in range(rng.randint(1, 2))))
+    values = sorted(values)
+    product = agent.new_entity('product', entries={value: [] for value in values})
+    intent = agent.new_intent('buy', ['I want to buy PRODUCT'])
+    intent.parameter('product', 'PRODUCT', product)
+    state = agent.new_state('state', initial=True)
+    state.when_intent_matched(intent).go_to(state)
+    return agent, values
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--values', type=int, nargs='+', default=[100, 1000, 10000])
+    parser.add_argument('--messages', type=int, default=200)
+    args = parser.parse_args()
+    logger.setLevel(logging.WARNING)
+
+    rows = []
+    for num_values in args.values:
+        rng = random.Random(num_values)
+        agent, values = build_agent(num_values, rng)
+        state = agent.initial_state()
+        intent = agent.intents[0]
+        messages = [f'I would like to buy {rng.choice(values)} please' for _ in range(args.messages)]
+        ner = SimpleNER(agent.nlp_engine, agent)
+        with timer() as compile_time:
+            ner.train()
+        for name, predict in (('regex', lambda m: regex_matching(intent, m)),
+                              ('automaton', lambda m: list(ner.predict(state, m).ner_sentences)[0])):
+            latencies = []
+            sentences = []
+            for message in messages:
+                with timer() as elapsed:
+                    sentences.append(predict(message))
+                latencies.append(elapsed['seconds'] * 1000)
+            rows.append([num_values, name, percentile(latencies, 50), percentile(latencies, 99),
+                         compile_time['seconds'] * 1000 if name == 'automaton' else '-',
+                         all(sentence.startswith('I would like to buy PRODUCT') for sentence in sentences)])
+    print_table(['values', 'matcher', 'p50 (ms)', 'p99 (ms)', 'compile (ms)', 'all matched'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Measure the latency of natural language queries of the DBHandler with and without the schema and SQL caches.
+
+A SQLite database with several tables is queried with a set of questions, asked repeatedly (as the users of an agent
+do). The questions are translated into SQL by a mock local LLM, which takes ``--llm-latency`` ms to answer:
+
+- ``no cache``: the schema is described and each question is translated on every query (``schema_cache_ttl`` = 0 and
+  ``sql_cache_size`` = 0, as in previous versions).
+- ``schema cache``: only the schema description is cached.
+- ``schema + sql cache``: the translations are cached too, so repeated questions do not call the LLM.
+
+Usage::
+
+    python -m baf.test.benchmarks.nl_to_sql_cache_benchmark --tables 50 --questions 20 --queries 500 --llm-latency 50
+"""
+
+import argparse
+import logging
+import random
+import tempfile
+import time
+
+from baf.core.agent import Agent
+from baf.exceptions.logger import logger
+from baf.nlp.llm.llm import LLM
+from baf.test.benchmarks.utils import percentile, print_table, timer
+
+
+class MockLLM(LLM):
+    """Local LLM that answers after a fixed latency, with a query on the table named in the question."""
+
+    def __init__(self, agent, latency: float):
+        super().__init__(agent, 'mock_llm', {})
+        self.latency = latency
+        self.predictions = 0
+
+    def initialize(self) -> None:
+        pass
+
+    def predict(self, message: str, parameters: dict = None, session=None, system_message: str = None) -> str:
+        self.predictions += 1
+        time.sleep(self.latency)
+        table = message.split('User request:\n')[1].split('\n')[0].split()[-1]
+        return f'SELECT COUNT(*) FROM {table}'
+
+
+def run(db_path: str, name: str, schema_cache_ttl: float or None, sql_cache_size: int, tables: int, questions: int,
+        queries: int, llm_latency: float) -> list:
+    agent = Agent('nl_to_sql_agent')
+    agent.config['db.sql.db1.dialect'] = 'sqlite'
+    agent.config['db.sql.db1.file'] = db_path
+    agent.config['db.sql.db1.schema_cache_ttl'] = schema_cache_ttl
+    agent.config['db.sql.db1.sql_cache_size'] = sql_cache_size
+    db_handler = agent.use_db_handler()
+    for i in range(tables):
+        db_handler.query('db1', f'CREATE TABLE IF NOT EXISTS table_{i} '
+                                f'(id INTEGER PRIMARY KEY, {", ".join(f"column_{j} VARCHAR" for j in range(10))})')
+    llm = MockLLM(agent, llm_latency / 1000)
+    rng = random.Random(42)
+    latencies = []
+    for _ in range(queries):
+        question = f'How many rows are in table_{rng.randrange(questions) % tables}'
+        with timer() as elapsed:
+            result = db_handler.select('db1', question, llm=llm)
+        latencies.append(elapsed['seconds'] * 1000)
+    assert result == 0  # The tables are empty
+    db_handler.close_all()
+    stats = db_handler.cache_stats
+    return [name, percentile(latencies, 50), percentile(latencies, 99), sum(latencies) / 1000, llm.predictions,
+            f"{stats['schema_hits']}/{stats['schema_misses']}", f"{stats['sql_hits']}/{stats['sql_misses']}"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tables', type=int, default=50)
+    parser.add_argument('--questions', type=int, default=20, help='number of distinct questions')
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--llm-latency', type=float, default=50, help='latency of each LLM prediction, in ms')
+    args = parser.parse_args()
+    logger.setLevel(logging.WARNING)
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, schema_cache_ttl, sql_cache_size in [('no cache', 0, 0), ('schema cache', None, 0),
+                                                       ('schema + sql cache', None, 256)]:
+            rows.append(run(f'{tmp}/business.db', name, schema_cache_ttl, sql_cache_size, args.tables,
+                            args.questions, args.queries, args.llm_latency))
+    print_table(['cache', 'p50 (ms)', 'p99 (ms)', 'total (s)', 'LLM calls', 'schema hits/misses',
+                 'sql hits/misses'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Measure the agent training time depending on the number of training worker processes.
+
+The agent has several states, each one with its own PyTorch intent classifier. The intent classifiers are trained with
+a fixed seed, and the benchmark checks that all the worker counts produce the same models.
+
+Note that each worker process takes a few seconds to start (it has to import PyTorch), so parallel training pays off
+for agents with several states and many epochs, in machines with several CPU cores.
+
+Usage::
+
+    python -m baf.test.benchmarks.parallel_training_benchmark --states 8 --workers 1 2 4 8
+"""
+
+import argparse
+import logging
+import os
+
+import torch
+
+from baf.core.agent import Agent
+from baf.exceptions.logger import logger
+from baf.nlp import NLP_TRAINING_WORKERS
+from baf.nlp.intent_classifier.intent_classifier_configuration import SimpleIntentClassifierConfiguration
+from baf.test.benchmarks.utils import print_table, timer
+
+WORDS = ['order', 'pizza', 'weather', 'tomorrow', 'book', 'flight', 'cancel', 'reservation', 'music', 'play', 'song',
+         'price', 'ticket', 'hotel', 'room', 'alarm', 'time', 'news', 'today', 'help']
+
+
+def build_agent(num_states: int, num_intents: int, epochs: int, batch_size: int or None, workers: int) -> Agent:
+    agent = Agent('training_agent')
+    agent.set_property(NLP_TRAINING_WORKERS, workers)
+    ic_config = SimpleIntentClassifierConfiguration(num_epochs=epochs, batch_size=batch_size, seed=42)
+    for s in range(num_states):
+        state = agent.new_state(f'state_{s}', initial=s == 0, ic_config=ic_config)
+        for i in range(num_intents):
+            k = s + i
+            intent = agent.new_intent(f'state_{s}_intent_{i}', [
+                f'{WORDS[k % len(WORDS)]} {WORDS[(k + j) % len(WORDS)]} {WORDS[(k * j) % len(WORDS)]}'
+                for j in range(1, 6)
+            ])
+            state.when_intent_matched(intent).go_to(state)
+    return agent
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--states', type=int, default=8)
+    parser.add_argument('--intents', type=int, default=10)
+    parser.add_argument('--epochs', type=int, default=300)
+    parser.add_argument('--batch-size', type=int, nargs='+', default=[2, 16, 0], help='0 means full-batch training')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+    logger.setLevel(logging.WARNING)
+    print(f'CPU cores: {os.cpu_count()}')
+
+    rows = []
+    for batch_size in args.batch_size:
+        reference = None
+        for workers in args.workers:
+            agent = build_agent(args.states, args.intents, args.epochs, batch_size or None, workers)
+            with timer() as elapsed:
+                agent.train()
+            models = [classifier._model.state_dict() for classifier in agent._nlp_engine._intent_classifiers.values()]
+            if reference is None:
+                reference = models
+            deterministic = all(
+                torch.equal(model[key], reference_model[key])
+                for model, reference_model in zip(models, reference) for key in model
+            )
+            rows.append([batch_size or 'full', workers, elapsed['seconds'], deterministic])
+    print_table(['batch size', 'workers', 'time (s)', 'same models'], rows)
+
+
+if __name__ == '__main__':
+    main()
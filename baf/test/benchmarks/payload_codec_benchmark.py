@@ -0,0 +1,82 @@
+"""Measure the encoding and decoding time and the size on the wire of the WebSocket payloads, with each payload codec.
+
+The payloads are built as the WebSocket platform builds them (the images and audios are base64 strings):
+
+- ``text``: an agent reply with ``--text-chars`` characters.
+- ``image``: a JPEG image of ``--image-kb`` KB.
+- ``audio``: ``--audio-seconds`` seconds of 16-bit mono audio at 16 kHz, with its metadata.
+
+The encoding time is measured on the server side (the payload is encoded to be sent), and the decoding time on the client
+side (the payload is decoded, and its binary content extracted as bytes, as the Streamlit UI does).
+
+Usage::
+
+    python -m baf.test.benchmarks.payload_codec_benchmark --iterations 200 --image-kb 500 --audio-seconds 10
+"""
+
+import argparse
+import base64
+import logging
+import random
+
+from baf.exceptions.logger import logger
+from baf.platforms.payload import PAYLOAD_CODECS, Payload, PayloadAction, PayloadCodec
+from baf.test.benchmarks.utils import percentile, print_table, timer
+
+SAMPLE_RATE = 16000
+
+
+def build_payloads(text_chars: int, image_kb: int, audio_seconds: float) -> dict[str, Payload]:
+    rng = random.Random(42)
+    words = ['agent', 'session', 'state', 'intent', 'reply', 'message', 'event', 'platform']
+    text = ' '.join(rng.choice(words) for _ in range(text_chars // 6))[:text_chars]
+    # Compressed data (e.g. a JPEG image) is close to random bytes
+    image = rng.randbytes(image_kb * 1024)
+    audio = rng.randbytes(int(audio_seconds * SAMPLE_RATE) * 2)
+    return {
+        'text': Payload(action=PayloadAction.AGENT_REPLY_STR, message=text),
+        'image': Payload(action=PayloadAction.AGENT_REPLY_IMAGE, message=base64.b64encode(image).decode('utf-8')),
+        'audio': Payload(action=PayloadAction.AGENT_REPLY_AUDIO, message={
+            'audio_data_base64': base64.b64encode(audio).decode('utf-8'),
+            'metadata': {'sample_rate': SAMPLE_RATE, 'dtype': 'int16', 'shape': [len(audio) // 2]},
+        }),
+    }
+
+
+def run(kind: str, payload: Payload, codec: PayloadCodec, iterations: int) -> list:
+    encode_times = []
+    decode_times = []
+    for _ in range(iterations):
+        with timer() as elapsed:
+            data = codec.encode(payload)
+        encode_times.append(elapsed['seconds'] * 1000)
+        with timer() as elapsed:
+            decoded = Payload.decode(data)
+            content = decoded.get_bytes()
+            if content is None:
+                content = decoded.message
+        decode_times.append(elapsed['seconds'] * 1000)
+    size = len(data.encode('utf-8')) if isinstance(data, str) else len(data)
+    return [kind, codec.name, percentile(encode_times, 50), percentile(decode_times, 50), size / 1024,
+            len(content) / 1024]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--text-chars', type=int, default=2000)
+    parser.add_argument('--image-kb', type=int, default=500)
+    parser.add_argument('--audio-seconds', type=float, default=10)
+    args = parser.parse_args()
+    logger.setLevel(logging.WARNING)
+
+    payloads = build_payloads(args.text_chars, args.image_kb, args.audio_seconds)
+    rows = []
+    for kind, payload in payloads.items():
+        for codec in PAYLOAD_CODECS.values():
+            rows.append(run(kind, payload, codec, args.iterations))
+    print_table(['payload', 'codec', 'encode p50 (ms)', 'decode p50 (ms)', 'on the wire (KB)', 'content (KB)'], rows)
+
+
+if __name__ == '__main__':
+    main()
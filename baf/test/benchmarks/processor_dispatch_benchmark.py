@@ -0,0 +1,114 @@
+"""Compare the overhead of selecting the processors to run on each message, before and after caching the pipelines.
+
+The agent registers the built-in processors (:class:`LanguageDetectionProcessor`, :class:`UserAdaptationProcessor` and
+:class:`AudioLanguageDetectionProcessor`, if its dependencies are installed). Their ``process`` methods are replaced by
+no-op methods with the same signature, so only the dispatch overhead is measured:
+
+- ``type_hints``: the type hints and signature of every processor are read for every message (the behaviour of
+  previous versions).
+- ``cached``: the processors are classified once, when they are registered (:meth:`Agent._get_processors`).
+
+Usage::
+
+    python -m baf.test.benchmarks.processor_dispatch_benchmark --messages 20000
+"""
+
+import argparse
+import inspect
+import logging
+from typing import Any, get_type_hints
+
+from baf.core.agent import Agent
+from baf.core.processors.language_detection_processor import LanguageDetectionProcessor
+from baf.core.processors.user_adaptation_processor import UserAdaptationProcessor
+from baf.core.session import Session
+from baf.exceptions.logger import logger
+from baf.test.benchmarks.utils import print_table, timer
+
+try:
+    from baf.core.processors.audio_language_detection_processor import AudioLanguageDetectionProcessor
+except ImportError:
+    AudioLanguageDetectionProcessor = None
+
+
+class NoOpLanguageDetectionProcessor(LanguageDetectionProcessor):
+
+    def process(self, session: Session, message: str) -> str:
+        return message
+
+
+class NoOpUserAdaptationProcessor(UserAdaptationProcessor):
+
+    def process(self, session: 'Session', message: str) -> str:
+        return message
+
+
+def build_agent() -> Agent:
+    agent = Agent('processor_agent')
+    NoOpLanguageDetectionProcessor(agent, user_messages=True)
+    NoOpUserAdaptationProcessor(agent, llm_name='llm')
+    if AudioLanguageDetectionProcessor is not None:
+        class NoOpAudioLanguageDetectionProcessor(AudioLanguageDetectionProcessor):
+
+            def process(self, session: Session, message: bytes) -> bytes:
+                return message
+
+        NoOpAudioLanguageDetectionProcessor(agent, transcription_model=None, llm_name='llm')
+    else:
+        logger.warning('AudioLanguageDetectionProcessor dependencies are not installed, it is not benchmarked')
+    return agent
+
+
+def process_with_type_hints(agent: Agent, session: Session, message: Any, is_user_message: bool) -> Any:
+    """Agent.process of previous versions."""
+    for processor in agent.processors:
+        method_return_type = get_type_hints(processor.process).get('return')
+        if method_return_type is not None and isinstance(message, method_return_type):
+            if (processor.agent_messages and not is_user_message) or (processor.user_messages and is_user_message):
+                message = processor.process(session=session, message=message)
+    return message
+
+
+def speech_processors_with_signature(agent: Agent, session: Session, speech: bytes) -> bytes:
+    """Processor selection of NLPEngine.speech2text of previous versions."""
+    for processor in agent.processors:
+        params = inspect.signature(processor.process).parameters
+        if "message" in params and params["message"].annotation is bytes:
+            speech = processor.process(session=session, message=speech)
+    return speech
+
+
+def speech_processors_cached(agent: Agent, session: Session, speech: bytes) -> bytes:
+    for processor in agent._get_processors(bytes, None):
+        speech = processor.process(session=session, message=speech)
+    return speech
+
+
+def run(function, agent: Agent, messages: int, *args) -> float:
+    with timer() as elapsed:
+        for _ in range(messages):
+            function(agent, None, *args)
+    return elapsed['seconds'] / messages * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=20000)
+    args = parser.parse_args()
+    logger.setLevel(logging.WARNING)
+    agent = build_agent()
+
+    rows = []
+    for name, message, is_user_message in (('user text', 'hello', True), ('agent text', 'hello', False),
+                                           ('user json', {'key': 'value'}, True)):
+        before = run(process_with_type_hints, agent, args.messages, message, is_user_message)
+        after = run(Agent.process, agent, args.messages, message, is_user_message)
+        rows.append([name, before, after, before / after])
+    before = run(speech_processors_with_signature, agent, args.messages, b'audio')
+    after = run(speech_processors_cached, agent, args.messages, b'audio')
+    rows.append(['speech', before, after, before / after])
+    print_table(['message', 'type hints (us)', 'cached (us)', 'speedup'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Compare the memory and reply latency of the session schedulers with many simulated sessions.
+
+Each configuration runs in a fresh process, so the reported memory only includes the sessions of that configuration.
+
+Usage::
+
+    python -m baf.test.benchmarks.session_scheduler_benchmark --sessions 1000 5000 10000 --workers 4
+"""
+
+import argparse
+import logging
+import multiprocessing
+import threading
+import time
+from datetime import datetime
+
+from baf import AGENT_SCHEDULER, AGENT_SCHEDULER_WORKERS
+from baf.core.agent import Agent
+from baf.core.session import Session
+from baf.core.transition.event import Event
+from baf.exceptions.logger import logger
+from baf.test.benchmarks.utils import BenchmarkPlatform, current_rss_mb, percentile, print_table
+
+
+class PingEvent(Event):
+    """Event carrying the instant it was sent, to measure the time until the agent replies."""
+
+    def __init__(self, sent_at: float = None, session_id: str = None):
+        super().__init__(name='ping', session_id=session_id, timestamp=datetime.now())
+        self.sent_at: float = sent_at
+
+
+def pong_body(session: Session) -> None:
+    session.reply(str(session.event.sent_at))
+
+
+def build_agent(scheduler_type: str, workers: int) -> tuple[Agent, BenchmarkPlatform]:
+    agent = Agent(f'{scheduler_type}_agent')
+    agent.set_property(AGENT_SCHEDULER, scheduler_type)
+    agent.set_property(AGENT_SCHEDULER_WORKERS, workers)
+    platform = BenchmarkPlatform()
+    agent._platforms.append(platform)
+    idle = agent.new_state('idle', initial=True)
+    pong = agent.new_state('pong')
+    pong.set_body(pong_body)
+    idle.when_event(PingEvent()).go_to(pong)
+    pong.go_to(idle)
+    agent._trained = True
+    platform.start()
+    return agent, platform
+
+
+def run_configuration(scheduler_type: str, workers: int, num_sessions: int, num_messages: int) -> dict:
+    logger.setLevel(logging.WARNING)
+    agent, platform = build_agent(scheduler_type, workers)
+    rss_before = current_rss_mb()
+    session_ids = [f'session-{i}' for i in range(num_sessions)]
+    for session_id in session_ids:
+        agent.get_or_create_session(session_id, platform)
+    rss_after = current_rss_mb()
+    threads = threading.active_count()
+
+    expected = 0
+    for _ in range(num_messages):
+        for session_id in session_ids:
+            agent.receive_event(PingEvent(time.perf_counter(), session_id))
+        expected += num_sessions
+        # Wait for the round to be answered, so each round measures the latency under a burst of num_sessions events
+        while len(platform.replies) < expected:
+            time.sleep(0.001)
+    latencies = [(replied_at - float(message)) * 1000 for _, message, replied_at in platform.replies]
+    agent.stop()
+    return {
+        'rss_mb': rss_after - rss_before,
+        'threads': threads,
+        'p50_ms': percentile(latencies, 50),
+        'p99_ms': percentile(latencies, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1000, 5000, 10000])
+    parser.add_argument('--workers', type=int, default=4, help='number of event loops of the shared_loops scheduler')
+    parser.add_argument('--messages', type=int, default=3, help='messages sent to each session')
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context('spawn')
+    rows = []
+    for num_sessions in args.sessions:
+        for scheduler_type in ('thread_per_session', 'shared_loops'):
+            with context.Pool(1) as pool:
+                result = pool.apply(run_configuration, (scheduler_type, args.workers, num_sessions, args.messages))
+            rows.append([scheduler_type, num_sessions, result['threads'], result['rss_mb'],
+                         result['p50_ms'], result['p99_ms']])
+    print_table(['scheduler', 'sessions', 'threads', 'session RSS (MB)', 'p50 (ms)', 'p99 (ms)'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Measure the bytes written to the monitoring database per message, for a session with a large dictionary.
+
+The session stores a large variable (e.g. a RAG context, 1MB by default) and, for each user message, a state body
+updates a few small variables:
+
+- ``full``: every ``session.set`` rewrites the whole JSON-serialized session dictionary in the ``variables`` column of
+  the sessions table (as in previous versions).
+- ``delta``: only the changed variables are written, one record per variable, in a single write at the end of the body.
+
+Usage::
+
+    python -m baf.test.benchmarks.session_variables_benchmark --messages 100 --size-mb 1 --sets 3
+"""
+
+import argparse
+import json
+import logging
+import tempfile
+
+from sqlalchemy import create_engine, event
+
+from baf.core.agent import Agent
+from baf.core.session import Session
+from baf.db import DB_MONITORING
+from baf.db.monitoring_db import MonitoringDB, TABLE_SESSION
+from baf.exceptions.logger import logger
+from baf.test.benchmarks.utils import BenchmarkPlatform, print_table, timer
+
+
+def store_full_dictionary(monitoring_db: MonitoringDB, session: Session) -> None:
+    """Store the session variables as previous versions did: the whole dictionary, at every change."""
+    table = monitoring_db._get_table(TABLE_SESSION)
+    monitoring_db.run_statement(
+        table.update().where(table.c.session_id == session.id).values(variables=json.dumps(session.get_dictionary()))
+    )
+
+
+def run(db_path: str, mode: str, messages: int, size_mb: float, sets: int) -> list:
+    monitoring_db = MonitoringDB()
+    monitoring_db.set_engine(create_engine(f'sqlite:///{db_path}'))
+    monitoring_db.initialize_db()
+    agent = Agent('variables_agent')
+    agent.set_property(DB_MONITORING, True)
+    agent._monitoring_db = monitoring_db
+    state = agent.new_state('state', initial=True)
+
+    def body(session: Session):
+        for i in range(sets):
+            session.set(f'variable_{i}', session.get(f'variable_{i}', 0) + 1)
+
+    state.set_body(body)
+    session = Session('session', agent, BenchmarkPlatform())
+    if mode == 'full':
+        session._store_variable = lambda key: store_full_dictionary(monitoring_db, session)
+    monitoring_db.insert_session(session)
+    session.set('context', 'x' * int(size_mb * 1024 * 1024))
+
+    written = {'bytes': 0, 'statements': 0}
+
+    @event.listens_for(monitoring_db.engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith(('INSERT', 'UPDATE', 'DELETE')):
+            written['statements'] += 1
+            written['bytes'] += len(statement) + sum(len(str(parameter)) for parameter in parameters)
+
+    with timer() as elapsed:
+        for _ in range(messages):
+            state.run(session)
+    monitoring_db.close_connection()
+    return [mode, written['bytes'] / messages, written['statements'] / messages, elapsed['seconds'] * 1000 / messages]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=100)
+    parser.add_argument('--size-mb', type=float, default=1.0, help='size of the large session variable')
+    parser.add_argument('--sets', type=int, default=3, help='number of session.set calls per message')
+    args = parser.parse_args()
+    logger.setLevel(logging.WARNING)
+
+    rows = []
+    for mode in ('full', 'delta'):
+        with tempfile.TemporaryDirectory() as tmp:
+            rows.append(run(f'{tmp}/monitoring.db', mode, args.messages, args.size_mb, args.sets))
+    print_table(['mode', 'bytes/message', 'statements/message', 'ms/message'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""Compare the cost of finding the triggered transition with linear evaluation and with compiled dispatch tables.
+
+A state has N intent matching transitions, and the session receives a user message whose intent (already predicted)
+matches one of them. The time to check the state transitions is measured for:
+
+- ``linear``: all the transitions are evaluated against the event, in order (the behaviour of previous versions).
+- ``dispatch_table``: the candidate transitions are looked up in the state
+  :class:`~baf.core.transition.dispatch_table.TransitionDispatchTable`.
+
+The message matches the intent of the last transition (the worst case for the linear evaluation) or of the middle one.
+
+Usage::
+
+    python -m baf.test.benchmarks.transition_dispatch_benchmark --transitions 5 50 500
+"""
+
+import argparse
+import logging
+from collections import deque
+
+from baf.core.agent import Agent
+from baf.core.session import Session
+from baf.core.state import State
+from baf.exceptions.logger import logger
+from baf.library.transition.events.base_events import ReceiveTextEvent
+from baf.nlp.intent_classifier.intent_classifier_prediction import IntentClassifierPrediction
+from baf.test.benchmarks.utils import BenchmarkPlatform, print_table, timer
+
+
+def linear_check_transitions(state: State, session: Session) -> None:
+    """The linear transitions evaluation of previous versions (without the fallback body)."""
+    for i, next_transition in enumerate(state.transitions):
+        if next_transition.is_event():
+            fallback_deque = deque()
+            while session.events:
+                session.event = session.events.pop()
+                if isinstance(session.event, ReceiveTextEvent):
+                    session.event.predict_intent(session)
+                if next_transition.evaluate(session, session.event):
+                    session.move(next_transition)
+                    session.events.extend(fallback_deque)
+                    return
+                if i < len(state.transitions) - 1:
+                    fallback_deque.appendleft(session.event)
+            session.events.extend(fallback_deque)
+        elif next_transition.is_condition_true(session):
+            session.move(next_transition)
+            return
+
+
+def build_session(num_transitions: int) -> tuple[Session, State, list]:
+    agent = Agent('dispatch_agent')
+    platform = BenchmarkPlatform()
+    agent._platforms.append(platform)
+    state = agent.new_state('state', initial=True)
+    target = agent.new_state('target')
+    intents = [agent.new_intent(f'intent_{i}') for i in range(num_transitions)]
+    for intent in intents:
+        state.when_intent_matched(intent).go_to(target)
+    agent._compile_transitions()
+    session = Session('session', agent, platform)
+    moves = []
+    session.move = moves.append  # Stay in the same state
+    return session, state, intents
+
+
+def run_configuration(mode: str, num_transitions: int, position: str, iterations: int) -> float:
+    session, state, intents = build_session(num_transitions)
+    intent = intents[-1] if position == 'last' else intents[num_transitions // 2]
+    event = ReceiveTextEvent(text=intent.name, session_id=session.id, human=True)
+    event.predicted_intent = IntentClassifierPrediction(intent=intent)
+    event.predicted_intent.state = state.name
+    check_transitions = linear_check_transitions if mode == 'linear' else State.check_transitions
+    with timer() as elapsed:
+        for _ in range(iterations):
+            session.events.appendleft(event)
+            check_transitions(state, session)
+    return elapsed['seconds'] / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--transitions', type=int, nargs='+', default=[5, 50, 500])
+    parser.add_argument('--iterations', type=int, default=20000)
+    args = parser.parse_args()
+    logger.setLevel(logging.WARNING)
+
+    rows = []
+    for num_transitions in args.transitions:
+        for position in ('middle', 'last'):
+            linear = run_configuration('linear', num_transitions, position, args.iterations)
+            dispatch = run_configuration('dispatch_table', num_transitions, position, args.iterations)
+            rows.append([num_transitions, position, linear, dispatch, linear / dispatch])
+    print_table(['transitions', 'matched', 'linear (us)', 'dispatch table (us)', 'speedup'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""Compare the message-to-reply latency of polled and event-driven transition evaluation.
+
+When a message is received, the agent starts a background job and waits in a state until the job stores its result in
+a session variable. Then, a condition transition moves the agent to a state that replies to the user.
+
+- ``polling``: the waiting state uses an arbitrary condition function, evaluated every ``agent.check_transitions_delay``
+  seconds (the behaviour of previous versions).
+- ``event_driven``: the waiting state uses a ``when_variable_matches_operation`` transition, evaluated as soon as the
+  job sets the variable.
+
+The number of transition evaluations while all sessions are idle is also reported.
+
+Usage::
+
+    python -m baf.test.benchmarks.transition_latency_benchmark --sessions 100 --messages 5
+"""
+
+import argparse
+import logging
+import operator
+import threading
+import time
+from datetime import datetime
+
+from baf import CHECK_TRANSITIONS_DELAY, CHECK_TRANSITIONS_POLLING
+from baf.core.agent import Agent
+from baf.core.session import Session
+from baf.core.transition.event import Event
+from baf.exceptions.logger import logger
+from baf.test.benchmarks.utils import BenchmarkPlatform, percentile, print_table
+
+
+class PingEvent(Event):
+    """Event carrying the instant it was sent, to measure the time until the agent replies."""
+
+    def __init__(self, sent_at: float = None, session_id: str = None):
+        super().__init__(name='ping', session_id=session_id, timestamp=datetime.now())
+        self.sent_at: float = sent_at
+
+
+def build_agent(mode: str, delay: float, job_seconds: float) -> tuple[Agent, BenchmarkPlatform]:
+    agent = Agent(f'{mode}_agent')
+    agent.set_property(CHECK_TRANSITIONS_DELAY, delay)
+    agent.set_property(CHECK_TRANSITIONS_POLLING, mode == 'polling')
+    platform = BenchmarkPlatform()
+    agent._platforms.append(platform)
+    idle = agent.new_state('idle', initial=True)
+    waiting = agent.new_state('waiting')
+    done = agent.new_state('done')
+
+    def waiting_body(session: Session) -> None:
+        sent_at = session.event.sent_at
+        session._dictionary.pop('job', None)
+
+        def job():
+            time.sleep(job_seconds)
+            if mode == 'polling':
+                # Previous versions did not react to variable changes
+                session._dictionary['job'] = sent_at
+            else:
+                session.set('job', sent_at)
+
+        threading.Thread(target=job).start()
+
+    def done_body(session: Session) -> None:
+        session.reply(str(session.get('job')))
+
+    waiting.set_body(waiting_body)
+    done.set_body(done_body)
+    idle.when_event(PingEvent()).go_to(waiting)
+    if mode == 'polling':
+        waiting.when_condition(lambda session: session.get('job') is not None).go_to(done)
+        # Keep the idle state polled too, as every state was in previous versions
+        idle.when_condition(lambda session: False).go_to(done)
+    else:
+        waiting.when_variable_matches_operation('job', operator.is_not, None).go_to(done)
+    done.go_to(idle)
+    agent._trained = True
+    platform.start()
+    return agent, platform
+
+
+def count_evaluations() -> dict:
+    """Count the transition evaluations of all sessions, wrapping :meth:`Session.manage_transition`."""
+    counter = {'evaluations': 0}
+    manage_transition = Session.manage_transition
+
+    def counting_manage_transition(session: Session) -> None:
+        counter['evaluations'] += 1
+        manage_transition(session)
+
+    Session.manage_transition = counting_manage_transition
+    return counter
+
+
+def run_configuration(mode: str, delay: float, job_seconds: float, num_sessions: int, num_messages: int,
+                      idle_seconds: float) -> dict:
+    agent, platform = build_agent(mode, delay, job_seconds)
+    counter = count_evaluations()
+    session_ids = [f'session-{i}' for i in range(num_sessions)]
+    for session_id in session_ids:
+        agent.get_or_create_session(session_id, platform)
+
+    expected = 0
+    for _ in range(num_messages):
+        for session_id in session_ids:
+            agent.receive_event(PingEvent(time.perf_counter(), session_id))
+        expected += num_sessions
+        while len(platform.replies) < expected:
+            time.sleep(0.001)
+    latencies = [(replied_at - float(message)) * 1000 for _, message, replied_at in platform.replies]
+
+    evaluations_before = counter['evaluations']
+    time.sleep(idle_seconds)
+    idle_evaluations = counter['evaluations'] - evaluations_before
+    agent.stop()
+    return {
+        'p50_ms': percentile(latencies, 50),
+        'p99_ms': percentile(latencies, 99),
+        'idle_wakeups_per_s': idle_evaluations / idle_seconds / num_sessions,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=100)
+    parser.add_argument('--messages', type=int, default=5, help='messages sent to each session')
+    parser.add_argument('--delay', type=float, default=1.0, help='agent.check_transitions_delay, in seconds')
+    parser.add_argument('--job', type=float, default=0.01, help='duration of the background job, in seconds')
+    parser.add_argument('--idle', type=float, default=3.0, help='seconds to count the idle wakeups')
+    args = parser.parse_args()
+    logger.setLevel(logging.WARNING)
+
+    rows = []
+    for mode in ('polling', 'event_driven'):
+        manage_transition = Session.manage_transition
+        try:
+            result = run_configuration(mode, args.delay, args.job, args.sessions, args.messages, args.idle)
+        finally:
+            Session.manage_transition = manage_transition
+        rows.append([mode, args.sessions, result['p50_ms'], result['p99_ms'], result['idle_wakeups_per_s']])
+    print_table(['evaluation', 'sessions', 'p50 (ms)', 'p99 (ms)', 'idle wakeups/s per session'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Helpers shared by the framework benchmarks.
+
+The benchmarks are standalone scripts (they are not collected by pytest). Run them as modules from the repository
+root, e.g. ``python -m baf.test.benchmarks.session_scheduler_benchmark``.
+"""
+
+import math
+import os
+import resource
+import time
+from contextlib import contextmanager
+from typing import Iterator
+
+from baf.platforms.platform import Platform
+
+
+class BenchmarkPlatform(Platform):
+    """In-memory platform recording, for each agent reply, the time at which it was sent.
+
+    Attributes:
+        replies (list[tuple[str, str, float]]): The replies sent by the agent, as (session_id, message,
+            time.perf_counter()) tuples
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.replies: list[tuple[str, str, float]] = []
+
+    def initialize(self) -> None:
+        pass
+
+    def start(self) -> None:
+        self.running = True
+
+    def stop(self) -> None:
+        self.running = False
+
+    def _send(self, session_id, payload) -> None:
+        pass
+
+    def reply(self, session, message: str) -> None:
+        self.replies.append((session.id, message, time.perf_counter()))
+
+
+def percentile(values: list[float], p: float) -> float:
+    """Get the p-th percentile (0-100) of a list of values, using the nearest-rank method."""
+    if not values:
+        return float('nan')
+    ordered = sorted(values)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def current_rss_mb() -> float:
+    """Get the resident set size of the current process, in MB (falls back to the peak RSS if /proc is missing)."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+@contextmanager
+def timer() -> Iterator[dict]:
+    """Measure the wall-clock time of a block of code. The elapsed seconds are stored in the ``seconds`` key."""
+    result = {}
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result['seconds'] = time.perf_counter() - start
+
+
+def print_table(headers: list[str], rows: list[list]) -> None:
+    """Print a list of rows as an aligned text table."""
+    cells = [[str(h) for h in headers]] + [[f'{c:.3f}' if isinstance(c, float) else str(c) for c in row]
+                                           for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(headers))]
+    for i, row in enumerate(cells):
+        print('  '.join(cell.rjust(width) for cell, width in zip(row, widths)))
+        if i == 0:
+            print('  '.join('-' * width for width in widths))
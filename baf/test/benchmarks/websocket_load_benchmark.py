@@ -0,0 +1,162 @@
+"""Load test of the WebSocket platform: connections per process and reply latency with simulated clients.
+
+An echo agent (which replies to each message with the same message) runs a WebSocket platform. Simulated clients (all
+in the asyncio event loop of the benchmark process) connect to it and send messages, measuring the time until each
+reply is received. A fraction of the clients can be slow consumers, which do not read their replies.
+
+- ``sync``: each connection is served by its own thread, and the replies are written by the session threads (as in
+  previous versions).
+- ``asyncio``: all the connections are served by one event loop, with a bounded outbound queue per connection.
+
+The agent uses the ``shared_loops`` session scheduler, so the number of threads of the process only depends on the
+WebSocket server.
+
+Usage::
+
+    python -m baf.test.benchmarks.websocket_load_benchmark --clients 1000 --messages 5 --slow-clients 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import socket
+import threading
+import time
+
+from websockets.client import connect
+
+from baf import AGENT_SCHEDULER, AGENT_SCHEDULER_WORKERS
+from baf.core.agent import Agent
+from baf.core.session import Session
+from baf.exceptions.logger import logger
+from baf.library.transition.events.base_events import ReceiveTextEvent
+from baf.platforms.payload import Payload, PayloadAction, PayloadEncoder
+from baf.platforms.websocket import WEBSOCKET_PORT, WEBSOCKET_SEND_QUEUE_SIZE, WEBSOCKET_SERVER, \
+    WEBSOCKET_SLOW_CONSUMER_POLICY, WEBSOCKET_SEND_BLOCK_TIMEOUT
+from baf.test.benchmarks.utils import current_rss_mb, percentile, print_table
+
+
+def build_agent(server: str, port: int, policy: str, queue_size: int) -> Agent:
+    agent = Agent(f'{server}_echo_agent')
+    agent.set_property(WEBSOCKET_PORT, port)
+    agent.set_property(WEBSOCKET_SERVER, server)
+    agent.set_property(WEBSOCKET_SLOW_CONSUMER_POLICY, policy)
+    agent.set_property(WEBSOCKET_SEND_QUEUE_SIZE, queue_size)
+    agent.set_property(WEBSOCKET_SEND_BLOCK_TIMEOUT, 2.0)
+    agent.set_property(AGENT_SCHEDULER, 'shared_loops')
+    agent.set_property(AGENT_SCHEDULER_WORKERS, 4)
+    platform = agent.use_websocket_platform(use_ui=False)
+    idle = agent.new_state('idle', initial=True)
+    echo = agent.new_state('echo')
+
+    def echo_body(session: Session) -> None:
+        message = session.event.message
+        # Slow clients get a burst of large replies, which they never read
+        for _ in range(200 if message.startswith('slow') else 1):
+            platform.reply(session, message if not message.startswith('slow') else message * 4000)
+
+    echo.set_body(echo_body)
+    idle.when_event(ReceiveTextEvent()).go_to(echo)
+    echo.go_to(idle)
+    agent._trained = True
+    agent.run(train=False, sleep=False)
+    deadline = time.monotonic() + 10
+    while not platform.running and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return agent
+
+
+def _payload(message: str) -> str:
+    return json.dumps(Payload(action=PayloadAction.USER_MESSAGE, message=message), cls=PayloadEncoder)
+
+
+async def simulate(port: int, clients: int, messages: int, slow_clients: int, stats: dict) -> list[float]:
+    latencies = []
+    connected = asyncio.Event()
+    pending = [clients]
+
+    async def client(i: int) -> None:
+        try:
+            websocket = await connect(f'ws://localhost:{port}?session_id=client_{i}', open_timeout=60, max_queue=1)
+        except Exception:
+            stats['failed'] += 1
+            pending[0] -= 1
+            if pending[0] == 0:
+                connected.set()
+            return
+        stats['connected'] += 1
+        pending[0] -= 1
+        if pending[0] == 0:
+            connected.set()
+        try:
+            await connected.wait()
+            if i < slow_clients:
+                await websocket.send(_payload(f'slow {i}'))
+                # Never read the replies
+                await asyncio.sleep(3)
+                return
+            for j in range(messages):
+                start = time.perf_counter()
+                await websocket.send(_payload(f'{i}-{j}'))
+                await asyncio.wait_for(websocket.recv(), 30)
+                stats['last_reply'] = time.perf_counter()
+                latencies.append((stats['last_reply'] - start) * 1000)
+        except Exception:
+            stats['errors'] += 1
+        finally:
+            await websocket.close()
+
+    await asyncio.gather(*[client(i) for i in range(clients)], return_exceptions=True)
+    return latencies
+
+
+def run(server: str, clients: int, messages: int, slow_fraction: float, policy: str, queue_size: int) -> list:
+    with socket.socket() as sock:
+        sock.bind(('localhost', 0))
+        port = sock.getsockname()[1]
+    agent = build_agent(server, port, policy, queue_size)
+    threads_before = threading.active_count()
+    stats = {'connected': 0, 'failed': 0, 'errors': 0, 'last_reply': 0.0}
+    peak_threads = [threads_before]
+    sampling = threading.Event()
+
+    def sample_threads():
+        while not sampling.wait(0.1):
+            peak_threads[0] = max(peak_threads[0], threading.active_count())
+
+    sampler = threading.Thread(target=sample_threads)
+    sampler.start()
+    start = time.perf_counter()
+    latencies = asyncio.run(simulate(port, clients, messages, int(clients * slow_fraction), stats))
+    # The throughput of the clients that read their replies
+    elapsed = stats['last_reply'] - start
+    sampling.set()
+    sampler.join()
+    rss = current_rss_mb()
+    agent.stop()
+    return [server, stats['connected'], stats['failed'], peak_threads[0] - threads_before, rss,
+            len(latencies) / elapsed, percentile(latencies, 50), percentile(latencies, 99)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=1000)
+    parser.add_argument('--messages', type=int, default=5, help='messages sent by each (not slow) client')
+    parser.add_argument('--slow-clients', type=float, default=0.05, help='fraction of clients that do not read')
+    parser.add_argument('--policy', default='disconnect', choices=['drop', 'disconnect', 'block'],
+                        help='slow consumer policy of the asyncio server')
+    parser.add_argument('--queue-size', type=int, default=16, help='outbound queue size of the asyncio server')
+    parser.add_argument('--servers', nargs='+', default=['sync', 'asyncio'])
+    args = parser.parse_args()
+    logger.setLevel(logging.WARNING)
+
+    rows = []
+    for server in args.servers:
+        rows.append(run(server, args.clients, args.messages, args.slow_clients, args.policy, args.queue_size))
+    print_table(['server', 'connected', 'failed', 'extra threads', 'RSS (MB)', 'replies/s', 'p50 (ms)', 'p99 (ms)'],
+                rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,9 +2,21 @@
 
 from __future__ import annotations
 
+import time
+from datetime import datetime, timedelta
+from typing import Callable
+
 import pytest
+from sqlalchemy import create_engine
 
 from baf.core.agent import Agent
+from baf.core.message import Message, MessageType
+from baf.core.session import Session
+from baf.core.transition.transition import Transition
+from baf.db.monitoring_db import MonitoringDB
+from baf.library.intent.intent_library import fallback_intent
+from baf.library.transition.events.base_events import ReceiveTextEvent
+from baf.nlp.intent_classifier.intent_classifier_prediction import IntentClassifierPrediction
 from baf.platforms.platform import Platform
 
 
@@ -54,3 +66,81 @@ def agent_with_platform(fake_platform) -> Agent:
     a = Agent("test_agent_platform")
     a._platforms.append(fake_platform)
     return a
+
+
+@pytest.fixture
+def wait_for() -> Callable[..., bool]:
+    """Wait until a condition holds (e.g. a session processed its events in another thread), up to a timeout (5
+    seconds by default). Returns whether the condition holds."""
+    def wait(predicate: Callable[[], bool], timeout: float = 5.0) -> bool:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if predicate():
+                return True
+            time.sleep(0.01)
+        return predicate()
+    return wait
+
+
+@pytest.fixture
+def db_url(tmp_path) -> str:
+    """URL of a SQLite database file, unique for each test."""
+    return f'sqlite:///{tmp_path / "monitoring.db"}'
+
+
+@pytest.fixture
+def monitoring_db(db_url) -> MonitoringDB:
+    """Monitoring database connected to a fresh SQLite database, with its tables created."""
+    monitoring_db = MonitoringDB()
+    monitoring_db.set_engine(create_engine(db_url))
+    monitoring_db.initialize_db()
+    yield monitoring_db
+    if monitoring_db.connected:
+        monitoring_db.close_connection()
+
+
+@pytest.fixture
+def new_session(agent, fake_platform) -> Callable[..., Session]:
+    """Create a session of the test agent and insert it into a monitoring database."""
+    def new(monitoring_db: MonitoringDB, session_id: str = 'sid') -> Session:
+        session = Session(session_id, agent, fake_platform)
+        monitoring_db.insert_session(session)
+        return session
+    return new
+
+
+@pytest.fixture
+def session(new_session, monitoring_db) -> Session:
+    """Session of the test agent, inserted into the monitoring database."""
+    return new_session(monitoring_db)
+
+
+@pytest.fixture
+def fill_monitoring_db(fake_platform) -> Callable[..., list[Session]]:
+    """Insert the records of 2 agents with 3 sessions each (chat messages from the given start instant, transitions,
+    intent predictions and events) into a monitoring database. Returns the sessions."""
+    def fill(monitoring_db: MonitoringDB, start: datetime,
+             message_interval: timedelta = timedelta(minutes=25)) -> list[Session]:
+        all_sessions = []
+        for a in range(2):
+            agent = Agent(f'agent_{a}')
+            states = [agent.new_state(f'state_{i}', initial=i == 0) for i in range(3)]
+            for s in range(3):
+                session = Session(f'session_{a}_{s}', agent, fake_platform)
+                monitoring_db.insert_session(session)
+                all_sessions.append(session)
+                for i in range(8):
+                    monitoring_db.insert_chat(session, Message(t=MessageType.STR, content=f'{a}-{s}-{i}',
+                                                               is_user=i % 3 != 0,
+                                                               timestamp=start + i * message_interval
+                                                               + timedelta(minutes=s)))
+                for i in range(s + 2):
+                    monitoring_db.insert_transition(session, Transition(f't{i}', states[i % 3], states[(i + 1) % 3],
+                                                                        None, None))
+                for i in range(3):
+                    prediction = IntentClassifierPrediction(fallback_intent, 0.1 * (i + s), f'sentence {i}', [])
+                    monitoring_db.insert_intent_prediction(session, states[0], prediction)
+                monitoring_db.insert_event(session, ReceiveTextEvent('hello', session.id))
+        monitoring_db.insert_event(None, ReceiveTextEvent('broadcast'))
+        return all_sessions
+    return fill
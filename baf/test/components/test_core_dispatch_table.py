@@ -0,0 +1,171 @@
+"""Tests for baf.core.transition.dispatch_table.TransitionDispatchTable and its use in State.check_transitions."""
+
+import operator
+import random
+from collections import deque
+from datetime import datetime
+
+import pytest
+
+from baf.core.agent import Agent
+from baf.core.session import Session
+from baf.core.state import State
+from baf.core.transition.event import Event
+from baf.library.intent.intent_library import fallback_intent
+from baf.library.transition.events.base_events import ReceiveJSONEvent, ReceiveTextEvent, WildcardEvent
+from baf.nlp.intent_classifier.intent_classifier_prediction import IntentClassifierPrediction
+
+
+class PingEvent(Event):
+    def __init__(self, channel: str = 'a', session_id: str = None):
+        super().__init__(name=f'ping_{channel}', session_id=session_id, timestamp=datetime.now())
+
+
+class AnyPingEvent(Event):
+    """Custom event that matches events of other classes, so it cannot be indexed by class."""
+
+    def __init__(self):
+        super().__init__(name='any_ping', timestamp=datetime.now())
+
+    def is_matching(self, event: Event) -> bool:
+        return event.name.startswith('ping')
+
+
+def _reference_check_transitions(state, session: Session) -> None:
+    """The linear transitions evaluation the dispatch table replaces, used as the reference behavior."""
+    last_event = session.event
+    run_fallback = False
+    for i, next_transition in enumerate(state.transitions):
+        if next_transition.is_event():
+            fallback_deque = deque()
+            while session.events:
+                session.event = session.events.pop()
+                if next_transition.evaluate(session, session.event):
+                    session.move(next_transition)
+                    session.events.extend(fallback_deque)
+                    return
+                if isinstance(session.event, ReceiveTextEvent) and session.event.human:
+                    run_fallback = True
+                    if i < len(state.transitions) - 1:
+                        fallback_deque.appendleft(session.event)
+                else:
+                    fallback_deque.appendleft(session.event)
+            session.events.extend(fallback_deque)
+        else:
+            if next_transition.is_condition_true(session):
+                session.move(next_transition)
+                return
+    if run_fallback:
+        state._fallback_body(session)
+    session.event = last_event
+
+
+def _text_event(intent, state_name: str, human: bool) -> ReceiveTextEvent:
+    event = ReceiveTextEvent(text=intent.name, session_id='sid', human=human)
+    event.predicted_intent = IntentClassifierPrediction(intent=intent)
+    event.predicted_intent.state = state_name
+    return event
+
+
+def test_candidates_are_indexed_by_event_class_and_intent(agent):
+    hello = agent.new_intent('hello')
+    bye = agent.new_intent('bye')
+    s0 = agent.new_state('s0', initial=True)
+    s1 = agent.new_state('s1')
+    s0.when_intent_matched(hello).go_to(s1)  # 0
+    s0.when_event(PingEvent('a')).go_to(s1)  # 1
+    s0.when_intent_matched(bye).go_to(s1)  # 2
+    s0.when_event(AnyPingEvent()).go_to(s1)  # 3
+    s0.when_event().go_to(s1)  # 4
+    table = s0.compile_transitions()
+    assert table.candidates(_text_event(hello, 's0', True)) == (0, 3, 4)
+    assert table.candidates(_text_event(bye, 's0', True)) == (2, 3, 4)
+    assert table.candidates(PingEvent('b')) == (1, 3, 4)
+    assert table.candidates(ReceiveJSONEvent({'key': 'value'})) == (3, 4)
+    assert table.first_event_transition == 0
+    assert table.last_is_event
+
+
+def test_compiled_table_is_refreshed_when_transitions_are_added(agent):
+    s0 = agent.new_state('s0', initial=True)
+    s1 = agent.new_state('s1')
+    s0.when_event(PingEvent('a')).go_to(s1)
+    table = s0.compile_transitions()
+    assert s0.compile_transitions() is table
+    s0.when_event(PingEvent('b')).go_to(s1)
+    assert s0.compile_transitions() is not table
+    assert s0.compile_transitions().candidates(PingEvent('b')) == (0, 1)
+
+
+def test_compiled_table_is_refreshed_when_transitions_are_replaced(agent):
+    s0 = agent.new_state('s0', initial=True)
+    s1 = agent.new_state('s1')
+    s0.when_event(PingEvent('a')).go_to(s1)
+    s0.when_event(ReceiveJSONEvent()).go_to(s1)
+    assert s0.compile_transitions().candidates(PingEvent('a')) == (0,)
+    s0.transitions.reverse()
+    assert s0.compile_transitions().candidates(PingEvent('a')) == (1,)
+    s1.when_event(ReceiveJSONEvent()).go_to(s0)
+    s0.transitions[1] = s1.transitions.pop()
+    assert s0.compile_transitions().candidates(PingEvent('a')) == ()
+    assert s0.compile_transitions().transitions == s0.transitions
+
+
+def test_agent_train_compiles_transitions(agent):
+    s0 = agent.new_state('s0', initial=True)
+    s1 = agent.new_state('s1')
+    s0.when_event(PingEvent('a')).go_to(s1)
+    agent._compile_transitions()
+    assert s0._dispatch_table is not None and len(s0._dispatch_table) == 1
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_check_transitions_matches_linear_evaluation(fake_platform, seed):
+    rng = random.Random(seed)
+    agent = Agent('dispatch_agent')
+    agent._platforms.append(fake_platform)
+    intents = [agent.new_intent(f'intent_{i}') for i in range(4)]
+    state = agent.new_state('state', initial=True)
+    dest = agent.new_state('dest')
+    fallbacks = []
+
+    def fallback_body(session: Session):
+        fallbacks.append(session.event)
+
+    state.set_fallback_body(fallback_body)
+    for intent in rng.sample(intents, rng.randint(0, len(intents))):
+        state.when_intent_matched(intent).go_to(dest)
+    builders = [
+        lambda: state.when_event(PingEvent(rng.choice('ab'))),
+        lambda: state.when_event(AnyPingEvent()),
+        lambda: state.when_event(WildcardEvent()).with_condition(lambda session: session.get('flag') is True),
+        lambda: state.when_variable_matches_operation('count', operator.gt, rng.randint(0, 3)),
+        lambda: state.when_condition(lambda session: session.get('flag') is False),
+    ]
+    for _ in range(rng.randint(0, 4)):
+        rng.choice(builders)().go_to(dest)
+    if rng.random() < 0.5:
+        state.when_no_intent_matched().go_to(dest)
+    rng.shuffle(state.transitions)  # Any transition order
+
+    events = []
+    for _ in range(rng.randint(0, 6)):
+        if rng.random() < 0.6:
+            intent = rng.choice(intents + [fallback_intent])
+            events.append(_text_event(intent, state.name, human=rng.random() < 0.7))
+        else:
+            events.append(PingEvent(rng.choice('abc'), 'sid'))
+    variables = {'count': rng.randint(0, 4), 'flag': rng.choice([True, False, None])}
+
+    results = []
+    for check_transitions in (_reference_check_transitions, State.check_transitions):
+        fallbacks.clear()
+        session = Session('sid', agent, fake_platform)
+        session._dictionary = dict(variables)
+        moves = []
+        session.move = moves.append
+        for event in events:
+            session.events.appendleft(event)
+        check_transitions(state, session)
+        results.append(([t.name for t in moves], list(session.events), len(fallbacks)))
+    assert results[0] == results[1]
@@ -0,0 +1,149 @@
+"""Tests for the lazy content storage of baf.core.file.File, and the memory used to upload a file."""
+
+import base64
+import hashlib
+import io
+import json
+import os
+import pickle
+import tracemalloc
+from datetime import datetime
+
+import pytest
+
+from baf.core.file import File
+from baf.core.message import Message, MessageType
+from baf.core.session import Session
+from baf.db import DB_MONITORING
+from baf.platforms.payload import BINARY_CODEC, JSON_CODEC, Payload, PayloadAction
+
+CONTENT = os.urandom(100_000)
+CONTENT_BASE64 = base64.b64encode(CONTENT).decode('utf-8')
+
+
+@pytest.fixture(params=['data', 'base64', 'path', 'stream'])
+def file(request, tmp_path) -> File:
+    """A file with :data:`CONTENT`, created from each kind of input."""
+    if request.param == 'data':
+        return File(file_name='f.bin', file_type='bin', file_data=CONTENT)
+    if request.param == 'base64':
+        return File(file_name='f.bin', file_type='bin', file_base64=CONTENT_BASE64)
+    if request.param == 'path':
+        path = tmp_path / 'f.bin'
+        path.write_bytes(CONTENT)
+        return File(file_path=str(path))
+    return File(file_name='f.bin', file_type='bin', file_stream=io.BytesIO(CONTENT))
+
+
+def test_content_representations(file):
+    assert file.name == 'f.bin'
+    assert file.type == 'bin'
+    assert file.data == CONTENT
+    assert file.base64 == CONTENT_BASE64
+    assert file.size == len(CONTENT)
+    assert file.sha256 == hashlib.sha256(CONTENT).hexdigest()
+
+
+@pytest.mark.parametrize('chunk_size', [1000, 1024, 65536])
+def test_chunks(file, chunk_size):
+    assert b''.join(file.iter_bytes(chunk_size)) == CONTENT
+    assert ''.join(file.iter_base64(chunk_size)) == CONTENT_BASE64
+
+
+def test_save(file, tmp_path):
+    path = tmp_path / 'saved.bin'
+    file.save(str(path))
+    assert path.read_bytes() == CONTENT
+
+
+def test_json_string(file):
+    assert json.loads(file.get_json_string()) == {'name': 'f.bin', 'type': 'bin', 'base64': CONTENT_BASE64}
+    assert File.decode(file.get_json_string()).data == CONTENT
+
+
+def test_content_is_stored_once():
+    file = File(file_data=CONTENT)
+    assert file.base64 == CONTENT_BASE64
+    assert file._base64 is None
+    file = File(file_base64=CONTENT_BASE64)
+    assert file.data == CONTENT
+    assert file._data is None
+
+
+def test_size_with_padding():
+    for size in range(1, 7):
+        assert File(file_base64=base64.b64encode(CONTENT[:size]).decode('utf-8')).size == size
+
+
+def test_large_stream_rolls_over_to_disk(monkeypatch):
+    monkeypatch.setattr('baf.core.file.SPOOL_MAX_SIZE', 1000)
+    file = File(file_stream=io.BytesIO(CONTENT))
+    assert file._spool._rolled
+    assert file.data == CONTENT
+
+
+def test_base64_setter():
+    file = File(file_data=b'old')
+    file.sha256
+    file.base64 = CONTENT_BASE64
+    assert file.data == CONTENT
+    assert file.sha256 == hashlib.sha256(CONTENT).hexdigest()
+
+
+def test_to_dict_not_encoded():
+    assert File(file_data=CONTENT).to_dict(encoded=False)['base64'] == CONTENT
+    assert File(file_base64=CONTENT_BASE64).to_dict(encoded=False)['base64'] == CONTENT_BASE64
+    assert File(file_data=CONTENT).to_dict()['base64'] == CONTENT_BASE64
+    assert File.from_dict(File(file_data=CONTENT).to_dict(encoded=False)).data == CONTENT
+
+
+def test_pickle(file):
+    restored = pickle.loads(pickle.dumps(file))
+    assert (restored.name, restored.type, restored.data) == ('f.bin', 'bin', CONTENT)
+    assert b''.join(restored.iter_bytes(1000)) == CONTENT
+
+
+def test_base64_with_line_breaks():
+    file = File(file_name='f.bin', file_type='bin', file_base64=base64.encodebytes(CONTENT).decode('utf-8'))
+    assert file.base64 == CONTENT_BASE64
+    assert file.size == len(CONTENT)
+    assert json.loads(file.get_json_string())['base64'] == CONTENT_BASE64
+
+
+def test_invalid_input():
+    with pytest.raises(ValueError):
+        File(file_name='f.bin')
+    for file_base64 in ['Zm9v!', 'Zm9vY', 'Zm9vYg=', 'Zm9=vYg=']:
+        with pytest.raises(ValueError):
+            File(file_base64=file_base64)
+    with pytest.raises(ValueError):
+        File(file_data=b'foo').base64 = 'Zm9vY'
+
+
+UPLOAD_SIZE = 8 * 1024 * 1024
+
+
+@pytest.mark.parametrize('file_storage, codec, max_peak', [
+    ('hash', BINARY_CODEC, 1.25),
+    ('hash', JSON_CODEC, 1.75),
+    # The base64 string of the file is copied by json.dumps to escape it
+    ('inline', BINARY_CODEC, 5.25),
+])
+def test_upload_peak_memory(monitoring_db, agent, fake_platform, tmp_path, file_storage, codec, max_peak):
+    """The peak memory used to receive a file and store it in the monitoring database, relative to the file size."""
+    monitoring_db.initialize_db(file_storage=file_storage)
+    agent._monitoring_db = monitoring_db
+    agent.set_property(DB_MONITORING, True)
+    session = Session('sid', agent, fake_platform)
+    monitoring_db.insert_session(session)
+    frame = codec.encode(Payload(action=PayloadAction.USER_FILE, message={
+        'name': 'f.bin', 'type': 'bin', 'base64': os.urandom(UPLOAD_SIZE)
+    }))
+    tracemalloc.start()
+    try:
+        file = File.from_dict(Payload.decode(frame).message)
+        session.save_message(Message(t=MessageType.FILE, content=file, is_user=True, timestamp=datetime.now()))
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert peak < max_peak * UPLOAD_SIZE
@@ -0,0 +1,274 @@
+"""Tests for baf.core.hibernation session hibernation."""
+
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from baf import AGENT_SCHEDULER, AGENT_SESSIONS_IDLE_TTL, AGENT_SESSIONS_MAX_RESIDENT, AGENT_SESSIONS_SNAPSHOT_PATH
+from baf.core.agent import Agent
+from baf.core.file import File
+from baf.core.session import Session
+from baf.core.transition.event import Event
+from baf.db import DB_MONITORING
+from baf.db.monitoring_db import TABLE_EVENT
+from baf.library.transition.events.base_events import ReceiveFileEvent
+
+
+class PingEvent(Event):
+    def __init__(self, n: int = None, session_id: str = None):
+        super().__init__(name='ping', session_id=session_id, timestamp=datetime.now())
+        self.n = n
+
+
+class UnlockEvent(Event):
+    def __init__(self, session_id: str = None):
+        super().__init__(name='unlock', session_id=session_id, timestamp=datetime.now())
+
+
+def _build_counter_agent(agent: Agent, tmp_path, properties: dict) -> Agent:
+    agent.set_property(AGENT_SESSIONS_SNAPSHOT_PATH, str(tmp_path / 'snapshots.db'))
+    for prop, value in properties.items():
+        agent.set_property(prop, value)
+    idle = agent.new_state('idle', initial=True)
+    count = agent.new_state('count')
+
+    def count_body(session: Session):
+        session.set('count', session.get('count', 0) + 1)
+        session.reply(f"{session.event.n}:{session.get('count')}")
+
+    count.set_body(count_body)
+    idle.when_event(PingEvent()).go_to(count)
+    count.go_to(idle)
+    return agent
+
+
+def test_hibernation_disabled_by_default(agent):
+    assert agent.hibernator is None
+
+
+def test_max_resident_hibernates_least_recently_used(agent_with_platform, fake_platform, tmp_path, wait_for):
+    agent = _build_counter_agent(agent_with_platform, tmp_path, {AGENT_SESSIONS_MAX_RESIDENT: 2})
+    fake_platform.start()
+    try:
+        for i in range(3):
+            agent.get_or_create_session(f'session-{i}', fake_platform)
+        assert set(agent._sessions) == {'session-1', 'session-2'}
+        assert agent.hibernator.hibernated_sessions == ['session-0']
+        # Waking session-0 up hibernates the least recently used one (session-1)
+        agent.receive_event(PingEvent(0, 'session-0'))
+        assert set(agent._sessions) == {'session-0', 'session-2'}
+        assert agent.hibernator.hibernated_sessions == ['session-1']
+        assert wait_for(lambda: fake_platform.replies == [('session-0', '0:1')])
+    finally:
+        agent.stop()
+
+
+def test_idle_session_is_hibernated_and_restored(agent_with_platform, fake_platform, tmp_path, wait_for):
+    agent = _build_counter_agent(agent_with_platform, tmp_path, {AGENT_SESSIONS_IDLE_TTL: 0.1})
+    fake_platform.start()
+    try:
+        session = agent.get_or_create_session('session', fake_platform, username='alice')
+        agent.receive_event(PingEvent(0, 'session'))
+        assert wait_for(lambda: len(fake_platform.replies) == 1)
+        assert wait_for(lambda: agent.hibernator.is_hibernated('session'))
+        assert 'session' not in agent._sessions
+        assert session._event_loop is None
+
+        restored = agent.get_or_create_session('session', fake_platform)
+        assert restored is not session
+        assert restored.current_state.name == 'idle'
+        assert restored.get('count') == 1
+        assert restored._username == 'alice'
+        agent.receive_event(PingEvent(1, 'session'))
+        assert wait_for(lambda: fake_platform.replies == [('session', '0:1'), ('session', '1:2')])
+    finally:
+        agent.stop()
+
+
+@pytest.mark.parametrize('scheduler', ['thread_per_session', 'shared_loops'])
+def test_no_message_lost_across_hibernation_cycles(agent_with_platform, fake_platform, tmp_path, scheduler, wait_for):
+    agent = _build_counter_agent(agent_with_platform, tmp_path, {AGENT_SESSIONS_IDLE_TTL: 0.02,
+                                                                 AGENT_SCHEDULER: scheduler})
+    fake_platform.start()
+    session_ids = ['session-0', 'session-1', 'session-2']
+    num_events = 30
+    try:
+        for session_id in session_ids:
+            agent.get_or_create_session(session_id, fake_platform)
+        for n in range(num_events):
+            for session_id in session_ids:
+                agent.receive_event(PingEvent(n, session_id))
+            # Give the sweeper the chance to hibernate sessions between events
+            time.sleep(0.01 * (n % 4))
+        assert wait_for(lambda: len(fake_platform.replies) == len(session_ids) * num_events)
+        for session_id in session_ids:
+            replies = [message for sid, message in fake_platform.replies if sid == session_id]
+            assert replies == [f'{n}:{n + 1}' for n in range(num_events)]
+    finally:
+        agent.stop()
+
+
+def _build_lock_agent(agent: Agent, tmp_path, snapshot_path: str = None) -> Agent:
+    """Agent whose sessions do not consume Ping events until they receive an UnlockEvent."""
+    agent.set_property(AGENT_SESSIONS_SNAPSHOT_PATH, snapshot_path or str(tmp_path / 'snapshots.db'))
+    agent.set_property(AGENT_SESSIONS_MAX_RESIDENT, 10)
+    locked = agent.new_state('locked', initial=True)
+    unlocked = agent.new_state('unlocked')
+
+    def unlocked_body(session: Session):
+        session.reply(str(getattr(session.event, 'n', 'unlocked')))
+
+    unlocked.set_body(unlocked_body)
+    locked.when_event(UnlockEvent()).go_to(unlocked)
+    unlocked.when_event(PingEvent()).go_to(unlocked)
+    return agent
+
+
+def test_hibernated_session_keeps_pending_events(agent_with_platform, fake_platform, tmp_path, wait_for):
+    agent = _build_lock_agent(agent_with_platform, tmp_path)
+    fake_platform.start()
+    try:
+        session = agent.get_or_create_session('session', fake_platform)
+        agent.receive_event(PingEvent(0, 'session'))
+        agent.receive_event(PingEvent(1, 'session'))
+        assert wait_for(lambda: session._event_loop is not None and len(session.events) == 2)
+        assert agent.hibernator.hibernate(session) is True
+        # Broadcasted events are also delivered to hibernated sessions
+        agent.receive_event(PingEvent(2))
+        assert agent.hibernator.is_hibernated('session')
+        agent.receive_event(UnlockEvent('session'))
+        assert wait_for(lambda: [m for _, m in fake_platform.replies] == ['unlocked', '0', '1', '2'])
+    finally:
+        agent.stop()
+
+
+def test_pending_events_are_kept_when_agent_stops(agent_with_platform, fake_platform, tmp_path, wait_for):
+    agent = _build_lock_agent(agent_with_platform, tmp_path)
+    fake_platform.start()
+    for session_id in ('session', 'idle'):
+        assert agent.hibernator.hibernate(agent.get_or_create_session(session_id, fake_platform)) is True
+    agent.hibernator.deliver('session', PingEvent(0, 'session'))
+    agent.stop()
+    # Only the session with pending events is restored in the next run
+    agent = _build_lock_agent(Agent('test_agent_platform'), tmp_path)
+    agent._platforms.append(fake_platform)
+    fake_platform.start()
+    try:
+        assert agent.hibernator.hibernated_sessions == ['session']
+        agent.receive_event(UnlockEvent('session'))
+        assert wait_for(lambda: [m for _, m in fake_platform.replies] == ['unlocked', '0'])
+    finally:
+        agent.stop()
+
+
+def test_pending_events_in_memory_are_discarded_when_agent_stops(agent_with_platform, fake_platform, tmp_path,
+                                                                 caplog):
+    agent = _build_lock_agent(agent_with_platform, tmp_path, snapshot_path=':memory:')
+    fake_platform.start()
+    assert agent.hibernator.hibernate(agent.get_or_create_session('session', fake_platform)) is True
+    agent.receive_event(PingEvent(0))
+    agent.receive_event(PingEvent(1))
+    agent.stop()
+    assert any(record.getMessage() == '2 pending events of hibernated sessions were discarded'
+               for record in caplog.records)
+
+
+def test_unserializable_session_stays_resident(agent_with_platform, fake_platform, tmp_path, monkeypatch, wait_for):
+    agent = _build_counter_agent(agent_with_platform, tmp_path, {AGENT_SESSIONS_MAX_RESIDENT: 10})
+    fake_platform.start()
+    try:
+        session = agent.get_or_create_session('session', fake_platform)
+        session.set('lock', threading.Lock())
+        stops = []
+        stop_event_thread = session._stop_event_thread
+        monkeypatch.setattr(session, '_stop_event_thread', lambda: stops.append(1) or stop_event_thread())
+        dumps = []
+        dump = agent.hibernator._dump
+        monkeypatch.setattr(agent.hibernator, '_dump', lambda s: dumps.append(1) or dump(s))
+        assert agent.hibernator.hibernate(session) is False
+        assert agent._sessions['session'] is session
+        # The runtime of the session is not released, and the session is not serialized again
+        assert agent.hibernator.hibernate(session) is False
+        assert stops == []
+        assert dumps == [1]
+        agent.receive_event(PingEvent(0, 'session'))
+        assert wait_for(lambda: fake_platform.replies == [('session', '0:1')])
+        # Once the data changes, the session can be hibernated
+        session.delete('lock')
+        assert agent.hibernator.hibernate(session) is True
+        assert stops == [1]
+    finally:
+        agent.stop()
+
+
+def test_close_hibernated_session_discards_snapshot(agent_with_platform, fake_platform, tmp_path):
+    agent = _build_counter_agent(agent_with_platform, tmp_path, {AGENT_SESSIONS_MAX_RESIDENT: 10})
+    fake_platform.start()
+    try:
+        session = agent.get_or_create_session('session', fake_platform)
+        session.set('count', 5)
+        assert agent.hibernator.hibernate(session) is True
+        agent.close_session('session')
+        assert not agent.hibernator.is_hibernated('session')
+        assert agent.get_or_create_session('session', fake_platform).get('count') is None
+    finally:
+        agent.stop()
+
+
+def test_receive_event_for_unknown_session_raises(agent_with_platform, tmp_path):
+    agent = _build_counter_agent(agent_with_platform, tmp_path, {AGENT_SESSIONS_MAX_RESIDENT: 10})
+    with pytest.raises(KeyError):
+        agent.receive_event(PingEvent(0, 'unknown'))
+
+
+def test_event_of_session_hibernated_concurrently_is_monitored(agent_with_platform, fake_platform, monitoring_db,
+                                                               tmp_path, monkeypatch, wait_for):
+    agent = agent_with_platform
+    agent.set_property(AGENT_SESSIONS_SNAPSHOT_PATH, str(tmp_path / 'snapshots.db'))
+    agent.set_property(AGENT_SESSIONS_MAX_RESIDENT, 10)
+    agent._monitoring_db = monitoring_db
+    agent.set_property(DB_MONITORING, True)
+    # The event is not consumed, so the session can be hibernated right after receiving it
+    agent.new_state('locked', initial=True).when_event(UnlockEvent()).go_to(agent.new_state('unlocked'))
+    fake_platform.start()
+    try:
+        session = agent.get_or_create_session('session', fake_platform)
+        assert wait_for(lambda: session._event_loop is not None)
+        # The session is hibernated (e.g. by the idle sweeper) before the event is stored in the monitoring DB
+        monkeypatch.setattr(agent.hibernator, 'enforce_limits', lambda: agent.hibernator.hibernate(session))
+        agent.receive_event(PingEvent(0, 'session'))
+        assert agent.hibernator.is_hibernated('session')
+        events = monitoring_db.select_records(TABLE_EVENT, session_ids=['session'])
+        assert events['event'].tolist() == ['ping']
+    finally:
+        agent.stop()
+
+
+def test_session_with_files_is_hibernated(agent_with_platform, fake_platform, tmp_path, wait_for):
+    agent = agent_with_platform
+    agent.set_property(AGENT_SESSIONS_SNAPSHOT_PATH, str(tmp_path / 'snapshots.db'))
+    agent.set_property(AGENT_SESSIONS_MAX_RESIDENT, 10)
+    idle = agent.new_state('idle', initial=True)
+    upload = agent.new_state('upload')
+
+    def upload_body(session: Session):
+        session.set('file', session.event.file)
+        session.reply(session.event.file.name)
+
+    upload.set_body(upload_body)
+    idle.when_file_received().go_to(upload)
+    fake_platform.start()
+    try:
+        session = agent.get_or_create_session('session', fake_platform)
+        agent.receive_event(ReceiveFileEvent(file=File(file_name='f.txt', file_type='txt', file_data=b'content'),
+                                             session_id='session', human=True))
+        assert wait_for(lambda: fake_platform.replies == [('session', 'f.txt')])
+        assert isinstance(session.event, ReceiveFileEvent)
+        assert agent.hibernator.hibernate(session) is True
+        restored = agent.get_or_create_session('session', fake_platform)
+        assert restored.get('file').data == b'content'
+        assert restored.event.file.name == 'f.txt'
+    finally:
+        agent.stop()
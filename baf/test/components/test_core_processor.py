@@ -45,3 +45,72 @@ def test_processor_is_abstract():
     a = Agent("a")
     with pytest.raises(TypeError):
         Processor(agent=a, user_messages=True)
+
+
+class SuffixProcessor(Processor):
+    def __init__(self, agent, suffix, **kwargs):
+        super().__init__(agent=agent, **kwargs)
+        self.suffix = suffix
+
+    def process(self, session, message: str) -> str:
+        return message + self.suffix
+
+
+class DictProcessor(Processor):
+    def process(self, session, message: dict) -> dict:
+        return {**message, 'processed': True}
+
+
+class AudioProcessor(Processor):
+    def process(self, session, message: bytes) -> bytes:
+        return message[::-1]
+
+
+def test_processor_message_types_are_read_at_creation():
+    a = Agent("a")
+    assert UpperProcessor(agent=a, user_messages=True).message_type is None
+    assert SuffixProcessor(a, '!', user_messages=True).message_type is str
+    audio = AudioProcessor(agent=a, user_messages=True)
+    assert audio.message_type is bytes and audio.audio_messages
+
+
+def test_agent_process_runs_matching_pipeline_in_order():
+    a = Agent("a")
+    SuffixProcessor(a, '1', user_messages=True)
+    DictProcessor(agent=a, user_messages=True)
+    SuffixProcessor(a, '2', agent_messages=True)
+    SuffixProcessor(a, '3', user_messages=True, agent_messages=True)
+    UpperProcessor(agent=a, user_messages=True)  # No return type, never run
+    assert a.process(session=None, message='m', is_user_message=True) == 'm13'
+    assert a.process(session=None, message='m', is_user_message=False) == 'm23'
+    assert a.process(session=None, message={}, is_user_message=True) == {'processed': True}
+    assert a.process(session=None, message={}, is_user_message=False) == {}
+    assert a.process(session=None, message=42, is_user_message=True) == 42
+
+
+def test_agent_process_pipelines_are_refreshed():
+    a = Agent("a")
+    SuffixProcessor(a, '1', user_messages=True)
+    assert a.process(session=None, message='m', is_user_message=True) == 'm1'
+    second = SuffixProcessor(a, '2', user_messages=True)
+    assert a.process(session=None, message='m', is_user_message=True) == 'm12'
+    a.processors.remove(second)
+    assert a.process(session=None, message='m', is_user_message=True) == 'm1'
+
+
+def test_agent_process_pipelines_are_refreshed_after_replacing_processors():
+    a = Agent("a")
+    SuffixProcessor(a, '1', user_messages=True)
+    SuffixProcessor(a, '2', user_messages=True)
+    assert a.process(session=None, message='m', is_user_message=True) == 'm12'
+    a.processors.reverse()
+    assert a.process(session=None, message='m', is_user_message=True) == 'm21'
+    a.processors[0] = SuffixProcessor(Agent("b"), '3', user_messages=True)
+    assert a.process(session=None, message='m', is_user_message=True) == 'm31'
+
+
+def test_audio_processors_pipeline():
+    a = Agent("a")
+    SuffixProcessor(a, '1', user_messages=True)
+    audio = AudioProcessor(agent=a, user_messages=True)
+    assert a._get_processors(bytes, None) == [audio]
@@ -0,0 +1,106 @@
+"""Tests for baf.core.scheduler session schedulers."""
+
+import threading
+from datetime import datetime
+
+import pytest
+
+from baf import AGENT_SCHEDULER, AGENT_SCHEDULER_WORKERS
+from baf.core.agent import Agent
+from baf.core.scheduler import SharedLoopScheduler, ThreadPerSessionScheduler
+from baf.core.session import Session
+from baf.core.transition.event import Event
+
+
+class PingEvent(Event):
+    def __init__(self, n: int = None, session_id: str = None):
+        super().__init__(name='ping', session_id=session_id, timestamp=datetime.now())
+        self.n = n
+
+
+def _build_ping_agent(agent: Agent) -> Agent:
+    idle = agent.new_state('idle', initial=True)
+    pong = agent.new_state('pong')
+
+    def pong_body(session: Session):
+        session.reply(str(session.event.n))
+
+    pong.set_body(pong_body)
+    idle.when_event(PingEvent()).go_to(pong)
+    pong.go_to(idle)
+    return agent
+
+
+def test_default_scheduler_is_thread_per_session(agent):
+    assert isinstance(agent.scheduler, ThreadPerSessionScheduler)
+
+
+def test_scheduler_created_from_properties(agent):
+    agent.set_property(AGENT_SCHEDULER, 'shared_loops')
+    agent.set_property(AGENT_SCHEDULER_WORKERS, 3)
+    assert isinstance(agent.scheduler, SharedLoopScheduler)
+    assert agent.scheduler.workers == 3
+
+
+def test_invalid_scheduler_property_raises(agent):
+    agent.set_property(AGENT_SCHEDULER, 'unknown')
+    with pytest.raises(ValueError):
+        _ = agent.scheduler
+
+
+def test_shared_loop_scheduler_requires_workers(agent):
+    with pytest.raises(ValueError):
+        SharedLoopScheduler(agent, workers=0)
+
+
+@pytest.mark.parametrize('scheduler_cls', [ThreadPerSessionScheduler, SharedLoopScheduler])
+def test_scheduler_keeps_per_session_event_order(agent_with_platform, fake_platform, scheduler_cls, wait_for):
+    agent = _build_ping_agent(agent_with_platform)
+    if scheduler_cls is SharedLoopScheduler:
+        agent.set_scheduler(SharedLoopScheduler(agent, workers=2))
+    else:
+        agent.set_scheduler(ThreadPerSessionScheduler(agent))
+    fake_platform.start()
+    num_sessions, num_events = 6, 20
+    session_ids = [f'session-{i}' for i in range(num_sessions)]
+    for session_id in session_ids:
+        agent.get_or_create_session(session_id, fake_platform)
+    try:
+        for n in range(num_events):
+            for session_id in session_ids:
+                agent.receive_event(PingEvent(n, session_id))
+        assert wait_for(lambda: len(fake_platform.replies) == num_sessions * num_events)
+        for session_id in session_ids:
+            replies = [message for sid, message in fake_platform.replies if sid == session_id]
+            assert replies == [str(n) for n in range(num_events)]
+    finally:
+        agent.stop()
+    assert agent._sessions == {}
+
+
+def test_shared_loop_scheduler_bounds_threads(agent_with_platform, fake_platform, wait_for):
+    agent = _build_ping_agent(agent_with_platform)
+    agent.set_scheduler(SharedLoopScheduler(agent, workers=2))
+    fake_platform.start()
+    threads_before = threading.active_count()
+    sessions = [agent.get_or_create_session(f'session-{i}', fake_platform) for i in range(10)]
+    try:
+        assert len({session._event_thread for session in sessions}) == 2
+        assert len({session._event_loop for session in sessions}) == 2
+        assert threading.active_count() - threads_before == 2
+    finally:
+        agent.stop()
+    assert all(session._event_loop is None for session in sessions)
+    assert wait_for(lambda: threading.active_count() == threads_before)
+
+
+def test_set_scheduler_with_active_sessions_raises(agent_with_platform, fake_platform):
+    agent = _build_ping_agent(agent_with_platform)
+    agent.set_scheduler(SharedLoopScheduler(agent, workers=1))
+    fake_platform.start()
+    agent.get_or_create_session('session', fake_platform)
+    try:
+        with pytest.raises(RuntimeError):
+            agent.set_scheduler(ThreadPerSessionScheduler(agent))
+    finally:
+        agent.stop()
@@ -1,7 +1,12 @@
 """Tests for baf.core.session.Session read/write and helpers."""
 
+import operator
+import threading
+import time
+
 import pytest
 
+from baf import CHECK_TRANSITIONS_DELAY, CHECK_TRANSITIONS_POLLING
 from baf.core.agent import Agent
 from baf.core.session import Session
 
@@ -65,3 +70,70 @@ def test_session_reply_goes_through_platform(fake_platform):
     s = _make_session(fake_platform)
     s.reply("hello user")
     assert fake_platform.replies == [("sid-1", "hello user")]
+
+
+def test_session_set_wakes_variable_transition(agent_with_platform, fake_platform, wait_for):
+    waiting = agent_with_platform.new_state("waiting", initial=True)
+    done = agent_with_platform.new_state("done")
+    waiting.when_variable_matches_operation("job", operator.eq, "finished").go_to(done)
+    # A long delay ensures the transition can only be triggered by the variable change, not by polling
+    agent_with_platform.set_property(CHECK_TRANSITIONS_DELAY, 60.0)
+    fake_platform.start()
+    session = agent_with_platform.get_or_create_session("sid", fake_platform)
+    try:
+        # Changes on other variables do not wake the session up
+        session.set("other", 1)
+        time.sleep(0.1)
+        assert session.current_state is waiting
+        session.set("job", "finished")
+        assert wait_for(lambda: session.current_state is done)
+    finally:
+        agent_with_platform.stop()
+
+
+def test_session_without_polling_schedules_no_wakeups(agent_with_platform, fake_platform, wait_for):
+    idle = agent_with_platform.new_state("idle", initial=True)
+    done = agent_with_platform.new_state("done")
+    idle.when_condition(lambda session: False).go_to(done)
+    fake_platform.start()
+    session = agent_with_platform.get_or_create_session("sid", fake_platform)
+    try:
+        assert wait_for(lambda: session._timer_handle is None and not session.events)
+        time.sleep(0.1)
+        assert session._timer_handle is None
+    finally:
+        agent_with_platform.stop()
+
+
+def test_session_polling_is_opt_in_for_arbitrary_conditions(agent_with_platform, fake_platform, wait_for):
+    idle = agent_with_platform.new_state("idle", initial=True)
+    done = agent_with_platform.new_state("done")
+    ready = threading.Event()
+    idle.when_condition(lambda session: ready.is_set()).go_to(done)
+    agent_with_platform.set_property(CHECK_TRANSITIONS_POLLING, True)
+    agent_with_platform.set_property(CHECK_TRANSITIONS_DELAY, 0.05)
+    fake_platform.start()
+    session = agent_with_platform.get_or_create_session("sid", fake_platform)
+    try:
+        ready.set()
+        assert wait_for(lambda: session.current_state is done)
+    finally:
+        agent_with_platform.stop()
+
+
+def test_session_timer_triggers_transition(agent_with_platform, fake_platform, wait_for):
+    idle = agent_with_platform.new_state("idle", initial=True)
+    reminded = agent_with_platform.new_state("reminded")
+    cancelled = agent_with_platform.new_state("cancelled")
+    idle.when_timer_expired("cancelled_timer").go_to(cancelled)
+    idle.when_timer_expired("reminder").go_to(reminded)
+    fake_platform.start()
+    session = agent_with_platform.get_or_create_session("sid", fake_platform)
+    try:
+        session.start_timer("cancelled_timer", 0.05)
+        session.cancel_timer("cancelled_timer")
+        session.start_timer("reminder", 0.1)
+        assert wait_for(lambda: session.current_state is reminded)
+        assert session._timers == {}
+    finally:
+        agent_with_platform.stop()
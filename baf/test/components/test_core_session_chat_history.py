@@ -0,0 +1,124 @@
+"""Tests for the in-memory chat history of baf.core.session.Session (see Session.get_chat_history)."""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from baf import AGENT_CHAT_HISTORY_BUFFER_SIZE
+from baf.core.message import Message, MessageType
+from baf.core.session import Session
+from baf.db import DB_MONITORING
+from baf.db.monitoring_db import TABLE_CHAT
+
+START = datetime(2024, 1, 1, 12)
+
+
+@pytest.fixture
+def chat_agent(agent_with_platform, monitoring_db):
+    agent_with_platform.new_state('initial', initial=True)
+    agent_with_platform.set_property(DB_MONITORING, True)
+    agent_with_platform._monitoring_db = monitoring_db
+    yield agent_with_platform
+    agent_with_platform.stop()
+
+
+@pytest.fixture
+def chat_queries(monitoring_db) -> list[str]:
+    """The queries to the chat table of the monitoring database."""
+    queries = []
+
+    @event.listens_for(monitoring_db.engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith('SELECT') and f'FROM {TABLE_CHAT}' in statement:
+            queries.append(statement)
+    return queries
+
+
+def _save_messages(session: Session, indexes: range) -> None:
+    for i in indexes:
+        session.save_message(Message(t=MessageType.STR, content=f'message {i}', is_user=i % 2 == 0,
+                                     timestamp=START + timedelta(seconds=i)))
+
+
+def _as_tuples(messages: list[Message]) -> list[tuple]:
+    return [(message.type, message.content, bool(message.is_user), message.timestamp) for message in messages]
+
+
+def _db_history(session: Session, n: int = None, until_timestamp: datetime = None) -> list[tuple]:
+    """The chat history, as read from the monitoring database."""
+    chat_df = session._agent._monitoring_db.select_chat(session, n=n, until_timestamp=until_timestamp)
+    return [(MessageType(row['type']), row['content'], bool(row['is_user']), row['timestamp'])
+            for _, row in chat_df.iterrows()]
+
+
+def test_new_session_history_is_read_from_memory(chat_agent, fake_platform, chat_queries):
+    session = chat_agent.get_or_create_session('sid', fake_platform)
+    _save_messages(session, range(5))
+    assert _as_tuples(session.get_chat_history()) == _db_history(session)
+    assert _as_tuples(session.get_chat_history(n=3)) == _db_history(session, n=3)
+    assert _as_tuples(session.get_chat_history(n=10)) == _db_history(session, n=10)
+    until = START + timedelta(seconds=2)
+    assert _as_tuples(session.get_chat_history(until_timestamp=until)) == _db_history(session, until_timestamp=until)
+    assert _as_tuples(session.get_chat_history(n=2, until_timestamp=until)) == \
+        _db_history(session, n=2, until_timestamp=until)
+    # Only the reference queries (_db_history) read the database
+    assert len(chat_queries) == 5
+
+
+def test_older_messages_are_read_from_db(chat_agent, fake_platform, chat_queries):
+    chat_agent.set_property(AGENT_CHAT_HISTORY_BUFFER_SIZE, 3)
+    session = chat_agent.get_or_create_session('sid', fake_platform)
+    _save_messages(session, range(5))
+    assert [message.content for message in session.get_chat_history(n=3)] == ['message 2', 'message 3', 'message 4']
+    assert chat_queries == []
+    assert _as_tuples(session.get_chat_history(n=4)) == _db_history(session, n=4)
+    assert _as_tuples(session.get_chat_history()) == _db_history(session)
+    # Messages older than the in-memory ones
+    until = START + timedelta(seconds=1)
+    assert _as_tuples(session.get_chat_history(n=1, until_timestamp=until)) == \
+        _db_history(session, n=1, until_timestamp=until)
+    assert len(chat_queries) == 6
+
+
+def test_restored_session_reads_previous_messages_from_db(chat_agent, fake_platform, monitoring_db, chat_queries):
+    session = Session('sid', chat_agent, fake_platform)
+    monitoring_db.insert_session(session)
+    _save_messages(session, range(3))
+    # E.g. after restarting the agent, the messages of the previous execution are only in the database
+    restored = Session('sid', chat_agent, fake_platform)
+    _save_messages(restored, range(3, 5))
+    assert [message.content for message in restored.get_chat_history(n=2)] == ['message 3', 'message 4']
+    assert chat_queries == []
+    assert [message.content for message in restored.get_chat_history()] == [f'message {i}' for i in range(5)]
+    assert len(chat_queries) == 1
+
+
+def test_messages_are_kept_in_chronological_order(chat_agent, fake_platform):
+    session = chat_agent.get_or_create_session('sid', fake_platform)
+    _save_messages(session, range(0, 6, 2))
+    _save_messages(session, range(1, 6, 2))
+    assert [message.content for message in session.get_chat_history()] == [f'message {i}' for i in range(6)]
+    assert _as_tuples(session.get_chat_history(n=4)) == _db_history(session, n=4)
+
+
+def test_message_content_is_stored_as_in_db(chat_agent, fake_platform):
+    session = chat_agent.get_or_create_session('sid', fake_platform)
+    session.save_message(Message(t=MessageType.JSON, content={'key': [1, 2]}, is_user=False, timestamp=START))
+    assert _as_tuples(session.get_chat_history()) == _db_history(session)
+
+
+def test_buffer_can_be_disabled(chat_agent, fake_platform, chat_queries):
+    chat_agent.set_property(AGENT_CHAT_HISTORY_BUFFER_SIZE, 0)
+    session = chat_agent.get_or_create_session('sid', fake_platform)
+    _save_messages(session, range(3))
+    assert len(session.get_chat_history(n=2)) == 2
+    assert len(chat_queries) == 1
+
+
+def test_buffer_is_not_used_without_monitoring_db(agent_with_platform, fake_platform):
+    agent_with_platform.new_state('initial', initial=True)
+    session = Session('sid', agent_with_platform, fake_platform)
+    _save_messages(session, range(3))
+    assert len(session._chat_history) == 0
+    assert session.get_chat_history() == []
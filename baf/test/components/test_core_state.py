@@ -121,3 +121,33 @@ def test_set_fallback_body_rejects_wrong_signature():
 
     with pytest.raises(BodySignatureError):
         s0.set_fallback_body(wrong_fallback)
+
+
+def test_variable_transition_watches_only_its_variable():
+    a = Agent("a")
+    s0 = a.new_state("s0", initial=True)
+    s1 = a.new_state("s1")
+    s0.when_variable_matches_operation("count", lambda value, target: value >= target, 3).go_to(s1)
+    assert s0.watches_variable("count") is True
+    assert s0.watches_variable("other") is False
+    assert s0.requires_polling() is False
+
+
+def test_arbitrary_condition_transition_requires_polling():
+    a = Agent("a")
+    s0 = a.new_state("s0", initial=True)
+    s1 = a.new_state("s1")
+    assert s0.requires_polling() is False
+    s0.when_condition(lambda session: True).go_to(s1)
+    # The analysis is refreshed when a transition is added
+    assert s0.watches_variable("anything") is True
+    assert s0.requires_polling() is True
+
+
+def test_event_transition_with_arbitrary_condition_does_not_require_polling():
+    a = Agent("a")
+    s0 = a.new_state("s0", initial=True)
+    s1 = a.new_state("s1")
+    s0.when_file_received("pdf").go_to(s1)
+    s0.when_timer_expired("reminder").go_to(s1)
+    assert s0.requires_polling() is False
@@ -0,0 +1,125 @@
+"""Tests for the schema description and NL-to-SQL caches of baf.db.db_handler.DBHandler, with a SQLite database and
+an LLM that translates the questions from a fixed dictionary."""
+
+import pytest
+
+from baf.core.agent import Agent
+from baf.db.db_handler import DBHandler
+from baf.nlp.llm.llm import LLM
+
+
+class DictLLM(LLM):
+    """LLM that answers each question with the SQL of a dictionary, counting the predictions."""
+
+    def __init__(self, agent, name: str, translations: dict[str, str]):
+        super().__init__(agent, name, {})
+        self.translations = translations
+        self.prompts = []
+
+    def initialize(self) -> None:
+        pass
+
+    def predict(self, message: str, parameters: dict = None, session=None, system_message: str = None) -> str:
+        self.prompts.append(message)
+        question = message.split('User request:\n')[1].split('\n')[0]
+        return f'```sql\n{self.translations[question.strip().rstrip("?")]}\n```'
+
+
+@pytest.fixture
+def cache_agent(tmp_path) -> Agent:
+    agent = Agent('db_agent')
+    agent.config['db.sql.db1.dialect'] = 'sqlite'
+    agent.config['db.sql.db1.file'] = str(tmp_path / 'business.db')
+    return agent
+
+
+@pytest.fixture
+def db_handler(cache_agent) -> DBHandler:
+    db_handler = cache_agent.use_db_handler()
+    db_handler.query('db1', 'CREATE TABLE weather (city VARCHAR, temperature INTEGER)')
+    db_handler.insert('db1', "INSERT INTO weather VALUES ('Barcelona', 21), ('Paris', 15)")
+    yield db_handler
+    db_handler.close_all()
+
+
+@pytest.fixture
+def llm(cache_agent) -> DictLLM:
+    return DictLLM(cache_agent, 'dict_llm', {
+        'Temperature in Barcelona': "SELECT temperature FROM weather WHERE city = 'Barcelona'",
+        'Temperature in Paris': "SELECT temperature FROM weather WHERE city = 'Paris'",
+        'Number of cities': 'SELECT COUNT(*) FROM weather',
+        'Broken': 'SELECT missing_column FROM weather',
+    })
+
+
+def test_repeated_questions_skip_the_llm(db_handler, llm):
+    assert db_handler.select('db1', 'Temperature in Barcelona', llm=llm) == 21
+    # Same question, up to whitespace and trailing punctuation
+    assert db_handler.select('db1', '  Temperature   in Barcelona? ', llm=llm) == 21
+    assert db_handler.select('db1', 'Temperature in Paris', llm=llm) == 15
+    assert len(llm.prompts) == 2
+    assert db_handler.cache_stats == {'schema_hits': 2, 'schema_misses': 1, 'sql_hits': 1, 'sql_misses': 2}
+
+
+def test_questions_are_cached_per_llm(db_handler, llm, cache_agent):
+    other_llm = DictLLM(cache_agent, 'other_llm', llm.translations)
+    db_handler.select('db1', 'Number of cities', llm=llm)
+    assert db_handler.select('db1', 'Number of cities', llm=other_llm) == 2
+    assert len(llm.prompts) == len(other_llm.prompts) == 1
+
+
+def test_schema_changes_invalidate_the_cache(db_handler, llm):
+    assert db_handler.select('db1', 'Number of cities', llm=llm) == 2
+    # The schema cache is invalidated by the DDL statements run by the handler
+    db_handler.query('db1', 'ALTER TABLE weather ADD COLUMN humidity INTEGER')
+    assert db_handler.select('db1', 'Number of cities', llm=llm) == 2
+    assert len(llm.prompts) == 2
+    assert 'humidity' in llm.prompts[1]
+    assert db_handler.cache_stats['schema_misses'] == 2
+
+
+def test_explicit_schema_invalidation(db_handler, llm):
+    db_handler.select('db1', 'Number of cities', llm=llm)
+    db_handler.invalidate_schema_cache('db1')
+    # The schema is described again, but its fingerprint did not change
+    db_handler.select('db1', 'Number of cities', llm=llm)
+    assert len(llm.prompts) == 1
+    assert db_handler.cache_stats['schema_misses'] == 2
+    db_handler.clear_sql_cache()
+    db_handler.select('db1', 'Number of cities', llm=llm)
+    assert len(llm.prompts) == 2
+
+
+def test_schema_cache_ttl(db_handler, llm, cache_agent, monkeypatch):
+    cache_agent.config['db.sql.db1.schema_cache_ttl'] = 60
+    db_handler._db_configs = db_handler._extract_db_configs(cache_agent.config)
+    now = [1000.0]
+    monkeypatch.setattr('baf.db.db_handler.time.monotonic', lambda: now[0])
+    db_handler.select('db1', 'Number of cities', llm=llm)
+    now[0] += 30
+    db_handler.select('db1', 'Number of cities', llm=llm)
+    assert db_handler.cache_stats['schema_misses'] == 1
+    now[0] += 31
+    db_handler.select('db1', 'Number of cities', llm=llm)
+    assert db_handler.cache_stats['schema_misses'] == 2
+
+
+def test_sql_cache_size(db_handler, llm, cache_agent):
+    cache_agent.config['db.sql.db1.sql_cache_size'] = 1
+    db_handler._db_configs = db_handler._extract_db_configs(cache_agent.config)
+    db_handler.select('db1', 'Temperature in Barcelona', llm=llm)
+    db_handler.select('db1', 'Temperature in Paris', llm=llm)
+    db_handler.select('db1', 'Temperature in Barcelona', llm=llm)
+    assert len(llm.prompts) == 3
+    cache_agent.config['db.sql.db1.sql_cache_size'] = 0
+    db_handler._db_configs = db_handler._extract_db_configs(cache_agent.config)
+    db_handler.clear_sql_cache()
+    db_handler.select('db1', 'Number of cities', llm=llm)
+    db_handler.select('db1', 'Number of cities', llm=llm)
+    assert len(llm.prompts) == 5
+
+
+def test_failed_translations_are_not_cached(db_handler, llm):
+    assert db_handler.select('db1', 'Broken', llm=llm) is None
+    assert db_handler.select('db1', 'Broken', llm=llm) is None
+    assert len(llm.prompts) == 2
@@ -0,0 +1,145 @@
+"""Tests for the table and session id caches of baf.db.monitoring_db.MonitoringDB."""
+
+import json
+import os
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, event
+
+from baf.core.file import File
+from baf.core.message import Message, MessageType
+from baf.core.session import Session
+from baf.db.monitoring_db import MonitoringDB, TABLE_CHAT, TABLE_ROLLUP_CHAT
+
+
+@pytest.fixture
+def statements(monitoring_db) -> list[str]:
+    """The SQL statements sent to the monitoring database (i.e., the round trips)."""
+    statements = []
+
+    @event.listens_for(monitoring_db.engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    return statements
+
+
+def _message(i: int) -> Message:
+    return Message(t=MessageType.STR, content=f'message {i}', is_user=True, timestamp=datetime.now())
+
+
+def test_tables_are_reflected_once(monitoring_db, session, statements):
+    tables = dict(monitoring_db._tables)
+    assert TABLE_CHAT in tables
+    monitoring_db.insert_chat(session, _message(0))
+    monitoring_db.select_chat(session)
+    assert monitoring_db._tables == tables
+    # No schema reflection queries
+    assert not any(statement.startswith('PRAGMA') for statement in statements)
+
+
+def test_insert_session_caches_session_id(monitoring_db, session, statements):
+    assert monitoring_db._session_ids == {(session._agent.name, 'sid'): 1}
+    assert monitoring_db.select_session_ids([session]) == {session: 1}
+    assert statements == []
+
+
+def test_one_round_trip_per_chat_message(monitoring_db, session, statements):
+    for i in range(10):
+        monitoring_db.insert_chat(session, _message(i))
+    # The message and the update of its rollup (in the same transaction)
+    assert len(statements) == 20
+    assert statements[0::2] == [statements[0]] * 10 and statements[0].startswith(f'INSERT INTO {TABLE_CHAT} ')
+    assert statements[1::2] == [statements[1]] * 10 and statements[1].startswith(f'INSERT INTO {TABLE_ROLLUP_CHAT} ')
+    statements.clear()
+    assert len(monitoring_db.select_chat(session)) == 10
+    assert len(statements) == 1
+
+
+def test_one_round_trip_per_chat_batch(monitoring_db, session, statements):
+    monitoring_db.start_writer(max_size=100, max_wait=5.0)
+    for i in range(10):
+        monitoring_db.insert_chat(session, _message(i))
+    monitoring_db.flush()
+    assert len(statements) == 2
+    assert statements[0].startswith(f'INSERT INTO {TABLE_CHAT} ')
+    assert statements[1].startswith(f'INSERT INTO {TABLE_ROLLUP_CHAT} ')
+
+
+def test_session_id_is_queried_once_if_not_cached(monitoring_db, session, db_url, statements):
+    # Another MonitoringDB instance (e.g. after restarting the agent) does not know the session id
+    restarted_db = MonitoringDB()
+    restarted_db.set_engine(monitoring_db.engine)
+    for i in range(3):
+        restarted_db.insert_chat(session, _message(i))
+    session_queries = [statement for statement in statements if statement.startswith('SELECT session.id')]
+    assert len(session_queries) == 1
+    assert restarted_db._session_ids == {(session._agent.name, 'sid'): 1}
+    assert len(monitoring_db.select_chat(session)) == 3
+
+
+def test_delete_session_invalidates_session_id(monitoring_db, session, agent, fake_platform):
+    monitoring_db.insert_chat(session, _message(0))
+    monitoring_db.delete_session(session)
+    assert monitoring_db._session_ids == {}
+    assert monitoring_db.select_session_ids([session]) == {}
+    # A new session with the same id gets its own database id
+    new_session = Session('sid', agent, fake_platform)
+    monitoring_db.insert_session(new_session)
+    monitoring_db.insert_chat(new_session, _message(1))
+    assert monitoring_db.select_session_ids([new_session]) == {
+        new_session: int(monitoring_db.select_session(new_session)['id'][0])
+    }
+    assert monitoring_db.select_chat(new_session)['content'].tolist() == ['message 1']
+
+
+def test_close_connection_clears_caches(db_url, agent, fake_platform):
+    monitoring_db = MonitoringDB()
+    monitoring_db.set_engine(create_engine(db_url))
+    monitoring_db.initialize_db()
+    monitoring_db.insert_session(Session('sid', agent, fake_platform))
+    monitoring_db.close_connection()
+    assert monitoring_db._tables == {}
+    assert monitoring_db._session_ids == {}
+
+
+def _file_message(data: bytes) -> Message:
+    file = File(file_name='f.bin', file_type='bin', file_data=data)
+    return Message(t=MessageType.FILE, content=file, is_user=True, timestamp=datetime.now())
+
+
+def test_file_storage_inline(monitoring_db, session):
+    monitoring_db.insert_chat(session, _file_message(b'content'))
+    content = monitoring_db.select_chat(session)['content'][0]
+    assert json.loads(content)['name'] == 'f.bin'
+    assert MonitoringDB.load_file(content).data == b'content'
+
+
+def test_file_storage_hash(monitoring_db, session):
+    monitoring_db.initialize_db(file_storage='hash')
+    monitoring_db.insert_chat(session, _file_message(b'content'))
+    content = monitoring_db.select_chat(session)['content'][0]
+    assert json.loads(content) == {
+        'name': 'f.bin', 'type': 'bin', 'size': 7, 'sha256': File(file_data=b'content').sha256
+    }
+    assert MonitoringDB.load_file(content) is None
+
+
+def test_file_storage_reference(monitoring_db, session, tmp_path):
+    files_path = str(tmp_path / 'files')
+    monitoring_db.initialize_db(file_storage='reference', files_path=files_path)
+    monitoring_db.insert_chat(session, _file_message(b'content'))
+    monitoring_db.insert_chat(session, _file_message(b'content'))
+    contents = monitoring_db.select_chat(session)['content'].tolist()
+    assert contents[0] == contents[1]
+    # Identical files are stored once
+    assert os.listdir(files_path) == [File(file_data=b'content').sha256]
+    file = MonitoringDB.load_file(contents[0])
+    assert (file.name, file.type, file.data) == ('f.bin', 'bin', b'content')
+
+
+def test_invalid_file_storage(monitoring_db):
+    with pytest.raises(ValueError):
+        monitoring_db.initialize_db(file_storage='s3')
+    with pytest.raises(ValueError):
+        monitoring_db.initialize_db(file_storage='reference')
@@ -0,0 +1,167 @@
+"""Tests for the embedded monitoring databases (the ``sqlite`` and ``duckdb`` dialects) of
+baf.db.monitoring_db.MonitoringDB.
+
+The DuckDB tests are skipped if ``duckdb-engine`` is not installed, or if the DuckDB ``sqlite`` extension cannot be
+installed (it is downloaded the first time it is used).
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+
+from baf.core.agent import Agent
+from baf.core.message import Message, MessageType
+from baf.core.session import Session
+from baf.core.transition.transition import Transition
+from baf.db import DB_MONITORING, DB_MONITORING_DATABASE, DB_MONITORING_DIALECT
+from baf.db.monitoring_db import MonitoringDB, TABLE_CHAT, TABLE_EVENT, TABLE_INTENT_PREDICTION, TABLE_PARAMETER, \
+    TABLE_SESSION, TABLE_SESSION_VARIABLE, TABLE_TRANSITION
+from baf.library.intent.intent_library import fallback_intent
+from baf.library.transition.events.base_events import ReceiveTextEvent
+from baf.nlp.intent_classifier.intent_classifier_prediction import IntentClassifierPrediction
+from baf.nlp.ner.matched_parameter import MatchedParameter
+
+START = datetime(2024, 1, 1, 12)
+
+
+@pytest.fixture
+def sqlite_db(tmp_path) -> MonitoringDB:
+    monitoring_db = MonitoringDB()
+    monitoring_db.connect('sqlite', str(tmp_path / 'monitoring.db'))
+    monitoring_db.initialize_db()
+    yield monitoring_db
+    monitoring_db.close_connection()
+
+
+@pytest.fixture
+def duckdb_db(tmp_path, fill_monitoring_db) -> MonitoringDB:
+    pytest.importorskip('duckdb_engine')
+    monitoring_db = MonitoringDB()
+    try:
+        monitoring_db.connect('duckdb', str(tmp_path / 'monitoring.db'))
+        with monitoring_db.analytics_engine.connect():
+            pass
+    except Exception as e:
+        pytest.skip(f'The DuckDB sqlite extension is not available: {e}')
+    monitoring_db.initialize_db()
+    fill_monitoring_db(monitoring_db, START, message_interval=timedelta(hours=7))
+    yield monitoring_db
+    monitoring_db.close_connection()
+
+
+def test_connect_sqlite(sqlite_db, tmp_path, agent, fake_platform):
+    assert (tmp_path / 'monitoring.db').exists()
+    assert sqlite_db.analytics_engine is sqlite_db.engine
+    with sqlite_db.engine.connect() as conn:
+        assert conn.exec_driver_sql('PRAGMA journal_mode').scalar() == 'wal'
+    session = Session('sid', agent, fake_platform)
+    sqlite_db.insert_session(session)
+    sqlite_db.insert_chat(session, Message(t=MessageType.STR, content='hello', is_user=True, timestamp=START))
+    assert sqlite_db.select_chat(session)['content'].tolist() == ['hello']
+
+
+@pytest.mark.parametrize('partition_interval', [None, 'month'])
+def test_delete_session_removes_its_records(tmp_path, agent, fake_platform, partition_interval):
+    monitoring_db = MonitoringDB()
+    monitoring_db.connect('sqlite', str(tmp_path / 'monitoring.db'))
+    monitoring_db.initialize_db(partition_interval=partition_interval)
+    state = agent.new_state('initial', initial=True)
+    session = Session('sid', agent, fake_platform)
+    monitoring_db.insert_session(session)
+    monitoring_db.insert_chat(session, Message(t=MessageType.STR, content='hello', is_user=True, timestamp=START))
+    monitoring_db.insert_transition(session, Transition('t', state, state, None, None))
+    monitoring_db.insert_intent_prediction(session, state, IntentClassifierPrediction(
+        fallback_intent, 0.5, 'hello', [MatchedParameter('p', 'v', {})]
+    ))
+    monitoring_db.insert_event(session, ReceiveTextEvent(text='hello', session_id='sid', human=True))
+    monitoring_db.store_session_variables(session, {'x': '1'})
+    monitoring_db.delete_session(session)
+    with monitoring_db.engine.connect() as conn:
+        for table in [TABLE_SESSION, TABLE_SESSION_VARIABLE, TABLE_CHAT, TABLE_TRANSITION, TABLE_INTENT_PREDICTION,
+                      TABLE_PARAMETER, TABLE_EVENT]:
+            assert conn.exec_driver_sql(f'SELECT COUNT(*) FROM {table}').scalar() == 0, table
+    # A new session (which may get the same id) has none of the records of the deleted one
+    new_session = Session('sid2', agent, fake_platform)
+    monitoring_db.insert_session(new_session)
+    assert monitoring_db.select_records(TABLE_INTENT_PREDICTION, agent_names=[agent.name]).empty
+    monitoring_db.close_connection()
+
+
+def test_connect_embedded_without_database():
+    with pytest.raises(ValueError):
+        MonitoringDB().connect('sqlite', None)
+
+
+def test_connect_server_url(monkeypatch):
+    engines = []
+    monkeypatch.setattr(MonitoringDB, 'set_engine', lambda self, engine, analytics_engine=None: engines.append(engine))
+    MonitoringDB().connect('postgresql', 'monitoring', host='localhost', port=5432, username='user',
+                           password='p@ss:w/rd')
+    # The special characters of the password are escaped
+    assert engines[0].url.password == 'p@ss:w/rd'
+    assert engines[0].url.host == 'localhost'
+    assert engines[0].url.database == 'monitoring'
+    engines[0].dispose()
+
+
+def test_connect_to_db_from_properties(tmp_path):
+    agent = Agent('embedded_agent')
+    agent.set_property(DB_MONITORING, True)
+    agent.set_property(DB_MONITORING_DIALECT, 'sqlite')
+    agent.set_property(DB_MONITORING_DATABASE, str(tmp_path / 'agent.db'))
+    monitoring_db = MonitoringDB()
+    monitoring_db.connect_to_db(agent)
+    assert monitoring_db.connected
+    assert monitoring_db.engine.url.database == str(tmp_path / 'agent.db')
+    monitoring_db.close_connection()
+
+
+def _sqlite_db(duckdb_db: MonitoringDB) -> MonitoringDB:
+    """Open the SQLite file of a DuckDB monitoring database without DuckDB."""
+    monitoring_db = MonitoringDB()
+    monitoring_db.set_engine(create_engine(duckdb_db.engine.url))
+    return monitoring_db
+
+
+def test_duckdb_queries_match_sqlite(duckdb_db):
+    assert duckdb_db.analytics_engine.dialect.name == 'duckdb'
+    sqlite_db = _sqlite_db(duckdb_db)
+    records = duckdb_db.select_records(TABLE_CHAT, agent_names=['agent_1'], limit=8, after_id=35, descending=True)
+    expected = sqlite_db.select_records(TABLE_CHAT, agent_names=['agent_1'], limit=8, after_id=35, descending=True)
+    assert records['id'].tolist() == expected['id'].tolist()
+    assert records['content'].tolist() == expected['content'].tolist()
+    assert records['is_user'].astype(bool).tolist() == expected['is_user'].tolist()
+    for kwargs in [{'per_day': True}, {'group_by': ['is_user']}, {'agent_names': ['agent_0'], 'per_day': True}]:
+        counts = duckdb_db.aggregate_records(TABLE_CHAT, **kwargs)
+        expected = sqlite_db.aggregate_records(TABLE_CHAT, **kwargs)
+        if 'is_user' in counts:
+            counts['is_user'] = counts['is_user'].astype(bool)
+        assert counts.to_dict('list') == expected.to_dict('list'), kwargs
+    intents = duckdb_db.aggregate_records(TABLE_INTENT_PREDICTION, group_by=['intent'], mean_columns=['score'])
+    expected = sqlite_db.aggregate_records(TABLE_INTENT_PREDICTION, group_by=['intent'], mean_columns=['score'])
+    assert intents['count'].tolist() == expected['count'].tolist()
+    assert intents['mean_score'].tolist() == pytest.approx(expected['mean_score'].tolist())
+    sqlite_db.close_connection()
+
+
+def test_duckdb_rollups_match_sqlite(duckdb_db):
+    sqlite_db = _sqlite_db(duckdb_db)
+    for table_name, kwargs in [(TABLE_CHAT, {'per_day': True}), (TABLE_SESSION, {'agent_names': ['agent_1']}),
+                               (TABLE_INTENT_PREDICTION, {'group_by': ['intent'], 'mean_columns': ['score']})]:
+        rollup = duckdb_db.select_rollup(table_name, **kwargs)
+        expected = sqlite_db.select_rollup(table_name, **kwargs)
+        assert rollup['count'].tolist() == expected['count'].tolist(), table_name
+        assert rollup.columns.tolist() == expected.columns.tolist(), table_name
+    counts = duckdb_db.select_transition_counts(agent_names=['agent_0'])
+    expected = sqlite_db.select_transition_counts(agent_names=['agent_0'])
+    assert sorted(map(tuple, counts.values.tolist())) == sorted(map(tuple, expected.values.tolist()))
+    sqlite_db.close_connection()
+
+
+def test_duckdb_reads_the_latest_records(duckdb_db, agent, fake_platform):
+    session = Session('late', agent, fake_platform)
+    duckdb_db.insert_session(session)
+    before = duckdb_db.aggregate_records(TABLE_CHAT)['count'].tolist()
+    duckdb_db.insert_chat(session, Message(t=MessageType.STR, content='late', is_user=True, timestamp=START))
+    assert duckdb_db.aggregate_records(TABLE_CHAT)['count'].tolist() == [before[0] + 1]
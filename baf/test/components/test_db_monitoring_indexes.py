@@ -0,0 +1,71 @@
+"""Tests for the indexes of the monitoring database tables, created by baf.db.monitoring_db.MonitoringDB.initialize_db."""
+
+from sqlalchemy import create_engine, inspect
+
+from baf.db.monitoring_db import MonitoringDB, TABLE_CHAT, TABLE_EVENT, TABLE_INTENT_PREDICTION, TABLE_PARAMETER, \
+    TABLE_TRANSITION
+
+EXPECTED_INDEXES = {
+    TABLE_CHAT: [['session_id', 'timestamp']],
+    TABLE_TRANSITION: [['session_id', 'timestamp'], ['source_state', 'dest_state'], ['dest_state']],
+    TABLE_EVENT: [['session_id', 'timestamp']],
+    TABLE_INTENT_PREDICTION: [['session_id', 'timestamp']],
+    TABLE_PARAMETER: [['intent_prediction_id']],
+}
+
+
+def _indexes(monitoring_db: MonitoringDB) -> dict[str, list[list[str]]]:
+    with monitoring_db.engine.connect() as conn:
+        inspector = inspect(conn)
+        return {table: [index['column_names'] for index in inspector.get_indexes(table)] for table in EXPECTED_INDEXES}
+
+
+def test_indexes_are_created(monitoring_db):
+    indexes = _indexes(monitoring_db)
+    for table, table_indexes in EXPECTED_INDEXES.items():
+        for columns in table_indexes:
+            assert columns in indexes[table]
+
+
+def test_indexes_are_added_to_existing_databases(monitoring_db, db_url):
+    # Simulate a database created by a previous version, without indexes
+    with monitoring_db.engine.begin() as conn:
+        for table in EXPECTED_INDEXES:
+            for index in inspect(conn).get_indexes(table):
+                conn.exec_driver_sql(f'DROP INDEX {index["name"]}')
+    assert all(indexes == [] for indexes in _indexes(monitoring_db).values())
+    monitoring_db.close_connection()
+
+    restarted_db = MonitoringDB()
+    restarted_db.set_engine(create_engine(db_url))
+    restarted_db.initialize_db()
+    # The migration is idempotent
+    restarted_db.initialize_db()
+    indexes = _indexes(restarted_db)
+    for table, table_indexes in EXPECTED_INDEXES.items():
+        assert sorted(indexes[table]) == sorted(table_indexes)
+    restarted_db.close_connection()
+
+
+def test_chat_history_query_uses_index(monitoring_db):
+    with monitoring_db.engine.connect() as conn:
+        plan = conn.exec_driver_sql(
+            f'EXPLAIN QUERY PLAN SELECT * FROM {TABLE_CHAT} WHERE session_id = 1 ORDER BY timestamp DESC, id DESC '
+            f'LIMIT 10'
+        ).all()
+    details = ' '.join(row[-1] for row in plan)
+    assert f'USING INDEX ix_{TABLE_CHAT}_session_id_timestamp' in details
+    # Rows are already sorted by the index
+    assert 'USE TEMP B-TREE FOR ORDER BY' not in details
+
+
+def test_transition_state_query_uses_indexes(monitoring_db):
+    with monitoring_db.engine.connect() as conn:
+        plan = conn.exec_driver_sql(
+            f"EXPLAIN QUERY PLAN SELECT source_state, dest_state, COUNT(*) FROM {TABLE_TRANSITION} "
+            f"WHERE source_state IN ('a', 'b') OR dest_state IN ('a', 'b') GROUP BY source_state, dest_state"
+        ).all()
+    details = ' '.join(row[-1] for row in plan)
+    assert 'MULTI-INDEX OR' in details
+    assert f'INDEX ix_{TABLE_TRANSITION}_source_state_dest_state ' in details
+    assert f'INDEX ix_{TABLE_TRANSITION}_dest_state ' in details
@@ -0,0 +1,181 @@
+"""Tests for the filtered, paginated and aggregated queries of baf.db.monitoring_db.MonitoringDB (used by the
+monitoring UI). The results are compared with the same computation done in pandas over the whole tables."""
+
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+from sqlalchemy import event
+
+from baf.core.agent import Agent
+from baf.core.message import Message, MessageType
+from baf.core.session import Session
+from baf.core.transition.transition import Transition
+from baf.db.monitoring_db import MonitoringDB, TABLE_CHAT, TABLE_EVENT, TABLE_INTENT_PREDICTION, TABLE_PARAMETER, \
+    TABLE_SESSION, TABLE_TRANSITION
+
+START = datetime(2024, 1, 1, 12)
+
+
+@pytest.fixture
+def filled_db(monitoring_db, fake_platform) -> MonitoringDB:
+    """Monitoring database with the records of 2 agents, with 3 sessions each, over 3 days."""
+    for a in range(2):
+        agent = Agent(f'agent_{a}')
+        states = [agent.new_state(f'state_{i}', initial=i == 0) for i in range(3)]
+        for s in range(3):
+            session = Session(f'session_{a}_{s}', agent, fake_platform)
+            monitoring_db.insert_session(session)
+            for i in range(10):
+                monitoring_db.insert_chat(session, Message(t=MessageType.STR, content=f'{a}-{s}-{i}', is_user=i % 3 != 0,
+                                                           timestamp=START + timedelta(hours=7 * i + s)))
+            for i in range(s + 2):
+                monitoring_db.insert_transition(session, Transition(f't{i}', states[i % 3], states[(i + 1) % 3],
+                                                                    None, None))
+    table_session = monitoring_db._get_table(TABLE_SESSION)
+    table_intent_prediction = monitoring_db._get_table(TABLE_INTENT_PREDICTION)
+    table_parameter = monitoring_db._get_table(TABLE_PARAMETER)
+    table_event = monitoring_db._get_table(TABLE_EVENT)
+    with monitoring_db.engine.begin() as conn:
+        for session_db_id in range(1, 7):
+            for i in range(4):
+                intent_prediction_id = conn.execute(table_intent_prediction.insert().values(
+                    session_id=session_db_id, message=f'message {i}', timestamp=START + timedelta(days=i % 3),
+                    intent_classifier='SimpleIntentClassifierTorch', intent=['greeting', 'fallback_intent'][i % 2],
+                    score=0.1 * (i + session_db_id)
+                ).returning(table_intent_prediction.c.id)).scalar_one()
+                conn.execute(table_parameter.insert().values(intent_prediction_id=intent_prediction_id, name='p',
+                                                             value=str(i), info=''))
+            conn.execute(table_event.insert().values(session_id=session_db_id, event='receive_message_text', info='',
+                                                     timestamp=START))
+        conn.execute(table_event.insert().values(session_id=None, event='broadcast', info='', timestamp=START))
+        # Make the session timestamps deterministic
+        for session_db_id in range(1, 7):
+            conn.execute(table_session.update().where(table_session.c.id == session_db_id)
+                         .values(timestamp=START + timedelta(days=session_db_id % 3)))
+    return monitoring_db
+
+
+def _session_db_ids(monitoring_db: MonitoringDB, agent_names: list[str] = None,
+                    session_ids: list[str] = None) -> set[int]:
+    sessions = monitoring_db.get_table(TABLE_SESSION)
+    if agent_names:
+        sessions = sessions[sessions['agent_name'].isin(agent_names)]
+    if session_ids:
+        sessions = sessions[sessions['session_id'].isin(session_ids)]
+    return set(sessions['id'])
+
+
+@pytest.mark.parametrize('table_name', [TABLE_CHAT, TABLE_TRANSITION, TABLE_EVENT, TABLE_INTENT_PREDICTION])
+@pytest.mark.parametrize('agent_names, session_ids', [
+    (None, None), (['agent_1'], None), (None, ['session_0_1', 'session_1_2']), (['agent_0'], ['session_1_2'])
+])
+def test_select_records_filtered_by_session(filled_db, table_name, agent_names, session_ids):
+    table = filled_db.get_table(table_name)
+    if agent_names or session_ids:
+        table = table[table['session_id'].isin(_session_db_ids(filled_db, agent_names, session_ids))]
+    records = filled_db.select_records(table_name, agent_names=agent_names, session_ids=session_ids)
+    assert records['id'].tolist() == table['id'].tolist()
+
+
+def test_select_records_filtered_by_date_and_columns(filled_db):
+    start = START + timedelta(days=1)
+    end = START + timedelta(days=2)
+    chat = filled_db.get_table(TABLE_CHAT)
+    chat['timestamp'] = pd.to_datetime(chat['timestamp'])
+    expected = chat[chat['timestamp'].between(start, end) & chat['is_user'].astype(bool)]
+    records = filled_db.select_records(TABLE_CHAT, columns=['id', 'content'], start=start, end=end,
+                                       filters={'is_user': True})
+    assert records.columns.tolist() == ['id', 'content']
+    assert records['id'].tolist() == expected['id'].tolist()
+    records = filled_db.select_records(TABLE_SESSION, agent_names=['agent_0'], start=start)
+    assert records['session_id'].tolist() == ['session_0_0', 'session_0_1']
+
+
+def test_select_parameters_filtered_by_intent_prediction(filled_db):
+    intent_predictions = filled_db.get_table(TABLE_INTENT_PREDICTION)
+    intent_predictions = intent_predictions[
+        intent_predictions['session_id'].isin(_session_db_ids(filled_db, ['agent_1']))
+    ]
+    parameters = filled_db.get_table(TABLE_PARAMETER)
+    expected = parameters[parameters['intent_prediction_id'].isin(intent_predictions['id'])]
+    records = filled_db.select_records(TABLE_PARAMETER, agent_names=['agent_1'])
+    assert records['id'].tolist() == expected['id'].tolist()
+
+
+@pytest.mark.parametrize('descending', [False, True])
+def test_pagination(filled_db, descending):
+    all_ids = filled_db.select_records(TABLE_CHAT, agent_names=['agent_0'], descending=descending)['id'].tolist()
+    assert all_ids == sorted(all_ids, reverse=descending)
+    offset_pages = []
+    keyset_pages = []
+    after_id = None
+    for page in range(4):
+        offset_pages.append(filled_db.select_records(TABLE_CHAT, agent_names=['agent_0'], limit=8, offset=page * 8,
+                                                     descending=descending)['id'].tolist())
+        keyset_page = filled_db.select_records(TABLE_CHAT, agent_names=['agent_0'], limit=8, after_id=after_id,
+                                               descending=descending)['id'].tolist()
+        keyset_pages.append(keyset_page)
+        after_id = keyset_page[-1] if keyset_page else after_id
+    assert offset_pages == keyset_pages
+    assert [len(page) for page in offset_pages] == [8, 8, 8, 6]
+    assert sum(offset_pages, []) == all_ids
+
+
+def test_pagination_is_done_by_the_database(filled_db):
+    statements = []
+
+    @event.listens_for(filled_db.engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    filled_db.select_records(TABLE_CHAT, limit=10, after_id=5)
+    assert 'LIMIT' in statements[-1]
+    assert 'chat.id >' in statements[-1]
+
+
+@pytest.mark.parametrize('agent_names', [None, ['agent_0']])
+def test_aggregate_records(filled_db, agent_names):
+    chat = filled_db.get_table(TABLE_CHAT)
+    if agent_names:
+        chat = chat[chat['session_id'].isin(_session_db_ids(filled_db, agent_names))]
+    counts = filled_db.aggregate_records(TABLE_CHAT, group_by=['is_user'], agent_names=agent_names)
+    expected = chat.groupby('is_user').size()
+    assert dict(zip(counts['is_user'].astype(bool), counts['count'])) == \
+        {bool(is_user): count for is_user, count in expected.items()}
+    assert filled_db.aggregate_records(TABLE_CHAT, agent_names=agent_names)['count'].tolist() == [len(chat)]
+
+
+def test_aggregate_records_per_day(filled_db):
+    chat = filled_db.get_table(TABLE_CHAT)
+    expected = pd.to_datetime(chat['timestamp']).dt.date.astype(str).value_counts().sort_index()
+    counts = filled_db.aggregate_records(TABLE_CHAT, per_day=True)
+    assert counts['date'].tolist() == expected.index.tolist()
+    assert counts['count'].tolist() == expected.tolist()
+
+
+def test_aggregate_records_mean(filled_db):
+    intent_predictions = filled_db.get_table(TABLE_INTENT_PREDICTION)
+    expected = intent_predictions.groupby('intent')['score'].agg(['size', 'mean'])
+    aggregates = filled_db.aggregate_records(TABLE_INTENT_PREDICTION, group_by=['intent'], mean_columns=['score'])
+    assert aggregates['intent'].tolist() == expected.index.tolist()
+    assert aggregates['count'].tolist() == expected['size'].tolist()
+    assert aggregates['mean_score'].tolist() == pytest.approx(expected['mean'].tolist())
+    events = filled_db.aggregate_records(TABLE_EVENT, group_by=['event'])
+    assert dict(zip(events['event'], events['count'])) == {'broadcast': 1, 'receive_message_text': 6}
+    events = filled_db.aggregate_records(TABLE_EVENT, group_by=['event'], agent_names=['agent_0', 'agent_1'])
+    assert dict(zip(events['event'], events['count'])) == {'receive_message_text': 6}
+
+
+@pytest.mark.parametrize('agent_names, states', [(None, None), (['agent_1'], None), (None, ['state_2'])])
+def test_select_transition_counts(filled_db, agent_names, states):
+    transitions = filled_db.get_table(TABLE_TRANSITION)
+    if agent_names:
+        transitions = transitions[transitions['session_id'].isin(_session_db_ids(filled_db, agent_names))]
+    if states:
+        transitions = transitions[transitions['source_state'].isin(states) | transitions['dest_state'].isin(states)]
+    expected = transitions.groupby(['source_state', 'dest_state', 'event', 'condition']).size()
+    counts = filled_db.select_transition_counts(agent_names=agent_names, states=states)
+    assert {
+        (row.source_state, row.dest_state, row.event, row.condition): row.count for row in counts.itertuples()
+    } == expected.to_dict()
@@ -0,0 +1,147 @@
+"""Tests for the rollup tables of baf.db.monitoring_db.MonitoringDB. The rollups are compared with the same aggregation
+done in pandas over the records of the monitoring database (i.e., a full recomputation)."""
+
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from baf.db.monitoring_db import MonitoringDB, ROLLUPS, TABLE_CHAT, TABLE_EVENT, TABLE_INTENT_PREDICTION, \
+    TABLE_SESSION, TABLE_TRANSITION
+
+START = datetime(2024, 1, 1, 12)
+
+
+def _recompute(monitoring_db: MonitoringDB, table_name: str) -> dict[tuple, tuple]:
+    """Aggregate the records of a table as its rollup table does, in pandas."""
+    _, group_columns, sum_columns = ROLLUPS[table_name]
+    sessions = monitoring_db.get_table(TABLE_SESSION)
+    if table_name == TABLE_SESSION:
+        records = sessions
+    else:
+        records = monitoring_db.get_table(table_name)
+        # Only the records of existing sessions, or that do not belong to a session
+        records = records[records['session_id'].isna() | records['session_id'].isin(sessions['id'])]
+        records = records.merge(sessions[['id', 'agent_name']].rename(columns={'id': 'session_id'}), on='session_id',
+                                how='left')
+        records['agent_name'] = records['agent_name'].fillna('')
+    records = records.assign(hour=pd.to_datetime(records['timestamp']).dt.floor('h'))
+    result = {}
+    for key, group in records.groupby(['agent_name', 'hour', *group_columns]):
+        key = tuple(bool(value) if column == 'is_user' else value
+                    for column, value in zip(['agent_name', 'hour', *group_columns], key))
+        result[key] = (len(group), *[pytest.approx(group[column].sum()) for column in sum_columns])
+    return result
+
+
+def _rollup(monitoring_db: MonitoringDB, table_name: str) -> dict[tuple, tuple]:
+    rollup_name, group_columns, sum_columns = ROLLUPS[table_name]
+    rollup = monitoring_db.get_table(rollup_name)
+    result = {}
+    for _, row in rollup.iterrows():
+        key = (row['agent_name'], pd.Timestamp(row['hour']),
+               *[bool(row[column]) if column == 'is_user' else row[column] for column in group_columns])
+        result[key] = (row['count'], *[row[f'{column}_sum'] for column in sum_columns])
+    return result
+
+
+def _assert_rollups_match(monitoring_db: MonitoringDB) -> None:
+    monitoring_db.flush()
+    for table_name in ROLLUPS:
+        assert _rollup(monitoring_db, table_name) == _recompute(monitoring_db, table_name), table_name
+
+
+def test_rollups_are_updated_on_insert(monitoring_db, fill_monitoring_db):
+    fill_monitoring_db(monitoring_db, START)
+    _assert_rollups_match(monitoring_db)
+    # Messages over 4 hours, from each of the 6 sessions
+    chat_rollup = monitoring_db.get_table(ROLLUPS[TABLE_CHAT][0])
+    assert chat_rollup['count'].sum() == 48
+    assert len(chat_rollup) < 48
+
+
+def test_rollups_are_updated_by_the_writer(monitoring_db, fill_monitoring_db):
+    monitoring_db.start_writer(max_size=7, max_wait=5.0)
+    fill_monitoring_db(monitoring_db, START)
+    _assert_rollups_match(monitoring_db)
+
+
+def test_rollups_are_updated_on_delete(monitoring_db, fill_monitoring_db):
+    sessions = fill_monitoring_db(monitoring_db, START)
+    monitoring_db.delete_session(sessions[0])
+    monitoring_db.delete_session(sessions[4])
+    _assert_rollups_match(monitoring_db)
+    assert 'session_0_0' not in monitoring_db.get_table(TABLE_SESSION)['session_id'].tolist()
+    # Empty groups are removed
+    assert (monitoring_db.get_table(ROLLUPS[TABLE_TRANSITION][0])['count'] > 0).all()
+
+
+def test_rebuild_rollups(monitoring_db, fill_monitoring_db):
+    fill_monitoring_db(monitoring_db, START)
+    expected = {table_name: _rollup(monitoring_db, table_name) for table_name in ROLLUPS}
+    monitoring_db.run_statement(monitoring_db._get_table(ROLLUPS[TABLE_CHAT][0]).delete())
+    assert _rollup(monitoring_db, TABLE_CHAT) == {}
+    monitoring_db.rebuild_rollups()
+    assert {table_name: _rollup(monitoring_db, table_name) for table_name in ROLLUPS} == expected
+
+
+def test_rollups_are_computed_for_existing_databases(monitoring_db, fill_monitoring_db):
+    fill_monitoring_db(monitoring_db, START)
+    # A database created by a previous version, without rollup tables
+    with monitoring_db.engine.begin() as conn:
+        for rollup_name, _, _ in ROLLUPS.values():
+            conn.exec_driver_sql(f'DROP TABLE {rollup_name}')
+    monitoring_db.initialize_db()
+    _assert_rollups_match(monitoring_db)
+    # Initializing a database with rollups does not recompute them
+    monitoring_db.run_statement(monitoring_db._get_table(ROLLUPS[TABLE_EVENT][0]).delete())
+    monitoring_db.initialize_db()
+    assert _rollup(monitoring_db, TABLE_EVENT) == {}
+
+
+@pytest.mark.parametrize('agent_names', [None, ['agent_1']])
+def test_select_rollup(monitoring_db, fill_monitoring_db, agent_names):
+    fill_monitoring_db(monitoring_db, START)
+    counts = monitoring_db.select_rollup(TABLE_CHAT, group_by=['is_user'], per_day=True, agent_names=agent_names)
+    expected = monitoring_db.aggregate_records(TABLE_CHAT, group_by=['is_user'], per_day=True,
+                                               agent_names=agent_names)
+    assert counts.to_dict('list') == expected.to_dict('list')
+    intents = monitoring_db.select_rollup(TABLE_INTENT_PREDICTION, group_by=['intent'], mean_columns=['score'],
+                                          agent_names=agent_names)
+    expected = monitoring_db.aggregate_records(TABLE_INTENT_PREDICTION, group_by=['intent'], mean_columns=['score'],
+                                               agent_names=agent_names)
+    assert intents['count'].tolist() == expected['count'].tolist()
+    assert intents['mean_score'].tolist() == pytest.approx(expected['mean_score'].tolist())
+    sessions = monitoring_db.select_rollup(TABLE_SESSION, agent_names=agent_names)
+    assert sessions['count'].tolist() == [3 if agent_names else 6]
+    events = monitoring_db.select_rollup(TABLE_EVENT, group_by=['event'], agent_names=agent_names)
+    # The broadcast event does not belong to any agent
+    assert dict(zip(events['event'], events['count'])) == {'receive_message_text': 3 if agent_names else 7}
+
+
+def test_select_rollup_filtered_by_date(monitoring_db, fill_monitoring_db):
+    fill_monitoring_db(monitoring_db, START)
+    counts = monitoring_db.select_rollup(TABLE_CHAT, start=START + timedelta(hours=1, minutes=30),
+                                         end=START + timedelta(hours=2, minutes=59))
+    # The rollups are hourly: the start is rounded down to the hour
+    expected = monitoring_db.aggregate_records(TABLE_CHAT, start=START + timedelta(hours=1),
+                                               end=START + timedelta(hours=2, minutes=59))
+    assert counts['count'].tolist() == expected['count'].tolist()
+    assert monitoring_db.select_rollup(TABLE_CHAT, start=START + timedelta(days=1))['count'].tolist() == [0]
+
+
+@pytest.mark.parametrize('agent_names, session_ids, states', [
+    (None, None, None), (['agent_1'], None, None), (None, None, ['state_2']), (None, ['session_0_2'], None)
+])
+def test_select_transition_counts(monitoring_db, fill_monitoring_db, agent_names, session_ids, states):
+    fill_monitoring_db(monitoring_db, START)
+    sessions = monitoring_db.select_records(TABLE_SESSION, agent_names=agent_names, session_ids=session_ids)
+    transitions = monitoring_db.get_table(TABLE_TRANSITION)
+    transitions = transitions[transitions['session_id'].isin(sessions['id'])]
+    if states:
+        transitions = transitions[transitions['source_state'].isin(states) | transitions['dest_state'].isin(states)]
+    expected = transitions.groupby(['source_state', 'dest_state', 'event', 'condition']).size()
+    counts = monitoring_db.select_transition_counts(agent_names=agent_names, session_ids=session_ids, states=states)
+    assert {
+        (row.source_state, row.dest_state, row.event, row.condition): row.count for row in counts.itertuples()
+    } == expected.to_dict()
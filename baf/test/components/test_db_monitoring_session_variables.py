@@ -0,0 +1,145 @@
+"""Tests for the storage of the session variables in the monitoring database (see
+baf.db.monitoring_db.MonitoringDB.store_session_variables)."""
+
+import json
+import logging
+
+import pytest
+from sqlalchemy import event
+
+from baf.core.agent import Agent
+from baf.core.session import Session
+from baf.db import DB_MONITORING
+from baf.db.monitoring_db import MonitoringDB, TABLE_SESSION, TABLE_SESSION_VARIABLE
+from baf.exceptions.logger import logger
+
+
+@pytest.fixture
+def agent(agent, monitoring_db) -> Agent:
+    agent.new_state('initial', initial=True)
+    agent.set_property(DB_MONITORING, True)
+    agent._monitoring_db = monitoring_db
+    return agent
+
+
+@pytest.fixture
+def writes(monitoring_db) -> list[tuple[str, object]]:
+    """The SQL statements that modify the monitoring database, with their parameters."""
+    writes = []
+
+    @event.listens_for(monitoring_db.engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if not statement.startswith('SELECT'):
+            writes.append((statement, parameters))
+    return writes
+
+
+def _stored_variables(monitoring_db: MonitoringDB) -> dict[str, str]:
+    table = monitoring_db.get_table(TABLE_SESSION_VARIABLE)
+    return dict(zip(table['name'], table['value']))
+
+
+def test_set_stores_only_the_changed_variable(monitoring_db, session, writes):
+    session.set('context', 'x' * 100000)
+    writes.clear()
+    session.set('counter', 1)
+    written = ''.join(str(parameters) for _, parameters in writes)
+    assert '"x' not in written
+    assert len(written) < 200
+    assert _stored_variables(monitoring_db) == {'context': json.dumps('x' * 100000), 'counter': '1'}
+
+
+def test_set_replaces_the_stored_value(monitoring_db, session):
+    session.set('counter', 1)
+    session.set('counter', 2)
+    assert _stored_variables(monitoring_db) == {'counter': '2'}
+
+
+def test_delete_removes_the_stored_variable(monitoring_db, session):
+    session.set('a', 1)
+    session.set('b', 2)
+    session.delete('a')
+    assert _stored_variables(monitoring_db) == {'b': '2'}
+
+
+def test_state_body_writes_are_coalesced(monitoring_db, session, writes):
+    def body(session: Session):
+        for i in range(10):
+            session.set('counter', i)
+        session.set('name', 'alice')
+        session.set('tmp', True)
+        session.delete('tmp')
+        # Not stored yet
+        assert _stored_variables(monitoring_db) == {}
+
+    state = session._agent.new_state('state')
+    state.set_body(body)
+    writes.clear()
+    state.run(session)
+    # A single transaction: delete the old values and insert the new ones
+    assert len([statement for statement, _ in writes if statement.startswith('DELETE')]) == 1
+    assert len([statement for statement, _ in writes if statement.startswith('INSERT')]) == 1
+    assert _stored_variables(monitoring_db) == {'counter': '9', 'name': '"alice"'}
+
+
+def test_state_body_writes_are_stored_if_body_fails(monitoring_db, session):
+    def body(session: Session):
+        session.set('counter', 1)
+        raise ValueError('body error')
+
+    state = session._agent.new_state('state')
+    state.set_body(body)
+    state.run(session)
+    assert _stored_variables(monitoring_db) == {'counter': '1'}
+
+
+def test_unserializable_value_is_detected_when_set(monitoring_db, session, caplog):
+    session.set('value', 1)
+    with caplog.at_level(logging.WARNING, logger=logger.name):
+        session.set('value', object())
+    assert "Session variable 'value' of session sid is not JSON serializable" in caplog.text
+    session.set('other', 'ok')
+    # The value is kept in the session, but the previously stored value is deleted
+    assert type(session.get('value')) is object
+    assert _stored_variables(monitoring_db) == {'other': '"ok"'}
+
+
+def test_load_session_variables(monitoring_db, session, agent, fake_platform, writes):
+    session.set('name', 'alice')
+    session.set('items', [1, 2, 3])
+    restored = Session('sid', agent, fake_platform)
+    writes.clear()
+    monitoring_db.load_session_variables(restored)
+    assert restored.get_dictionary() == {'name': 'alice', 'items': [1, 2, 3]}
+    # Loading the variables does not store them again
+    assert writes == []
+
+
+def test_load_session_variables_stored_by_previous_versions(monitoring_db, session, agent, fake_platform):
+    table = monitoring_db._get_table(TABLE_SESSION)
+    monitoring_db.run_statement(table.update().values(variables=json.dumps({'name': 'alice', 'age': 30})))
+    restored = Session('sid', agent, fake_platform)
+    monitoring_db.load_session_variables(restored)
+    assert restored.get_dictionary() == {'name': 'alice', 'age': 30}
+    assert _stored_variables(monitoring_db) == {'name': '"alice"', 'age': '30'}
+    # Deleted variables are not loaded again from the old column
+    restored.delete('name')
+    restored.delete('age')
+    monitoring_db.load_session_variables(Session('sid', agent, fake_platform))
+    assert _stored_variables(monitoring_db) == {}
+    assert monitoring_db.get_table(TABLE_SESSION)['variables'][0] == '{}'
+
+
+def test_store_all_session_variables(monitoring_db, session):
+    session._dictionary = {'a': 1, 'b': object()}
+    monitoring_db.store_session_variables(session)
+    assert _stored_variables(monitoring_db) == {'a': '1'}
+    session._dictionary = {'c': 3}
+    monitoring_db.store_session_variables(session)
+    assert _stored_variables(monitoring_db) == {'c': '3'}
+
+
+def test_delete_session_deletes_variables(monitoring_db, session):
+    session.set('a', 1)
+    monitoring_db.delete_session(session)
+    assert _stored_variables(monitoring_db) == {}
@@ -0,0 +1,187 @@
+"""Tests for the write-behind queue of the monitoring database, in baf.db.monitoring_writer."""
+
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import create_engine, event
+
+from baf.core.message import Message, MessageType
+from baf.core.transition.transition import Transition
+from baf.db import DB_MONITORING
+from baf.db.monitoring_db import TABLE_CHAT, TABLE_EVENT, TABLE_INTENT_PREDICTION, TABLE_PARAMETER, \
+    TABLE_TRANSITION
+from baf.library.intent.intent_library import fallback_intent
+from baf.library.transition.events.base_events import ReceiveTextEvent
+from baf.nlp.intent_classifier.intent_classifier_prediction import IntentClassifierPrediction
+from baf.nlp.ner.matched_parameter import MatchedParameter
+
+
+def _count(db_url: str, table_name: str) -> int:
+    engine = create_engine(db_url)
+    with engine.connect() as conn:
+        count = conn.exec_driver_sql(f'SELECT COUNT(*) FROM {table_name}').scalar()
+    engine.dispose()
+    return count
+
+
+def _insert_statements(engine, table_name: str) -> list[str]:
+    """Record the INSERT statements run on a table."""
+    statements = []
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith(f'INSERT INTO {table_name} '):
+            statements.append(statement)
+    return statements
+
+
+def _message(i: int) -> Message:
+    return Message(t=MessageType.STR, content=f'message {i}', is_user=i % 2 == 0, timestamp=datetime.now())
+
+
+def test_insert_without_writer_is_synchronous(monitoring_db, session, db_url):
+    monitoring_db.insert_chat(session, _message(0))
+    assert monitoring_db.writer is None
+    assert _count(db_url, TABLE_CHAT) == 1
+
+
+def test_writer_batches_records(monitoring_db, session, db_url):
+    statements = _insert_statements(monitoring_db.engine, TABLE_CHAT)
+    monitoring_db.start_writer(max_size=50, max_wait=5.0)
+    threads = [
+        threading.Thread(target=lambda k: [monitoring_db.insert_chat(session, _message(k * 30 + i)) for i in range(30)],
+                         args=(k,))
+        for k in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    monitoring_db.flush()
+    assert _count(db_url, TABLE_CHAT) == 120
+    # Each batch is written with a single multi-row insert
+    assert monitoring_db.writer.written_records == 120
+    assert monitoring_db.writer.written_batches == len(statements) == 3
+    chat = monitoring_db.select_chat(session)
+    assert sorted(chat['content']) == sorted(f'message {i}' for i in range(120))
+
+
+def test_writer_flushes_on_max_wait(monitoring_db, session, db_url):
+    monitoring_db.start_writer(max_size=100, max_wait=0.05)
+    monitoring_db.insert_chat(session, _message(0))
+    deadline = time.monotonic() + 5
+    while _count(db_url, TABLE_CHAT) == 0 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert _count(db_url, TABLE_CHAT) == 1
+
+
+def test_writer_inserts_all_record_types(monitoring_db, session, db_url, agent):
+    state = agent.new_state('state', initial=True)
+    dest = agent.new_state('dest')
+    monitoring_db.start_writer(max_size=100, max_wait=5.0)
+    for i in range(3):
+        prediction = IntentClassifierPrediction(
+            fallback_intent, 0.5, f'sentence {i}',
+            [MatchedParameter(f'param_{i}_{j}', f'value_{i}_{j}', {}) for j in range(i)]
+        )
+        monitoring_db.insert_intent_prediction(session, state, prediction)
+    monitoring_db.insert_transition(session, Transition('t', state, dest, None, None))
+    monitoring_db.insert_event(session, ReceiveTextEvent('hello', session.id))
+    monitoring_db.insert_event(None, ReceiveTextEvent('broadcast'))
+    monitoring_db.flush()
+    assert monitoring_db.writer.written_batches == 1
+    predictions = monitoring_db.get_table(TABLE_INTENT_PREDICTION).set_index('id')
+    parameters = monitoring_db.get_table(TABLE_PARAMETER)
+    assert len(predictions) == 3 and len(parameters) == 3
+    # The parameters reference their own intent prediction
+    for _, parameter in parameters.iterrows():
+        i = parameter['name'].split('_')[1]
+        assert predictions.loc[parameter['intent_prediction_id'], 'message'] == f'sentence {i}'
+    assert predictions['intent_classifier'].tolist() == ['None'] * 3
+    assert monitoring_db.get_last_state_of_session(agent.name, session.platform.__class__.__name__, 'sid') == 'dest'
+    events = monitoring_db.get_table(TABLE_EVENT)
+    assert events['session_id'].isna().tolist() == [False, True]
+    assert _count(db_url, TABLE_TRANSITION) == 1
+
+
+def test_writer_backpressure(monitoring_db, session, db_url, monkeypatch):
+    write_records = monitoring_db.write_records
+
+    def slow_write_records(records, conn):
+        time.sleep(0.1)
+        write_records(records, conn)
+
+    monkeypatch.setattr(monitoring_db, 'write_records', slow_write_records)
+    monitoring_db.start_writer(max_queue_size=1, max_size=1, max_wait=0.0)
+    start = time.monotonic()
+    for i in range(5):
+        monitoring_db.insert_chat(session, _message(i))
+        assert monitoring_db.writer._queue.qsize() <= 1
+    # The producer had to wait for the writer to make room in the queue
+    assert time.monotonic() - start >= 0.2
+    monitoring_db.flush()
+    assert _count(db_url, TABLE_CHAT) == 5
+
+
+def test_failed_batch_is_discarded(monitoring_db, session, db_url, monkeypatch):
+    write_records = monitoring_db.write_records
+    fail = [True]
+
+    def failing_write_records(records, conn):
+        if fail.pop() if fail else False:
+            raise RuntimeError('DB is down')
+        write_records(records, conn)
+
+    monkeypatch.setattr(monitoring_db, 'write_records', failing_write_records)
+    monitoring_db.start_writer(max_size=1, max_wait=0.0)
+    monitoring_db.insert_chat(session, _message(0))
+    monitoring_db.flush()
+    monitoring_db.insert_chat(session, _message(1))
+    monitoring_db.flush()
+    assert monitoring_db.writer.running
+    assert monitoring_db.writer.dropped_records == 1
+    assert monitoring_db.select_chat(session)['content'].tolist() == ['message 1']
+
+
+def test_failed_record_is_discarded_from_batch(monitoring_db, session, db_url, monkeypatch):
+    write_records = monitoring_db.write_records
+    attempts = []
+
+    def failing_write_records(records, conn):
+        attempts.append(len(records))
+        if any(row['content'] == 'message 5' for _, _, row, _ in records):
+            raise RuntimeError('Invalid record')
+        write_records(records, conn)
+
+    monkeypatch.setattr(monitoring_db, 'write_records', failing_write_records)
+    monitoring_db.start_writer(max_size=10, max_wait=5.0)
+    for i in range(10):
+        monitoring_db.insert_chat(session, _message(i))
+    monitoring_db.flush()
+    assert monitoring_db.writer.written_records == 9
+    assert monitoring_db.writer.dropped_records == 1
+    # The batch is bisected until the failing record is isolated
+    assert attempts == [10, 5, 5, 2, 1, 1, 3]
+    assert monitoring_db.select_chat(session)['content'].tolist() == [f'message {i}' for i in range(10) if i != 5]
+
+
+def test_delete_session_writes_queued_records_first(monitoring_db, session, db_url):
+    monitoring_db.start_writer(max_size=100, max_wait=5.0)
+    for i in range(10):
+        monitoring_db.insert_chat(session, _message(i))
+    monitoring_db.delete_session(session)
+    assert _count(db_url, TABLE_CHAT) == 0
+    assert not monitoring_db.session_exists(session._agent.name, session.platform.__class__.__name__, session.id)
+
+
+def test_agent_stop_flushes_queued_records(agent, monitoring_db, session, db_url):
+    agent.set_property(DB_MONITORING, True)
+    agent._monitoring_db = monitoring_db
+    monitoring_db.start_writer(max_size=1000, max_wait=60.0)
+    for i in range(20):
+        agent._monitoring_db_insert_chat(session, _message(i))
+    agent.stop()
+    assert not monitoring_db.connected
+    assert monitoring_db.writer is None
+    assert _count(db_url, TABLE_CHAT) == 20
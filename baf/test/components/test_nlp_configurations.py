@@ -20,6 +20,8 @@ def test_simple_config_defaults():
     assert cfg.check_exact_prediction_match is True
     assert cfg.activation_last_layer == "sigmoid"
     assert cfg.lr == 0.001
+    assert cfg.batch_size == 2
+    assert cfg.seed is None
 
 
 def test_simple_config_custom_values():
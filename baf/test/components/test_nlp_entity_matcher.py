@@ -0,0 +1,137 @@
+"""Tests for the entity value matching of the SimpleNER, in baf.nlp.ner.entity_matcher."""
+
+import random
+
+import pytest
+
+from baf.core.agent import Agent
+from baf.core.intent.intent_parameter import IntentParameter
+from baf.nlp import NLP_PRE_PROCESSING
+from baf.nlp.ner.entity_matcher import EntityValueMatcher, select_matches
+from baf.nlp.ner.simple_ner import SimpleNER, get_custom_entity_values_dict
+from baf.nlp.utils import find_first_temp, replace_temp_value_in_sentence, replace_value_in_sentence, \
+    value_in_sentence
+
+
+def _reference_custom_entities(intent, message: str) -> tuple[str, list[tuple[str, str]]]:
+    """The regex based matching of custom entities used by previous versions of the SimpleNER."""
+    ner_sentence = message
+    intent_matches = []
+    all_entity_values = get_custom_entity_values_dict(intent, False)
+    temps = {}
+    temp_count = 1
+    for value, (intent_parameters, entry_value) in sorted(all_entity_values.items(),
+                                                    key=lambda x: (len(x[0]), x[0].casefold()), reverse=True):
+        if value_in_sentence(value, ner_sentence):
+            temp_n = f'/temp{temp_count}/'
+            temp_count += 1
+            ner_sentence = replace_value_in_sentence(ner_sentence, value, temp_n)
+            temps[temp_n] = (intent_parameters, entry_value)
+    intent_parameters_done: list[IntentParameter] = []
+    while len(temps) > 0:
+        temp = find_first_temp(ner_sentence)
+        (intent_parameters, value) = temps.pop(temp)
+        intent_parameter = next((e for e in intent_parameters if e not in intent_parameters_done), None)
+        if intent_parameter is None:
+            ner_sentence = replace_temp_value_in_sentence(ner_sentence, temp, value)
+        else:
+            intent_parameters_done.append(intent_parameter)
+            ner_sentence = replace_temp_value_in_sentence(ner_sentence, temp, intent_parameter.entity.name.upper())
+            intent_matches.append((intent_parameter.name, value))
+    return ner_sentence, intent_matches
+
+
+def _matches(ner_prediction, intent) -> list[tuple[str, str]]:
+    return [(mp.name, mp.value) for mp in ner_prediction.intent_matched_parameters[intent] if mp.value is not None]
+
+
+@pytest.fixture
+def city_agent() -> Agent:
+    agent = Agent('ner_agent')
+    agent.set_property(NLP_PRE_PROCESSING, False)
+    city = agent.new_entity('city', entries={
+        'Barcelona': ['BCN'],
+        'New York': ['NYC', 'New York City', 'Big Apple'],
+        'York': [],
+        'Paris': ['paris'],
+    })
+    intent = agent.new_intent('travel', ['I want to travel from ORIGIN to DESTINATION'])
+    intent.parameter('origin', 'ORIGIN', city)
+    intent.parameter('destination', 'DESTINATION', city)
+    state = agent.new_state('state', initial=True)
+    state.when_intent_matched(intent).go_to(state)
+    return agent
+
+
+def test_find_all_whole_words_case_insensitive():
+    matcher = EntityValueMatcher(['york', 'new york', 'ork'])
+    assert len(matcher) == 3
+    assert matcher.find_all('I love New York') == [(7, 15, 'new york'), (11, 15, 'york')]
+    # 'ork' is never a whole word, 'yorkshire' does not contain 'york' as a word
+    assert matcher.find_all('yorkshire and York.') == [(14, 18, 'york')]
+    assert matcher.find_all('') == []
+    assert EntityValueMatcher([]).find_all('york') == []
+
+
+def test_find_all_same_normalized_values():
+    matcher = EntityValueMatcher(['Paris', 'paris'])
+    assert len(matcher) == 1
+    assert matcher.find_all('PARIS') == [(0, 5, 'Paris'), (0, 5, 'paris')]
+
+
+def test_find_all_non_word_boundaries():
+    matcher = EntityValueMatcher(['c++', 'a.b'])
+    # Like the regex \bc\+\+\b, 'c++' needs a word character after it (or to be the whole sentence)
+    assert matcher.find_all('I code in c++') == []
+    assert matcher.find_all('c++') == [(0, 3, 'c++')]
+    assert matcher.find_all('c++x and a.b') == [(0, 3, 'c++'), (9, 12, 'a.b')]
+
+
+def test_select_matches_priority():
+    occurrences = EntityValueMatcher(['new york', 'york', 'new']).find_all('new york and york and new')
+    # Longer values first, each value only once, in its first non-overlapping occurrence
+    assert select_matches(occurrences, {'new york': None, 'york': None, 'new': None}) == [
+        (0, 8, 'new york'), (13, 17, 'york'), (22, 25, 'new')
+    ]
+    # Occurrences of values that are not selectable are ignored
+    assert select_matches(occurrences, {'york': None}) == [(4, 8, 'york')]
+
+
+def test_simple_ner_predict(city_agent):
+    ner = SimpleNER(city_agent.nlp_engine, city_agent)
+    ner.train()
+    intent = city_agent.intents[0]
+    prediction = ner.predict(city_agent.initial_state(), 'from the big apple to bcn, then paris')
+    assert list(prediction.ner_sentences) == ['from the CITY to CITY, then Paris']
+    assert _matches(prediction, intent) == [('origin', 'New York'), ('destination', 'Barcelona')]
+    prediction = ner.predict(city_agent.initial_state(), 'nothing here')
+    assert list(prediction.ner_sentences) == ['nothing here']
+    assert [(mp.name, mp.value) for mp in prediction.intent_matched_parameters[intent]] == [
+        ('origin', None), ('destination', None)
+    ]
+
+
+def test_simple_ner_matchers_are_compiled_on_training(city_agent):
+    ner = SimpleNER(city_agent.nlp_engine, city_agent)
+    ner.train()
+    assert (city_agent.initial_state(), False) in ner._state_matchers
+    city = city_agent.entities[0]
+    city.entries[0].synonyms.append('Barna')
+    ner.train()
+    prediction = ner.predict(city_agent.initial_state(), 'to barna')
+    assert _matches(prediction, city_agent.intents[0]) == [('origin', 'Barcelona')]
+
+
+def test_simple_ner_same_result_as_regex_matching(city_agent):
+    rng = random.Random(0)
+    words = ['to', 'from', 'new', 'york', 'city', 'big', 'apple', 'nyc', 'bcn', 'barcelona', 'paris', 'PARIS', 'go',
+             'New York', 'york,', 'yorkshire', 'the', '.', '-']
+    ner = SimpleNER(city_agent.nlp_engine, city_agent)
+    ner.train()
+    intent = city_agent.intents[0]
+    for _ in range(500):
+        message = ' '.join(rng.choice(words) for _ in range(rng.randint(1, 10)))
+        prediction = ner.predict(city_agent.initial_state(), message)
+        ner_sentence, matches = _reference_custom_entities(intent, message)
+        assert list(prediction.ner_sentences) == [ner_sentence], message
+        assert _matches(prediction, intent) == matches, message
@@ -0,0 +1,150 @@
+"""Tests for baf.nlp.intent_classifier.intent_classifier_cache.IntentClassifierCache and the intent classifier
+fingerprints."""
+
+import json
+
+import pytest
+
+from baf.core.agent import Agent
+from baf.nlp import NLP_LANGUAGE, NLP_MODEL_CACHE_PATH, NLP_PRE_PROCESSING
+from baf.nlp.intent_classifier.intent_classifier import IntentClassifier
+from baf.nlp.intent_classifier.intent_classifier_cache import IntentClassifierCache
+from baf.nlp.intent_classifier.intent_classifier_configuration import SimpleIntentClassifierConfiguration
+from baf.nlp.intent_classifier.intent_classifier_prediction import IntentClassifierPrediction
+
+
+class WeightsClassifier(IntentClassifier):
+    """Intent classifier whose 'model' is a number set when it is trained."""
+
+    cache_file_extension = '.json'
+
+    def __init__(self, nlp_engine, state):
+        super().__init__(nlp_engine, state)
+        self.weights = None
+        self.trainings = 0
+
+    def train(self) -> None:
+        self.trainings += 1
+        self.weights = 42
+
+    def predict(self, message: str) -> list[IntentClassifierPrediction]:
+        return []
+
+    def save(self, path: str) -> None:
+        with open(path, 'w') as file:
+            json.dump({'weights': self.weights}, file)
+
+    def load(self, path: str) -> bool:
+        with open(path) as file:
+            self.weights = json.load(file)['weights']
+        return True
+
+
+def _build_agent(sentences=('hello', 'hi'), entries=('red', 'blue'), epochs=10, pre_processing=True):
+    agent = Agent('cache_agent')
+    agent.set_property(NLP_PRE_PROCESSING, pre_processing)
+    color = agent.new_entity('color', entries={entry: [] for entry in entries})
+    state = agent.new_state('state', initial=True, ic_config=SimpleIntentClassifierConfiguration(num_epochs=epochs))
+    hello = agent.new_intent('hello', list(sentences))
+    paint = agent.new_intent('paint', ['paint it COLOR'])
+    paint.parameter('color', 'COLOR', color)
+    state.when_intent_matched(hello).go_to(state)
+    state.when_intent_matched(paint).go_to(state)
+    return agent, WeightsClassifier(agent.nlp_engine, state)
+
+
+def test_same_definition_has_same_fingerprint():
+    assert _build_agent()[1].fingerprint() == _build_agent()[1].fingerprint()
+
+
+@pytest.mark.parametrize('changes', [
+    {'sentences': ('hello', 'hey')},
+    {'entries': ('red', 'green')},
+    {'epochs': 11},
+    {'pre_processing': False},
+])
+def test_fingerprint_changes_with_training_data_and_configuration(changes):
+    assert _build_agent(**changes)[1].fingerprint() != _build_agent()[1].fingerprint()
+
+
+def test_fingerprint_changes_with_language_and_intents():
+    agent, classifier = _build_agent()
+    fingerprint = classifier.fingerprint()
+    agent.set_property(NLP_LANGUAGE, 'es')
+    assert classifier.fingerprint() != fingerprint
+    agent.set_property(NLP_LANGUAGE, 'en')
+    agent.new_intent('bye', ['bye'])  # Not an intent of the state
+    assert classifier.fingerprint() == fingerprint
+    agent.initial_state().when_intent_matched(agent.intents[-1]).go_to(agent.initial_state())
+    assert classifier.fingerprint() != fingerprint
+
+
+def test_cache_saves_and_loads_models(tmp_path):
+    cache = IntentClassifierCache(str(tmp_path / 'models'))
+    _, classifier = _build_agent()
+    assert not cache.load(classifier)
+    classifier.train()
+    cache.save(classifier)
+    assert cache.get_file(classifier).is_file()
+
+    _, restarted_classifier = _build_agent()
+    assert cache.load(restarted_classifier)
+    assert restarted_classifier.weights == 42
+    assert restarted_classifier.trainings == 0
+
+
+def test_cache_is_invalidated_and_outdated_models_are_removed(tmp_path):
+    cache = IntentClassifierCache(str(tmp_path))
+    _, classifier = _build_agent()
+    classifier.train()
+    cache.save(classifier)
+    old_file = cache.get_file(classifier)
+
+    _, changed_classifier = _build_agent(sentences=('hello', 'good morning'))
+    assert not cache.load(changed_classifier)
+    changed_classifier.train()
+    cache.save(changed_classifier)
+    assert not old_file.exists()
+    assert [file.name for file in tmp_path.iterdir()] == [cache.get_file(changed_classifier).name]
+
+
+def test_corrupted_model_is_not_loaded(tmp_path):
+    cache = IntentClassifierCache(str(tmp_path))
+    _, classifier = _build_agent()
+    cache.get_file(classifier).write_text('not json')
+    assert not cache.load(classifier)
+
+
+def test_classifiers_without_cache_support_are_ignored(tmp_path):
+    cache = IntentClassifierCache(str(tmp_path))
+    _, classifier = _build_agent()
+    classifier.cache_file_extension = None
+    assert cache.get_file(classifier) is None
+    assert not cache.load(classifier)
+    cache.save(classifier)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_agent_train_loads_pytorch_classifier_from_cache(tmp_path):
+    def build():
+        agent = Agent('cache_agent')
+        agent.set_property(NLP_MODEL_CACHE_PATH, str(tmp_path))
+        state = agent.new_state('state', initial=True, ic_config=SimpleIntentClassifierConfiguration(num_epochs=5))
+        for name, sentences in (('hello', ['hello', 'hi']), ('bye', ['bye', 'see you'])):
+            state.when_intent_matched(agent.new_intent(name, sentences)).go_to(state)
+        return agent, state
+
+    agent, state = build()
+    agent.train()
+    trained = agent._nlp_engine._intent_classifiers[state]
+    assert len(list(tmp_path.iterdir())) == 1
+
+    restarted_agent, restarted_state = build()
+    restarted = restarted_agent._nlp_engine
+    restarted.initialize()
+    classifier = restarted._intent_classifiers[restarted_state]
+    classifier.train = lambda: pytest.fail('The intent classifier should be loaded from the cache')
+    restarted.train()
+    for message in ('hi', 'see you', 'something else'):
+        expected = [p.score for p in trained.predict(message)]
+        assert [p.score for p in classifier.predict(message)] == pytest.approx(expected)
@@ -0,0 +1,92 @@
+"""Tests for baf.nlp.intent_classifier.intent_prediction_batcher.IntentPredictionBatcher."""
+
+import threading
+import time
+
+import pytest
+
+from baf.core.agent import Agent
+from baf.nlp.intent_classifier.intent_classifier import IntentClassifier
+from baf.nlp.intent_classifier.intent_classifier_prediction import IntentClassifierPrediction
+from baf.nlp.intent_classifier.intent_prediction_batcher import IntentPredictionBatcher
+
+
+class RecordingClassifier(IntentClassifier):
+    """Predicts the intent whose name is the message, recording the size of each batch."""
+
+    def __init__(self, agent: Agent, delay: float = 0.0):
+        self.intent = agent.new_intent('hello', ['hello'])
+        state = agent.new_state('state', initial=True)
+        state.when_intent_matched(self.intent).go_to(state)
+        super().__init__(agent.nlp_engine, state)
+        self.delay = delay
+        self.batches: list[list[str]] = []
+
+    def train(self) -> None:
+        pass
+
+    def predict(self, message: str) -> list[IntentClassifierPrediction]:
+        return self.predict_batch([message])[0]
+
+    def predict_batch(self, messages: list[str]) -> list[list[IntentClassifierPrediction]]:
+        self.batches.append(list(messages))
+        if 'error' in messages:
+            raise ValueError('prediction failed')
+        time.sleep(self.delay)
+        return [[IntentClassifierPrediction(self.intent, 1.0, message, [])] for message in messages]
+
+
+def _predict_concurrently(batcher: IntentPredictionBatcher, messages: list[str]) -> dict:
+    results = {}
+
+    def predict(message):
+        try:
+            results[message] = batcher.predict(message)
+        except Exception as e:
+            results[message] = e
+
+    threads = [threading.Thread(target=predict, args=(message,)) for message in messages]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    return results
+
+
+def test_batch_size_one_predicts_directly():
+    classifier = RecordingClassifier(Agent('a'))
+    batcher = IntentPredictionBatcher(classifier, max_batch_size=1)
+    assert batcher.predict('hi')[0].matched_sentence == 'hi'
+    assert classifier.batches == [['hi']]
+
+
+def test_concurrent_predictions_are_batched_and_scattered():
+    classifier = RecordingClassifier(Agent('a'), delay=0.01)
+    batcher = IntentPredictionBatcher(classifier, max_batch_size=8, max_wait=0.2)
+    messages = [f'message {i}' for i in range(8)]
+    results = _predict_concurrently(batcher, messages)
+    for message in messages:
+        assert results[message][0].matched_sentence == message
+    assert sorted(m for batch in classifier.batches for m in batch) == sorted(messages)
+    assert len(classifier.batches) < len(messages)
+    assert all(len(batch) <= 8 for batch in classifier.batches)
+
+
+def test_batches_do_not_exceed_max_batch_size():
+    classifier = RecordingClassifier(Agent('a'), delay=0.01)
+    batcher = IntentPredictionBatcher(classifier, max_batch_size=3, max_wait=0.05)
+    messages = [f'message {i}' for i in range(10)]
+    results = _predict_concurrently(batcher, messages)
+    assert all(results[message][0].matched_sentence == message for message in messages)
+    assert all(len(batch) <= 3 for batch in classifier.batches)
+
+
+def test_errors_are_raised_in_all_requests_of_the_batch():
+    classifier = RecordingClassifier(Agent('a'))
+    batcher = IntentPredictionBatcher(classifier, max_batch_size=4, max_wait=0.2)
+    results = _predict_concurrently(batcher, ['error', 'a', 'b', 'c'])
+    assert isinstance(results['error'], ValueError)
+    with pytest.raises(ValueError):
+        batcher.predict('error')
+    # The batcher keeps working after an error
+    assert batcher.predict('d')[0].matched_sentence == 'd'
@@ -0,0 +1,119 @@
+"""Tests for the (parallel) training of intent classifiers, in baf.nlp.intent_classifier.training_pool."""
+
+import os
+
+import pytest
+import torch
+
+from baf.core.agent import Agent
+from baf.nlp import NLP_TRAINING_WORKERS
+from baf.nlp.intent_classifier.intent_classifier import IntentClassifier
+from baf.nlp.intent_classifier.intent_classifier_configuration import SimpleIntentClassifierConfiguration
+from baf.nlp.intent_classifier.intent_classifier_prediction import IntentClassifierPrediction
+from baf.nlp.intent_classifier.simple_intent_classifier_pytorch import train_text_classifier
+from baf.nlp.intent_classifier.training_pool import train_intent_classifiers
+
+MODEL_PARAMETERS = {'vocab_size': 10, 'embed_dim': 8, 'hidden_dim': 8, 'output_dim': 3, 'pad_idx': 0,
+                    'activation_last_layer': 'sigmoid'}
+SEQUENCES = [[1, 2, 0, 0], [3, 4, 5, 0], [6, 7, 0, 0], [8, 9, 1, 0], [2, 5, 0, 0], [7, 3, 0, 0]]
+LABELS = [0, 1, 2, 0, 1, 2]
+
+
+def _job(value: int) -> tuple[int, int]:
+    """Training job run in the worker processes."""
+    return value * value, os.getpid()
+
+
+class JobClassifier(IntentClassifier):
+
+    def __init__(self, nlp_engine, state, value: int or None):
+        super().__init__(nlp_engine, state)
+        self.value = value
+        self.result = None
+        self.trained_in_process = False
+
+    def train(self) -> None:
+        self.trained_in_process = True
+        self.result = (self.value * self.value, os.getpid()) if self.value is not None else None
+
+    def training_job(self):
+        return (_job, (self.value,)) if self.value is not None else None
+
+    def set_training_result(self, result) -> None:
+        self.result = result
+
+    def predict(self, message: str) -> list[IntentClassifierPrediction]:
+        return []
+
+
+def _job_classifiers(values: list[int or None]) -> list[JobClassifier]:
+    agent = Agent('pool_agent')
+    intent = agent.new_intent('hello', ['hello'])
+    classifiers = []
+    for i, value in enumerate(values):
+        state = agent.new_state(f'state_{i}', initial=i == 0)
+        state.when_intent_matched(intent).go_to(state)
+        classifiers.append(JobClassifier(agent.nlp_engine, state, value))
+    return classifiers
+
+
+def _assert_same_state_dict(a: dict, b: dict) -> None:
+    assert a.keys() == b.keys()
+    for key in a:
+        assert torch.equal(a[key], b[key]), key
+
+
+def test_training_is_deterministic_with_seed():
+    args = (MODEL_PARAMETERS, SEQUENCES, LABELS, 5, 0.01)
+    _assert_same_state_dict(train_text_classifier(*args, 2, 7), train_text_classifier(*args, 2, 7))
+    different = train_text_classifier(*args, 2, 8)
+    assert not torch.equal(different['fc3.weight'], train_text_classifier(*args, 2, 7)['fc3.weight'])
+
+
+def test_seeded_training_keeps_the_global_random_state():
+    torch.manual_seed(42)
+    expected = torch.rand(3)
+    torch.manual_seed(42)
+    train_text_classifier(MODEL_PARAMETERS, SEQUENCES, LABELS, 2, 0.01, 2, 7)
+    assert torch.equal(torch.rand(3), expected)
+
+
+@pytest.mark.parametrize('batch_size', [1, 4, None])
+def test_training_batch_sizes(batch_size):
+    state_dict = train_text_classifier(MODEL_PARAMETERS, SEQUENCES, LABELS, 3, 0.01, batch_size, 0)
+    assert state_dict['fc3.weight'].shape == (3, 8)
+
+
+def test_sequential_training_with_one_worker():
+    classifiers = _job_classifiers([2, 3, None])
+    train_intent_classifiers(classifiers, workers=1)
+    assert all(classifier.trained_in_process for classifier in classifiers)
+    assert [classifier.result for classifier in classifiers] == [(4, os.getpid()), (9, os.getpid()), None]
+
+
+def test_parallel_training_in_worker_processes():
+    classifiers = _job_classifiers([2, 3, 4, None])
+    train_intent_classifiers(classifiers, workers=2)
+    assert [classifier.result[0] for classifier in classifiers[:3]] == [4, 9, 16]
+    assert all(classifier.result[1] != os.getpid() for classifier in classifiers[:3])
+    assert not any(classifier.trained_in_process for classifier in classifiers[:3])
+    # Intent classifiers without training job are trained in the agent process
+    assert classifiers[3].trained_in_process
+
+
+def test_parallel_training_produces_the_same_models():
+    def train(workers: int) -> list[dict]:
+        ic_config = SimpleIntentClassifierConfiguration(num_epochs=5, seed=3)
+        agent = Agent('pool_agent')
+        agent.set_property(NLP_TRAINING_WORKERS, workers)
+        hello = agent.new_intent('hello', ['hello', 'hi', 'good morning'])
+        bye = agent.new_intent('bye', ['bye', 'see you', 'goodbye'])
+        states = [agent.new_state(f'state_{i}', initial=i == 0, ic_config=ic_config) for i in range(3)]
+        for state in states:
+            state.when_intent_matched(hello).go_to(state)
+            state.when_intent_matched(bye).go_to(state)
+        agent.train()
+        return [agent._nlp_engine._intent_classifiers[state]._model.state_dict() for state in states]
+
+    for sequential, parallel in zip(train(1), train(2)):
+        _assert_same_state_dict(sequential, parallel)
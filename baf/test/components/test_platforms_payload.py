@@ -0,0 +1,97 @@
+"""Tests for the payload codecs of baf.platforms.payload."""
+
+import base64
+import json
+from datetime import datetime
+
+import pytest
+
+from baf.core.file import File
+from baf.platforms.payload import BINARY_CODEC, JSON_CODEC, Payload, PayloadAction, PayloadEncoder, get_codec
+
+DATA = bytes(range(256)) * 40
+DATA_BASE64 = base64.b64encode(DATA).decode('utf-8')
+
+
+@pytest.mark.parametrize('action', list(PayloadAction))
+def test_decode_action(action):
+    payload = Payload.decode(json.dumps({'action': action.value, 'message': 'hello', 'history': True}))
+    assert payload.action == action.value
+    assert payload.message == 'hello'
+    assert payload.history
+
+
+def test_decode_unknown_action():
+    assert Payload.decode(json.dumps({'action': 'unknown', 'message': 'hello'})) is None
+    assert Payload.decode({'action': PayloadAction.USER_MESSAGE.value, 'message': 'hello'}).message == 'hello'
+
+
+def test_get_codec():
+    assert get_codec('baf.binary') is BINARY_CODEC
+    assert get_codec('baf.json') is JSON_CODEC
+    assert get_codec(None) is JSON_CODEC
+    assert get_codec('unknown') is JSON_CODEC
+
+
+def test_json_codec_is_the_legacy_format():
+    payload = Payload(action=PayloadAction.AGENT_REPLY_STR, message='hello', timestamp=datetime(2024, 1, 1, 12))
+    assert JSON_CODEC.encode(payload) == json.dumps(payload, cls=PayloadEncoder)
+    assert json.loads(JSON_CODEC.encode(payload)) == {'action': 'agent_reply_str', 'message': 'hello',
+                                                      'history': False, 'timestamp': '2024-01-01 12:00:00'}
+
+
+@pytest.mark.parametrize('codec', [JSON_CODEC, BINARY_CODEC])
+@pytest.mark.parametrize('action, message', [
+    (PayloadAction.AGENT_REPLY_STR, 'hello'),
+    (PayloadAction.AGENT_REPLY_LOCATION, {'latitude': 1.5, 'longitude': 2.5}),
+    (PayloadAction.AGENT_REPLY_OPTIONS, json.dumps({'0': 'yes', '1': 'no'})),
+    (PayloadAction.RESET, None),
+])
+def test_round_trip(codec, action, message):
+    payload = codec.decode(codec.encode(Payload(action=action, message=message, history=True)))
+    assert (payload.action, payload.message, payload.history) == (action.value, message, True)
+
+
+@pytest.mark.parametrize('codec', [JSON_CODEC, BINARY_CODEC])
+@pytest.mark.parametrize('action, message', [
+    (PayloadAction.AGENT_REPLY_IMAGE, DATA_BASE64),
+    (PayloadAction.AGENT_REPLY_IMAGE, DATA),
+    (PayloadAction.USER_VOICE, DATA),
+    (PayloadAction.AGENT_REPLY_FILE, File(file_name='f.bin', file_type='bin', file_data=DATA).to_dict()),
+    (PayloadAction.USER_FILE, {'name': 'f.bin', 'type': 'bin', 'base64': DATA}),
+    (PayloadAction.AGENT_REPLY_AUDIO, {'audio_data_base64': DATA_BASE64,
+                                       'metadata': {'sample_rate': 16000, 'dtype': 'int16', 'shape': [5120]}}),
+], ids=['image_base64', 'image_bytes', 'voice', 'file', 'user_file', 'audio'])
+def test_binary_content(codec, action, message):
+    encoded = codec.encode(Payload(action=action, message=message))
+    payload = Payload.decode(encoded)
+    assert payload.get_bytes() == DATA
+    if codec is BINARY_CODEC:
+        # The binary content is not base64-encoded
+        assert len(encoded) < len(DATA) + 300
+    else:
+        assert len(encoded) > len(DATA_BASE64)
+    if isinstance(message, dict) and 'metadata' in message:
+        assert payload.message['metadata'] == message['metadata']
+
+
+def test_user_file_json_string():
+    # The files sent as JSON strings (e.g. by older clients) keep their base64 content
+    message = File(file_name='f.bin', file_type='bin', file_data=DATA).get_json_string()
+    payload = BINARY_CODEC.decode(BINARY_CODEC.encode(Payload(action=PayloadAction.USER_FILE, message=message)))
+    assert payload.message == message
+    assert payload.get_bytes() == DATA
+
+
+def test_binary_codec_nested_bytes():
+    message = {'files': [{'name': 'a', 'data': b'a' * 10}, {'name': 'b', 'data': b''}], 'raw': b'\x00\xff'}
+    encoded = BINARY_CODEC.encode(Payload(action=PayloadAction.AGENT_REPLY_RAG, message=message))
+    assert BINARY_CODEC.decode(encoded).message == message
+    # With the JSON codec, they are base64 strings
+    decoded = JSON_CODEC.decode(JSON_CODEC.encode(Payload(action=PayloadAction.AGENT_REPLY_RAG, message=message)))
+    assert decoded.message['raw'] == base64.b64encode(b'\x00\xff').decode('utf-8')
+
+
+def test_payloads_without_binary_content():
+    assert Payload(action=PayloadAction.AGENT_REPLY_STR, message='hello').get_bytes() is None
+    assert Payload(action=PayloadAction.AGENT_REPLY_FILE, message={'name': 'f'}).get_bytes() is None
@@ -0,0 +1,242 @@
+"""Tests for the asyncio server of baf.platforms.websocket.websocket_platform.WebSocketPlatform and the outbound queues
+of its connections (baf.platforms.websocket.async_connection.AsyncConnection)."""
+
+import asyncio
+import json
+import socket
+import threading
+import time
+import uuid
+
+import pytest
+from websockets.client import connect
+
+from baf import AGENT_SCHEDULER
+from baf.core.agent import Agent
+from baf.core.session import Session
+from baf.library.transition.events.base_events import ReceiveTextEvent
+from baf.platforms.payload import BINARY_CODEC, JSON_CODEC, Payload, PayloadAction, PayloadEncoder
+from baf.platforms.websocket import WEBSOCKET_PORT, WEBSOCKET_SERVER
+from baf.platforms.websocket.async_connection import AsyncConnection, SLOW_CONSUMER_CLOSE_CODE
+
+
+class StalledWebSocket:
+    """WebSocket connection whose client does not read the messages until it is unblocked."""
+
+    def __init__(self):
+        self.id = uuid.uuid4()
+        self.subprotocol = None
+        self.sent: list[str] = []
+        self.closed_with: tuple[int, str] or None = None
+        self.unblocked = asyncio.Event()
+
+    async def send(self, message: str) -> None:
+        await self.unblocked.wait()
+        self.sent.append(message)
+
+    async def close(self, code: int = 1000, reason: str = '') -> None:
+        self.closed_with = (code, reason)
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    yield loop
+
+    async def cancel_writers():
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run_coroutine_threadsafe(cancel_writers(), loop).result()
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+def _connection(loop, policy: str, max_queue_size: int = 2,
+                block_timeout: float = 5.0) -> tuple[StalledWebSocket, AsyncConnection]:
+    async def create():
+        websocket = StalledWebSocket()
+        connection = AsyncConnection(websocket, max_queue_size, policy, block_timeout)
+        connection.start()
+        return websocket, connection
+
+    return asyncio.run_coroutine_threadsafe(create(), loop).result()
+
+
+def _unblock(loop, websocket: StalledWebSocket, sent: int) -> None:
+    loop.call_soon_threadsafe(websocket.unblocked.set)
+    deadline = time.monotonic() + 5
+    while len(websocket.sent) < sent and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def _wait_closed(websocket: StalledWebSocket) -> None:
+    deadline = time.monotonic() + 5
+    while websocket.closed_with is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def test_invalid_policy():
+    with pytest.raises(ValueError):
+        AsyncConnection(StalledWebSocket(), 10, 'retry', 1.0)
+
+
+def test_drop_policy(loop):
+    websocket, connection = _connection(loop, 'drop')
+    assert [connection.send(f'message {i}') for i in range(4)] == [True, True, False, False]
+    assert connection.dropped == 2
+    _unblock(loop, websocket, 2)
+    assert websocket.sent == ['message 0', 'message 1']
+    # There is room in the queue again
+    assert connection.send('message 4')
+    _unblock(loop, websocket, 3)
+    assert websocket.sent[-1] == 'message 4'
+    assert websocket.closed_with is None
+
+
+def test_disconnect_policy(loop):
+    websocket, connection = _connection(loop, 'disconnect')
+    assert [connection.send(f'message {i}') for i in range(3)] == [True, True, False]
+    _wait_closed(websocket)
+    assert websocket.closed_with == (SLOW_CONSUMER_CLOSE_CODE, 'slow consumer')
+    assert connection.closed
+    assert not connection.send('message 3')
+
+
+def test_block_policy(loop):
+    websocket, connection = _connection(loop, 'block')
+    assert connection.send('message 0') and connection.send('message 1')
+    result = []
+    sender = threading.Thread(target=lambda: result.append(connection.send('message 2')))
+    sender.start()
+    sender.join(0.2)
+    # The sender waits for room in the queue
+    assert sender.is_alive()
+    _unblock(loop, websocket, 3)
+    sender.join(5)
+    assert result == [True]
+    assert websocket.sent == ['message 0', 'message 1', 'message 2']
+
+
+def test_block_policy_timeout(loop):
+    websocket, connection = _connection(loop, 'block', block_timeout=0.2)
+    assert connection.send('message 0') and connection.send('message 1')
+    start = time.monotonic()
+    assert not connection.send('message 2')
+    assert time.monotonic() - start >= 0.2
+    _wait_closed(websocket)
+    assert websocket.closed_with == (SLOW_CONSUMER_CLOSE_CODE, 'slow consumer')
+
+
+def test_concurrent_senders_keep_their_order(loop):
+    websocket, connection = _connection(loop, 'block', max_queue_size=10)
+    loop.call_soon_threadsafe(websocket.unblocked.set)
+
+    def send(i: int):
+        for j in range(100):
+            assert connection.send(f'{i}-{j}')
+
+    threads = [threading.Thread(target=send, args=(i,)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    _unblock(loop, websocket, 800)
+    assert len(websocket.sent) == 800
+    for i in range(8):
+        assert [message for message in websocket.sent if message.startswith(f'{i}-')] == \
+            [f'{i}-{j}' for j in range(100)]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('localhost', 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture(params=['asyncio', 'sync'])
+def echo_agent(request) -> Agent:
+    """Agent replying to each message with the same message, through a running WebSocket platform."""
+    agent = Agent(f'{request.param}_echo_agent')
+    agent.set_property(WEBSOCKET_PORT, _free_port())
+    agent.set_property(WEBSOCKET_SERVER, request.param)
+    agent.set_property(AGENT_SCHEDULER, 'shared_loops')
+    platform = agent.use_websocket_platform(use_ui=False)
+    idle = agent.new_state('idle', initial=True)
+    echo = agent.new_state('echo')
+
+    def echo_body(session: Session) -> None:
+        platform.reply(session, f'echo: {session.event.message}')
+
+    echo.set_body(echo_body)
+    idle.when_event(ReceiveTextEvent()).go_to(echo)
+    echo.go_to(idle)
+    agent._trained = True
+    agent.run(train=False, sleep=False)
+    deadline = time.monotonic() + 5
+    while not platform.running and time.monotonic() < deadline:
+        time.sleep(0.01)
+    yield agent
+    agent.stop()
+
+
+async def _chat(port: int, clients: int, messages: int) -> list[list[str]]:
+    async def client(i: int) -> list[str]:
+        replies = []
+        async with connect(f'ws://localhost:{port}?session_id=client_{i}') as websocket:
+            for j in range(messages):
+                await websocket.send(json.dumps(Payload(action=PayloadAction.USER_MESSAGE, message=f'{i}-{j}'),
+                                                cls=PayloadEncoder))
+                replies.append(json.loads(await asyncio.wait_for(websocket.recv(), 10))['message'])
+        return replies
+
+    return await asyncio.gather(*[client(i) for i in range(clients)])
+
+
+def test_echo(echo_agent):
+    port = echo_agent.get_property(WEBSOCKET_PORT)
+    replies = asyncio.run(_chat(port, clients=5, messages=3))
+    assert replies == [[f'echo: {i}-{j}' for j in range(3)] for i in range(5)]
+
+
+@pytest.mark.parametrize('subprotocols, codec', [
+    (None, JSON_CODEC), (['baf.binary', 'baf.json'], BINARY_CODEC), (['baf.json', 'baf.binary'], JSON_CODEC),
+    (['unknown'], JSON_CODEC),
+])
+def test_codec_negotiation(echo_agent, subprotocols, codec):
+    port = echo_agent.get_property(WEBSOCKET_PORT)
+
+    async def chat():
+        async with connect(f'ws://localhost:{port}', subprotocols=subprotocols) as websocket:
+            # The client can send payloads with any codec
+            await websocket.send(BINARY_CODEC.encode(Payload(action=PayloadAction.USER_MESSAGE, message='binary')))
+            await websocket.send(JSON_CODEC.encode(Payload(action=PayloadAction.USER_MESSAGE, message='json')))
+            return [await asyncio.wait_for(websocket.recv(), 10) for _ in range(2)]
+
+    replies = asyncio.run(chat())
+    assert [type(reply) for reply in replies] == [bytes if codec is BINARY_CODEC else str] * 2
+    assert [codec.decode(reply).message for reply in replies] == ['echo: binary', 'echo: json']
+
+
+def test_asyncio_server_does_not_use_a_thread_per_connection(echo_agent):
+    if echo_agent.get_property(WEBSOCKET_SERVER) != 'asyncio':
+        pytest.skip('the sync server uses a thread per connection')
+    port = echo_agent.get_property(WEBSOCKET_PORT)
+    threads = []
+
+    async def connect_all():
+        websockets = [await connect(f'ws://localhost:{port}') for _ in range(50)]
+        await asyncio.sleep(0.2)
+        threads.append(threading.active_count())
+        for websocket in websockets:
+            await websocket.close()
+
+    before = threading.active_count()
+    asyncio.run(connect_all())
+    # The sessions are scheduled on a shared pool of event loops and the messages are handled by a thread pool
+    assert threads[0] - before < 50
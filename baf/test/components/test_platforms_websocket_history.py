@@ -0,0 +1,131 @@
+"""Tests for the paginated chat history of baf.platforms.websocket.websocket_platform.WebSocketPlatform (see
+baf.platforms.websocket.chat_history_cache.ChatHistoryCache)."""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from baf import AGENT_CHAT_HISTORY_BUFFER_SIZE
+from baf.core.agent import Agent
+from baf.core.message import Message, MessageType
+from baf.db import DB_MONITORING
+from baf.platforms.payload import BINARY_CODEC, Payload, PayloadAction
+from baf.platforms.websocket import WEBSOCKET_HISTORY_PAGE_SIZE
+from baf.platforms.websocket.chat_history_cache import ChatHistoryCache
+
+START = datetime(2024, 1, 1)
+CONNECTION_TIME = START + timedelta(days=1)
+
+
+@pytest.fixture
+def history_agent(monitoring_db) -> Agent:
+    """Agent with a WebSocket platform (not running) and a monitoring database."""
+    agent = Agent('history_agent')
+    agent.set_property(AGENT_CHAT_HISTORY_BUFFER_SIZE, 20)
+    agent._monitoring_db = monitoring_db
+    agent.set_property(DB_MONITORING, True)
+    platform = agent.use_websocket_platform(use_ui=False)
+    platform.sent = []
+    platform._send = lambda session_id, payload: platform.sent.append(payload)
+    agent.new_state('initial', initial=True)
+    yield agent
+    for session_id in list(agent._sessions):
+        agent.close_session(session_id)
+    agent.scheduler.stop()
+
+
+def _fill(agent: Agent, session_id: str, n: int):
+    session = agent.get_or_create_session(session_id, agent._platforms[0])
+    for i in range(n):
+        session.save_message(Message(t=MessageType.STR, content=f'message {i}', is_user=i % 2 == 0,
+                                     timestamp=START + timedelta(seconds=i)))
+    return session
+
+
+def _fetch(agent: Agent, session_id: str, request: dict) -> dict:
+    platform = agent._platforms[0]
+    frame = BINARY_CODEC.encode(Payload(action=PayloadAction.FETCH_HISTORY_PAGE, message=request))
+    platform._handle_payload(session_id, None, None, CONNECTION_TIME, frame)
+    payload = platform.sent.pop()
+    assert payload.action == PayloadAction.AGENT_REPLY_HISTORY.value
+    return payload.message
+
+
+def test_pages(history_agent):
+    _fill(history_agent, 'sid', 125)
+    history_agent.set_property(WEBSOCKET_HISTORY_PAGE_SIZE, 50)
+    contents = []
+    cursor = None
+    pages = 0
+    while True:
+        page = _fetch(history_agent, 'sid', {'cursor': cursor})
+        contents[:0] = [message['message'] for message in page['messages']]
+        pages += 1
+        cursor = page['cursor']
+        if cursor is None:
+            break
+    assert pages == 3
+    assert contents == [f'message {i}' for i in range(125)]
+    assert history_agent._platforms[0].sent == []
+
+
+def test_page_content(history_agent):
+    _fill(history_agent, 'sid', 3)
+    page = _fetch(history_agent, 'sid', {'cursor': None, 'limit': 2})
+    assert page['cursor'] == '2'
+    assert page['messages'] == [
+        {'action': PayloadAction.AGENT_REPLY_STR.value, 'message': 'message 1', 'history': True,
+         'timestamp': '2024-01-01 00:00:01'},
+        {'action': PayloadAction.USER_MESSAGE.value, 'message': 'message 2', 'history': True,
+         'timestamp': '2024-01-01 00:00:02'},
+    ]
+    page = _fetch(history_agent, 'sid', {'cursor': page['cursor'], 'limit': 2})
+    assert page['cursor'] is None
+    assert [message['message'] for message in page['messages']] == ['message 0']
+
+
+def test_limit_is_bounded_by_page_size(history_agent):
+    _fill(history_agent, 'sid', 30)
+    history_agent.set_property(WEBSOCKET_HISTORY_PAGE_SIZE, 10)
+    assert len(_fetch(history_agent, 'sid', {'cursor': None, 'limit': 1000})['messages']) == 10
+    assert len(_fetch(history_agent, 'sid', {'limit': 0})['messages']) == 10
+    assert len(_fetch(history_agent, 'sid', None)['messages']) == 10
+
+
+def test_messages_after_connection_are_not_paged(history_agent):
+    session = _fill(history_agent, 'sid', 10)
+    session.save_message(Message(t=MessageType.STR, content='new', is_user=True,
+                                 timestamp=CONNECTION_TIME + timedelta(seconds=1)))
+    page = _fetch(history_agent, 'sid', {'cursor': None})
+    assert page['messages'][-1]['message'] == 'message 9'
+
+
+def test_history_is_read_once(history_agent, monkeypatch):
+    session = _fill(history_agent, 'sid', 100)
+    calls = []
+    get_chat_history = session.get_chat_history
+    monkeypatch.setattr(session, 'get_chat_history', lambda **kwargs: calls.append(kwargs) or get_chat_history(**kwargs))
+    cache = ChatHistoryCache(max_size=10)
+    # The first page is read from the in-memory chat history
+    assert [m.content for m in cache.get_page(session, CONNECTION_TIME, 0, 10)[0]] == \
+           [f'message {i}' for i in range(90, 100)]
+    assert calls == [{'n': 11, 'until_timestamp': CONNECTION_TIME}]
+    for offset in range(10, 100, 10):
+        messages, more = cache.get_page(session, CONNECTION_TIME, offset, 10)
+        assert [m.content for m in messages] == [f'message {i}' for i in range(90 - offset, 100 - offset)]
+        assert more == (offset < 90)
+    assert calls[1:] == [{'until_timestamp': CONNECTION_TIME}]
+    assert cache.get_page(session, CONNECTION_TIME, 200, 10) == ([], False)
+
+
+def test_cache_eviction(history_agent):
+    sessions = [_fill(history_agent, f'sid_{i}', 5) for i in range(3)]
+    cache = ChatHistoryCache(max_size=2)
+    for session in sessions:
+        cache.get_page(session, CONNECTION_TIME, 1, 1)
+    assert list(cache._histories) == [('sid_1', CONNECTION_TIME), ('sid_2', CONNECTION_TIME)]
+    cache.get_page(sessions[1], CONNECTION_TIME, 2, 1)
+    cache.get_page(sessions[0], CONNECTION_TIME, 1, 1)
+    assert list(cache._histories) == [('sid_1', CONNECTION_TIME), ('sid_0', CONNECTION_TIME)]
+    cache.discard('sid_1')
+    assert list(cache._histories) == [('sid_0', CONNECTION_TIME)]
@@ -96,6 +96,20 @@ def test_greetings_agent_predicts_correct_intent():
     assert top_bye.intent.name == "bye_intent"
 
 
+def test_greetings_agent_batched_prediction_matches_single_predictions():
+    agent = _tiny_greetings_agent()
+    agent.train()
+    classifier = agent._nlp_engine._intent_classifiers[agent.initial_state()]
+
+    messages = ["hi", "see you later", "unknown words", "good morning"]
+    batched = classifier.predict_batch(messages)
+    assert len(batched) == len(messages)
+    for message, predictions in zip(messages, batched):
+        single = classifier.predict(message)
+        assert [p.intent.name for p in predictions] == [p.intent.name for p in single]
+        assert [p.score for p in predictions] == pytest.approx([p.score for p in single], abs=1e-6)
+
+
 def test_session_reply_drives_platform_after_body_execution(fake_platform):
     """Execute a State body manually; the reply should land on the platform."""
     agent = Agent("body_agent")